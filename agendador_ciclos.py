@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AGENDADOR DOS CICLOS 00Z E 12Z COM SOBREPOSIÇÃO ENTRE CICLOS - UFSC
+
+O executar_tudo.sh roda um ciclo 00Z por dia, do download à publicação, e o
+ciclo seguinte só começa quando ele termina. Este agendador trata os ciclos
+como um pipeline:
+1. Um ciclo (00Z, 12Z) fica devido quando o ICON dele já deve estar no servidor
+   do DWD (hora do ciclo + --atraso-horas) e ainda está na janela em que o DWD
+   o mantém (--janela-horas). Ciclos já publicados no WEB_ROOT contam como feitos.
+2. Cada ciclo roda num executar_pipeline.py próprio, em segundo plano. Até
+   --max-ciclos ciclos ficam em andamento ao mesmo tempo, e um ciclo novo só
+   começa quando o anterior terminou a aquisição (etapa 'icon'): o ciclo N+1
+   baixa o ICON e roda o WRF enquanto o ciclo N plota e publica.
+3. Os núcleos são divididos pelo registro de reservas (reservas_cpu.py): o WRF
+   reserva os slots do mpirun, e as etapas de pós-processamento só usam os
+   núcleos que sobram, então a plotagem de um ciclo não disputa CPU com o
+   wrf.exe do outro, e dois wrf.exe nunca dividem os mesmos núcleos.
+4. O estado de cada ciclo (em andamento, concluído, falhou) fica em
+   $WORK_DIR/agendador.json. Um ciclo interrompido (queda da máquina) é
+   relançado e o executar_pipeline.py retoma da primeira etapa incompleta; um
+   ciclo que falhou é tentado de novo até --tentativas vezes.
+
+Uso:
+    ./agendador_ciclos.py executar [--ciclos 00,12] [--max-ciclos 2] [--continuo]   (no cron, a cada hora)
+    ./agendador_ciclos.py estado
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import argparse
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+WEB_ROOT = os.environ.get("WEB_ROOT", "/var/www/html")
+SCRIPTS_DIR = os.environ.get("SCRIPTS_DIR", os.path.dirname(os.path.abspath(__file__)))
+ESTADO_FILENAME = "agendador.json"
+CACHE_FILENAME = ".cache_etapas.json"
+CICLOS_PADRAO = "00,12"
+ATRASO_HORAS = 4          # o ICON global leva ~3h30 para estar completo no opendata.dwd.de
+JANELA_HORAS = 24         # o DWD mantém só as últimas ~24 h de rodadas
+MAX_CICLOS = 2
+TENTATIVAS = 3
+ESPERA_RETENTATIVA_MIN = 30
+INTERVALO_CONTINUO_S = 300
+EM_ANDAMENTO, CONCLUIDA, FALHOU = "em_andamento", "concluida", "falhou"
+
+# ==============================================================================
+# SEÇÃO 1: ESTADO DOS CICLOS
+# ==============================================================================
+
+@contextmanager
+def _estado():
+    """Lê o estado sob trava exclusiva (a passada do cron e os ciclos o atualizam) e o grava ao sair."""
+    os.makedirs(WORK_DIR, exist_ok=True)
+    path = os.path.join(WORK_DIR, ESTADO_FILENAME)
+    with open(path + ".trava", 'w') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    estado = json.load(f)
+            except (IOError, ValueError):
+                estado = {}
+            yield estado
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(estado, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+def agora():
+    return datetime.now(timezone.utc)
+
+def _ciclo_vivo(registro, date_arg):
+    """O processo do ciclo ainda roda? Confere a linha de comando para não confundir um pid reaproveitado."""
+    try:
+        with open(f"/proc/{registro['pid']}/cmdline", 'rb') as f:
+            cmdline = f.read().decode(errors="replace")
+    except (IOError, KeyError):
+        return False
+    return "agendador_ciclos" in cmdline and date_arg in cmdline
+
+def aquisicao_concluida(date_arg):
+    """A etapa 'icon' do ciclo já terminou (está no cache do executar_pipeline.py)."""
+    try:
+        with open(os.path.join(WORK_DIR, date_arg, CACHE_FILENAME), 'r', encoding='utf-8') as f:
+            return "icon" in json.load(f).get("etapas", {})
+    except (IOError, ValueError):
+        return False
+
+def publicado(date_arg):
+    return os.path.isfile(os.path.join(WEB_ROOT, date_arg, "data.js"))
+
+# ==============================================================================
+# SEÇÃO 2: CICLOS DEVIDOS E LANÇAMENTO
+# ==============================================================================
+
+def ciclos_devidos(ciclos, atraso_horas, janela_horas, referencia):
+    """Ciclos (YYYYMMDDHH, do mais antigo ao mais novo) já disponíveis no DWD e ainda na janela."""
+    devidos = []
+    inicio = referencia - timedelta(hours=janela_horas + atraso_horas)
+    dia = inicio.replace(hour=0, minute=0, second=0, microsecond=0)
+    while dia <= referencia:
+        for hora in ciclos:
+            ciclo = dia.replace(hour=hora)
+            if inicio <= ciclo and ciclo + timedelta(hours=atraso_horas) <= referencia:
+                devidos.append(ciclo.strftime("%Y%m%d%H"))
+        dia += timedelta(days=1)
+    return devidos
+
+def lancar(date_arg, extras):
+    """Inicia o ciclo em segundo plano (sessão própria, sobrevive ao fim da passada do cron)."""
+    log_dir = os.path.join(WORK_DIR, date_arg, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    comando = [sys.executable or "python3", os.path.abspath(__file__), "ciclo", date_arg] + extras
+    with open(os.path.join(log_dir, "agendador.log"), 'a', encoding='utf-8') as log:
+        processo = subprocess.Popen(comando, stdout=log, stderr=subprocess.STDOUT,
+                                    stdin=subprocess.DEVNULL, start_new_session=True)
+    return processo.pid
+
+def passada(args):
+    """Atualiza o estado dos ciclos e lança os devidos que cabem no pipeline. Retorna os lançados."""
+    ciclos = sorted(int(c) for c in args.ciclos.split(",") if c)
+    devidos = ciclos_devidos(ciclos, args.atraso_horas, args.janela_horas, agora())
+    extras = ["--pular", args.pular] if args.pular else []
+    pulados = set(args.pular.split(","))
+    lancados = []
+    with _estado() as estado:
+        # Ciclos em andamento cujo processo sumiu (queda da máquina): voltam a ser pendentes
+        for date_arg, registro in estado.items():
+            if registro["estado"] == EM_ANDAMENTO and not _ciclo_vivo(registro, date_arg):
+                print(f"⚠️ Ciclo {date_arg} interrompido (pid {registro.get('pid')} não existe mais).")
+                registro.update({"estado": FALHOU, "interrompido": True, "fim": agora().isoformat(timespec="seconds")})
+        em_andamento = sorted(d for d, r in estado.items() if r["estado"] == EM_ANDAMENTO)
+
+        for date_arg in devidos:
+            registro = estado.get(date_arg)
+            if registro is None and publicado(date_arg):
+                estado[date_arg] = {"estado": CONCLUIDA, "tentativas": 0, "fim": agora().isoformat(timespec="seconds")}
+                continue
+            if registro and registro["estado"] in (CONCLUIDA, EM_ANDAMENTO):
+                continue
+            if registro and registro["estado"] == FALHOU:
+                if registro["tentativas"] >= args.tentativas:
+                    continue
+                # Um ciclo interrompido é retomado já; um que falhou espera (ex.: ICON ainda incompleto)
+                fim = datetime.fromisoformat(registro["fim"])
+                if not registro.get("interrompido") and agora() - fim < timedelta(minutes=args.espera_retentativa):
+                    continue
+            if len(em_andamento) >= args.max_ciclos:
+                print(f"⏸️  Ciclo {date_arg} aguardando: {len(em_andamento)} ciclo(s) em andamento ({', '.join(em_andamento)}).")
+                break
+            # Uma aquisição por vez: o ciclo novo entra quando o anterior já está no WRF ou depois
+            adquirindo = [d for d in em_andamento if not aquisicao_concluida(d)] if "icon" not in pulados else []
+            if adquirindo:
+                print(f"⏸️  Ciclo {date_arg} aguardando a aquisição do ICON de {', '.join(adquirindo)}.")
+                break
+            pid = lancar(date_arg, extras)
+            estado[date_arg] = {
+                "estado": EM_ANDAMENTO, "pid": pid,
+                "tentativas": (registro or {}).get("tentativas", 0) + 1,
+                "inicio": agora().isoformat(timespec="seconds"),
+            }
+            em_andamento.append(date_arg)
+            lancados.append(date_arg)
+            print(f"▶️  Ciclo {date_arg} iniciado (pid {pid}, tentativa {estado[date_arg]['tentativas']}). "
+                  f"Log: {os.path.join(WORK_DIR, date_arg, 'logs', 'agendador.log')}")
+    return lancados
+
+# ==============================================================================
+# SEÇÃO 3: SUBCOMANDOS
+# ==============================================================================
+
+def executar(args):
+    """Uma passada (cron) ou, com --continuo, uma passada a cada --intervalo segundos."""
+    print("=" * 50)
+    print(f"AGENDADOR DE CICLOS ({args.ciclos}Z) - {agora().strftime('%Y-%m-%d %H:%M')} UTC")
+    print("=" * 50)
+    while True:
+        lancados = passada(args)
+        if not lancados:
+            print("✔️ Nenhum ciclo novo para iniciar.")
+        if not args.continuo:
+            return 0
+        time.sleep(args.intervalo)
+
+def ciclo(args):
+    """Roda o executar_pipeline.py de um ciclo e registra o resultado no estado."""
+    comando = [sys.executable or "python3", os.path.join(os.path.dirname(os.path.abspath(__file__)), "executar_pipeline.py"),
+               "--date", args.date, "--scripts-dir", SCRIPTS_DIR]
+    if args.pular:
+        comando += ["--pular", args.pular]
+    print(f"[{agora().isoformat(timespec='seconds')}] {' '.join(comando)}", flush=True)
+    retorno = subprocess.call(comando)
+    with _estado() as estado:
+        registro = estado.setdefault(args.date, {"tentativas": 1})
+        registro.update({"estado": CONCLUIDA if retorno == 0 else FALHOU, "codigo": retorno,
+                         "fim": agora().isoformat(timespec="seconds")})
+        registro.pop("pid", None)
+        registro.pop("interrompido", None)
+    print(f"[{agora().isoformat(timespec='seconds')}] ciclo {args.date}: código {retorno}", flush=True)
+    return retorno
+
+def mostrar_estado(args):
+    """Lista o estado de cada ciclo conhecido."""
+    with _estado() as estado:
+        itens = sorted(estado.items())
+    if not itens:
+        print("Nenhum ciclo registrado.")
+    for date_arg, r in itens:
+        etapa = "aquisição" if r["estado"] == EM_ANDAMENTO and not aquisicao_concluida(date_arg) else ""
+        print(f"  {date_arg}  {r['estado']:<13} tentativas {r.get('tentativas', 0)}  "
+              f"início {r.get('inicio', '-'):<25} fim {r.get('fim', '-'):<25} {etapa}")
+    return 0
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Interpreta o subcomando e o executa."""
+    parser = argparse.ArgumentParser(description="Agenda os ciclos 00Z/12Z sobrepondo pós-processamento e aquisição.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("executar", help="Lança os ciclos devidos (uma passada, ou contínuo).")
+    p.add_argument("--ciclos", default=CICLOS_PADRAO, help="Horas dos ciclos (UTC), separadas por vírgula.")
+    p.add_argument("--atraso-horas", type=float, default=ATRASO_HORAS, help="Horas até o ICON do ciclo estar no DWD.")
+    p.add_argument("--janela-horas", type=float, default=JANELA_HORAS, help="Ciclos mais antigos que isso não são mais buscados.")
+    p.add_argument("--max-ciclos", type=int, default=MAX_CICLOS, help="Ciclos em andamento ao mesmo tempo.")
+    p.add_argument("--tentativas", type=int, default=TENTATIVAS)
+    p.add_argument("--espera-retentativa", type=float, default=ESPERA_RETENTATIVA_MIN, help="Minutos antes de tentar de novo um ciclo que falhou.")
+    p.add_argument("--pular", default="", help="Etapas repassadas ao executar_pipeline.py --pular.")
+    p.add_argument("--continuo", action="store_true", help="Não sai: repete a passada a cada --intervalo segundos.")
+    p.add_argument("--intervalo", type=float, default=INTERVALO_CONTINUO_S)
+    p.set_defaults(funcao=executar)
+
+    p = sub.add_parser("ciclo", help="(interno) Roda um ciclo e registra o resultado.")
+    p.add_argument("date", help="Ciclo (YYYYMMDDHH).")
+    p.add_argument("--pular", default="")
+    p.set_defaults(funcao=ciclo)
+
+    p = sub.add_parser("estado", help="Mostra o estado dos ciclos.")
+    p.set_defaults(funcao=mostrar_estado)
+
+    args = parser.parse_args()
+    sys.exit(args.funcao(args))
+
+if __name__ == "__main__":
+    main()
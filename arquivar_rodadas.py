@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ARQUIVAMENTO DE RODADAS ANTIGAS EM PACOTES INDEXADOS - UFSC
+
+Cada rodada publicada em /var/www/html tem milhares de PNGs pequenos, o que
+consome inodes e deixa lentas as varreduras do orquestrador e do lftp mirror.
+Este script compacta as rodadas com mais de N dias:
+1. Empacota d0*/<variavel>/*.png em um único quadros.zip SEM compressão
+   (PNG já é comprimido), de modo que cada quadro ocupa um trecho contíguo do arquivo.
+2. Confere o pacote (CRC de todos os membros e contagem de arquivos).
+3. Regenera o data.js da rodada com o índice de bytes (offset, tamanho) de cada
+   quadro; o visualizador passa a buscar os quadros com requisições HTTP Range.
+4. Remove os diretórios d0* originais e marca a rodada como arquivada no catálogo
+   SQLite, de onde também saem as rodadas candidatas (sem listar o WEB_ROOT).
+
+Uso:
+    ./arquivar_rodadas.py [--dias 30] [--rodada YYYYMMDDHH] [--excluir YYYYMMDDHH] [--simular]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import shutil
+import zipfile
+import argparse
+from datetime import date, timedelta
+
+import orquestrador_web
+import catalogo_quadros
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WEB_ROOT = orquestrador_web.WEB_ROOT
+DIAS_PADRAO = 30
+
+def arquivos_da_rodada(forecast_dir):
+    """
+    Lista (caminho absoluto, caminho no pacote) de todos os arquivos sob d0*/ da rodada.
+    O pacote leva o que está no disco, não o catálogo, porque os d0* são removidos em seguida.
+    """
+    arquivos = []
+    for domain in sorted(os.listdir(forecast_dir)):
+        domain_path = os.path.join(forecast_dir, domain)
+        if not (domain.startswith('d0') and os.path.isdir(domain_path)):
+            continue
+        for raiz, _, nomes in os.walk(domain_path):
+            for nome in sorted(nomes):
+                caminho = os.path.join(raiz, nome)
+                arquivos.append((caminho, os.path.relpath(caminho, forecast_dir).replace(os.sep, '/')))
+    return arquivos
+
+def empacotar(forecast_dir, arquivos):
+    """Grava o pacote via arquivo temporário e só o coloca no lugar depois de conferido."""
+    pacote_path = os.path.join(forecast_dir, orquestrador_web.PACOTE_QUADROS)
+    tmp_path = pacote_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as pacote:
+        for caminho, nome in arquivos:
+            pacote.write(caminho, nome)
+    with zipfile.ZipFile(tmp_path) as pacote:
+        corrompido = pacote.testzip()
+        total = len(pacote.infolist())
+    if corrompido or total != len(arquivos):
+        os.remove(tmp_path)
+        raise IOError(f"pacote inválido (membro corrompido: {corrompido}, {total}/{len(arquivos)} arquivos)")
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, pacote_path)
+    return pacote_path
+
+def remover_originais(forecast_dir):
+    """Remove os diretórios d0* que já estão no pacote."""
+    for domain in os.listdir(forecast_dir):
+        domain_path = os.path.join(forecast_dir, domain)
+        if domain.startswith('d0') and os.path.isdir(domain_path):
+            shutil.rmtree(domain_path)
+
+def arquivar_rodada(forecast_dir, simular=False):
+    """Arquiva uma rodada. Retorna (arquivos removidos, bytes empacotados) ou None se não havia o que arquivar."""
+    arquivos = arquivos_da_rodada(forecast_dir)
+    if not arquivos:
+        # Execução interrompida depois de remover os originais: só falta o catálogo
+        if not simular and os.path.isfile(os.path.join(forecast_dir, orquestrador_web.PACOTE_QUADROS)):
+            catalogo_quadros.marcar_arquivada(*orquestrador_web.raiz_e_rodada(forecast_dir))
+        return None
+    tamanho = sum(os.path.getsize(c) for c, _ in arquivos)
+    if simular:
+        return len(arquivos), tamanho
+    pacote_path = os.path.join(forecast_dir, orquestrador_web.PACOTE_QUADROS)
+    # Um pacote já existente com os d0* ainda presentes é uma execução interrompida
+    # depois do empacotamento: basta regenerar o data.js e remover os originais.
+    if not os.path.isfile(pacote_path):
+        empacotar(forecast_dir, arquivos)
+    orquestrador_web.generate_forecast_viewer(forecast_dir)
+    remover_originais(forecast_dir)
+    catalogo_quadros.marcar_arquivada(*orquestrador_web.raiz_e_rodada(forecast_dir))
+    return len(arquivos), tamanho
+
+def rodadas_para_arquivar(root_path, dias):
+    """Rodadas publicadas e ainda não arquivadas com data anterior a hoje - N dias (consulta ao catálogo)."""
+    limite = (date.today() - timedelta(days=dias)).strftime("%Y%m%d")
+    return [d for d in catalogo_quadros.rodadas(root_path, arquivada=False) if d[:8] < limite]
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Arquiva as rodadas antigas (ou uma rodada específica) e reporta a redução de arquivos."""
+    parser = argparse.ArgumentParser(description="Compacta rodadas antigas em pacotes zip indexados.")
+    parser.add_argument("--dias", type=int, default=DIAS_PADRAO, help="Arquiva rodadas com mais de N dias.")
+    parser.add_argument("--rodada", help="Arquiva apenas esta rodada (YYYYMMDDHH), independente da idade.")
+    parser.add_argument("--excluir", help="Nunca arquiva esta rodada (a rodada em andamento).")
+    parser.add_argument("--web-root", default=WEB_ROOT)
+    parser.add_argument("--simular", action="store_true", help="Só mostra o que seria arquivado.")
+    args = parser.parse_args()
+
+    print("="*50)
+    print("ARQUIVAMENTO DE RODADAS ANTIGAS")
+    print("="*50)
+    dir_names = [args.rodada] if args.rodada else rodadas_para_arquivar(args.web_root, args.dias)
+    dir_names = [d for d in dir_names if d != args.excluir]
+    total_arquivos, total_bytes, rodadas, falhas = 0, 0, 0, 0
+    for dir_name in dir_names:
+        forecast_dir = os.path.join(args.web_root, dir_name)
+        if not os.path.isdir(forecast_dir):
+            print(f"⚠️ Rodada '{dir_name}' não encontrada.")
+            continue
+        try:
+            resultado = arquivar_rodada(forecast_dir, args.simular)
+        except (IOError, OSError, zipfile.BadZipFile) as e:
+            print(f"❌ ERRO ao arquivar {dir_name}: {e}")
+            falhas += 1
+            continue
+        if resultado is None:
+            continue
+        arquivos, tamanho = resultado
+        rodadas += 1
+        total_arquivos += arquivos
+        total_bytes += tamanho
+        print(f"✅ {dir_name}: {arquivos} arquivos ({tamanho / 1e6:.1f} MB) -> 1 pacote")
+
+    acao = "seriam arquivadas" if args.simular else "arquivadas"
+    print(f"\n{rodadas} rodada(s) {acao}: {total_arquivos} arquivos substituídos por {rodadas} pacote(s), "
+          f"{total_bytes / 1e6:.1f} MB.")
+    if falhas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AJUSTE AUTOMÁTICO DA DECOMPOSIÇÃO MPI E DOS NÚCLEOS DO WRF - UFSC
+
+O rodar_wps_wrf.sh usava sempre 6 processos MPI e a decomposição padrão do WRF.
+Este script mede combinações em uma integração curta e guarda a melhor:
+1. Os candidatos combinam -np, nproc_x/nproc_y (todas as fatorações de -np,
+   mais a automática -1/-1), numtiles e OMP_NUM_THREADS, descartando os que
+   passam do número de núcleos ou deixam patches com menos de PATCH_MINIMO pontos.
+2. Cada candidato roda o wrf.exe de uma rodada já preparada pelo real.exe
+   (wrfinput/wrfbdy) em um diretório próprio, com run_minutes reduzido.
+3. O custo é lido das linhas "Timing for main" do rsl.error.0000: a soma dos
+   tempos de todos os domínios por passo do d01, sem os primeiros passos
+   (inicialização).
+4. A melhor combinação é gravada no perfil ($WORK_DIR/perfil_wrf.json) sob a
+   chave da configuração dos domínios (hash de &domains, &physics e &dynamics,
+   sem os campos de decomposição). O rodar_wps_wrf.sh a aplica com --aplicar.
+
+Uso:
+    ./autotune_wrf.py YYYYMMDDHH [--nucleos 4,6,8,12] [--tiles 1,2] [--omp 1] [--minutos 30]
+    ./autotune_wrf.py --aplicar namelist.input     (imprime "np omp" e ajusta o namelist)
+    ./autotune_wrf.py --listar
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+PERFIL_WRF = os.environ.get("PERFIL_WRF", os.path.join(WORK_DIR, "perfil_wrf.json"))
+AUTOTUNE_DIR = "autotune"
+SECOES_CHAVE = ("domains", "physics", "dynamics")
+CAMPOS_DECOMPOSICAO = {"nproc_x", "nproc_y", "numtiles"}
+PATCH_MINIMO = 10
+PADRAO_TEMPO = re.compile(r"Timing for main: time (\S+) on domain\s+(\d+):\s+([\d.]+) elapsed seconds")
+
+# ==============================================================================
+# SEÇÃO 1: NAMELIST
+# ==============================================================================
+
+def ler_namelist(texto):
+    """{seção: {chave: [valores]}} de um namelist do WRF (leitura simples, uma entrada por linha)."""
+    secoes, atual = {}, None
+    for linha in texto.splitlines():
+        linha = linha.split("!", 1)[0].strip()
+        if linha.startswith("&"):
+            atual = secoes.setdefault(linha[1:].strip().lower(), {})
+        elif linha == "/":
+            atual = None
+        elif atual is not None and "=" in linha:
+            chave, valor = linha.split("=", 1)
+            valores = [v.strip().strip("'\"") for v in valor.split(",") if v.strip()]
+            atual[chave.strip().lower()] = valores
+    return secoes
+
+def chave_dominios(secoes):
+    """Hash da configuração que determina o custo por passo (sem datas nem decomposição)."""
+    normalizado = {s: {k: v for k, v in sorted(secoes.get(s, {}).items()) if k not in CAMPOS_DECOMPOSICAO}
+                   for s in SECOES_CHAVE}
+    return hashlib.sha256(json.dumps(normalizado, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+
+def definir_no_namelist(texto, secao, valores):
+    """Substitui (ou insere logo após '&secao') as entradas 'chave = valor' da seção."""
+    linhas = texto.splitlines()
+    inicio = next((i for i, l in enumerate(linhas) if l.strip().lower() == f"&{secao}"), None)
+    if inicio is None:
+        linhas += [f" &{secao}", " /"]
+        inicio = len(linhas) - 2
+    fim = next(i for i in range(inicio + 1, len(linhas)) if linhas[i].strip() == "/")
+    for chave, valor in valores.items():
+        nova = f" {chave:<36}= {valor},"
+        existente = next((i for i in range(inicio + 1, fim)
+                          if linhas[i].split("=", 1)[0].strip().lower() == chave), None)
+        if existente is None:
+            linhas.insert(inicio + 1, nova)
+            fim += 1
+        else:
+            linhas[existente] = nova
+    return "\n".join(linhas) + "\n"
+
+# ==============================================================================
+# SEÇÃO 2: CANDIDATOS E MEDIÇÃO
+# ==============================================================================
+
+def fatoracoes(n):
+    return [(x, n // x) for x in range(1, n + 1) if n % x == 0]
+
+def gerar_candidatos(secoes, nucleos, tiles, omp, max_nucleos):
+    """Combinações (np, nproc_x, nproc_y, numtiles, omp) viáveis para os domínios do namelist."""
+    dominios = secoes.get("domains", {})
+    max_dom = int(dominios.get("max_dom", ["1"])[0])
+    e_we = [int(v) for v in dominios.get("e_we", [])[:max_dom]]
+    e_sn = [int(v) for v in dominios.get("e_sn", [])[:max_dom]]
+    candidatos = []
+    for np_ in nucleos:
+        for threads in omp:
+            if np_ * threads > max_nucleos:
+                continue
+            for nx, ny in [(-1, -1)] + fatoracoes(np_):
+                if nx > 0 and any(we // nx < PATCH_MINIMO or sn // ny < PATCH_MINIMO for we, sn in zip(e_we, e_sn)):
+                    continue
+                for nt in tiles:
+                    candidatos.append({"np": np_, "nproc_x": nx, "nproc_y": ny, "numtiles": nt, "omp": threads})
+    return candidatos
+
+def custo_por_passo(rsl_path, descartar):
+    """Segundos por passo do d01 (somando os domínios aninhados) e número de passos medidos."""
+    por_dominio = {}
+    with open(rsl_path, errors="replace") as f:
+        for linha in f:
+            m = PADRAO_TEMPO.search(linha)
+            if m:
+                por_dominio.setdefault(int(m.group(2)), []).append(float(m.group(3)))
+    passos_d01 = len(por_dominio.get(1, [])) - descartar
+    if passos_d01 <= 0:
+        return None, 0
+    total = 0.0
+    for dominio, tempos in por_dominio.items():
+        # Os domínios aninhados dão mais passos por passo do d01; descarta a mesma fração inicial
+        n = max(0, round(descartar * len(tempos) / len(por_dominio[1])))
+        total += sum(tempos[n:])
+    return total / passos_d01, passos_d01
+
+def nome_candidato(c):
+    return f"np{c['np']}_x{c['nproc_x']}_y{c['nproc_y']}_t{c['numtiles']}_omp{c['omp']}"
+
+def medir(candidato, run_dir, namelist, minutos, descartar, tempo_limite, manter):
+    """Roda o wrf.exe com o candidato em um diretório de rascunho e devolve o resultado."""
+    nome = nome_candidato(candidato)
+    trabalho = os.path.join(run_dir, AUTOTUNE_DIR, nome)
+    shutil.rmtree(trabalho, ignore_errors=True)
+    os.makedirs(trabalho)
+    for arquivo in os.listdir(run_dir):
+        if arquivo == AUTOTUNE_DIR or arquivo == "namelist.input" or arquivo.startswith(("rsl.", "wrfout_", "wrfrst_")):
+            continue
+        os.symlink(os.path.join(run_dir, arquivo), os.path.join(trabalho, arquivo))
+    texto = definir_no_namelist(namelist, "time_control", {
+        "run_days": 0, "run_hours": 0, "run_minutes": minutos, "run_seconds": 0,
+        "history_interval": minutos * 10, "restart": ".false."})
+    texto = definir_no_namelist(texto, "domains", {
+        "nproc_x": candidato["nproc_x"], "nproc_y": candidato["nproc_y"], "numtiles": candidato["numtiles"]})
+    with open(os.path.join(trabalho, "namelist.input"), "w") as f:
+        f.write(texto)
+
+    env = dict(os.environ, OMP_NUM_THREADS=str(candidato["omp"]))
+    t0 = time.perf_counter()
+    try:
+        with open(os.path.join(trabalho, "autotune.log"), "w") as log:
+            retorno = subprocess.call(["mpirun", "-np", str(candidato["np"]), "./wrf.exe"], cwd=trabalho,
+                                      stdout=log, stderr=subprocess.STDOUT, env=env, timeout=tempo_limite)
+    except subprocess.TimeoutExpired:
+        retorno = "tempo esgotado"
+    parede = time.perf_counter() - t0
+    rsl = os.path.join(trabalho, "rsl.error.0000")
+    custo, passos = custo_por_passo(rsl, descartar) if os.path.exists(rsl) else (None, 0)
+    resultado = dict(candidato, nome=nome, segundos_por_passo=custo, passos=passos,
+                     parede_s=round(parede, 2), ok=(retorno == 0 and custo is not None))
+    if not resultado["ok"]:
+        resultado["erro"] = f"retorno {retorno}" if custo is not None else f"retorno {retorno}, sem tempos no rsl"
+    if not manter:
+        shutil.rmtree(trabalho, ignore_errors=True)
+    return resultado
+
+# ==============================================================================
+# SEÇÃO 3: PERFIL
+# ==============================================================================
+
+def carregar_perfil(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def salvar_perfil(path, perfil):
+    """Grava o perfil de forma atômica."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(perfil, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    os.chmod(path, 0o644)
+
+def aplicar(namelist_path, perfil_path):
+    """Ajusta o namelist com a melhor combinação do perfil e imprime 'np omp'. Retorna o código de saída."""
+    with open(namelist_path) as f:
+        texto = f.read()
+    melhor = carregar_perfil(perfil_path).get(chave_dominios(ler_namelist(texto)), {}).get("melhor")
+    if not melhor:
+        print(f"Sem perfil para estes domínios em {perfil_path}.", file=sys.stderr)
+        return 1
+    texto = definir_no_namelist(texto, "domains", {k: melhor[k] for k in ("nproc_x", "nproc_y", "numtiles")})
+    with open(namelist_path, "w") as f:
+        f.write(texto)
+    print(melhor["np"], melhor["omp"])
+    return 0
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Mede as combinações candidatas e grava a melhor no perfil."""
+    parser = argparse.ArgumentParser(description="Ajusta -np, nproc_x/nproc_y, numtiles e OpenMP do WRF.")
+    parser.add_argument("date", nargs="?", help="Rodada já preparada pelo real.exe (YYYYMMDDHH).")
+    parser.add_argument("--nucleos", default="4,6,8,12,16", help="Valores de -np a testar.")
+    parser.add_argument("--tiles", default="1", help="Valores de numtiles a testar.")
+    parser.add_argument("--omp", default="1", help="Valores de OMP_NUM_THREADS (só para executáveis híbridos).")
+    parser.add_argument("--max-nucleos", type=int, default=os.cpu_count() or 1,
+                        help="Limite de np x omp (padrão: núcleos da máquina).")
+    parser.add_argument("--minutos", type=int, default=30, help="Duração da integração curta (minutos simulados).")
+    parser.add_argument("--descartar", type=int, default=2, help="Passos iniciais do d01 ignorados na medição.")
+    parser.add_argument("--tempo-limite", type=int, default=1800, help="Limite por candidato, em segundos.")
+    parser.add_argument("--perfil", default=PERFIL_WRF)
+    parser.add_argument("--manter", action="store_true", help="Mantém os diretórios de cada candidato.")
+    parser.add_argument("--aplicar", metavar="NAMELIST", help="Aplica o perfil ao namelist.input dado.")
+    parser.add_argument("--listar", action="store_true", help="Mostra o perfil gravado.")
+    args = parser.parse_args()
+
+    if args.aplicar:
+        sys.exit(aplicar(args.aplicar, args.perfil))
+    if args.listar:
+        for chave, registro in carregar_perfil(args.perfil).items():
+            m = registro["melhor"]
+            print(f"  {chave}: {nome_candidato(m)} ({m['segundos_por_passo']:.3f} s/passo, {registro['data']})")
+        return
+    if not args.date:
+        parser.error("informe a rodada (YYYYMMDDHH), --aplicar ou --listar")
+
+    print("="*50)
+    print(f"AJUSTE DA DECOMPOSIÇÃO DO WRF: {args.date}")
+    print("="*50)
+    run_dir = os.path.join(WORK_DIR, args.date, "WRF_RUN", "run_wrf")
+    faltando = [a for a in ("namelist.input", "wrf.exe", "wrfinput_d01", "wrfbdy_d01")
+                if not os.path.exists(os.path.join(run_dir, a))]
+    if faltando:
+        print(f"❌ ERRO: {', '.join(faltando)} ausente(s) em {run_dir}. Rode o real.exe antes.")
+        sys.exit(1)
+    with open(os.path.join(run_dir, "namelist.input")) as f:
+        namelist = f.read()
+    secoes = ler_namelist(namelist)
+    chave = chave_dominios(secoes)
+    inteiros = lambda s: [int(v) for v in s.split(",") if v.strip()]
+    candidatos = gerar_candidatos(secoes, inteiros(args.nucleos), inteiros(args.tiles), inteiros(args.omp),
+                                  args.max_nucleos)
+    if not candidatos:
+        print(f"❌ ERRO: nenhum candidato cabe em {args.max_nucleos} núcleos.")
+        sys.exit(1)
+    print(f"Domínios {chave}: {len(candidatos)} candidatos, {args.minutos} min simulados cada.")
+
+    resultados = []
+    for i, candidato in enumerate(candidatos, 1):
+        r = medir(candidato, run_dir, namelist, args.minutos, args.descartar, args.tempo_limite, args.manter)
+        resultados.append(r)
+        if r["ok"]:
+            print(f"  ✅ [{i}/{len(candidatos)}] {r['nome']:<28} {r['segundos_por_passo']:8.3f} s/passo "
+                  f"({r['passos']} passos, {r['parede_s']:.0f}s)")
+        else:
+            print(f"  ❌ [{i}/{len(candidatos)}] {r['nome']:<28} {r['erro']}")
+    validos = sorted((r for r in resultados if r["ok"]), key=lambda r: r["segundos_por_passo"])
+    if not validos:
+        print("❌ ERRO: nenhum candidato terminou. Veja os rsl.error.* com --manter.")
+        sys.exit(1)
+
+    melhor = validos[0]
+    perfil = carregar_perfil(args.perfil)
+    perfil[chave] = {
+        "data": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "rodada": args.date,
+        "melhor": {k: melhor[k] for k in ("np", "nproc_x", "nproc_y", "numtiles", "omp", "segundos_por_passo")},
+        "resultados": resultados,
+    }
+    salvar_perfil(args.perfil, perfil)
+    padrao = next((r for r in validos if r["nproc_x"] == -1 and r["numtiles"] == 1 and r["omp"] == 1
+                   and r["np"] == 6), None)
+    print(f"\n✅ Melhor: {melhor['nome']} ({melhor['segundos_por_passo']:.3f} s/passo)"
+          + (f", {padrao['segundos_por_passo'] / melhor['segundos_por_passo']:.2f}x mais rápido que -np 6 padrão"
+             if padrao else ""))
+    print(f"   Perfil gravado em {args.perfil}")
+
+if __name__ == "__main__":
+    main()
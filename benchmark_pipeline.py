@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+BENCHMARK PONTA A PONTA DA CADEIA DIÁRIA COM EXECUTÁVEIS STUB - UFSC
+
+Roda os scripts reais da cadeia (trazer_icon_sul_br.sh, rodar_wps_wrf.sh,
+plotar_rodadas_diaria.sh, orquestrador_web.py, sync_html.sh) em uma máquina
+Linux comum, sem rede e sem o modelo:
+- aria2c, cdo, grib_copy, parallel, ncdump, wrfplot, mpirun e lftp vêm de stubs/bin;
+- geogrid/ungrib/metgrid vêm de stubs/wps e real/wrf de stubs/wrf/main;
+- o servidor remoto do sync é um diretório local (STUB_REMOTE_DIR).
+Cada stub tem atraso configurável e registra quando rodou, o que permite medir
+o overhead de orquestração, o volume de E/S e o paralelismo efetivo de cada modo:
+- linear: os scripts em sequência, como o executar_tudo.sh original;
+- dag:    o executar_pipeline.py (grafo de etapas com cache e paralelismo).
+Cada modo é executado duas vezes na mesma sandbox (rodada nova e reexecução).
+
+Uso:
+    ./benchmark_pipeline.py [--modos linear,dag] [--atrasos wrf=3,ungrib=1,wrfplot=0.2]
+                            [--horas 37] [--saida resultados.json]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+from datetime import datetime
+
+import rastreamento
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STUBS_DIR = os.path.join(SCRIPTS_DIR, "stubs")
+DATA_PADRAO = "2025072000"
+ATRASOS_PADRAO = "aria2c=0.5,cdo=0.02,ungrib=0.5,metgrid=0.5,real=0.5,wrf=2,wrfplot=0.05,lftp=0.2"
+VARIAVEIS_ICON = ["T", "U", "V", "RELHUM", "FI"]
+NIVEIS_ICON = [1000, 850, 500, 250]
+TMPFS_DIR = "/dev/shm"
+STAGING_LIMITE_GB = "1"
+NUCLEOS_SANDBOX = "64"
+ETAPAS_LINEARES = [
+    ["trazer_icon_sul_br.sh", "{date}"],
+    ["rodar_wps_wrf.sh", "{date}"],
+    ["plotar_rodadas_diaria.sh", "{date}"],
+    ["orquestrador_web.py", "--rodada", "{date}"],
+    ["sync_html.sh"],
+]
+
+# ==============================================================================
+# SEÇÃO 1: PREPARAÇÃO DA SANDBOX
+# ==============================================================================
+
+def gerar_urls(path, date_arg, horas):
+    """Gera um urls.txt no formato do gerar_urls_icon.sh, com um subconjunto de campos."""
+    base = "https://opendata.dwd.de/weather/nwp/icon/grib/00"
+    with open(path, "w") as f:
+        f.write(f"{base}/hsurf/icon_global_icosahedral_time-invariant_{date_arg}_HSURF.grib2.bz2\n")
+        for h in range(horas):
+            for var in VARIAVEIS_ICON:
+                for nivel in NIVEIS_ICON:
+                    f.write(f"{base}/{var.lower()}/icon_global_icosahedral_pressure-level_{date_arg}_{h:03d}_{nivel}_{var}.grib2.bz2\n")
+            for var in ("T_2M", "U_10M", "V_10M", "PS", "PMSL"):
+                f.write(f"{base}/{var.lower()}/icon_global_icosahedral_single-level_{date_arg}_{h:03d}_{var}.grib2.bz2\n")
+
+def preparar_sandbox(base, date_arg, horas):
+    """Cria os diretórios de trabalho, o template e a instalação conda falsa."""
+    dirs = {
+        "work": os.path.join(base, "trabalho"),
+        "web": os.path.join(base, "www"),
+        "remoto": os.path.join(base, "remoto"),
+        "conda": os.path.join(base, "conda"),
+        "geog": os.path.join(base, "geog"),
+        # Staging dos intermediários do ICON: em tmpfs quando existe, como em produção
+        "staging": (os.path.join(TMPFS_DIR, f"bench_staging_{os.getpid()}_{os.path.basename(base)}")
+                    if os.path.isdir(TMPFS_DIR) else os.path.join(base, "staging")),
+    }
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+    template = os.path.join(dirs["work"], "template")
+    shutil.copytree(os.path.join(STUBS_DIR, "template"), template, dirs_exist_ok=True)
+    for nome in ("target_grid_sul_br_0125.txt", "weights_sul_br_0125.nc"):
+        with open(os.path.join(template, nome), "w") as f:
+            f.write("stub\n")
+    gerar_urls(os.path.join(template, "urls.txt"), date_arg, horas)
+
+    conda_sh = os.path.join(dirs["conda"], "etc", "profile.d", "conda.sh")
+    os.makedirs(os.path.dirname(conda_sh), exist_ok=True)
+    with open(conda_sh, "w") as f:
+        f.write("# conda falso do benchmark\nconda() { return 0; }\n")
+    # O logo é baixado da internet pelo orquestrador; a sandbox já o fornece
+    with open(os.path.join(dirs["web"], "Brasao_UFSC_vertical_extenso.svg"), "w") as f:
+        f.write("<svg/>")
+    return dirs
+
+def ambiente(dirs, atrasos, registro, horas):
+    """Variáveis de ambiente que apontam os scripts reais para os stubs e para a sandbox."""
+    env = dict(os.environ)
+    env.update({
+        "PATH": os.path.join(STUBS_DIR, "bin") + os.pathsep + env.get("PATH", ""),
+        "WORK_DIR": dirs["work"],
+        "WEB_ROOT": dirs["web"],
+        "SCRIPTS_DIR": SCRIPTS_DIR,
+        "WPS_HOME": os.path.join(STUBS_DIR, "wps"),
+        "WRF_HOME": os.path.join(STUBS_DIR, "wrf"),
+        "GEOG_DATA_DIR": dirs["geog"],
+        "CONDA_INSTALL_PATH": dirs["conda"],
+        "STUB_REMOTE_DIR": dirs["remoto"],
+        "STUB_REGISTRO": registro,
+        "STUB_TEMPOS": str(horas),
+        "STAGING_RAIZ": dirs["staging"],
+        "STAGING_LIMITE_GB": STAGING_LIMITE_GB,
+        # Os stubs só dormem: as reservas de núcleos não devem serializar as etapas da sandbox
+        "NUCLEOS_TOTAIS": NUCLEOS_SANDBOX,
+    })
+    for nome, segundos in atrasos.items():
+        env[f"STUB_ATRASO_{nome.upper().replace('-', '_')}"] = str(segundos)
+    return env
+
+# ==============================================================================
+# SEÇÃO 2: EXECUÇÃO E MÉTRICAS
+# ==============================================================================
+
+def comandos_do_modo(modo, date_arg, paralelo):
+    """Lista de comandos executados em sequência para um modo."""
+    if modo == "linear":
+        comandos = []
+        for etapa in ETAPAS_LINEARES:
+            script = os.path.join(SCRIPTS_DIR, etapa[0])
+            prefixo = [sys.executable] if script.endswith(".py") else []
+            comandos.append(prefixo + [script] + [a.format(date=date_arg) for a in etapa[1:]])
+        return comandos
+    if modo == "dag":
+        # Conversão, campos, meteogramas e lestada leem o wrfout real com netCDF4/wrf-python,
+        # e os stubs não o produzem
+        return [[sys.executable, os.path.join(SCRIPTS_DIR, "executar_pipeline.py"), "--date", date_arg,
+                 "--scripts-dir", SCRIPTS_DIR, "--paralelo", str(paralelo), "--pular", "converter,campos,meteograma,lestada"]]
+    raise ValueError(f"modo desconhecido: {modo}")
+
+def ler_registro_stubs(registro):
+    """Lê as execuções registradas pelos stubs."""
+    if not os.path.isfile(registro):
+        return []
+    execucoes = []
+    with open(registro) as f:
+        for linha in f:
+            try:
+                execucoes.append(json.loads(linha))
+            except ValueError:
+                continue
+    return execucoes
+
+def tempo_ocupado(intervalos):
+    """Duração da união dos intervalos (tempo em que pelo menos um stub estava rodando)."""
+    total, fim_atual = 0.0, None
+    for inicio, fim in sorted(intervalos):
+        if fim_atual is None or inicio > fim_atual:
+            total += fim - inicio
+            fim_atual = fim
+        elif fim > fim_atual:
+            total += fim - fim_atual
+            fim_atual = fim
+    return total
+
+def tamanho_arvore(path):
+    """Soma dos tamanhos dos arquivos regulares sob 'path' (sem seguir links)."""
+    total = 0
+    for raiz, _, arquivos in os.walk(path):
+        for nome in arquivos:
+            caminho = os.path.join(raiz, nome)
+            if not os.path.islink(caminho):
+                total += os.path.getsize(caminho)
+    return total
+
+def executar_modo(modo, dirs, env, registro, date_arg, paralelo):
+    """Executa um modo e retorna suas métricas."""
+    if os.path.exists(registro):
+        os.remove(registro)
+    timeline = registro + ".timeline"
+    if os.path.exists(timeline):
+        os.remove(timeline)
+    log_path = os.path.join(os.path.dirname(registro), f"{modo}.log")
+    antes = sum(tamanho_arvore(dirs[d]) for d in ("work", "web", "remoto"))
+
+    t0 = time.perf_counter()
+    codigos = []
+    with open(log_path, "a") as log:
+        for comando in comandos_do_modo(modo, date_arg, paralelo):
+            codigos.append(rastreamento.executar_comando(comando, modo, timeline=timeline,
+                                                         stdout=log, stderr=log, env=env))
+            if codigos[-1] != 0:
+                break
+    wall = time.perf_counter() - t0
+    # Código zero sem a rodada publicada não conta: a comparação de tempos perderia o sentido
+    publicada = os.path.isfile(os.path.join(dirs["web"], date_arg, "index.html"))
+    if not publicada:
+        with open(log_path, "a") as log:
+            log.write(f"ERRO: {os.path.join(dirs['web'], date_arg, 'index.html')} ausente ao fim do modo.\n")
+
+    spans = rastreamento.ler_timeline(timeline)
+    execucoes = ler_registro_stubs(registro)
+    intervalos = [(e["inicio"], e["fim"]) for e in execucoes]
+    ocupado = tempo_ocupado(intervalos)
+    soma_stubs = sum(fim - inicio for inicio, fim in intervalos)
+    depois = sum(tamanho_arvore(dirs[d]) for d in ("work", "web", "remoto"))
+    por_stub = {}
+    for e in execucoes:
+        s = por_stub.setdefault(e["stub"], {"execucoes": 0, "segundos": 0.0})
+        s["execucoes"] += 1
+        s["segundos"] = round(s["segundos"] + e["fim"] - e["inicio"], 3)
+
+    return {
+        "sucesso": publicada and all(c == 0 for c in codigos),
+        "wall_s": round(wall, 3),
+        "cpu_s": round(sum(s["cpu_s"] for s in spans), 3),
+        "tempo_stubs_s": round(soma_stubs, 3),
+        "tempo_ocupado_s": round(ocupado, 3),
+        "overhead_orquestracao_s": round(wall - ocupado, 3),
+        "paralelismo": round(soma_stubs / ocupado, 2) if ocupado else 0.0,
+        "bytes_escritos_disco": sum(s["bytes_escritos"] for s in spans),
+        "bytes_novos_sandbox": depois - antes,
+        "bytes_enviados_sync": sum(e.get("bytes", 0) for e in execucoes if e["stub"] == "lftp"),
+        "stubs": por_stub,
+        "log": log_path,
+    }
+
+def interpretar_atrasos(texto):
+    """Converte 'wrf=3,ungrib=1' em {'wrf': 3.0, 'ungrib': 1.0}."""
+    atrasos = {}
+    for item in filter(None, (t.strip() for t in texto.split(","))):
+        nome, _, valor = item.partition("=")
+        atrasos[nome] = float(valor)
+    return atrasos
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Prepara uma sandbox por modo, executa duas vezes e reporta as métricas."""
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta da cadeia com executáveis stub.")
+    parser.add_argument("--modos", default="linear,dag", help="Modos a comparar (linear, dag).")
+    parser.add_argument("--date", default=DATA_PADRAO, help="Data da rodada simulada (YYYYMMDDHH).")
+    parser.add_argument("--horas", type=int, default=37, help="Horas de previsão (arquivos ICON e quadros).")
+    parser.add_argument("--atrasos", default=ATRASOS_PADRAO, help="Atraso de cada stub em segundos.")
+    parser.add_argument("--paralelo", type=int, default=4, help="Etapas simultâneas no modo dag.")
+    parser.add_argument("--dir-trabalho", help="Diretório da sandbox (padrão: temporário, removido ao final).")
+    parser.add_argument("--saida", help="Grava os resultados neste JSON.")
+    args = parser.parse_args()
+
+    atrasos = interpretar_atrasos(args.atrasos)
+    base = args.dir_trabalho or tempfile.mkdtemp(prefix="bench_pipeline_")
+    resultados, stagings = {}, []
+    try:
+        for modo in [m.strip() for m in args.modos.split(",") if m.strip()]:
+            sandbox = os.path.join(base, modo)
+            dirs = preparar_sandbox(sandbox, args.date, args.horas)
+            stagings.append(dirs["staging"])
+            registro = os.path.join(sandbox, "stubs.jsonl")
+            env = ambiente(dirs, atrasos, registro, args.horas)
+            resultados[modo] = {}
+            for rodada in ("nova", "reexecucao"):
+                print(f">> Modo '{modo}', rodada {rodada}...")
+                m = executar_modo(modo, dirs, env, registro, args.date, args.paralelo)
+                resultados[modo][rodada] = m
+                estado = "✅" if m["sucesso"] else f"❌ (veja {m['log']})"
+                print(f"   {estado} parede {m['wall_s']:.2f}s | stubs ocupados {m['tempo_ocupado_s']:.2f}s | "
+                      f"overhead {m['overhead_orquestracao_s']:.2f}s | paralelismo {m['paralelismo']:.2f}x | "
+                      f"escrito {m['bytes_novos_sandbox'] / 1e6:.1f} MB | enviado {m['bytes_enviados_sync'] / 1e6:.1f} MB")
+
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                json.dump({
+                    "meta": {"data": datetime.now().isoformat(timespec="seconds"), "host": platform.node(),
+                             "rodada": args.date, "horas": args.horas, "atrasos": atrasos},
+                    "resultados": resultados,
+                }, f, indent=2)
+    finally:
+        for staging in stagings:
+            shutil.rmtree(staging, ignore_errors=True)
+        if not args.dir_trabalho:
+            shutil.rmtree(base, ignore_errors=True)
+    if not all(r["sucesso"] for modo in resultados.values() for r in modo.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+BENCHMARK DE THROUGHPUT DA PLOTAGEM (wrfplot) COM wrfout SINTÉTICO - UFSC
+
+1. Gera um wrfout sintético (gerar_wrfout_sintetico.py) com o tamanho de grade
+   e o número de tempos pedidos.
+2. Para cada variável de ALL_VARIABLES (lida de plotar_rodadas_diaria.sh),
+   executa o wrfplot com os mesmos argumentos da rodada diária.
+3. Reporta quadros por segundo, tempo de parede, CPU e pico de memória (RSS)
+   de cada variável, medidos pelo rastreamento.py.
+
+Uso:
+    ./benchmark_plotagem.py [--nx 60 --ny 50 --nz 20 --tempos 13] [--variaveis slp,winds]
+                            [--wrfplot wrfplot] [--saida resultados.json]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import tempfile
+import argparse
+import platform
+from datetime import datetime
+
+import rastreamento
+from gerar_wrfout_sintetico import gerar_wrfout, nome_wrfout
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PLOTAGEM = os.path.join(SCRIPTS_DIR, "plotar_rodadas_diaria.sh")
+SHAPEFILE_PADRAO = os.path.join(SCRIPTS_DIR, "SC_RS_d01", "SC_RS_d01.shp")
+NIVEIS = "900,500,200"
+
+def ler_all_variables(script_path=SCRIPT_PLOTAGEM):
+    """Extrai a lista ALL_VARIABLES=( ... ) do script de plotagem, para não duplicá-la."""
+    with open(script_path, "r", encoding="utf-8") as f:
+        conteudo = f.read()
+    bloco = re.search(r"ALL_VARIABLES=\((.*?)\)", conteudo, re.S)
+    if not bloco:
+        raise ValueError(f"ALL_VARIABLES não encontrado em {script_path}")
+    return re.findall(r'"([^"]+)"', bloco.group(1))
+
+def medir_variavel(wrfplot, wrfout, variavel, shapefile, dir_saida):
+    """Roda o wrfplot para uma variável e retorna as métricas do span registrado."""
+    os.makedirs(dir_saida, exist_ok=True)
+    timeline = os.path.join(dir_saida, "span.jsonl")
+    comando = [wrfplot, "--shapefile", shapefile, "--input", wrfout, "--vars", variavel,
+               "--ulevels", NIVEIS, "--output", dir_saida]
+    with open(os.devnull, "w") as nulo:
+        retorno = rastreamento.executar_comando(comando, "benchmark_plotagem", timeline=timeline,
+                                                stdout=nulo, stderr=nulo, variavel=variavel)
+    span = rastreamento.ler_timeline(timeline)[-1]
+    quadros = len([f for f in os.listdir(dir_saida) if f.endswith(".png")])
+    return {
+        "retorno": retorno,
+        "quadros": quadros,
+        "wall_s": span["wall_s"],
+        "cpu_s": span["cpu_s"],
+        "pico_rss_mb": round(span["pico_rss_kb"] / 1024.0, 1),
+        "quadros_por_s": round(quadros / span["wall_s"], 3) if span["wall_s"] > 0 else 0.0,
+    }
+
+def main():
+    """Gera a fixture, mede cada variável e imprime/grava o relatório."""
+    parser = argparse.ArgumentParser(description="Benchmark de quadros/s e memória do wrfplot por variável.")
+    parser.add_argument("--nx", type=int, default=60)
+    parser.add_argument("--ny", type=int, default=50)
+    parser.add_argument("--nz", type=int, default=20)
+    parser.add_argument("--tempos", type=int, default=13, help="Instantes no wrfout sintético.")
+    parser.add_argument("--variaveis", help="Subconjunto de variáveis (padrão: ALL_VARIABLES do script).")
+    parser.add_argument("--wrfplot", default="wrfplot", help="Executável do wrfplot.")
+    parser.add_argument("--shapefile", default=SHAPEFILE_PADRAO)
+    parser.add_argument("--dir-trabalho", help="Diretório de trabalho (padrão: temporário, removido ao final).")
+    parser.add_argument("--saida", help="Grava os resultados neste JSON.")
+    args = parser.parse_args()
+
+    if not shutil.which(args.wrfplot):
+        print(f"❌ ERRO: executável '{args.wrfplot}' não encontrado. Ative o ambiente conda da plotagem.")
+        sys.exit(1)
+
+    variaveis = args.variaveis.split(",") if args.variaveis else ler_all_variables()
+    dir_trabalho = args.dir_trabalho or tempfile.mkdtemp(prefix="bench_plot_")
+    inicio = datetime(2025, 7, 20, 0)
+    wrfout = os.path.join(dir_trabalho, nome_wrfout(1, inicio))
+    try:
+        print(f">> Gerando wrfout sintético {args.nx}x{args.ny}x{args.nz} com {args.tempos} tempos...")
+        gerar_wrfout(wrfout, args.nx, args.ny, args.nz, args.tempos, inicio)
+        print(f"   {os.path.getsize(wrfout) / 1024 / 1024:.1f} MB em {wrfout}")
+
+        resultados = {}
+        print(f"\n{'variável':<18} {'quadros':>7} {'parede(s)':>10} {'CPU(s)':>8} {'quadros/s':>10} {'pico RSS(MB)':>13}")
+        for variavel in variaveis:
+            m = medir_variavel(args.wrfplot, wrfout, variavel, args.shapefile,
+                               os.path.join(dir_trabalho, "saida", variavel))
+            resultados[variavel] = m
+            aviso = "" if m["retorno"] == 0 else f"  ❌ código {m['retorno']}"
+            print(f"{variavel:<18} {m['quadros']:>7} {m['wall_s']:>10.2f} {m['cpu_s']:>8.2f} "
+                  f"{m['quadros_por_s']:>10.2f} {m['pico_rss_mb']:>13.1f}{aviso}")
+
+        total_quadros = sum(m["quadros"] for m in resultados.values())
+        total_wall = sum(m["wall_s"] for m in resultados.values())
+        print(f"\nTotal: {total_quadros} quadros em {total_wall:.1f}s "
+              f"({total_quadros / total_wall if total_wall else 0:.2f} quadros/s)")
+
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                json.dump({
+                    "meta": {"data": datetime.now().isoformat(timespec="seconds"), "host": platform.node(),
+                             "grade": [args.nx, args.ny, args.nz], "tempos": args.tempos},
+                    "resultados": resultados,
+                }, f, indent=2)
+    finally:
+        if not args.dir_trabalho:
+            shutil.rmtree(dir_trabalho, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+BENCHMARK DA GERAÇÃO WEB (orquestrador_web.py) COM WEB_ROOT SINTÉTICO - UFSC
+
+1. Gera árvores no formato de /var/www/html com 1, 30, 365 e 1000 rodadas,
+   usando nomes reais do wrfplot: d0*/<variavel>/<nome>_<nivel>_dd-mm-YYYY_HH_MM.png,
+   e o catálogo SQLite (catalogo_quadros.py) correspondente, fora da medição.
+2. Mede cada fase (find_forecast_dirs, registrar_rodadas, registrar_rodada,
+   generate_main_index, generate_forecast_viewer):
+   tempo de parede, CPU, pico de memória alocada (tracemalloc) e número de
+   chamadas ao sistema de arquivos (listdir, stat, open, ...).
+3. Repete as fases N vezes (cada vez a partir das mesmas saídas limpas) e guarda a
+   mediana de tempo e memória, para que uma amostra isolada não decida nada.
+4. Salva os resultados como baseline (--salvar-baseline) e compara execuções
+   futuras com ela, para que regressões apareçam antes de estourar a janela do
+   cron. Tempo e memória só regridem se piorarem além da tolerância relativa e
+   também de um piso absoluto (5 ms, 256 KB).
+
+Uso:
+    ./benchmark_web.py [--tamanhos 1,30,365,1000] [--quadros 37] [--dir-trabalho /tmp/bench_web]
+                       [--repeticoes 5] [--salvar-baseline] [--comparar] [--baseline benchmarks/baseline_web.json]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import builtins
+import statistics
+import resource
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timedelta
+
+import orquestrador_web
+import catalogo_quadros
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+TAMANHOS_PADRAO = [1, 30, 365, 1000]
+QUADROS_PADRAO = 37          # 0 a 36 h, de hora em hora
+DOMINIOS = ["d01", "d02"]
+NIVEIS = ["900", "500", "200"]
+# Mesma lista de plotar_rodadas_diaria.sh
+VARIAVEIS = ["slp", "mcape", "mcin", "pw", "winds", "ppn", "mdbz", "helicity",
+             "updraft_helicity", "ctt", "high_cloudfrac", "low_cloudfrac",
+             "mid_cloudfrac", "u_pvo", "u_winds", "u_temp"]
+BASELINE_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "baseline_web.json")
+TOLERANCIA_PADRAO = 0.25
+REPETICOES_PADRAO = 5
+# Pioras menores que estes pisos são ruído de medição, qualquer que seja a variação relativa
+PISOS_REGRESSAO = {"wall_s": 0.005, "pico_mem_kb": 256.0}
+MARCADOR = ".arvore_sintetica.json"
+PNG_FALSO = b"\x89PNG\r\n\x1a\n"
+
+# ==============================================================================
+# SEÇÃO 1: GERADOR DE WEB_ROOT SINTÉTICO
+# ==============================================================================
+
+def nomes_quadros(variavel, inicio, quadros):
+    """Nomes de arquivo que o wrfplot gera para uma variável (já sem o prefixo do domínio)."""
+    nomes = []
+    for h in range(quadros):
+        carimbo = (inicio + timedelta(hours=h)).strftime("%d-%m-%Y_%H_%M")
+        if variavel.startswith("u_"):
+            nomes.extend(f"{variavel}_{nivel}_{carimbo}.png" for nivel in NIVEIS)
+        else:
+            nomes.append(f"{variavel}_{carimbo}.png")
+    return nomes
+
+def gerar_arvore_sintetica(root, n_rodadas, quadros=QUADROS_PADRAO, data_final=None):
+    """
+    Cria (ou reaproveita) um WEB_ROOT com 'n_rodadas' rodadas diárias 00Z.
+    Retorna o número de arquivos PNG da árvore.
+    """
+    parametros = {"rodadas": n_rodadas, "quadros": quadros, "dominios": DOMINIOS, "variaveis": VARIAVEIS}
+    marcador = os.path.join(root, MARCADOR)
+    try:
+        with open(marcador, "r", encoding="utf-8") as f:
+            existente = json.load(f)
+        if existente.get("parametros") == parametros:
+            return existente["arquivos"]
+    except (IOError, ValueError):
+        pass
+
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    os.makedirs(root)
+    data_final = data_final or datetime(2025, 7, 26)
+    total = 0
+    for i in range(n_rodadas):
+        inicio = data_final - timedelta(days=i)
+        run_dir = os.path.join(root, inicio.strftime("%Y%m%d") + "00")
+        for dominio in DOMINIOS:
+            for variavel in VARIAVEIS:
+                var_dir = os.path.join(run_dir, dominio, variavel)
+                os.makedirs(var_dir)
+                for nome in nomes_quadros(variavel, inicio, quadros):
+                    with open(os.path.join(var_dir, nome), "wb") as f:
+                        f.write(PNG_FALSO)
+                    total += 1
+    # Evita que generate_main_index tente baixar o logo durante a medição
+    with open(os.path.join(root, "Brasao_UFSC_vertical_extenso.svg"), "w") as f:
+        f.write("<svg/>")
+    # A primeira abertura do catálogo importa a árvore; na produção os quadros
+    # entram nele durante a plotagem, então isso também fica fora da medição
+    catalogo_quadros.rodadas(root)
+    with open(marcador, "w", encoding="utf-8") as f:
+        json.dump({"parametros": parametros, "arquivos": total}, f)
+    return total
+
+def limpar_saidas(root):
+    """Remove as páginas geradas por uma medição anterior, para que toda execução parta do mesmo estado."""
+    saidas = [os.path.join(root, "index.html"), os.path.join(root, orquestrador_web.SERVICE_WORKER)]
+    for item in os.listdir(root):
+        saidas += [os.path.join(root, item, "index.html"), os.path.join(root, item, "data.js")]
+    for path in saidas:
+        if os.path.isfile(path):
+            os.remove(path)
+    shutil.rmtree(os.path.join(root, orquestrador_web.CATALOGO_DIR), ignore_errors=True)
+
+# ==============================================================================
+# SEÇÃO 2: MEDIÇÃO (TEMPO, MEMÓRIA E CHAMADAS AO SISTEMA DE ARQUIVOS)
+# ==============================================================================
+
+# Funções que resultam em chamadas de sistema de arquivos no caminho web.
+# os.path.isdir/exists usam os.stat internamente e entram na contagem de 'stat'.
+FUNCOES_OS = ["listdir", "scandir", "stat", "lstat", "chmod", "replace", "rename", "makedirs", "unlink"]
+
+@contextmanager
+def contar_chamadas(contador):
+    """Substitui temporariamente funções de os/open por versões que contam as chamadas."""
+    originais = {nome: getattr(os, nome) for nome in FUNCOES_OS}
+    open_original = builtins.open
+
+    def envolver(nome, funcao):
+        def contada(*args, **kwargs):
+            contador[nome] = contador.get(nome, 0) + 1
+            return funcao(*args, **kwargs)
+        return contada
+
+    try:
+        for nome, funcao in originais.items():
+            setattr(os, nome, envolver(nome, funcao))
+        builtins.open = envolver("open", open_original)
+        yield contador
+    finally:
+        for nome, funcao in originais.items():
+            setattr(os, nome, funcao)
+        builtins.open = open_original
+
+def medir(funcao, *args):
+    """Executa uma fase e retorna (resultado, métricas). A saída de texto da fase é descartada."""
+    contador = {}
+    tracemalloc.start()
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    with contar_chamadas(contador), redirect_stdout(io.StringIO()):
+        resultado = funcao(*args)
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, {
+        "wall_s": round(wall, 6),
+        "cpu_s": round(cpu, 6),
+        "pico_mem_kb": round(pico / 1024.0, 1),
+        "chamadas": dict(sorted(contador.items())),
+        "total_chamadas": sum(contador.values()),
+    }
+
+def gerar_todos_visualizadores(root, forecasts):
+    """Mesma iteração do main() do orquestrador sobre todas as rodadas."""
+    for dir_name in sorted(forecasts, reverse=True):
+        orquestrador_web.generate_forecast_viewer(os.path.join(root, dir_name))
+
+def medir_fases(root):
+    """Uma execução das fases sobre as saídas limpas: {fase: métricas}."""
+    limpar_saidas(root)
+    forecasts, m_find = medir(orquestrador_web.find_forecast_dirs, root)
+    _, m_catalogo = medir(orquestrador_web.registrar_rodadas, root, forecasts)
+    # Rodada nova (12Z do último dia) entrando em um catálogo já populado
+    nova = max(forecasts)[:8] + "12"
+    _, m_nova = medir(orquestrador_web.registrar_rodada, root, nova)
+    _, m_index = medir(orquestrador_web.generate_main_index, root)
+    _, m_viewer = medir(gerar_todos_visualizadores, root, forecasts)
+    m_viewer["por_rodada_s"] = round(m_viewer["wall_s"] / max(len(forecasts), 1), 6)
+    return {
+        "find_forecast_dirs": m_find,
+        "registrar_rodadas": m_catalogo,
+        "registrar_rodada": m_nova,
+        "generate_main_index": m_index,
+        "generate_forecast_viewer": m_viewer,
+    }
+
+def mediana_das_execucoes(execucoes):
+    """
+    Combina as repetições de uma fase: mediana de tempo, CPU e memória; as chamadas
+    (determinísticas, já que toda execução parte das mesmas saídas) são as da última.
+    """
+    m = dict(execucoes[-1])
+    for chave in ("wall_s", "cpu_s", "pico_mem_kb", "por_rodada_s"):
+        if chave in m:
+            m[chave] = round(statistics.median(e[chave] for e in execucoes), 6)
+    m["amostras_wall_s"] = [e["wall_s"] for e in execucoes]
+    return m
+
+def executar_benchmark(tamanhos, quadros, dir_trabalho, repeticoes=REPETICOES_PADRAO):
+    """Roda as fases 'repeticoes' vezes para cada tamanho de árvore e retorna as medianas."""
+    resultados = {}
+    for n in tamanhos:
+        root = os.path.join(dir_trabalho, f"web_root_{n}")
+        print(f">> Preparando WEB_ROOT sintético com {n} rodada(s) em {root}...")
+        t0 = time.perf_counter()
+        arquivos = gerar_arvore_sintetica(root, n, quadros)
+        print(f"   {arquivos} PNGs ({time.perf_counter() - t0:.1f}s de preparação)")
+
+        execucoes = [medir_fases(root) for _ in range(max(1, repeticoes))]
+        resultados[str(n)] = {
+            "arquivos": arquivos,
+            "repeticoes": len(execucoes),
+            "fases": {fase: mediana_das_execucoes([e[fase] for e in execucoes]) for fase in execucoes[0]},
+        }
+        for fase, m in resultados[str(n)]["fases"].items():
+            print(f"   {fase:<26} {m['wall_s']:9.3f}s parede {m['cpu_s']:9.3f}s CPU "
+                  f"{m['pico_mem_kb']:10.1f} KB {m['total_chamadas']:9d} chamadas")
+        # RSS do processo inteiro, acumulado até aqui
+        resultados[str(n)]["pico_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return resultados
+
+# ==============================================================================
+# SEÇÃO 3: BASELINE E COMPARAÇÃO
+# ==============================================================================
+
+def comparar_com_baseline(atual, baseline, tolerancia):
+    """
+    Compara fase a fase (medianas). Tempo e memória regridem se piorarem além da
+    tolerância relativa e do piso absoluto; o número de chamadas é determinístico e
+    regride com qualquer aumento.
+    Retorna a lista de regressões encontradas.
+    """
+    regressoes = []
+    for n, dados in atual["resultados"].items():
+        base_n = baseline.get("resultados", {}).get(n)
+        if not base_n:
+            continue
+        for fase, m in dados["fases"].items():
+            b = base_n["fases"].get(fase)
+            if not b:
+                continue
+            for chave in ("wall_s", "pico_mem_kb"):
+                piora = m[chave] - b[chave]
+                if b[chave] > 0 and piora > b[chave] * tolerancia and piora > PISOS_REGRESSAO[chave]:
+                    regressoes.append(f"{n} rodadas / {fase}: {chave} {b[chave]} -> {m[chave]}")
+            if m["total_chamadas"] > b["total_chamadas"]:
+                regressoes.append(f"{n} rodadas / {fase}: chamadas {b['total_chamadas']} -> {m['total_chamadas']}")
+    return regressoes
+
+def main():
+    """Interpreta os argumentos, roda o benchmark e salva/compara a baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark da geração web com WEB_ROOT sintético.")
+    parser.add_argument("--tamanhos", default=",".join(map(str, TAMANHOS_PADRAO)),
+                        help="Números de rodadas separados por vírgula (padrão: 1,30,365,1000).")
+    parser.add_argument("--quadros", type=int, default=QUADROS_PADRAO, help="Quadros (horas) por variável.")
+    parser.add_argument("--dir-trabalho", default="/tmp/bench_web", help="Onde criar as árvores sintéticas.")
+    parser.add_argument("--baseline", default=BASELINE_PADRAO, help="Arquivo JSON da baseline.")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava os resultados como nova baseline.")
+    parser.add_argument("--comparar", action="store_true", help="Compara com a baseline e falha se houver regressão.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="Piora relativa aceita em tempo/memória (padrão: 0.25).")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES_PADRAO,
+                        help="Execuções de cada fase; compara-se a mediana (padrão: 5).")
+    parser.add_argument("--saida", help="Grava os resultados desta execução neste JSON.")
+    args = parser.parse_args()
+
+    tamanhos = [int(t) for t in args.tamanhos.split(",") if t.strip()]
+    atual = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "quadros": args.quadros,
+            "repeticoes": args.repeticoes,
+        },
+        "resultados": executar_benchmark(tamanhos, args.quadros, args.dir_trabalho, args.repeticoes),
+    }
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(atual, f, indent=2)
+
+    if args.comparar and not os.path.isfile(args.baseline):
+        # A baseline é da máquina e só é gravada quando pedida (--salvar-baseline)
+        print(f"⚠️ AVISO: baseline '{args.baseline}' inexistente; nada a comparar. "
+              f"Grave uma com --salvar-baseline.")
+    elif args.comparar:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"❌ ERRO: não foi possível ler a baseline '{args.baseline}': {e}")
+            sys.exit(2)
+        if baseline.get("meta", {}).get("quadros") != args.quadros:
+            print("⚠️ AVISO: a baseline foi medida com outro número de quadros.")
+        regressoes = comparar_com_baseline(atual, baseline, args.tolerancia)
+        if regressoes:
+            print("\n❌ Regressões em relação à baseline:")
+            for r in regressoes:
+                print(f"   - {r}")
+            sys.exit(1)
+        print("\n✅ Nenhuma regressão em relação à baseline.")
+
+    if args.salvar_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(atual, f, indent=2)
+        print(f"✅ Baseline salva em {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CACHE DE DIAGNÓSTICOS DERIVADOS DO WRFOUT - UFSC
+
+Diagnósticos caros (CAPE/CIN, helicidade, topo de nuvem, interpolações para
+níveis de pressão...) eram recalculados por cada produto. Este módulo os guarda
+uma única vez por rodada:
+1. Cada (domínio, variável, nível) é um NetCDF4 comprimido (zlib + shuffle) em
+   $WORK_DIR/<rodada>/diagnosticos/<domínio>/, com um bloco (chunk) por tempo e
+   uma marca 'calculado' por tempo: a chave é (rodada, domínio, variável, nível, tempo).
+2. Só os tempos ausentes são calculados: todos de uma vez (timeidx=ALL_TIMES)
+   quando o arquivo não existe, ou quadro a quadro quando faltam alguns.
+3. O arquivo guarda a identidade do wrfout (nome, tamanho, mtime); se o wrfout
+   mudar (rodada refeita), as entradas antigas viram falhas e são recalculadas.
+4. A gravação é atômica (temporário + os.replace), então etapas paralelas que
+   pedem o mesmo campo no máximo repetem o cálculo, sem corromper o arquivo.
+5. Acertos e falhas são contados por quadro e impressos no fim; cada cálculo
+   vira um span 'diagnostico' na linha do tempo do rastreamento.
+
+Uso como biblioteca:
+    cache = CacheDiagnosticos(wrfout_path, "2025072000", "d01")
+    cape = cache.obter(nc, "mcape", lambda nc, t: getvar(nc, "cape_2d", timeidx=t, ...)[0])
+    cache.relatorio()
+
+Uso pela linha de comando (ocupação do cache de uma rodada):
+    ./cache_diagnosticos.py YYYYMMDDHH [--limpar]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import glob
+import time
+import shutil
+import argparse
+
+import numpy as np
+from netCDF4 import Dataset
+from wrf import to_np, ALL_TIMES
+
+import rastreamento
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+DIAGNOSTICOS_DIR = "diagnosticos"
+NIVEL_COMPRESSAO = 4
+
+# ==============================================================================
+# SEÇÃO 1: ARMAZENAMENTO POR (DOMÍNIO, VARIÁVEL, NÍVEL)
+# ==============================================================================
+
+def fatia_de_tempo(timeidx):
+    """Fatia do eixo do tempo que mantém a dimensão: todos os tempos ou só o quadro pedido."""
+    return slice(None) if timeidx is ALL_TIMES else slice(timeidx, timeidx + 1)
+
+def normalizar(campo, forma):
+    """(tempos, ny, nx) em float32 com NaN nos pontos ausentes, qualquer que seja a saída do cálculo."""
+    campo = np.ma.filled(np.ma.masked_invalid(np.ma.asarray(to_np(campo), dtype="f4")), np.nan)
+    return campo.reshape((-1,) + forma)
+
+class CacheDiagnosticos:
+    """Campos derivados de um wrfout em NetCDF4 comprimido, reaproveitados por todos os produtos da rodada."""
+
+    def __init__(self, wrfout_path, date_arg, domain, work_dir=WORK_DIR):
+        self.domain = domain
+        self.dir = os.path.join(work_dir, date_arg, DIAGNOSTICOS_DIR, domain)
+        st = os.stat(wrfout_path)
+        self.origem = f"{os.path.basename(wrfout_path)}:{st.st_size}:{st.st_mtime_ns}"
+        self.acertos = 0
+        self.falhas = 0
+        self.tempo_calculo = 0.0
+
+    def caminho(self, nome, nivel=None):
+        return os.path.join(self.dir, f"{nome}_{nivel}.nc" if nivel is not None else f"{nome}.nc")
+
+    def _ler(self, caminho, nt):
+        """(campo, calculado) do arquivo; (None, nenhum) se não existir ou for de outro wrfout."""
+        try:
+            with Dataset(caminho) as ds:
+                if ds.getncattr("origem") != self.origem or len(ds.dimensions["Time"]) != nt:
+                    return None, np.zeros(nt, dtype=bool)
+                calculado = np.asarray(ds.variables["calculado"][:]).astype(bool)
+                campo = np.ma.filled(ds.variables["campo"][:], np.nan).astype("f4")
+        except (OSError, KeyError, AttributeError):
+            return None, np.zeros(nt, dtype=bool)
+        return campo, calculado
+
+    def _gravar(self, caminho, campo, calculado, nome, nivel, unidade):
+        """Grava o arquivo inteiro em um temporário e o troca atomicamente."""
+        os.makedirs(self.dir, exist_ok=True)
+        tmp_path = f"{caminho}.tmp{os.getpid()}"
+        nt, ny, nx = campo.shape
+        with Dataset(tmp_path, "w", format="NETCDF4") as ds:
+            ds.setncattr("origem", self.origem)
+            ds.createDimension("Time", nt)
+            ds.createDimension("south_north", ny)
+            ds.createDimension("west_east", nx)
+            var = ds.createVariable("campo", "f4", ("Time", "south_north", "west_east"), zlib=True,
+                                    complevel=NIVEL_COMPRESSAO, shuffle=True, chunksizes=(1, ny, nx),
+                                    fill_value=np.float32(np.nan))
+            var.setncattr("variavel", nome)
+            var.setncattr("nivel", "" if nivel is None else str(nivel))
+            var.units = unidade
+            var[:] = campo
+            ds.createVariable("calculado", "u1", ("Time",))[:] = calculado.astype("u1")
+        os.replace(tmp_path, caminho)
+        os.chmod(caminho, 0o644)
+
+    def obter(self, nc, nome, calcular, nivel=None, unidade=""):
+        """
+        Campo (tempos, ny, nx) em float32. calcular(nc, timeidx) recebe ALL_TIMES ou o
+        índice de um quadro e pode devolver o campo com ou sem o eixo do tempo.
+        """
+        nt = len(nc.dimensions["Time"])
+        forma = (len(nc.dimensions["south_north"]), len(nc.dimensions["west_east"]))
+        caminho = self.caminho(nome, nivel)
+        campo, calculado = self._ler(caminho, nt)
+        faltando = np.flatnonzero(~calculado)
+        self.acertos += nt - len(faltando)
+        self.falhas += len(faltando)
+        if not len(faltando):
+            return campo
+
+        t0 = time.perf_counter()
+        with rastreamento.span("diagnostico", dominio=self.domain, variavel=nome, nivel=nivel, quadros=len(faltando)):
+            if campo is None:
+                campo = normalizar(calcular(nc, ALL_TIMES), forma)
+            else:
+                for t in faltando:
+                    campo[t] = normalizar(calcular(nc, int(t)), forma)[0]
+        self.tempo_calculo += time.perf_counter() - t0
+        calculado[:] = True
+        self._gravar(caminho, campo, calculado, nome, nivel, unidade)
+        return campo
+
+    def relatorio(self):
+        """Imprime e retorna os acertos e falhas (por quadro) do cache neste processo."""
+        total = self.acertos + self.falhas
+        taxa = 100.0 * self.acertos / total if total else 0.0
+        print(f"  Cache de diagnósticos ({self.domain}): {self.acertos} acerto(s), {self.falhas} falha(s) "
+              f"({taxa:.0f}% de acertos), {self.tempo_calculo:.1f}s calculando.")
+        return {"acertos": self.acertos, "falhas": self.falhas, "tempo_calculo_s": round(self.tempo_calculo, 3)}
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Lista (ou remove) o cache de diagnósticos de uma rodada."""
+    parser = argparse.ArgumentParser(description="Ocupação do cache de diagnósticos derivados de uma rodada.")
+    parser.add_argument("date", help="Rodada (YYYYMMDDHH).")
+    parser.add_argument("--limpar", action="store_true", help="Remove o cache da rodada.")
+    args = parser.parse_args()
+
+    raiz = os.path.join(WORK_DIR, args.date, DIAGNOSTICOS_DIR)
+    if not os.path.isdir(raiz):
+        print(f"⚠️ Nenhum cache de diagnósticos em {raiz}.")
+        sys.exit(0)
+    if args.limpar:
+        shutil.rmtree(raiz)
+        print(f"✅ Cache de diagnósticos removido: {raiz}")
+        return
+    total = 0
+    for caminho in sorted(glob.glob(os.path.join(raiz, "*", "*.nc"))):
+        with Dataset(caminho) as ds:
+            calculado = int(np.asarray(ds.variables["calculado"][:]).sum())
+            nt = len(ds.dimensions["Time"])
+        tamanho = os.path.getsize(caminho)
+        total += tamanho
+        print(f"  {os.path.relpath(caminho, raiz):<30} {calculado:>3}/{nt} quadros  {tamanho / 1e6:7.2f} MB")
+    print(f"Total: {total / 1e6:.1f} MB em {raiz}")
+
+if __name__ == "__main__":
+    main()
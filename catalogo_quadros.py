@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CATÁLOGO SQLITE DAS RODADAS E QUADROS PUBLICADOS - UFSC
+
+A geração web, o arquivamento e a deduplicação refaziam o próprio estado a cada
+execução listando o WEB_ROOT (rodadas, d0*/<variável>/*.png). Este módulo mantém
+esse estado num banco SQLite em WEB_ROOT/.catalogo/quadros.sqlite (fora do
+mirror do lftp), atualizado por quem escreve os arquivos:
+1. 'rodadas': uma linha por rodada, com o estado ('preparo' ou 'publicada') e se
+   já foi arquivada em pacote.
+2. 'quadros': um PNG por linha (rodada, domínio, variável, arquivo), com o nível,
+   a validade, o tamanho e o SHA-256. Quando a deduplicação remove a cópia,
+   'objeto' aponta para o arquivo em WEB_ROOT/objetos.
+3. 'objetos': os conteúdos guardados uma única vez pela deduplicação.
+4. A plotagem (manifesto_quadros.py registrar) grava os quadros de cada variável
+   numa transação; o orquestrador marca a publicação, o arquivar_rodadas.py o
+   arquivamento e o deduplicar_imagens.py as referências e os objetos.
+5. Na primeira abertura o catálogo é preenchido a partir do disco (só listagem e
+   stat; o hash dos quadros antigos é calculado pela deduplicação quando preciso).
+   Uma rodada pedida que não está no catálogo é importada do disco na hora.
+
+Uso:
+    ./catalogo_quadros.py importar [--rodada YYYYMMDDHH] [--web-root DIR]
+    ./catalogo_quadros.py rodadas [--decrescente] [--web-root DIR]
+    ./catalogo_quadros.py resumo [--web-root DIR]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import hashlib
+import zipfile
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WEB_ROOT = os.environ.get("WEB_ROOT", "/var/www/html")
+CATALOGO_SQLITE = os.path.join(".catalogo", "quadros.sqlite")
+# Mesmos nomes usados pelo orquestrador_web.py e pelo deduplicar_imagens.py
+PREPARO_DIR = ".preparo"
+PACOTE_QUADROS = "quadros.zip"
+REFERENCIAS_QUADROS = "referencias.json"
+OBJETOS_DIR = "objetos"
+PREPARO = "preparo"
+PUBLICADA = "publicada"
+ESPERA_TRAVA_S = 300         # A importação inicial pode segurar o banco por um tempo
+PADRAO_QUADRO = re.compile(r"^(?:.+?_(\d+)_|.+?_)(\d{2}-\d{2}-\d{4}_\d{2}_\d{2})\.png$")
+
+# PRAGMA user_version: 0 enquanto o catálogo não foi criado e importado do disco
+VERSAO_ESQUEMA = 1
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS rodadas (
+    rodada TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    arquivada INTEGER NOT NULL DEFAULT 0,
+    atualizada TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rodadas_estado ON rodadas (estado, arquivada, rodada);
+CREATE TABLE IF NOT EXISTS quadros (
+    rodada TEXT NOT NULL,
+    dominio TEXT NOT NULL,
+    variavel TEXT NOT NULL,
+    arquivo TEXT NOT NULL,
+    nivel INTEGER,
+    valido TEXT,
+    tamanho INTEGER NOT NULL,
+    sha256 TEXT,
+    objeto TEXT,
+    PRIMARY KEY (rodada, dominio, variavel, arquivo)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS quadros_tamanho ON quadros (tamanho);
+CREATE INDEX IF NOT EXISTS quadros_sha256 ON quadros (sha256);
+CREATE INDEX IF NOT EXISTS quadros_objeto ON quadros (objeto) WHERE objeto IS NOT NULL;
+CREATE TABLE IF NOT EXISTS objetos (
+    objeto TEXT PRIMARY KEY,
+    tamanho INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# ==============================================================================
+# SEÇÃO 1: CONEXÃO E IMPORTAÇÃO DO DISCO
+# ==============================================================================
+
+def _agora():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def hash_arquivo(path):
+    """SHA-256 do conteúdo do arquivo."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def nivel_e_validade(nome):
+    """'u_temp_500_17-07-2025_06_00.png' -> (500, '2025-07-17T06:00'); nível None fora das u_*."""
+    match = PADRAO_QUADRO.match(nome)
+    if not match:
+        return None, None
+    nivel = int(match.group(1)) if match.group(1) else None
+    try:
+        valido = datetime.strptime(match.group(2), "%d-%m-%Y_%H_%M").isoformat(timespec="minutes")
+    except ValueError:
+        valido = None
+    return nivel, valido
+
+@contextmanager
+def _transacao(con):
+    """Transação de escrita: a trava do banco é tomada já no início (BEGIN IMMEDIATE)."""
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        yield con
+    except BaseException:
+        con.rollback()
+        raise
+    con.commit()
+
+@contextmanager
+def conectar(root_path=WEB_ROOT):
+    """Abre o catálogo do WEB_ROOT, criando-o (e importando o disco) na primeira vez."""
+    path = os.path.join(root_path, CATALOGO_SQLITE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # isolation_level=None: as transações são abertas explicitamente por _transacao
+    con = sqlite3.connect(path, timeout=ESPERA_TRAVA_S, isolation_level=None)
+    try:
+        con.execute("PRAGMA synchronous=NORMAL")
+        if con.execute("PRAGMA user_version").fetchone()[0] != VERSAO_ESQUEMA:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(ESQUEMA)
+            with _transacao(con):
+                # Outro processo pode ter importado enquanto esperávamos a trava
+                if con.execute("PRAGMA user_version").fetchone()[0] != VERSAO_ESQUEMA:
+                    _importar_tudo(con, root_path)
+                    con.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+        yield con
+    finally:
+        con.close()
+
+def _diretorio_da_rodada(root_path, rodada):
+    preparo = os.path.join(root_path, PREPARO_DIR, rodada)
+    return preparo if os.path.isdir(preparo) else os.path.join(root_path, rodada)
+
+def _publicada(root_path, rodada):
+    """
+    WEB_ROOT/<rodada> com visualizador ou quadros (d0*/, pacote). Um diretório só com
+    sobras (ex.: relatório de uma cadeia que falhou antes da publicação) não conta.
+    """
+    publicado = os.path.join(root_path, rodada)
+    if not os.path.isdir(publicado):
+        return False
+    return any(nome in ("index.html", PACOTE_QUADROS) or nome.startswith('d0') for nome in os.listdir(publicado))
+
+def _e_rodada(nome):
+    return len(nome) == 10 and nome.isdigit()
+
+def _ler_referencias(forecast_dir):
+    try:
+        with open(os.path.join(forecast_dir, REFERENCIAS_QUADROS), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def _importar_rodada(con, root_path, rodada):
+    """Substitui as linhas da rodada pelo que está no disco (preparo, se houver, senão o publicado)."""
+    forecast_dir = _diretorio_da_rodada(root_path, rodada)
+    if not os.path.isdir(forecast_dir):
+        con.execute("DELETE FROM quadros WHERE rodada = ?", (rodada,))
+        con.execute("DELETE FROM rodadas WHERE rodada = ?", (rodada,))
+        return 0
+    estado = PUBLICADA if _publicada(root_path, rodada) else PREPARO
+    linhas = []
+    pacote_path = os.path.join(forecast_dir, PACOTE_QUADROS)
+    arquivada = os.path.isfile(pacote_path)
+    if arquivada:
+        # Rodada arquivada: os quadros estão no pacote; o hash fica em aberto
+        with zipfile.ZipFile(pacote_path) as pacote:
+            for info in pacote.infolist():
+                partes = info.filename.split('/')
+                if len(partes) == 3 and partes[0].startswith('d0') and partes[2].endswith('.png'):
+                    linhas.append((*partes, *nivel_e_validade(partes[2]), info.file_size, None, None))
+    else:
+        for domain in os.listdir(forecast_dir):
+            domain_path = os.path.join(forecast_dir, domain)
+            if not (domain.startswith('d0') and os.path.isdir(domain_path)):
+                continue
+            for variable in os.listdir(domain_path):
+                variable_path = os.path.join(domain_path, variable)
+                if not os.path.isdir(variable_path):
+                    continue
+                for entrada in os.scandir(variable_path):
+                    if entrada.name.endswith('.png') and entrada.is_file(follow_symlinks=False):
+                        linhas.append((domain, variable, entrada.name, *nivel_e_validade(entrada.name),
+                                       entrada.stat().st_size, None, None))
+    # Quadros deduplicados: sem arquivo na rodada, apontam para o objeto (um replotado prevalece)
+    presentes = {f"{d}/{v}/{a}" for d, v, a, *_ in linhas}
+    for caminho, objeto in _ler_referencias(forecast_dir).items():
+        if caminho in presentes:
+            continue
+        domain, variable, nome = caminho.split('/')
+        try:
+            tamanho = os.path.getsize(os.path.join(root_path, objeto))
+        except OSError:
+            continue
+        digest = os.path.splitext(os.path.basename(objeto))[0]
+        linhas.append((domain, variable, nome, *nivel_e_validade(nome), tamanho, digest, objeto))
+
+    con.execute("DELETE FROM quadros WHERE rodada = ?", (rodada,))
+    con.executemany("INSERT INTO quadros (rodada, dominio, variavel, arquivo, nivel, valido, tamanho, sha256, objeto) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [(rodada, *linha) for linha in linhas])
+    con.execute("INSERT OR REPLACE INTO rodadas (rodada, estado, arquivada, atualizada) VALUES (?, ?, ?, ?)",
+                (rodada, estado, int(arquivada), _agora()))
+    return len(linhas)
+
+def _importar_objetos(con, root_path):
+    con.execute("DELETE FROM objetos")
+    base = os.path.join(root_path, OBJETOS_DIR)
+    if not os.path.isdir(base):
+        return
+    for prefixo in os.listdir(base):
+        prefixo_path = os.path.join(base, prefixo)
+        if os.path.isdir(prefixo_path):
+            con.executemany("INSERT INTO objetos (objeto, tamanho) VALUES (?, ?)",
+                            [(f"{OBJETOS_DIR}/{prefixo}/{e.name}", e.stat().st_size)
+                             for e in os.scandir(prefixo_path) if e.name.endswith('.png')])
+
+def _importar_tudo(con, root_path):
+    """Reconstrói o catálogo inteiro a partir do disco. Chamar dentro de uma transação."""
+    rodadas = set()
+    for base in (root_path, os.path.join(root_path, PREPARO_DIR)):
+        if os.path.isdir(base):
+            rodadas.update(d for d in os.listdir(base) if _e_rodada(d) and os.path.isdir(os.path.join(base, d)))
+    rodadas.update(r for (r,) in con.execute("SELECT rodada FROM rodadas"))
+    quadros = sum(_importar_rodada(con, root_path, rodada) for rodada in sorted(rodadas))
+    _importar_objetos(con, root_path)
+    return len(rodadas), quadros
+
+# ==============================================================================
+# SEÇÃO 2: ESCRITA (PLOTAGEM, PUBLICAÇÃO, ARQUIVAMENTO E DEDUPLICAÇÃO)
+# ==============================================================================
+
+def _garantir_rodada(con, root_path, rodada):
+    """Rodada ausente do catálogo (ex.: criada fora da cadeia) é importada do disco antes de ser alterada."""
+    if con.execute("SELECT 1 FROM rodadas WHERE rodada = ?", (rodada,)).fetchone() is None:
+        _importar_rodada(con, root_path, rodada)
+        con.execute("INSERT OR IGNORE INTO rodadas (rodada, estado, atualizada) VALUES (?, ?, ?)",
+                    (rodada, PREPARO, _agora()))
+
+def registrar_quadros(root_path, rodada, dominio, variavel, quadros):
+    """
+    Grava (numa transação) os quadros recém-plotados de uma variável: lista de
+    (caminho do PNG, nível, validade ISO). O hash é calculado aqui, com o arquivo
+    ainda no cache de páginas. Um quadro replotado deixa de apontar para um objeto.
+    """
+    linhas = []
+    for path, nivel, valido in quadros:
+        linhas.append((rodada, dominio, variavel, os.path.basename(path), nivel, valido,
+                       os.path.getsize(path), hash_arquivo(path)))
+    with conectar(root_path) as con, _transacao(con):
+        _garantir_rodada(con, root_path, rodada)
+        con.executemany("INSERT OR REPLACE INTO quadros (rodada, dominio, variavel, arquivo, nivel, valido, tamanho, sha256, objeto) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)", linhas)
+        con.execute("UPDATE rodadas SET atualizada = ? WHERE rodada = ?", (_agora(), rodada))
+    return len(linhas)
+
+def marcar_publicada(root_path, rodada):
+    with conectar(root_path) as con, _transacao(con):
+        _garantir_rodada(con, root_path, rodada)
+        con.execute("UPDATE rodadas SET estado = ?, atualizada = ? WHERE rodada = ?", (PUBLICADA, _agora(), rodada))
+
+def marcar_arquivada(root_path, rodada):
+    with conectar(root_path) as con, _transacao(con):
+        _garantir_rodada(con, root_path, rodada)
+        con.execute("UPDATE rodadas SET arquivada = 1, atualizada = ? WHERE rodada = ?", (_agora(), rodada))
+
+def gravar_hashes(root_path, hashes):
+    """Guarda hashes calculados depois (quadros importados do disco): lista de (rodada, caminho, sha256)."""
+    with conectar(root_path) as con, _transacao(con):
+        con.executemany("UPDATE quadros SET sha256 = ? WHERE rodada = ? AND dominio = ? AND variavel = ? AND arquivo = ?",
+                        [(digest, rodada, *caminho.split('/')) for rodada, caminho, digest in hashes])
+
+def referenciar(root_path, referencias, novos_objetos):
+    """
+    Numa transação, registra os objetos criados ({objeto: tamanho}) e aponta os quadros
+    deduplicados ({rodada: {caminho: objeto}}).
+    """
+    with conectar(root_path) as con, _transacao(con):
+        con.executemany("INSERT OR REPLACE INTO objetos (objeto, tamanho) VALUES (?, ?)", novos_objetos.items())
+        con.executemany("UPDATE quadros SET objeto = ? WHERE rodada = ? AND dominio = ? AND variavel = ? AND arquivo = ?",
+                        [(objeto, rodada, *caminho.split('/'))
+                         for rodada, por_caminho in referencias.items() for caminho, objeto in por_caminho.items()])
+
+def remover_objetos(root_path, objetos):
+    with conectar(root_path) as con, _transacao(con):
+        con.executemany("DELETE FROM objetos WHERE objeto = ?", [(o,) for o in objetos])
+
+# ==============================================================================
+# SEÇÃO 3: CONSULTAS
+# ==============================================================================
+
+def rodadas(root_path, estado=PUBLICADA, arquivada=None):
+    """Rodadas no estado pedido (todas com estado=None), em ordem crescente."""
+    sql, parametros = "SELECT rodada FROM rodadas WHERE 1", []
+    if estado is not None:
+        sql += " AND estado = ?"
+        parametros.append(estado)
+    if arquivada is not None:
+        sql += " AND arquivada = ?"
+        parametros.append(int(arquivada))
+    with conectar(root_path) as con:
+        return [r for (r,) in con.execute(sql + " ORDER BY rodada", parametros)]
+
+def quadros_da_rodada(root_path, rodada):
+    """Lista (domínio, variável, arquivo, objeto, sha256) dos quadros da rodada (importada do disco se faltar)."""
+    with conectar(root_path) as con:
+        if con.execute("SELECT 1 FROM rodadas WHERE rodada = ?", (rodada,)).fetchone() is None:
+            with _transacao(con):
+                _importar_rodada(con, root_path, rodada)
+        return con.execute("SELECT dominio, variavel, arquivo, objeto, sha256 FROM quadros WHERE rodada = ? "
+                           "ORDER BY dominio, variavel, arquivo", (rodada,)).fetchall()
+
+def candidatos_repetidos(root_path, dir_names):
+    """
+    Quadros presentes (sem objeto) das rodadas pedidas cujo tamanho coincide com o de
+    outro quadro delas ou de um objeto: lista de (rodada, caminho, tamanho, sha256 ou None).
+    """
+    if not dir_names:
+        return []
+    marcas = ",".join("?" * len(dir_names))
+    sql = (f"SELECT rodada, dominio || '/' || variavel || '/' || arquivo, tamanho, sha256 FROM quadros "
+           f"WHERE objeto IS NULL AND rodada IN ({marcas}) AND tamanho IN ("
+           f"SELECT tamanho FROM quadros WHERE objeto IS NULL AND rodada IN ({marcas}) "
+           f"GROUP BY tamanho HAVING COUNT(*) > 1 UNION SELECT tamanho FROM objetos)")
+    with conectar(root_path) as con:
+        return con.execute(sql, [*dir_names, *dir_names]).fetchall()
+
+def objetos(root_path):
+    """{objeto: tamanho} dos objetos guardados pela deduplicação."""
+    with conectar(root_path) as con:
+        return dict(con.execute("SELECT objeto, tamanho FROM objetos"))
+
+def objetos_sem_referencia(root_path):
+    """{objeto: tamanho} dos objetos que nenhum quadro (publicado, em preparo ou arquivado) referencia."""
+    with conectar(root_path) as con:
+        return dict(con.execute("SELECT objeto, tamanho FROM objetos o WHERE NOT EXISTS "
+                                "(SELECT 1 FROM quadros q WHERE q.objeto = o.objeto)"))
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def comando_importar(args):
+    with conectar(args.web_root) as con, _transacao(con):
+        if args.rodada:
+            n_rodadas, n_quadros = 1, _importar_rodada(con, args.web_root, args.rodada)
+        else:
+            n_rodadas, n_quadros = _importar_tudo(con, args.web_root)
+    print(f"✅ Catálogo atualizado a partir do disco: {n_rodadas} rodada(s), {n_quadros} quadro(s).")
+    return 0
+
+def comando_rodadas(args):
+    lista = rodadas(args.web_root)
+    for rodada in (reversed(lista) if args.decrescente else lista):
+        print(rodada)
+    return 0
+
+def comando_resumo(args):
+    with conectar(args.web_root) as con:
+        for estado, arquivada, n in con.execute("SELECT estado, arquivada, COUNT(*) FROM rodadas GROUP BY estado, arquivada"):
+            print(f"{n:>6} rodada(s) {estado}{' (arquivadas)' if arquivada else ''}")
+        n, total, sem_hash, dedup = con.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamanho), 0), SUM(sha256 IS NULL), SUM(objeto IS NOT NULL) FROM quadros").fetchone()
+        print(f"{n:>6} quadro(s), {total / 1e6:.1f} MB ({sem_hash or 0} sem hash, {dedup or 0} deduplicados)")
+        n, total = con.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM objetos").fetchone()
+        print(f"{n:>6} objeto(s), {total / 1e6:.1f} MB")
+    return 0
+
+def main():
+    """Interpreta o subcomando e o executa."""
+    parser = argparse.ArgumentParser(description="Catálogo SQLite das rodadas e quadros do WEB_ROOT.")
+    parser.add_argument("--web-root", default=WEB_ROOT)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("importar", help="Reconstrói o catálogo (ou uma rodada) a partir do disco.")
+    p.add_argument("--rodada", help="Reimporta só esta rodada (YYYYMMDDHH).")
+    p.set_defaults(funcao=comando_importar)
+
+    p = sub.add_parser("rodadas", help="Lista as rodadas publicadas.")
+    p.add_argument("--decrescente", action="store_true", help="Da mais nova para a mais antiga.")
+    p.set_defaults(funcao=comando_rodadas)
+
+    p = sub.add_parser("resumo", help="Mostra os totais do catálogo.")
+    p.set_defaults(funcao=comando_resumo)
+
+    args = parser.parse_args()
+    sys.exit(args.funcao(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CONVERSÃO DOS WRFOUT PARA ARQUIVAMENTO COMPACTO - UFSC
+
+Os wrfout saem do WRF sem compressão e com todas as variáveis do modelo, e a
+plotagem os lê por inteiro. Esta etapa os reescreve no mesmo lugar e com o
+mesmo nome, para que os leitores (wrfplot, wrf-python) não mudem:
+1. Só as variáveis usadas pela plotagem e pelos produtos (VARIAVEIS_USADAS) são
+   copiadas, com os atributos globais do WRF (projeção, DX, datas...).
+2. Os campos reais vão em float32, em NetCDF4 com blocos (chunks) de um tempo e
+   BLOCO_XY x BLOCO_XY pontos: ler um quadro ou a série de um ponto só
+   descomprime os blocos necessários.
+3. O codec padrão é zlib nível 1 com shuffle (rápido e legível por qualquer
+   netCDF4); --codec zstd usa o Zstandard quando a biblioteca tem suporte.
+4. O arquivo convertido é comparado variável a variável com o original e só então
+   o substitui (os.replace); se a verificação falhar, o original fica intacto.
+5. A vazão (MB/s lidos), a taxa de compressão e o tempo de cada arquivo são relatados.
+6. Uma rodada retomada de um wrfrst deixa um wrfout por trecho (wrfout_d01_<início>,
+   wrfout_d01_<reinício>...). Os trechos são antes juntados no primeiro arquivo,
+   cada um valendo até o início do seguinte; --juntar-segmentos só faz essa junção.
+
+Uso:
+    ./converter_wrfout.py YYYYMMDDHH [--codec zlib|zstd] [--nivel 1] [--todas] [--manter-original]
+    ./converter_wrfout.py YYYYMMDDHH --juntar-segmentos
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+import numpy as np
+import netCDF4
+from netCDF4 import Dataset, chartostring
+
+import rastreamento
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+BLOCO_XY = 64
+MARCA_CONVERTIDO = "CONVERTIDO_UFSC"
+# Variáveis brutas de que o wrf-python precisa para os campos do wrfplot, do
+# exportar_campos.py, do meteograma.py e do lestada.py (as ausentes são ignoradas)
+VARIAVEIS_USADAS = [
+    "Times", "XTIME", "XLAT", "XLONG", "XLAT_U", "XLONG_U", "XLAT_V", "XLONG_V",
+    "HGT", "LANDMASK", "XLAND", "LU_INDEX", "MAPFAC_M", "MAPFAC_U", "MAPFAC_V", "F", "SINALPHA", "COSALPHA",
+    "ZNU", "ZNW", "P_TOP", "P", "PB", "PH", "PHB", "T", "U", "V", "W",
+    "QVAPOR", "QCLOUD", "QRAIN", "QICE", "QSNOW", "QGRAUP", "REFL_10CM",
+    "PSFC", "MU", "MUB", "T2", "Q2", "TH2", "U10", "V10", "TSK", "PBLH",
+    "RAINC", "RAINNC", "SNOWNC", "GRAUPELNC", "HAILNC", "SWDOWN", "GLW", "HFX", "LH",
+]
+
+# ==============================================================================
+# SEÇÃO 1: CÓPIA COMPACTADA
+# ==============================================================================
+
+def blocos(var):
+    """Um tempo por bloco, a coluna vertical inteira e BLOCO_XY x BLOCO_XY pontos na horizontal."""
+    tamanhos = []
+    for dim, n in zip(var.dimensions, var.shape):
+        if dim == "Time":
+            tamanhos.append(1)
+        elif dim.startswith(("south_north", "west_east")):
+            tamanhos.append(max(1, min(n, BLOCO_XY)))
+        else:
+            tamanhos.append(max(1, n))
+    return tamanhos
+
+def tipo_destino(var):
+    """float64 vira float32; os demais tipos (inteiros, caracteres) são mantidos."""
+    return np.dtype("f4") if var.dtype.kind == "f" else var.dtype
+
+def converter(origem, destino, variaveis, codec, nivel):
+    """Escreve em 'destino' o subconjunto compactado de 'origem'. Retorna os nomes copiados."""
+    opcoes = {"compression": codec, "complevel": nivel, "shuffle": True}
+    with Dataset(origem) as src, Dataset(destino, "w", format="NETCDF4") as dst:
+        dst.setncatts({k: src.getncattr(k) for k in src.ncattrs()})
+        dst.setncattr(MARCA_CONVERTIDO, f"float32, {codec} nível {nivel}, blocos de {BLOCO_XY} pontos")
+        nomes = [n for n in (variaveis or list(src.variables)) if n in src.variables]
+        dims = {d for n in nomes for d in src.variables[n].dimensions}
+        for nome, dim in src.dimensions.items():
+            if nome in dims:
+                dst.createDimension(nome, None if dim.isunlimited() else len(dim))
+        for nome in nomes:
+            var = src.variables[nome]
+            var.set_auto_maskandscale(False)
+            atributos = {k: var.getncattr(k) for k in var.ncattrs() if k != "_FillValue"}
+            fill = var.getncattr("_FillValue") if "_FillValue" in var.ncattrs() else None
+            if var.dtype.kind == "S" or not var.dimensions:
+                saida = dst.createVariable(nome, var.dtype, var.dimensions, fill_value=fill)
+            else:
+                saida = dst.createVariable(nome, tipo_destino(var), var.dimensions, chunksizes=blocos(var),
+                                           fill_value=fill, **opcoes)
+            saida.set_auto_maskandscale(False)
+            saida.setncatts(atributos)
+            # Tempo a tempo: a memória fica limitada a um quadro da variável
+            if var.dimensions and var.dimensions[0] == "Time":
+                for t in range(var.shape[0]):
+                    saida[t] = var[t].astype(saida.dtype, copy=False)
+            else:
+                saida[...] = var[...]
+    return nomes
+
+def verificar(origem, destino, nomes):
+    """Compara cada variável copiada (no tipo de destino) e os atributos globais. Retorna a lista de problemas."""
+    problemas = []
+    with Dataset(origem) as src, Dataset(destino) as dst:
+        for k in src.ncattrs():
+            if k not in dst.ncattrs():
+                problemas.append(f"atributo global {k} ausente")
+        for nome in nomes:
+            a, b = src.variables[nome], dst.variables[nome]
+            a.set_auto_maskandscale(False)
+            b.set_auto_maskandscale(False)
+            if a.shape != b.shape:
+                problemas.append(f"{nome}: forma {b.shape} != {a.shape}")
+                continue
+            tempos = range(a.shape[0]) if a.dimensions and a.dimensions[0] == "Time" else [Ellipsis]
+            for t in tempos:
+                esperado = np.asarray(a[t]).astype(b.dtype, copy=False)
+                obtido = np.asarray(b[t])
+                iguais = (np.array_equal(esperado, obtido, equal_nan=True) if esperado.dtype.kind == "f"
+                          else np.array_equal(esperado, obtido))
+                if not iguais:
+                    problemas.append(f"{nome}: valores diferentes no tempo {t}")
+                    break
+    return problemas
+
+def ja_convertido(path):
+    try:
+        with Dataset(path) as nc:
+            return MARCA_CONVERTIDO in nc.ncattrs()
+    except OSError:
+        return False
+
+# ==============================================================================
+# SEÇÃO 2: JUNÇÃO DOS TRECHOS DE UMA RODADA RETOMADA
+# ==============================================================================
+
+def segmentos_por_dominio(arquivos):
+    """{'wrfout_d01': [trechos em ordem de início]} só para os domínios com mais de um arquivo."""
+    grupos = {}
+    for path in arquivos:
+        grupos.setdefault(os.path.basename(path)[:len("wrfout_d01")], []).append(path)
+    return {dominio: sorted(trechos) for dominio, trechos in grupos.items() if len(trechos) > 1}
+
+def tempos(nc):
+    return [str(t) for t in chartostring(nc.variables["Times"][:])]
+
+def juntar(trechos):
+    """Junta os trechos no primeiro arquivo (cada trecho vale até o início do seguinte). Retorna o nº de tempos."""
+    fontes = [Dataset(path) for path in trechos]
+    try:
+        inicios = [tempos(nc)[0] for nc in fontes[1:]] + [None]
+        # Quadros de cada trecho antes do início do seguinte (o reinício reescreve o quadro dele)
+        quadros = [[i for i, t in enumerate(tempos(nc)) if fim is None or t < fim]
+                   for nc, fim in zip(fontes, inicios)]
+        base = fontes[0]
+        tmp_path = f"{trechos[0]}.tmp"
+        with Dataset(tmp_path, "w", format=base.data_model) as dst:
+            dst.setncatts({k: base.getncattr(k) for k in base.ncattrs() if k != MARCA_CONVERTIDO})
+            for nome, dim in base.dimensions.items():
+                dst.createDimension(nome, None if dim.isunlimited() else len(dim))
+            for nome, var in base.variables.items():
+                var.set_auto_maskandscale(False)
+                atributos = {k: var.getncattr(k) for k in var.ncattrs() if k != "_FillValue"}
+                fill = var.getncattr("_FillValue") if "_FillValue" in var.ncattrs() else None
+                saida = dst.createVariable(nome, var.dtype, var.dimensions, fill_value=fill)
+                saida.set_auto_maskandscale(False)
+                saida.setncatts(atributos)
+                if not (var.dimensions and var.dimensions[0] == "Time"):
+                    saida[...] = var[...]
+                    continue
+                k = 0
+                for nc, indices in zip(fontes, quadros):
+                    origem = nc.variables[nome]
+                    origem.set_auto_maskandscale(False)
+                    for t in indices:
+                        saida[k] = origem[t].astype(saida.dtype, copy=False)
+                        k += 1
+    finally:
+        for nc in fontes:
+            nc.close()
+    os.replace(tmp_path, trechos[0])
+    for path in trechos[1:]:
+        os.remove(path)
+    return sum(len(q) for q in quadros)
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Converte os wrfout da rodada, verifica e substitui os originais."""
+    parser = argparse.ArgumentParser(description="Reescreve os wrfout em NetCDF4 float32 compactado e com blocos.")
+    parser.add_argument("date", help="Rodada (YYYYMMDDHH).")
+    parser.add_argument("--codec", choices=["zlib", "zstd"], default="zlib")
+    parser.add_argument("--nivel", type=int, default=1, help="Nível de compressão (1 = mais rápido).")
+    parser.add_argument("--todas", action="store_true", help="Mantém todas as variáveis (só compacta).")
+    parser.add_argument("--manter-original", action="store_true",
+                        help="Grava <wrfout>.nc4 ao lado do original, sem substituí-lo.")
+    parser.add_argument("--juntar-segmentos", action="store_true",
+                        help="Só junta os trechos de uma rodada retomada, sem converter.")
+    args = parser.parse_args()
+
+    print("="*50)
+    print(f"CONVERSÃO DOS WRFOUT PARA ARQUIVAMENTO: {args.date}")
+    print("="*50)
+    if args.codec == "zstd" and not getattr(netCDF4, "__has_zstandard_support__", False):
+        print("❌ ERRO: esta instalação do netCDF4 não tem suporte a Zstandard. Use --codec zlib.")
+        sys.exit(1)
+    wrf_dir = os.path.join(WORK_DIR, args.date, "WRF_RUN", "run_wrf")
+    arquivos = sorted(glob.glob(os.path.join(wrf_dir, "wrfout_d0*")))
+    arquivos = [a for a in arquivos if not a.endswith((".tmp", ".nc4"))]
+    if not arquivos:
+        print(f"❌ ERRO: nenhum wrfout em {wrf_dir}.")
+        sys.exit(1)
+    for dominio, trechos in segmentos_por_dominio(arquivos).items():
+        n = juntar(trechos)
+        print(f"  🔗 {dominio}: {len(trechos)} trechos da rodada retomada juntados ({n} tempos).")
+        arquivos = [a for a in arquivos if a not in trechos[1:]]
+    if args.juntar_segmentos:
+        return
+
+    total_lido, total_gravado, total_s, falhas = 0, 0, 0.0, 0
+    for origem in arquivos:
+        nome = os.path.basename(origem)
+        if ja_convertido(origem):
+            print(f"  ⏭️ {nome}: já convertido.")
+            continue
+        tmp_path = f"{origem}.tmp"
+        t0 = time.perf_counter()
+        with rastreamento.span("converter", variavel=nome):
+            nomes = converter(origem, tmp_path, None if args.todas else VARIAVEIS_USADAS, args.codec, args.nivel)
+            problemas = verificar(origem, tmp_path, nomes)
+        duracao = time.perf_counter() - t0
+        if problemas:
+            print(f"  ❌ {nome}: verificação falhou ({'; '.join(problemas[:3])}). Original mantido.")
+            os.remove(tmp_path)
+            falhas += 1
+            continue
+        lido, gravado = os.path.getsize(origem), os.path.getsize(tmp_path)
+        os.replace(tmp_path, f"{origem}.nc4" if args.manter_original else origem)
+        total_lido += lido
+        total_gravado += gravado
+        total_s += duracao
+        print(f"  ✅ {nome}: {len(nomes)} variáveis, {lido / 1e6:.0f} MB -> {gravado / 1e6:.0f} MB "
+              f"({lido / max(gravado, 1):.1f}x) em {duracao:.1f}s ({lido / 1e6 / max(duracao, 1e-9):.0f} MB/s)")
+
+    if total_lido:
+        print(f"\nTotal: {total_lido / 1e6:.0f} MB -> {total_gravado / 1e6:.0f} MB "
+              f"({total_lido / max(total_gravado, 1):.1f}x), {total_lido / 1e6 / max(total_s, 1e-9):.0f} MB/s "
+              f"incluindo a verificação.")
+    if falhas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
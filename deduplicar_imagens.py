@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+DEDUPLICAÇÃO DE IMAGENS POR CONTEÚDO ENTRE RODADAS E VARIÁVEIS - UFSC
+
+Vários quadros saem idênticos byte a byte (precipitação vazia na hora 0,
+sobreposições constantes, campos iguais entre rodadas) e cada um é guardado e
+enviado pelo lftp separadamente. Este script:
+1. Consulta no catálogo SQLite (catalogo_quadros.py) os PNGs de WEB_ROOT/<rodada>/d0*/
+   cujo tamanho coincide com o de outro quadro ou objeto. O SHA-256 vem do catálogo
+   (gravado na plotagem); só é calculado para quadros importados do disco sem hash.
+2. Guarda cada conteúdo repetido uma única vez em WEB_ROOT/objetos/<ab>/<sha256>.png.
+3. Remove as cópias das rodadas e registra em <rodada>/referencias.json para
+   onde cada quadro aponta; o orquestrador leva essas referências ao data.js.
+4. Remove objetos que nenhum quadro do catálogo referencia mais.
+5. Reporta os bytes economizados no disco e no próximo lftp mirror.
+
+Com --rodada, só a rodada indicada é comparada com as N rodadas anteriores e com
+os objetos já armazenados, sem varrer o arquivo inteiro, e só ela é alterada. A
+coleta dos objetos sem uso é uma consulta ao catálogo e roda nos dois modos; as
+execuções (dos dois ciclos) são serializadas por uma trava em WEB_ROOT/.catalogo.
+
+Uso:
+    ./deduplicar_imagens.py [--rodada YYYYMMDDHH [--vizinhas 1]] [--simular]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import json
+import fcntl
+import argparse
+from collections import defaultdict
+from contextlib import contextmanager
+
+import orquestrador_web
+import catalogo_quadros
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WEB_ROOT = orquestrador_web.WEB_ROOT
+OBJETOS_DIR = "objetos"
+TRAVA_DEDUPLICACAO = os.path.join(".catalogo", "deduplicacao.trava")
+VIZINHAS_PADRAO = 1
+
+@contextmanager
+def _trava_deduplicacao(root_path):
+    """
+    Uma deduplicação por vez: a coleta de outro ciclo não pode remover um objeto sem
+    uso que esta execução acabou de planejar reaproveitar.
+    """
+    trava_path = os.path.join(root_path, TRAVA_DEDUPLICACAO)
+    os.makedirs(os.path.dirname(trava_path), exist_ok=True)
+    with open(trava_path, 'w') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+def caminho_objeto(digest):
+    """Caminho do objeto relativo ao WEB_ROOT."""
+    return f"{OBJETOS_DIR}/{digest[:2]}/{digest}.png"
+
+def objetos_armazenados(root_path):
+    """{digest: tamanho} dos objetos já existentes, segundo o catálogo."""
+    return {os.path.basename(objeto)[:-4]: tamanho for objeto, tamanho in catalogo_quadros.objetos(root_path).items()}
+
+def rodadas_alvo(root_path, rodada, vizinhas):
+    """Rodadas a comparar: todas as não arquivadas, ou a indicada e as N anteriores."""
+    todas = catalogo_quadros.rodadas(root_path, arquivada=False)
+    if not rodada:
+        return todas
+    anteriores = [d for d in todas if d < rodada][-vizinhas:] if vizinhas > 0 else []
+    # A rodada nova normalmente ainda está no diretório de preparo
+    existe = os.path.isdir(orquestrador_web.diretorio_da_rodada(root_path, rodada))
+    return anteriores + ([rodada] if existe else [])
+
+def planejar(root_path, dir_names):
+    """
+    Retorna {digest: [(rodada, caminho, tamanho), ...]} dos conteúdos que aparecem mais
+    de uma vez (contando objetos já armazenados). Os candidatos (tamanho igual ao de outro
+    quadro ou objeto) saem do catálogo; só os que ainda não têm hash são lidos.
+    """
+    objetos = objetos_armazenados(root_path)
+    por_hash = defaultdict(list)
+    calculados = []
+    for dir_name, caminho, tamanho, digest in catalogo_quadros.candidatos_repetidos(root_path, dir_names):
+        if digest is None:
+            forecast_dir = orquestrador_web.diretorio_da_rodada(root_path, dir_name)
+            try:
+                digest = catalogo_quadros.hash_arquivo(os.path.join(forecast_dir, caminho))
+            except OSError:
+                continue
+            calculados.append((dir_name, caminho, digest))
+        por_hash[digest].append((dir_name, caminho, tamanho))
+    if calculados:
+        catalogo_quadros.gravar_hashes(root_path, calculados)
+
+    repetidos = {}
+    for digest, quadros in por_hash.items():
+        if len(quadros) < 2 and digest not in objetos:
+            continue
+        # O catálogo pode estar atrás do disco (quadro apagado à mão): só entram cópias existentes
+        quadros = [q for q in quadros
+                   if os.path.isfile(os.path.join(orquestrador_web.diretorio_da_rodada(root_path, q[0]), q[1]))]
+        if len(quadros) > 1 or (quadros and digest in objetos):
+            repetidos[digest] = quadros
+    return repetidos, objetos
+
+def economia(repetidos, objetos, editaveis):
+    """
+    Bytes economizados (disco, envio). Só as cópias em rodadas editáveis são removidas.
+    Um objeto novo é hardlink de uma cópia: no disco só custa se todas as cópias saírem,
+    mas para o lftp é sempre um arquivo a mais.
+    """
+    disco, envio, copias = 0, 0, 0
+    for digest, quadros in repetidos.items():
+        tamanho = quadros[0][2]
+        removidas = sum(1 for q in quadros if q[0] in editaveis)
+        if not removidas:
+            continue
+        copias += removidas
+        novo = digest not in objetos
+        disco += tamanho * (removidas - (1 if novo and removidas == len(quadros) else 0))
+        envio += tamanho * (removidas - (1 if novo else 0))
+    return disco, envio, copias
+
+def aplicar(root_path, repetidos, objetos, editaveis):
+    """
+    Cria os objetos que faltam, remove as cópias das rodadas editáveis e atualiza as
+    referências delas. As demais rodadas só servem de origem para os objetos.
+    Retorna as rodadas alteradas.
+    """
+    novas_referencias = defaultdict(dict)
+    novos_objetos = {}
+    for digest, quadros in repetidos.items():
+        alvo = [q for q in quadros if q[0] in editaveis]
+        if not alvo:
+            continue
+        objeto = caminho_objeto(digest)
+        if digest not in objetos:
+            objeto_path = os.path.join(root_path, objeto)
+            os.makedirs(os.path.dirname(objeto_path), exist_ok=True)
+            # Hardlink de uma cópia: o conteúdo não é copiado, só ganha um segundo nome
+            tmp_path = f"{objeto_path}.tmp{os.getpid()}"
+            origem = orquestrador_web.diretorio_da_rodada(root_path, quadros[0][0])
+            os.link(os.path.join(origem, quadros[0][1]), tmp_path)
+            os.replace(tmp_path, objeto_path)
+            novos_objetos[objeto] = quadros[0][2]
+        for dir_name, caminho, _ in alvo:
+            novas_referencias[dir_name][caminho] = objeto
+
+    for dir_name, referencias in novas_referencias.items():
+        forecast_dir = orquestrador_web.diretorio_da_rodada(root_path, dir_name)
+        todas = orquestrador_web.ler_referencias(forecast_dir)
+        todas.update(referencias)
+        ref_path = os.path.join(forecast_dir, orquestrador_web.REFERENCIAS_QUADROS)
+        tmp_path = f"{ref_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(todas, f, separators=(',', ':'))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, ref_path)
+    catalogo_quadros.referenciar(root_path, novas_referencias, novos_objetos)
+
+    # As cópias só são removidas depois de as referências estarem gravadas (arquivo e catálogo)
+    for dir_name, referencias in novas_referencias.items():
+        forecast_dir = orquestrador_web.diretorio_da_rodada(root_path, dir_name)
+        for caminho in referencias:
+            os.remove(os.path.join(forecast_dir, caminho))
+        orquestrador_web.generate_forecast_viewer(forecast_dir)
+    return sorted(novas_referencias)
+
+def coletar_objetos(root_path):
+    """
+    Remove objetos que nenhum quadro do catálogo referencia (rodadas publicadas, em
+    montagem ou arquivadas) nem a versão publicada de uma rodada em replotagem. Rodadas
+    apagadas à mão só soltam seus objetos depois de 'catalogo_quadros.py importar'.
+    Retorna os bytes liberados.
+    """
+    sem_uso = catalogo_quadros.objetos_sem_referencia(root_path)
+    # Rodada sendo replotada: o catálogo já tem os quadros novos, mas a versão publicada
+    # continua apontando para os objetos antigos até a etapa 'web' trocar os diretórios
+    for dir_name in orquestrador_web.rodadas_em_preparo(root_path):
+        for objeto in orquestrador_web.ler_referencias(os.path.join(root_path, dir_name)).values():
+            sem_uso.pop(objeto, None)
+    liberados = 0
+    for objeto, tamanho in sem_uso.items():
+        objeto_path = os.path.join(root_path, objeto)
+        if os.path.isfile(objeto_path):
+            os.remove(objeto_path)
+            liberados += tamanho
+        if os.path.isdir(os.path.dirname(objeto_path)) and not os.listdir(os.path.dirname(objeto_path)):
+            os.rmdir(os.path.dirname(objeto_path))
+    catalogo_quadros.remover_objetos(root_path, sem_uso)
+    return liberados
+
+def deduplicar(args):
+    """Planeja, aplica (fora do --simular) e coleta os objetos sem uso."""
+    dir_names = rodadas_alvo(args.web_root, args.rodada, args.vizinhas)
+    # Com --rodada só ela é alterada: as vizinhas podem estar sendo lidas pelo
+    # orquestrador em paralelo e ficam para a próxima varredura completa.
+    editaveis = {args.rodada} if args.rodada else set(dir_names)
+    repetidos, objetos = planejar(args.web_root, dir_names)
+    disco, envio, copias = economia(repetidos, objetos, editaveis)
+    print(f"-> {len(dir_names)} rodada(s) comparada(s): {len(repetidos)} conteúdo(s) repetido(s), "
+          f"{copias} cópia(s) a remover.")
+
+    if args.simular:
+        print(f"\nEconomia estimada: {disco / 1e6:.2f} MB no disco e {envio / 1e6:.2f} MB no envio ao servidor.")
+        return
+    try:
+        alteradas = aplicar(args.web_root, repetidos, objetos, editaveis)
+        # O catálogo enxerga as referências de todas as rodadas, inclusive com --rodada
+        liberados = coletar_objetos(args.web_root)
+    except OSError as e:
+        print(f"❌ ERRO durante a deduplicação: {e}")
+        sys.exit(1)
+    for dir_name in alteradas:
+        print(f"✅ {dir_name}: referências atualizadas.")
+    print(f"\nEconomia: {disco / 1e6:.2f} MB no disco e {envio / 1e6:.2f} MB no próximo lftp mirror.")
+    if liberados:
+        print(f"-> {liberados / 1e6:.2f} MB de objetos sem uso removidos.")
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Deduplica os quadros e reporta a economia de espaço e de envio."""
+    parser = argparse.ArgumentParser(description="Deduplica PNGs idênticos entre rodadas e variáveis.")
+    parser.add_argument("--rodada", help="Compara só esta rodada (YYYYMMDDHH) com as anteriores e os objetos.")
+    parser.add_argument("--vizinhas", type=int, default=VIZINHAS_PADRAO,
+                        help="Rodadas anteriores comparadas com --rodada.")
+    parser.add_argument("--web-root", default=WEB_ROOT)
+    parser.add_argument("--simular", action="store_true", help="Só reporta, sem alterar nada.")
+    args = parser.parse_args()
+
+    print("="*50)
+    print("DEDUPLICAÇÃO DE IMAGENS")
+    print("="*50)
+    with _trava_deduplicacao(args.web_root):
+        deduplicar(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ESCRITA DIRETA DOS INTERMEDIÁRIOS DO WPS A PARTIR DO REGRID - UFSC
+
+Cada campo do ICON era decodificado do GRIB2, regradeado pelo cdo, recodificado
+em GRIB2, concatenado pelo grib_copy e decodificado de novo pelo ungrib.exe.
+Com o regrid gravando NetCDF (trazer_icon_sul_br.sh com ICON_INTERMEDIARIO=1),
+este script grava os FILE:YYYY-MM-DD_HH diretamente:
+1. A Vtable (Vtable.ICONp) é lida como o ungrib a lê: cada arquivo do ICON é
+   associado a uma linha pelos códigos GRIB2 (disciplina, categoria, parâmetro,
+   tipo de nível) e pelo nível, e a linha dá o nome, a unidade e a descrição.
+2. Os níveis seguem a convenção do ungrib: pressão em Pa, 200100 para superfície,
+   2 m, 10 m e camadas de solo, e 201300 para o nível do mar. O geopotencial (FI)
+   vira altura dividindo por 9.81, como o ungrib faz com o parâmetro 0/3/4.
+3. Os registros são Fortran sem formatação, big-endian, versão 5 do formato
+   intermediário, em projeção lat-lon (iproj 0) com o canto SW da grade regular.
+4. Cada instante é um arquivo independente, gravado em paralelo e de forma
+   atômica (temporário + os.replace) em $WORK_DIR/<rodada>/intermediario/.
+
+Uso:
+    ./escrever_intermediario.py YYYYMMDDHH [--vtable Vtable.ICONp] [--processos 4] [--origem DIR]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import re
+import sys
+import glob
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from netCDF4 import Dataset
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+REGRID_NC_DIR = os.path.join("regrid", "netcdf")
+INTERMEDIARIO_DIR = "intermediario"
+PREFIXO = "FILE"
+VERSAO_FORMATO = 5
+FONTE = "DWD ICON"
+RAIO_TERRA_KM = 6371.229
+GRAVIDADE = 9.81
+VALOR_AUSENTE = -1.0e30
+NIVEL_SUPERFICIE = 200100.0
+NIVEL_MAR = 201300.0
+
+# Códigos GRIB2 (disciplina, categoria, parâmetro, tipo de nível) das variáveis do ICON
+CODIGOS_ICON = {
+    "T": (0, 0, 0, 100), "U": (0, 2, 2, 100), "V": (0, 2, 3, 100),
+    "RELHUM": (0, 1, 1, 100), "FI": (0, 3, 4, 100),
+    "T_2M": (0, 0, 0, 103), "RELHUM_2M": (0, 1, 1, 103),
+    "U_10M": (0, 2, 2, 103), "V_10M": (0, 2, 3, 103),
+    "PS": (0, 3, 0, 1), "PMSL": (0, 3, 1, 101), "T_G": (0, 0, 0, 1),
+    "HSURF": (0, 3, 6, 1), "T_SO": (2, 3, 18, 106), "W_SO": (2, 3, 20, 106),
+}
+# Altura (m) dos campos de nível fixo acima do solo, como no nível 1 da Vtable
+ALTURA_ICON = {"T_2M": 2, "RELHUM_2M": 2, "U_10M": 10, "V_10M": 10}
+# Nomes dos arquivos regradeados: sulbr_icon_global_icosahedral_<tipo>_<rodada>_[HHH_][nível_]<VAR>.nc
+PADRAO_ARQUIVO = re.compile(
+    r"_(?P<tipo>pressure-level|single-level|soil-level|time-invariant)_\d{10}"
+    r"(?:_(?P<hora>\d{3}))?(?:_(?P<nivel>\d+))?_(?P<var>[A-Z0-9_]+?)\.nc$")
+
+# ==============================================================================
+# SEÇÃO 1: VTABLE E IDENTIFICAÇÃO DOS CAMPOS
+# ==============================================================================
+
+def ler_vtable(path):
+    """Linhas da Vtable: {(disc, cat, param, tipo_nivel): [(nivel1, nome, unidade, descricao)]}."""
+    tabela = {}
+    with open(path) as f:
+        for linha in f:
+            colunas = [c.strip() for c in linha.split("|")]
+            if len(colunas) < 11 or not colunas[0].isdigit() or not colunas[4]:
+                continue
+            try:
+                chave = tuple(int(c) for c in colunas[7:11])
+            except ValueError:
+                continue
+            tabela.setdefault(chave, []).append((colunas[2], colunas[4], colunas[5], colunas[6]))
+    return tabela
+
+def identificar(nome_arquivo, vtable):
+    """(hora, campo, unidade, descricao, xlvl, fator) do arquivo, ou None se a Vtable não o usa."""
+    m = PADRAO_ARQUIVO.search(nome_arquivo)
+    if not m or m.group("var") not in CODIGOS_ICON:
+        return None
+    var, tipo = m.group("var"), m.group("tipo")
+    codigos = CODIGOS_ICON[var]
+    nivel = int(m.group("nivel") or ALTURA_ICON.get(var, 0))
+    for nivel1, campo, unidade, descricao in vtable.get(codigos, []):
+        if nivel1 != "*" and int(nivel1) != nivel:
+            continue
+        if codigos[3] == 100:
+            xlvl = nivel * 100.0
+        elif codigos[3] == 101:
+            xlvl = NIVEL_MAR
+        else:
+            xlvl = NIVEL_SUPERFICIE
+        fator = 1.0 / GRAVIDADE if codigos[:3] == (0, 3, 4) else 1.0
+        hora = None if tipo == "time-invariant" else int(m.group("hora"))
+        return hora, campo, unidade, descricao, xlvl, fator
+    return None
+
+def ler_campo(path):
+    """(lat, lon, campo 2D float32 com o sul na primeira linha) do NetCDF gravado pelo cdo."""
+    with Dataset(path) as nc:
+        lat = np.asarray(nc.variables["lat"][:], dtype="f8")
+        lon = np.asarray(nc.variables["lon"][:], dtype="f8")
+        coordenadas = set(nc.dimensions) | {"lat", "lon"}
+        nome = next(n for n, v in nc.variables.items()
+                    if n not in coordenadas and not n.endswith("_bnds") and v.ndim >= 2)
+        campo = np.ma.filled(np.ma.masked_invalid(nc.variables[nome][:].astype("f4")), VALOR_AUSENTE)
+    campo = campo.reshape(campo.shape[-2:])
+    if lat[0] > lat[-1]:
+        lat, campo = lat[::-1], campo[::-1]
+    return lat, lon, campo
+
+# ==============================================================================
+# SEÇÃO 2: FORMATO INTERMEDIÁRIO DO WPS
+# ==============================================================================
+
+def registro(*partes):
+    """Registro Fortran sequencial: marcador de tamanho big-endian antes e depois dos dados."""
+    dados = b"".join(partes)
+    marcador = np.array([len(dados)], dtype=">i4").tobytes()
+    return marcador + dados + marcador
+
+def texto(valor, tamanho):
+    return valor.encode("ascii")[:tamanho].ljust(tamanho)
+
+def registros_campo(hdate, xfcst, campo, unidade, descricao, xlvl, lat, lon, dados):
+    """Os cinco registros de um campo (versão 5, projeção lat-lon)."""
+    ny, nx = dados.shape
+    return (
+        registro(np.array([VERSAO_FORMATO], dtype=">i4").tobytes())
+        + registro(texto(hdate, 24), np.array([xfcst], dtype=">f4").tobytes(), texto(FONTE, 32),
+                   texto(campo, 9), texto(unidade, 25), texto(descricao, 46),
+                   np.array([xlvl], dtype=">f4").tobytes(), np.array([nx, ny, 0], dtype=">i4").tobytes())
+        + registro(texto("SWCORNER", 8),
+                   np.array([lat[0], lon[0], lat[1] - lat[0], lon[1] - lon[0], RAIO_TERRA_KM], dtype=">f4").tobytes())
+        # is_wind_grid_rel = .false.: na grade lat-lon os ventos são relativos à Terra
+        + registro(np.array([0], dtype=">i4").tobytes())
+        + registro(np.ascontiguousarray(dados, dtype=">f4").tobytes())
+    )
+
+def escrever_instante(destino, inicio, hora, campos):
+    """Grava PREFIXO:YYYY-MM-DD_HH com os campos [(path, campo, unidade, descricao, xlvl, fator)]."""
+    valido = inicio + timedelta(hours=hora)
+    hdate = valido.strftime("%Y-%m-%d_%H:%M:%S")
+    caminho = os.path.join(destino, f"{PREFIXO}:{valido.strftime('%Y-%m-%d_%H')}")
+    tmp_path = f"{caminho}.tmp"
+    # Ordem estável (campo, nível decrescente), como o ungrib grava
+    campos = sorted(campos, key=lambda c: (c[1], -c[4]))
+    with open(tmp_path, "wb") as f:
+        for path, campo, unidade, descricao, xlvl, fator in campos:
+            lat, lon, dados = ler_campo(path)
+            if fator != 1.0:
+                dados = np.where(dados == VALOR_AUSENTE, dados, dados * fator)
+            f.write(registros_campo(hdate, float(hora), campo, unidade, descricao, xlvl, lat, lon, dados))
+    os.replace(tmp_path, caminho)
+    os.chmod(caminho, 0o644)
+    return os.path.basename(caminho), len(campos)
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Agrupa os NetCDF regradeados por hora e grava um intermediário por instante."""
+    parser = argparse.ArgumentParser(description="Grava os intermediários do WPS a partir do regrid em NetCDF.")
+    parser.add_argument("date", help="Rodada (YYYYMMDDHH).")
+    parser.add_argument("--vtable", default=os.path.join(WORK_DIR, "template", "Vtable.ICONp"))
+    parser.add_argument("--processos", type=int, default=4, help="Instantes gravados em paralelo.")
+    parser.add_argument("--origem", help="Diretório dos NetCDF regradeados (padrão: regrid/netcdf da rodada; "
+                                         "o trazer_icon_sul_br.sh passa o do staging).")
+    args = parser.parse_args()
+
+    print("="*50)
+    print(f"ESCRITA DOS INTERMEDIÁRIOS DO WPS: {args.date}")
+    print("="*50)
+    origem = args.origem or os.path.join(WORK_DIR, args.date, REGRID_NC_DIR)
+    destino = os.path.join(WORK_DIR, args.date, INTERMEDIARIO_DIR)
+    arquivos = sorted(glob.glob(os.path.join(origem, "*.nc")))
+    if not arquivos:
+        print(f"❌ ERRO: nenhum NetCDF regradeado em {origem}.")
+        sys.exit(1)
+    if not os.path.isfile(args.vtable):
+        print(f"❌ ERRO: Vtable não encontrada: {args.vtable}")
+        sys.exit(1)
+    vtable = ler_vtable(args.vtable)
+
+    por_hora, invariantes, ignorados = {}, [], 0
+    for path in arquivos:
+        info = identificar(os.path.basename(path), vtable)
+        if info is None:
+            ignorados += 1
+            continue
+        hora, *campo = info
+        if hora is None:
+            invariantes.append((path, *campo))
+        else:
+            por_hora.setdefault(hora, []).append((path, *campo))
+    if not por_hora:
+        print("❌ ERRO: nenhum campo da Vtable entre os arquivos regradeados.")
+        sys.exit(1)
+    print(f"  {len(arquivos) - ignorados} campos da Vtable em {len(por_hora)} instantes "
+          f"({ignorados} arquivos fora da Vtable ignorados).")
+
+    os.makedirs(destino, exist_ok=True)
+    inicio = datetime.strptime(args.date, "%Y%m%d%H")
+    # Campos invariantes (SOILHGT) entram em todos os instantes, como nos GRIB de cada hora
+    with ProcessPoolExecutor(max_workers=max(1, args.processos)) as executor:
+        futuros = [executor.submit(escrever_instante, destino, inicio, hora, campos + invariantes)
+                   for hora, campos in sorted(por_hora.items())]
+        for futuro in futuros:
+            nome, n = futuro.result()
+            print(f"  ✅ {nome}: {n} campos")
+    print(f"\n✅ {len(futuros)} intermediários em {destino}")
+
+if __name__ == "__main__":
+    main()
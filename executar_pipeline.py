@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+EXECUTOR DA CADEIA WRF-ICON COMO GRAFO DE ETAPAS (DAG) - UFSC
+
+Substitui a sequência linear do 'executar_tudo.sh':
+1. Cada etapa declara suas dependências, entradas e saídas (padrões glob). Uma
+   dependência opcional ('depende_opcional') só é esperada: se falhar, a etapa
+   roda mesmo assim com o que existir.
+2. Uma etapa é considerada concluída quando suas saídas existem e o hash do
+   conteúdo das entradas (mais o comando) é igual ao registrado na última
+   execução bem-sucedida. Assim a cadeia retoma na primeira etapa incompleta.
+3. Etapas independentes rodam em paralelo (ex.: plotagem d01 e d02, ou a
+   regeneração web das rodadas antigas enquanto o WRF roda).
+4. Cada etapa reserva seus núcleos ('nucleos', padrão 1) no registro comum aos
+   ciclos (reservas_cpu.py) antes de rodar; com 'nucleos_min' a reserva é
+   elástica. O WRF reserva os slots do mpirun dentro do rodar_wps_wrf.sh.
+
+Uso:
+    ./executar_pipeline.py [--date YYYYMMDDHH] [--scripts-dir DIR] [--paralelo N]
+                           [--desde ETAPA] [--forcar] [--pular ETAPA,...] [--listar]
+
+Para testar sem o modelo, aponte --scripts-dir para 'stubs/etapas' e defina
+WORK_DIR e WEB_ROOT para diretórios temporários.
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import json
+import glob
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import rastreamento
+import reservas_cpu
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+WEB_ROOT = os.environ.get("WEB_ROOT", "/var/www/html")
+SCRIPTS_DIR = os.environ.get("SCRIPTS_DIR", "/home/geral1/scripts_previsao_UFSC")
+CACHE_FILENAME = ".cache_etapas.json"
+TIMELINE_FILENAME = "timeline.jsonl"
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+# ==============================================================================
+# SEÇÃO 1: DEFINIÇÃO DAS ETAPAS
+# ==============================================================================
+
+def definir_etapas(date_arg, scripts_dir):
+    """Retorna a lista de etapas da cadeia para a data fornecida."""
+    run_dir = os.path.join(WORK_DIR, date_arg)
+    wrf_dir = os.path.join(run_dir, "WRF_RUN", "run_wrf")
+    web_dir = os.path.join(WEB_ROOT, date_arg)
+    preparo_dir = os.path.join(WEB_ROOT, ".preparo", date_arg)
+    python = sys.executable or "python3"
+
+    etapas = [
+        {
+            "nome": "icon",
+            "comando": [os.path.join(scripts_dir, "trazer_icon_sul_br.sh"), date_arg],
+            "depende": [],
+            # Regrid com o cdo: usa o que o pós-processamento do outro ciclo deixar livre
+            "nucleos": 10,
+            "nucleos_min": 1,
+            "entradas": [],
+            # GRIB2 concatenados ou, com ICON_INTERMEDIARIO=1, os intermediários do WPS
+            "saidas": [[os.path.join(run_dir, "regrid", "concatenado", "icon_sulbr_*.grib2"),
+                        os.path.join(run_dir, "intermediario", "FILE:*")]],
+        },
+        {
+            "nome": "wrf",
+            "comando": [os.path.join(scripts_dir, "rodar_wps_wrf.sh"), date_arg],
+            "depende": ["icon"],
+            # Os slots do mpirun são reservados pelo próprio script (classe 'wrf')
+            "nucleos": 0,
+            "entradas": [os.path.join(run_dir, "regrid", "concatenado", "icon_sulbr_*.grib2"),
+                         os.path.join(run_dir, "intermediario", "FILE:*")],
+            "saidas": [os.path.join(wrf_dir, "wrfout_d01_*"), os.path.join(wrf_dir, "wrfout_d02_*")],
+        },
+        {
+            # Reescreve os wrfout (mesmo nome) em float32 compactado, só com as variáveis usadas
+            "nome": "converter",
+            "comando": [python, os.path.join(scripts_dir, "converter_wrfout.py"), date_arg],
+            "depende": ["wrf"],
+            "entradas": [os.path.join(wrf_dir, "wrfout_d0*")],
+            "saidas": [os.path.join(wrf_dir, "wrfout_d01_*"), os.path.join(wrf_dir, "wrfout_d02_*")],
+        },
+        {
+            # Retenção das rodadas antigas em $WORK_DIR (intermediários e orçamento de disco);
+            # libera espaço enquanto o ICON da rodada atual é baixado.
+            "nome": "armazenamento",
+            "comando": [python, os.path.join(scripts_dir, "politica_armazenamento.py"), "reter", "--excluir", date_arg],
+            "depende": [],
+            "nucleos": 0,
+            "entradas": [],
+            "saidas": [],
+        },
+        {
+            # Compacta as rodadas antigas antes de o histórico ser regenerado.
+            "nome": "arquivar",
+            "comando": [python, os.path.join(scripts_dir, "arquivar_rodadas.py"), "--excluir", date_arg],
+            "depende": [],
+            "nucleos": 0,
+            "entradas": [],
+            "saidas": [],
+        },
+        {
+            # Não depende da rodada atual: roda enquanto o WRF integra.
+            "nome": "web_historico",
+            "comando": [python, os.path.join(scripts_dir, "orquestrador_web.py"), "--excluir", date_arg],
+            "depende": ["arquivar"],
+            "entradas": [],
+            "saidas": [],
+        },
+    ]
+    for domain in ("d01", "d02"):
+        etapas.append({
+            "nome": f"plot_{domain}",
+            "comando": [os.path.join(scripts_dir, "plotar_rodadas_diaria.sh"), date_arg, domain],
+            "depende": ["converter"],
+            "entradas": [os.path.join(wrf_dir, f"wrfout_{domain}_*")],
+            # Os PNGs são montados no preparo e só depois publicados pela etapa 'web'
+            "saidas": [[os.path.join(preparo_dir, domain, "*", "*.png"), os.path.join(web_dir, domain, "*", "*.png")]],
+        })
+    etapas += [
+        {
+            # Campos quantizados para a página em canvas (roda em paralelo com a plotagem)
+            "nome": "campos",
+            "comando": [python, os.path.join(scripts_dir, "exportar_campos.py"), date_arg],
+            "depende": ["converter"],
+            "entradas": [os.path.join(wrf_dir, "wrfout_d0*")],
+            "saidas": [[os.path.join(preparo_dir, "campos", "indice.json"), os.path.join(web_dir, "campos", "indice.json")]],
+        },
+        {
+            # Séries por cidade (meteogramas), com os índices de grade em cache
+            "nome": "meteograma",
+            "comando": [python, os.path.join(scripts_dir, "meteograma.py"), date_arg],
+            "depende": ["converter"],
+            "entradas": [os.path.join(wrf_dir, "wrfout_d0*"), os.path.join(scripts_dir, "cidades_sc_rs.csv")],
+            "saidas": [[os.path.join(preparo_dir, "meteograma.json"), os.path.join(web_dir, "meteograma.json")]],
+        },
+        {
+            # Detecção de lestada no litoral (linhas do tempo por trecho e mapas)
+            "nome": "lestada",
+            "comando": [python, os.path.join(scripts_dir, "lestada.py"), date_arg],
+            "depende": ["converter"],
+            "entradas": [os.path.join(wrf_dir, "wrfout_d0*")],
+            "saidas": [[os.path.join(preparo_dir, "lestada", "eventos.json"), os.path.join(web_dir, "lestada", "eventos.json")]],
+        },
+        {
+            # Troca os quadros repetidos da rodada por referências ao armazenamento comum.
+            "nome": "deduplicar",
+            "comando": [python, os.path.join(scripts_dir, "deduplicar_imagens.py"), "--rodada", date_arg],
+            "depende": ["plot_d01", "plot_d02"],
+            "entradas": [],
+            "saidas": [],
+        },
+        {
+            "nome": "web",
+            "comando": [python, os.path.join(scripts_dir, "orquestrador_web.py"), "--rodada", date_arg],
+            "depende": ["deduplicar"],
+            # Produtos derivados: a falha de um deles não impede a publicação da rodada
+            "depende_opcional": ["campos", "meteograma", "lestada"],
+            # Qualquer arquivo no preparo muda a chave: rodada montada ainda não publicada
+            "entradas": [os.path.join(web_dir, "d0*", "*", "*.png"),
+                         os.path.join(preparo_dir, "*"), os.path.join(preparo_dir, "d0*", "*", "*.png")],
+            "saidas": [os.path.join(web_dir, "data.js"), os.path.join(web_dir, "index.html")],
+        },
+        {
+            "nome": "sync",
+            "comando": [os.path.join(scripts_dir, "sync_html.sh")],
+            "depende": ["web", "web_historico"],
+            "nucleos": 0,
+            "entradas": [],
+            "saidas": [],
+        },
+    ]
+    return etapas
+
+def todas_as_dependencias(etapa):
+    """Dependências obrigatórias e opcionais da etapa."""
+    return etapa["depende"] + etapa.get("depende_opcional", [])
+
+def ordenar_etapas(etapas):
+    """Ordena topologicamente as etapas, falhando em dependências inválidas ou ciclos."""
+    por_nome = {e["nome"]: e for e in etapas}
+    for etapa in etapas:
+        for dep in todas_as_dependencias(etapa):
+            if dep not in por_nome:
+                raise ValueError(f"Etapa '{etapa['nome']}' depende de '{dep}', que não existe.")
+    ordem, visitando, visitadas = [], set(), set()
+
+    def visitar(nome):
+        if nome in visitadas:
+            return
+        if nome in visitando:
+            raise ValueError(f"Ciclo de dependências envolvendo a etapa '{nome}'.")
+        visitando.add(nome)
+        for dep in todas_as_dependencias(por_nome[nome]):
+            visitar(dep)
+        visitando.discard(nome)
+        visitadas.add(nome)
+        ordem.append(por_nome[nome])
+
+    for etapa in etapas:
+        visitar(etapa["nome"])
+    return ordem
+
+def dependentes_de(etapas, nomes):
+    """Retorna o conjunto formado por 'nomes' e todas as etapas que dependem deles."""
+    resultado = set(nomes)
+    mudou = True
+    while mudou:
+        mudou = False
+        for etapa in etapas:
+            if etapa["nome"] not in resultado and resultado.intersection(todas_as_dependencias(etapa)):
+                resultado.add(etapa["nome"])
+                mudou = True
+    return resultado
+
+# ==============================================================================
+# SEÇÃO 2: CACHE POR HASH DE CONTEÚDO
+# ==============================================================================
+
+def carregar_cache(cache_path):
+    """Lê o cache de etapas; retorna uma estrutura vazia se não existir ou estiver corrompido."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        cache.setdefault("etapas", {})
+        cache.setdefault("arquivos", {})
+        return cache
+    except (IOError, ValueError):
+        return {"etapas": {}, "arquivos": {}}
+
+def salvar_cache(cache_path, cache):
+    """Grava o cache via arquivo temporário, para nunca deixá-lo pela metade."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+def hash_arquivo(path, cache):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo.
+    O resultado é memorizado por (tamanho, mtime) para não reler wrfouts de vários GB.
+    """
+    st = os.stat(path)
+    assinatura = [st.st_size, st.st_mtime_ns]
+    memo = cache["arquivos"].get(path)
+    if memo and memo["assinatura"] == assinatura:
+        return memo["sha256"]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            h.update(bloco)
+    cache["arquivos"][path] = {"assinatura": assinatura, "sha256": h.hexdigest()}
+    return h.hexdigest()
+
+def expandir_padroes(padroes):
+    """Expande os padrões glob em uma lista ordenada de arquivos regulares."""
+    arquivos = set()
+    for padrao in padroes:
+        arquivos.update(p for p in glob.glob(padrao) if os.path.isfile(p))
+    return sorted(arquivos)
+
+def chave_etapa(etapa, cache):
+    """Chave de cache: hash do comando e do conteúdo de todas as entradas."""
+    h = hashlib.sha256()
+    h.update(json.dumps(etapa["comando"]).encode('utf-8'))
+    for path in expandir_padroes(etapa["entradas"]):
+        h.update(path.encode('utf-8'))
+        h.update(hash_arquivo(path, cache).encode('ascii'))
+    return h.hexdigest()
+
+def saidas_completas(etapa):
+    """
+    Verifica se cada padrão de saída casa com ao menos um arquivo não vazio.
+    Uma saída pode ser uma lista de padrões alternativos (basta um deles casar).
+    """
+    for saida in etapa["saidas"]:
+        alternativas = saida if isinstance(saida, list) else [saida]
+        if not any(os.path.isfile(p) and os.path.getsize(p) > 0
+                   for padrao in alternativas for p in glob.glob(padrao)):
+            return False
+    return True
+
+def etapa_em_dia(etapa, cache):
+    """Uma etapa sem saídas declaradas nunca é considerada em dia (ex.: sync)."""
+    if not etapa["saidas"]:
+        return False
+    registro = cache["etapas"].get(etapa["nome"])
+    if not registro or not saidas_completas(etapa):
+        return False
+    return registro.get("chave") == chave_etapa(etapa, cache)
+
+# ==============================================================================
+# SEÇÃO 3: EXECUÇÃO
+# ==============================================================================
+
+def executar_etapa(etapa, date_arg, log_dir, timeline):
+    """
+    Executa o comando de uma etapa, com a saída redirecionada para um log próprio.
+    O consumo do processo é registrado na linha do tempo do ciclo, e os scripts
+    filhos herdam o destino para registrar seus próprios spans. A espera pelos
+    núcleos reservados entra na duração da etapa e fica registrada no log.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{etapa['nome']}.log")
+    env = dict(os.environ, **{rastreamento.ENV_TIMELINE: timeline, rastreamento.ENV_ETAPA: etapa["nome"]})
+    inicio = datetime.now(timezone.utc)
+    with open(log_path, 'w', encoding='utf-8') as log:
+        with reservas_cpu.reservar(f"{etapa['nome']} {date_arg}", etapa.get("nucleos", 1),
+                                   minimo=etapa.get("nucleos_min")) as nucleos:
+            if nucleos:
+                env[reservas_cpu.ENV_NUCLEOS] = str(nucleos)
+                log.write(f"Núcleos reservados: {nucleos} (espera {(datetime.now(timezone.utc) - inicio).total_seconds():.1f}s)\n")
+                log.flush()
+            try:
+                retorno = rastreamento.executar_comando(etapa["comando"], etapa["nome"], timeline=timeline,
+                                                        stdout=log, stderr=subprocess.STDOUT, env=env)
+            except OSError as e:
+                log.write(f"ERRO ao iniciar o comando: {e}\n")
+                retorno = 127
+    duracao = (datetime.now(timezone.utc) - inicio).total_seconds()
+    return retorno, duracao, log_path
+
+def executar_pipeline(etapas, date_arg, paralelo=4, desde=None, forcar=False, pular=()):
+    """
+    Executa o grafo de etapas. Retorna True se todas as etapas terminaram com sucesso.
+    Etapas em dia são puladas; dependentes de uma etapa que falhou não são executadas,
+    exceto quando a dependência é opcional (a etapa espera que ela termine e roda).
+    Etapas em 'pular' contam como concluídas sem rodar (ex.: sem wrf-python na máquina).
+    """
+    etapas = ordenar_etapas(etapas)
+    run_dir = os.path.join(WORK_DIR, date_arg)
+    cache_path = os.path.join(run_dir, CACHE_FILENAME)
+    log_dir = os.path.join(run_dir, "logs")
+    timeline = os.path.join(run_dir, TIMELINE_FILENAME)
+    cache = carregar_cache(cache_path)
+
+    if forcar:
+        refazer = {e["nome"] for e in etapas}
+    elif desde:
+        refazer = dependentes_de(etapas, [desde])
+    else:
+        refazer = set()
+
+    pendentes = {e["nome"]: e for e in etapas}
+    concluidas, falhas = set(), set()
+    em_execucao = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, paralelo)) as executor:
+        while pendentes or em_execucao:
+            # Descarta etapas cujas dependências falharam
+            for nome, etapa in list(pendentes.items()):
+                if falhas.intersection(etapa["depende"]):
+                    print(f"⏭️  Etapa '{nome}' não executada (dependência falhou).")
+                    falhas.add(nome)
+                    del pendentes[nome]
+
+            prontas = [e for e in pendentes.values() if concluidas.issuperset(e["depende"])
+                       and (concluidas | falhas).issuperset(e.get("depende_opcional", []))]
+            for etapa in prontas:
+                nome = etapa["nome"]
+                del pendentes[nome]
+                if nome in pular:
+                    print(f"⏭️  Etapa '{nome}' pulada (--pular).")
+                    concluidas.add(nome)
+                    continue
+                if nome not in refazer and etapa_em_dia(etapa, cache):
+                    print(f"✔️  Etapa '{nome}' já concluída (cache válido). Pulando.")
+                    concluidas.add(nome)
+                    continue
+                print(f"▶️  Iniciando etapa '{nome}': {' '.join(etapa['comando'])}")
+                em_execucao[executor.submit(executar_etapa, etapa, date_arg, log_dir, timeline)] = etapa
+
+            if not em_execucao:
+                if pendentes and not prontas:
+                    # Só acontece se algo ficou sem dependências satisfazíveis
+                    falhas.update(pendentes)
+                    pendentes.clear()
+                continue
+
+            feitas, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+            for futuro in feitas:
+                etapa = em_execucao.pop(futuro)
+                nome = etapa["nome"]
+                retorno, duracao, log_path = futuro.result()
+                if retorno == 0 and (not etapa["saidas"] or saidas_completas(etapa)):
+                    print(f"✅ Etapa '{nome}' concluída em {duracao:.1f}s.")
+                    concluidas.add(nome)
+                    if etapa["saidas"]:
+                        cache["etapas"][nome] = {
+                            "chave": chave_etapa(etapa, cache),
+                            "concluida_em": datetime.now(timezone.utc).isoformat(),
+                            "duracao_s": round(duracao, 3),
+                        }
+                        salvar_cache(cache_path, cache)
+                else:
+                    motivo = f"código {retorno}" if retorno != 0 else "saídas declaradas ausentes"
+                    print(f"❌ ERRO na etapa '{nome}' ({motivo}). Verifique {log_path}")
+                    falhas.add(nome)
+                    cache["etapas"].pop(nome, None)
+                    salvar_cache(cache_path, cache)
+
+    gerar_relatorio_rodada(date_arg, timeline)
+    return not falhas
+
+def gerar_relatorio_rodada(date_arg, timeline):
+    """
+    Grava o relatório Gantt da linha do tempo ao lado dela, em $WORK_DIR/<rodada>, e o
+    copia para o WEB_ROOT só se a rodada já está publicada (tem index.html): numa cadeia
+    que falhou antes da etapa 'web', criar WEB_ROOT/<rodada> a faria parecer publicada.
+    """
+    if not os.path.isfile(timeline):
+        return
+    destinos = [os.path.join(os.path.dirname(timeline), "timeline.html")]
+    web_dir = os.path.join(WEB_ROOT, date_arg)
+    if os.path.isfile(os.path.join(web_dir, "index.html")):
+        destinos.append(os.path.join(web_dir, "timeline.html"))
+    try:
+        for output_path in destinos:
+            rastreamento.escrever_relatorio(timeline, output_path, f"Linha do tempo da rodada {date_arg}")
+        print(f"📊 Linha do tempo: {timeline} | relatório: {' e '.join(destinos)}")
+    except (IOError, OSError) as e:
+        print(f"⚠️ AVISO: não foi possível gerar o relatório da linha do tempo: {e}")
+
+def listar_etapas(etapas, date_arg):
+    """Mostra o estado de cada etapa sem executar nada."""
+    cache = carregar_cache(os.path.join(WORK_DIR, date_arg, CACHE_FILENAME))
+    for etapa in ordenar_etapas(etapas):
+        estado = "em dia" if etapa_em_dia(etapa, cache) else "pendente"
+        deps = ", ".join(etapa["depende"] + [f"{d}?" for d in etapa.get("depende_opcional", [])]) or "-"
+        print(f"  {etapa['nome']:<14} {estado:<9} depende de: {deps}")
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Interpreta os argumentos e executa a cadeia para a data pedida."""
+    parser = argparse.ArgumentParser(description="Executa a cadeia WRF-ICON como um grafo de etapas com cache.")
+    parser.add_argument("--date", default=datetime.now(timezone.utc).strftime("%Y%m%d") + "00",
+                        help="Data da rodada no formato YYYYMMDDHH (padrão: hoje 00Z).")
+    parser.add_argument("--scripts-dir", default=SCRIPTS_DIR, help="Diretório com os scripts das etapas.")
+    parser.add_argument("--paralelo", type=int, default=4, help="Número máximo de etapas simultâneas.")
+    parser.add_argument("--desde", help="Refaz a etapa indicada e todas as que dependem dela.")
+    parser.add_argument("--forcar", action="store_true", help="Ignora o cache e refaz todas as etapas.")
+    parser.add_argument("--pular", default="", help="Etapas (separadas por vírgula) tratadas como concluídas sem rodar.")
+    parser.add_argument("--listar", action="store_true", help="Apenas lista o estado das etapas.")
+    args = parser.parse_args()
+
+    if len(args.date) != 10 or not args.date.isdigit():
+        parser.error("--date deve estar no formato YYYYMMDDHH")
+
+    etapas = definir_etapas(args.date, os.path.abspath(args.scripts_dir))
+    nomes = {e["nome"] for e in etapas}
+    if args.desde and args.desde not in nomes:
+        parser.error(f"etapa desconhecida: {args.desde}")
+    pular = {n for n in args.pular.split(",") if n}
+    if pular - nomes:
+        parser.error(f"etapa desconhecida: {', '.join(sorted(pular - nomes))}")
+
+    if args.listar:
+        print(f"Etapas para a rodada {args.date}:")
+        listar_etapas(etapas, args.date)
+        return
+
+    print("=" * 50)
+    print(f"INICIANDO CADEIA WRF-ICON (DAG) PARA {args.date}")
+    print("=" * 50)
+    if not executar_pipeline(etapas, args.date, args.paralelo, args.desde, args.forcar, pular):
+        print("\n❌ A cadeia terminou com falhas.")
+        sys.exit(1)
+    print("\n" + "=" * 50)
+    print("CADEIA WRF-ICON CONCLUÍDA!")
+    print("=" * 50)
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,7 @@ fi
 
 # Define o diretório base onde os scripts originais estão localizados
 # Ajuste este caminho conforme a sua instalação
-SCRIPTS_DIR="/home/geral1/scripts_previsao_UFSC" 
+SCRIPTS_DIR="${SCRIPTS_DIR:-/home/geral1/scripts_previsao_UFSC}"
 
 if [ ! -d "$SCRIPTS_DIR" ]; then
     echo "❌ ERRO: Diretório de scripts não encontrado: $SCRIPTS_DIR"
@@ -31,33 +31,13 @@ if [ ! -d "$SCRIPTS_DIR" ]; then
     exit 1
 fi
 
-# 1. Executa o script de download e pré-processamento ICON
-echo -e "\n--- Executando trazer_icon_sul_br.sh ---"
-"$SCRIPTS_DIR/trazer_icon_sul_br.sh" "$DATE_ARG"
-echo "trazer_icon_sul_br.sh concluído."
-
-# 2. Executa o script WPS-WRF
-echo -e "\n--- Executando rodar_wps_wrf.sh ---"
-"$SCRIPTS_DIR/rodar_wps_wrf.sh" "$DATE_ARG"
-echo "rodar_wps_wrf.sh concluído."
-
-# 3. Executa o script de plotagem
-echo -e "\n--- Executando plotar_rodadas_diaria.sh ---"
-"$SCRIPTS_DIR/plotar_rodadas_diaria.sh" "$DATE_ARG"
-echo "plotar_rodadas_diaria.sh concluído."
-
-# 4. Executa o script orquestrador web (Python)
-# Nota: orquestrador_web.py escaneia /var/www/html para encontrar as rodadas,
-# então não precisa de um argumento de data específico, apenas deve ser executado
-# depois que a rodada atual foi processada e as imagens geradas.
-echo -e "\n--- Executando orquestrador_web.py ---"
-python3 "$SCRIPTS_DIR/orquestrador_web.py"
-echo "orquestrador_web.py concluído."
-
-# 5. Executa o script de sync_html.sh
-echo -e "\n--- Executando sync_html.sh "
-"$SCRIPTS_DIR/sync_html.sh" 
-echo "sync_html.sh concluído."
+# As etapas (download ICON, WPS/WRF, plotagem por domínio, web e sync) são
+# executadas pelo executor em grafo, que pula etapas já concluídas (cache por
+# hash de conteúdo), retoma na primeira etapa incompleta e paraleliza o que
+# for independente. Os logs de cada etapa ficam em /trabalho/icon/$DATE_ARG/logs.
+echo -e "\n--- Executando executar_pipeline.py ---"
+python3 "$SCRIPTS_DIR/executar_pipeline.py" --date "$DATE_ARG" --scripts-dir "$SCRIPTS_DIR"
+echo "executar_pipeline.py concluído."
 
 echo -e "\n=================================================="
 echo "ORQUESTRAÇÃO COMPLETA DA CADEIA WRF-ICON CONCLUÍDA!"
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+EXPORTAÇÃO DE CAMPOS QUANTIZADOS PARA RENDERIZAÇÃO NO NAVEGADOR - UFSC
+
+Cada quadro do wrfplot é um PNG colorido de um campo que o próprio navegador
+pode desenhar. Este script exporta, para cada (domínio, variável, nível), todos
+os tempos do wrfout como um único binário quantizado:
+1. O campo é calculado com o wrf-python para todos os tempos de uma vez.
+2. Os valores são quantizados em uint8 ou uint16 (little-endian) com escala e
+   deslocamento comuns a todos os tempos; o último código marca pontos ausentes.
+3. Os binários ficam em <rodada>/campos/<domínio>/<campo>.bin e o cabeçalho de
+   cada um (dimensões, tempos, escala, deslocamento, unidade, paleta) vai para
+   <rodada>/campos/indice.json, lido pelo campos.html gerado pelo orquestrador.
+4. Cada domínio ganha um grade.json com o mapa de fundo (shapefile da plotagem)
+   e os contornos dos demais domínios, em coordenadas de ponto de grade.
+
+No navegador o campo é pintado em um canvas com uma paleta (LUT) escolhida pelo
+usuário, com troca instantânea de variável/paleta e leitura do valor sob o mouse.
+
+Uso:
+    ./exportar_campos.py YYYYMMDDHH [--dominios d01,d02] [--campos slp,winds,u_temp]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+import numpy as np
+import geopandas as gpd
+from netCDF4 import Dataset
+from wrf import getvar, interplevel, ll_to_xy, extract_times, ALL_TIMES
+
+import orquestrador_web
+from cache_diagnosticos import CacheDiagnosticos, fatia_de_tempo, normalizar
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+WEB_ROOT = orquestrador_web.WEB_ROOT
+SCRIPTS_DIR = os.environ.get("SCRIPTS_DIR", os.path.dirname(os.path.abspath(__file__)))
+CAMPOS_DIR = orquestrador_web.CAMPOS_DIR
+NIVEIS = [900, 500, 200]
+SHAPEFILES = {
+    "d01": os.path.join(SCRIPTS_DIR, "SC_RS_d01", "SC_RS_d01.shp"),
+    "d02": os.path.join(SCRIPTS_DIR, "BR_SC_RS_d02", "BR_SC_RS_d02.shp"),
+}
+CASAS_MAPA = 1  # Precisão (em pontos de grade) das linhas do mapa de fundo
+LEITURA_DIRETA = {"t2", "ppn"}  # Lidos direto do wrfout: não compensa guardar no cache de diagnósticos
+
+# ==============================================================================
+# SEÇÃO 1: CÁLCULO DOS CAMPOS (TODOS OS TEMPOS OU UM QUADRO)
+# ==============================================================================
+
+def _nos_tempos(nc, nome, t, **kwargs):
+    return getvar(nc, nome, timeidx=t, squeeze=False, meta=False, **kwargs)
+
+def _chuva_horaria(nc, nivel, t):
+    """Precipitação entre saídas consecutivas (mm), a partir de RAINC + RAINNC acumulados."""
+    fatia = fatia_de_tempo(t)
+    if t is not ALL_TIMES and t > 0:
+        fatia = slice(t - 1, t + 1)
+    acumulada = nc.variables["RAINC"][fatia] + nc.variables["RAINNC"][fatia]
+    chuva = np.diff(acumulada, axis=0, prepend=acumulada[:1])
+    return chuva if t is ALL_TIMES else chuva[-1:]
+
+def _no_nivel(nome, indice=None, **kwargs):
+    """Campo 3D interpolado no nível de pressão (hPa)."""
+    def calcular(nc, nivel, t):
+        campo = _nos_tempos(nc, nome, t, **kwargs)
+        if indice is not None:
+            campo = campo[indice]
+        return interplevel(campo, _nos_tempos(nc, "pressure", t), nivel, meta=False)
+    return calcular
+
+# nome -> (função(nc, nivel, timeidx), unidade, paleta, bits, multinível)
+CAMPOS = {
+    "slp": (lambda nc, n, t: _nos_tempos(nc, "slp", t, units="hPa"), "hPa", "viridis", 16, False),
+    "t2": (lambda nc, n, t: nc.variables["T2"][fatia_de_tempo(t)] - 273.15, "°C", "temperatura", 16, False),
+    "winds": (lambda nc, n, t: _nos_tempos(nc, "uvmet10_wspd_wdir", t, units="km h-1")[0], "km/h", "viridis", 8, False),
+    "ppn": (_chuva_horaria, "mm", "chuva", 16, False),
+    "pw": (lambda nc, n, t: _nos_tempos(nc, "pw", t), "mm", "chuva", 8, False),
+    "mdbz": (lambda nc, n, t: _nos_tempos(nc, "mdbz", t), "dBZ", "viridis", 8, False),
+    "mcape": (lambda nc, n, t: _nos_tempos(nc, "cape_2d", t)[0], "J/kg", "viridis", 16, False),
+    "mcin": (lambda nc, n, t: _nos_tempos(nc, "cape_2d", t)[1], "J/kg", "viridis", 16, False),
+    "ctt": (lambda nc, n, t: _nos_tempos(nc, "ctt", t, units="degC"), "°C", "cinza", 8, False),
+    "helicity": (lambda nc, n, t: _nos_tempos(nc, "helicity", t), "m²/s²", "divergente", 16, False),
+    "updraft_helicity": (lambda nc, n, t: _nos_tempos(nc, "updraft_helicity", t), "m²/s²", "viridis", 16, False),
+    "low_cloudfrac": (lambda nc, n, t: 100.0 * _nos_tempos(nc, "cloudfrac", t)[0], "%", "cinza", 8, False),
+    "mid_cloudfrac": (lambda nc, n, t: 100.0 * _nos_tempos(nc, "cloudfrac", t)[1], "%", "cinza", 8, False),
+    "high_cloudfrac": (lambda nc, n, t: 100.0 * _nos_tempos(nc, "cloudfrac", t)[2], "%", "cinza", 8, False),
+    "u_temp": (_no_nivel("tc"), "°C", "temperatura", 16, True),
+    "u_winds": (_no_nivel("wspd_wdir", indice=0, units="km h-1"), "km/h", "viridis", 8, True),
+    "u_pvo": (_no_nivel("pvo"), "PVU", "divergente", 16, True),
+}
+
+def calcular_campo(nc, nome, nivel=None, cache=None):
+    """Retorna o campo (tempos, ny, nx) em float32, com NaN nos pontos ausentes."""
+    funcao, unidade = CAMPOS[nome][0], CAMPOS[nome][1]
+    if cache is None or nome in LEITURA_DIRETA:
+        forma = (len(nc.dimensions["south_north"]), len(nc.dimensions["west_east"]))
+        return normalizar(funcao(nc, nivel, ALL_TIMES), forma)
+    return cache.obter(nc, nome, lambda nc, t: funcao(nc, nivel, t), nivel=nivel, unidade=unidade)
+
+# ==============================================================================
+# SEÇÃO 2: QUANTIZAÇÃO E ESCRITA
+# ==============================================================================
+
+def quantizar(campo, bits):
+    """
+    Quantiza em uint8/uint16 com escala e deslocamento únicos para todos os tempos,
+    para que a mesma paleta valha para a animação inteira. O erro máximo é escala/2.
+    Retorna (códigos, escala, deslocamento, código de ausente).
+    """
+    ausente = (1 << bits) - 1
+    validos = np.isfinite(campo)
+    if not validos.any():
+        return np.full(campo.shape, ausente, dtype=f"<u{bits // 8}"), 1.0, 0.0, ausente
+    vmin, vmax = float(campo[validos].min()), float(campo[validos].max())
+    escala = (vmax - vmin) / (ausente - 1) if vmax > vmin else 1.0
+    codigos = np.full(campo.shape, ausente, dtype=f"<u{bits // 8}")
+    codigos[validos] = np.round((campo[validos] - vmin) / escala)
+    return codigos, escala, vmin, ausente
+
+def exportar_campo(nc, domain, nome, nivel, destino, tempos, cache=None):
+    """Calcula (ou lê do cache de diagnósticos), quantiza e grava um campo. Retorna o cabeçalho para o indice.json."""
+    _, unidade, paleta, bits, _ = CAMPOS[nome]
+    chave = f"{nome}_{nivel}" if nivel else nome
+    campo = calcular_campo(nc, nome, nivel, cache)
+    codigos, escala, deslocamento, ausente = quantizar(campo, bits)
+    arquivo = f"{domain}/{chave}.bin"
+    orquestrador_web.escrever_arquivo(os.path.join(destino, arquivo), codigos.tobytes())
+    return chave, {
+        "arquivo": arquivo, "variavel": nome, "nivel": nivel, "unidade": unidade, "paleta": paleta,
+        "bits": bits, "escala": escala, "deslocamento": deslocamento, "ausente": int(ausente),
+        "tempos": len(tempos), "ny": int(codigos.shape[1]), "nx": int(codigos.shape[2]),
+        "bytes": int(codigos.nbytes),
+    }
+
+# ==============================================================================
+# SEÇÃO 3: MAPA DE FUNDO E CONTORNOS EM COORDENADAS DE GRADE
+# ==============================================================================
+
+def _linhas_da_geometria(geom):
+    if geom is None or geom.is_empty:
+        return []
+    if geom.geom_type == "Polygon":
+        return [list(geom.exterior.coords)] + [list(anel.coords) for anel in geom.interiors]
+    if geom.geom_type == "LineString":
+        return [list(geom.coords)]
+    if hasattr(geom, "geoms"):
+        return [linha for parte in geom.geoms for linha in _linhas_da_geometria(parte)]
+    return []
+
+def para_grade(nc, lons, lats):
+    """Converte lon/lat em coordenadas fracionárias (x, y) de ponto de grade do domínio."""
+    xy = ll_to_xy(nc, np.asarray(lats), np.asarray(lons), as_int=False, meta=False)
+    return np.round(np.asarray(xy, dtype="f8").reshape(2, -1), CASAS_MAPA)
+
+def mapa_de_fundo(nc, shapefile):
+    """Linhas do shapefile da plotagem em coordenadas de grade (uma lista de [x, y, x, y, ...] por linha)."""
+    if not os.path.isfile(shapefile):
+        print(f"  ⚠️ Shapefile '{shapefile}' não encontrado: mapa de fundo vazio.")
+        return []
+    linhas = []
+    for geom in gpd.read_file(shapefile).to_crs(epsg=4326).geometry:
+        for linha in _linhas_da_geometria(geom):
+            lons, lats = np.asarray(linha)[:, 0], np.asarray(linha)[:, 1]
+            x, y = para_grade(nc, lons, lats)
+            linhas.append(np.column_stack([x, y]).ravel().tolist())
+    return linhas
+
+def perimetro(nc):
+    """Lon/lat do perímetro da grade de massa (para desenhar o contorno nos outros domínios)."""
+    lat = nc.variables["XLAT"][0]
+    lon = nc.variables["XLONG"][0]
+    borda = lambda a: np.concatenate([a[0, :], a[1:, -1], a[-1, -2::-1], a[-2:0:-1, 0], a[:1, 0]])
+    return borda(np.asarray(lon)), borda(np.asarray(lat))
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Exporta os campos quantizados de todos os domínios da rodada."""
+    parser = argparse.ArgumentParser(description="Exporta campos do wrfout quantizados para o visualizador em canvas.")
+    parser.add_argument("date", help="Rodada (YYYYMMDDHH).")
+    parser.add_argument("--dominios", default="d01,d02")
+    parser.add_argument("--campos", default=",".join(CAMPOS), help="Campos a exportar (separados por vírgula).")
+    parser.add_argument("--web-root", default=WEB_ROOT)
+    args = parser.parse_args()
+
+    print("="*50)
+    print(f"EXPORTAÇÃO DE CAMPOS QUANTIZADOS: {args.date}")
+    print("="*50)
+    wrf_dir = os.path.join(WORK_DIR, args.date, "WRF_RUN", "run_wrf")
+    campos = [c for c in args.campos.split(",") if c]
+    desconhecidos = [c for c in campos if c not in CAMPOS]
+    if desconhecidos:
+        print(f"❌ ERRO: campos desconhecidos: {', '.join(desconhecidos)}")
+        sys.exit(1)
+    destino = os.path.join(orquestrador_web.preparar_rodada(args.web_root, args.date), CAMPOS_DIR)
+
+    indice = {"rodada": args.date, "dominios": {}}
+    perimetros = {}
+    t0 = time.perf_counter()
+    total_bytes, falhas = 0, 0
+    for domain in args.dominios.split(","):
+        arquivos = sorted(glob.glob(os.path.join(wrf_dir, f"wrfout_{domain}_*")))
+        if not arquivos:
+            print(f"⚠️ AVISO: Nenhum arquivo wrfout encontrado para o domínio {domain}. Pulando.")
+            continue
+        os.makedirs(os.path.join(destino, domain), exist_ok=True)
+        cache = CacheDiagnosticos(arquivos[0], args.date, domain)
+        with Dataset(arquivos[0]) as nc:
+            tempos = [str(t)[:16] for t in extract_times(nc, ALL_TIMES, meta=False)]
+            cabecalhos = {}
+            for nome in campos:
+                for nivel in (NIVEIS if CAMPOS[nome][4] else [None]):
+                    try:
+                        chave, cabecalho = exportar_campo(nc, domain, nome, nivel, destino, tempos, cache)
+                    except (KeyError, ValueError, RuntimeError) as e:
+                        print(f"  ❌ ERRO em {domain}/{nome}{f' {nivel} hPa' if nivel else ''}: {e}")
+                        falhas += 1
+                        continue
+                    cabecalhos[chave] = cabecalho
+                    total_bytes += cabecalho["bytes"]
+                    print(f"  ✅ {domain}/{chave}: {cabecalho['tempos']} tempos, uint{cabecalho['bits']}, "
+                          f"{cabecalho['bytes'] / 1e6:.2f} MB")
+            grade = {"nx": len(nc.dimensions["west_east"]), "ny": len(nc.dimensions["south_north"]),
+                     "mapa": mapa_de_fundo(nc, SHAPEFILES.get(domain, "")), "contornos": {}}
+            perimetros[domain] = (arquivos[0], perimetro(nc))
+        cache.relatorio()
+        indice["dominios"][domain] = {"grade": f"{domain}/grade.json", "tempos": tempos, "campos": cabecalhos}
+        orquestrador_web.escrever_arquivo(os.path.join(destino, domain, "grade.json"),
+                                          json.dumps(grade, separators=(',', ':')))
+
+    # Contorno de cada domínio desenhado sobre os demais (ex.: d02 dentro do d01)
+    for domain, (arquivo, _) in perimetros.items():
+        grade_path = os.path.join(destino, domain, "grade.json")
+        with open(grade_path, encoding="utf-8") as f:
+            grade = json.load(f)
+        with Dataset(arquivo) as nc:
+            for outro, (_, (lons, lats)) in perimetros.items():
+                if outro != domain:
+                    x, y = para_grade(nc, lons, lats)
+                    grade["contornos"][outro] = np.column_stack([x, y]).ravel().tolist()
+        orquestrador_web.escrever_arquivo(grade_path, json.dumps(grade, separators=(',', ':')))
+
+    orquestrador_web.escrever_arquivo(os.path.join(destino, "indice.json"), json.dumps(indice, separators=(',', ':')))
+    duracao = time.perf_counter() - t0
+    print(f"\n{total_bytes / 1e6:.1f} MB exportados em {duracao:.1f}s para {destino}.")
+    if falhas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
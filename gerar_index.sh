@@ -6,14 +6,15 @@
 # Data: 2025-07-17
 #
 # Descrição:
-# Este script varre o diretório web em busca de subdiretórios de rodadas
-# (ex: 2025071500) e gera uma página HTML com links para cada previsão,
-# ordenados da mais recente para a mais antiga.
+# Este script consulta o catálogo SQLite (catalogo_quadros.py) das rodadas
+# publicadas (ex: 2025071500) e gera uma página HTML com links para cada
+# previsão, ordenados da mais recente para a mais antiga.
 # ==============================================================================
 
 # --- CONFIGURAÇÕES ---
 # Diretório raiz do site. O script deve ser executado a partir daqui.
-WEB_ROOT="/var/www/html"
+WEB_ROOT="${WEB_ROOT:-/var/www/html}"
+SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 # Nome do arquivo de saída
 OUTPUT_FILE="index.html"
 
@@ -27,12 +28,11 @@ export LC_TIME=pt_BR.UTF-8
 # Inicia uma variável vazia para armazenar o HTML da lista de links
 LINK_LIST=""
 
-# Encontra todos os diretórios que começam com '20' (assumindo século 21)
-# e os ordena em ordem reversa (mais novos primeiro)
-for dir in $(ls -r -d 20*/ 2>/dev/null); do
-    # Remove a barra final do nome do diretório (ex: 2025071500/ -> 2025071500)
-    dirname="${dir%/}"
-
+# Rodadas publicadas, da mais nova para a mais antiga, lidas do catálogo
+# (sem listar o diretório web)
+RODADAS=$(python3 "$SCRIPTS_DIR/catalogo_quadros.py" --web-root "$WEB_ROOT" rodadas --decrescente) || {
+    echo "ERRO: Falha ao consultar o catálogo de rodadas."; exit 1; }
+for dirname in $RODADAS; do
     # Extrai o ano, mês e dia do nome do diretório
     year=${dirname:0:4}
     month=${dirname:4:2}
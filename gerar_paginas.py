@@ -47,8 +47,8 @@ def find_forecast_dirs(root_path):
                 month = int(item[4:6])
                 day = int(item[6:8])
                 forecast_date = date(year, month, day)
-                # Armazena o primeiro diretório encontrado para um dia (caso haja 00Z e 12Z)
-                if forecast_date not in forecasts:
+                # Armazena o ciclo mais recente do dia (12Z sobre 00Z, quando houver os dois)
+                if forecast_date not in forecasts or item > forecasts[forecast_date]:
                     forecasts[forecast_date] = item
             except ValueError:
                 # Ignora diretórios que não representam uma data válida
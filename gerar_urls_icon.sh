@@ -1,7 +1,14 @@
 #!/bin/bash
 cd /trabalho/icon/template/
-# Data do run (00Z do dia atual em UTC)
+# Data do run: YYYYMMDDHH do argumento (ciclo 00Z ou 12Z) ou 00Z do dia atual em UTC
+if [[ -n $1 ]]; then
+DATA=$1
+else
 DATA=$(date -u +%Y%m%d)00
+fi
+# Diretório do ciclo no servidor do DWD (/grib/00/, /grib/12/)
+CICLO=${DATA:8:2}
+BASE_URL="https://opendata.dwd.de/weather/nwp/icon/grib/${CICLO}"
 echo $DATA
 # Horas de previsão: de 0 a 24 em passos de 3
 HORAS=$(seq -w 0 1 36)
@@ -26,9 +33,9 @@ SOIL_VARS=(
 )
 
 # Adiciona HSURF (apenas uma vez)
-echo "https://opendata.dwd.de/weather/nwp/icon/grib/00/hsurf/icon_global_icosahedral_time-invariant_${DATA}_HSURF.grib2.bz2" >> "$OUTFILE"
-echo "https://opendata.dwd.de/weather/nwp/icon/grib/00/clat/icon_global_icosahedral_time-invariant_${DATA}_CLAT.grib2.bz2" >> "$OUTFILE"
-echo "https://opendata.dwd.de/weather/nwp/icon/grib/00/clon/icon_global_icosahedral_time-invariant_${DATA}_CLON.grib2.bz2" >> "$OUTFILE"
+echo "${BASE_URL}/hsurf/icon_global_icosahedral_time-invariant_${DATA}_HSURF.grib2.bz2" >> "$OUTFILE"
+echo "${BASE_URL}/clat/icon_global_icosahedral_time-invariant_${DATA}_CLAT.grib2.bz2" >> "$OUTFILE"
+echo "${BASE_URL}/clon/icon_global_icosahedral_time-invariant_${DATA}_CLON.grib2.bz2" >> "$OUTFILE"
 
 # Laço para todas as horas
 for H in $HORAS; do
@@ -36,21 +43,21 @@ for H in $HORAS; do
   # PRESSÃO
   for VAR in "${PRESSURE_VARS[@]}"; do
     for NIVEL in "${NIVEIS[@]}"; do
-      URL="https://opendata.dwd.de/weather/nwp/icon/grib/00/${VAR}/icon_global_icosahedral_pressure-level_${DATA}_0${H}_${NIVEL}_${VAR^^}.grib2.bz2"
+      URL="${BASE_URL}/${VAR}/icon_global_icosahedral_pressure-level_${DATA}_0${H}_${NIVEL}_${VAR^^}.grib2.bz2"
       echo "$URL" >> "$OUTFILE"
     done
   done
 
   # NÍVEL ÚNICO
   for VAR in "${SINGLE_LEVEL_VARS[@]}"; do
-    URL="https://opendata.dwd.de/weather/nwp/icon/grib/00/${VAR}/icon_global_icosahedral_single-level_${DATA}_0${H}_${VAR^^}.grib2.bz2"
+    URL="${BASE_URL}/${VAR}/icon_global_icosahedral_single-level_${DATA}_0${H}_${VAR^^}.grib2.bz2"
     echo "$URL" >> "$OUTFILE"
   done
 
   # SOLO
   for VAR in "${SOIL_VARS[@]}"; do
     VAR_BASE=$(echo "$VAR" | sed -E 's/^[0-9]+_//; s/_[0-9.]+//g' | tr '[:upper:]' '[:lower:]')
-    URL="https://opendata.dwd.de/weather/nwp/icon/grib/00/${VAR_BASE}/icon_global_icosahedral_soil-level_${DATA}_0${H}_${VAR}.grib2.bz2"
+    URL="${BASE_URL}/${VAR_BASE}/icon_global_icosahedral_soil-level_${DATA}_0${H}_${VAR}.grib2.bz2"
     echo "$URL" >> "$OUTFILE"
   done
 
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GERADOR DE ARQUIVOS wrfout SINTÉTICOS (FIXTURES) - UFSC
+
+Escreve arquivos NetCDF pequenos, mas com a estrutura de um wrfout real
+(dimensões escalonadas, Times, XLAT/XLONG, P/PB, PH/PHB, U/V/W, T, QVAPOR,
+RAINC/RAINNC e os atributos globais de projeção Lambert), para medir e testar
+o pós-processamento sem depender de uma rodada de vários GB.
+
+Os campos são suaves e fisicamente plausíveis (atmosfera padrão, vento de
+leste perto da costa, chuva acumulada não decrescente), e determinísticos
+para uma mesma semente.
+
+Uso:
+    ./gerar_wrfout_sintetico.py --saida /tmp/wrfout_d01_2025-07-20_00:00:00 \\
+        [--nx 60 --ny 50 --nz 20 --tempos 37] [--inicio 2025072000] [--dominio 1]
+
+Autor: Reinaldo Haas
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+from netCDF4 import Dataset
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+G = 9.81
+R_D = 287.0
+CP = 1004.5
+P0 = 100000.0
+P_TOP = 5000.0
+T0_BASE = 300.0          # T do wrfout é a perturbação em relação a 300 K
+CEN_LAT, CEN_LON = -28.0, -50.0
+TRUELAT1, TRUELAT2, STAND_LON = -25.0, -32.0, -50.0
+N_SOLO = 4
+
+# ==============================================================================
+# SEÇÃO 1: CAMPOS SINTÉTICOS
+# ==============================================================================
+
+def grade_latlon(nx, ny, dx, deslocamento_x=0.0, deslocamento_y=0.0):
+    """Latitudes/longitudes aproximadas de uma grade Lambert centrada no Sul do Brasil."""
+    km_por_grau = 111.2
+    j, i = np.meshgrid(np.arange(ny) - (ny - 1) / 2.0 + deslocamento_y,
+                       np.arange(nx) - (nx - 1) / 2.0 + deslocamento_x, indexing="ij")
+    lat = CEN_LAT + j * dx / 1000.0 / km_por_grau
+    lon = CEN_LON + i * dx / 1000.0 / (km_por_grau * np.cos(np.deg2rad(lat)))
+    return lat.astype("f4"), lon.astype("f4")
+
+def niveis_eta(nz):
+    """Níveis eta em pontos de massa (ZNU) e escalonados (ZNW), mais densos perto da superfície."""
+    znw = (1.0 - np.linspace(0.0, 1.0, nz + 1) ** 1.5).astype("f4")
+    znu = (0.5 * (znw[:-1] + znw[1:])).astype("f4")
+    return znu, znw
+
+def atmosfera_padrao(p):
+    """Altura (m) e temperatura (K) da atmosfera padrão para uma pressão (Pa)."""
+    t = 288.15 * (p / 101325.0) ** (R_D * 0.0065 / G)
+    z = (288.15 - t) / 0.0065
+    return z, t
+
+def campos_do_tempo(k, nx, ny, nz, lat, lon, hgt, rng):
+    """Gera os campos 3D/2D de um instante 'k'."""
+    znu, znw = niveis_eta(nz)
+    fase = 2.0 * np.pi * k / 24.0
+    x = (lon - lon.min()) / max(float(np.ptp(lon)), 1e-6)
+    y = (lat - lat.min()) / max(float(np.ptp(lat)), 1e-6)
+
+    psfc = (101325.0 - 12.0 * hgt - 600.0 * np.sin(np.pi * x + fase) * np.cos(np.pi * y)).astype("f4")
+    mu = psfc - P_TOP
+
+    p_total = znu[:, None, None] * mu[None] + P_TOP
+    pb = (znu[:, None, None] * (101325.0 - 12.0 * hgt - P_TOP)[None] + P_TOP).astype("f4")
+    p = (p_total - pb).astype("f4")
+
+    p_w = znw[:, None, None] * mu[None] + P_TOP
+    z_w, _ = atmosfera_padrao(p_w)
+    z_w = np.maximum(z_w, 0.0) + hgt[None] * (znw[:, None, None])
+    phb = (G * z_w).astype("f4")
+    ph = (G * 5.0 * np.sin(fase + 3.0 * x)[None] * (1.0 - znw[:, None, None])).astype("f4")
+
+    z_m, t_abs = atmosfera_padrao(p_total)
+    t_abs = t_abs + 4.0 * np.cos(np.pi * y)[None] + 1.5 * np.sin(fase)
+    t_abs = np.maximum(t_abs, 200.0)
+    theta = t_abs * (P0 / p_total) ** (R_D / CP)
+    t_pert = (theta - T0_BASE).astype("f4")
+
+    qv = (0.014 * np.exp(-z_m / 2500.0) * (0.6 + 0.4 * x[None])).astype("f4")
+    qc = np.where((z_m > 1500.0) & (z_m < 6000.0), 2e-4 * np.clip(np.sin(2 * np.pi * x + fase), 0, None)[None], 0.0).astype("f4")
+
+    # Vento: jato de oeste em altitude e componente de leste (lestada) nos baixos níveis perto da costa
+    perfil = np.clip(z_m / 10000.0, 0.0, 1.5)
+    costa = np.exp(-((x - 0.7) / 0.15) ** 2)
+    u_m = 25.0 * perfil - 8.0 * costa[None] * np.exp(-z_m / 1000.0) + rng.normal(0, 0.5, z_m.shape)
+    v_m = 5.0 * np.sin(np.pi * y + fase)[None] * np.ones_like(z_m)
+    u = np.concatenate([u_m[:, :, :1], 0.5 * (u_m[:, :, 1:] + u_m[:, :, :-1]), u_m[:, :, -1:]], axis=2).astype("f4")
+    v = np.concatenate([v_m[:, :1], 0.5 * (v_m[:, 1:] + v_m[:, :-1]), v_m[:, -1:]], axis=1).astype("f4")
+    w = (0.05 * np.sin(np.pi * znw)[:, None, None] * np.sin(2 * np.pi * x + fase)[None]).astype("f4")
+
+    t2 = (t_abs[0] - 0.5).astype("f4")
+    q2 = qv[0].copy()
+    u10 = (0.8 * u_m[0]).astype("f4")
+    v10 = (0.8 * v_m[0]).astype("f4")
+
+    taxa = np.clip(np.sin(2 * np.pi * x + fase) * np.cos(np.pi * y), 0, None)
+    return {
+        "P": p, "PB": pb, "PH": ph, "PHB": phb, "T": t_pert, "QVAPOR": qv, "QCLOUD": qc,
+        "QRAIN": (0.3 * qc).astype("f4"), "QICE": (0.1 * qc).astype("f4"),
+        "QSNOW": np.zeros_like(qc), "QGRAUP": np.zeros_like(qc),
+        "U": u, "V": v, "W": w,
+        "PSFC": psfc, "MU": (mu - mu.mean()).astype("f4"), "MUB": np.full_like(mu, mu.mean()),
+        "T2": t2, "Q2": q2, "U10": u10, "V10": v10, "TSK": (t2 + 1.0).astype("f4"),
+        "_taxa_chuva": taxa,
+    }
+
+# ==============================================================================
+# SEÇÃO 2: ESCRITA DO NetCDF
+# ==============================================================================
+
+def _variavel(nc, nome, dims, unidades, descricao, stagger="", dtype="f4"):
+    """Cria uma variável com os atributos usados pelo WRF/wrf-python."""
+    var = nc.createVariable(nome, dtype, dims)
+    var.FieldType = np.int32(104)
+    var.MemoryOrder = {1: "0  ", 2: "Z  ", 3: "XY ", 4: "XYZ"}.get(len(dims), "XYZ")
+    var.description = descricao
+    var.units = unidades
+    var.stagger = stagger
+    if "west_east" in dims or "west_east_stag" in dims:
+        var.coordinates = "XLONG XLAT XTIME"
+    return var
+
+def gerar_wrfout(path, nx=60, ny=50, nz=20, tempos=37, inicio=None, dominio=1, dx=9000.0,
+                 intervalo_min=60, semente=42):
+    """Escreve um wrfout sintético com a estrutura de uma saída real do WRF."""
+    inicio = inicio or datetime(2025, 7, 20, 0)
+    rng = np.random.default_rng(semente)
+    nz = max(nz, 2)
+    lat, lon = grade_latlon(nx, ny, dx)
+    lat_u, lon_u = grade_latlon(nx + 1, ny, dx)
+    lat_v, lon_v = grade_latlon(nx, ny + 1, dx)
+    x = (lon - lon.min()) / max(float(np.ptp(lon)), 1e-6)
+    hgt = (900.0 * np.clip(0.55 - x, 0, None) * (1 + 0.3 * np.sin(3 * lat))).astype("f4")
+    landmask = (x < 0.7).astype("f4")
+    znu, znw = niveis_eta(nz)
+
+    with Dataset(path, "w", format="NETCDF4") as nc:
+        nc.createDimension("Time", None)
+        nc.createDimension("DateStrLen", 19)
+        nc.createDimension("west_east", nx)
+        nc.createDimension("south_north", ny)
+        nc.createDimension("bottom_top", nz)
+        nc.createDimension("bottom_top_stag", nz + 1)
+        nc.createDimension("west_east_stag", nx + 1)
+        nc.createDimension("south_north_stag", ny + 1)
+        nc.createDimension("soil_layers_stag", N_SOLO)
+
+        inicio_str = inicio.strftime("%Y-%m-%d_%H:%M:%S")
+        nc.TITLE = " OUTPUT FROM WRF V4.7.1 MODEL (SINTETICO)"
+        nc.START_DATE = inicio_str
+        nc.SIMULATION_START_DATE = inicio_str
+        for chave, valor in {
+            "WEST-EAST_GRID_DIMENSION": nx + 1, "SOUTH-NORTH_GRID_DIMENSION": ny + 1,
+            "BOTTOM-TOP_GRID_DIMENSION": nz + 1, "GRID_ID": dominio, "PARENT_ID": max(dominio - 1, 0),
+            "I_PARENT_START": 1, "J_PARENT_START": 1, "PARENT_GRID_RATIO": 1 if dominio == 1 else 3,
+            "MAP_PROJ": 1, "NUM_LAND_CAT": 21, "ISWATER": 17, "ISLAKE": 21, "ISICE": 15,
+            "ISURBAN": 13, "ISOILWATER": 14, "HYPSOMETRIC_OPT": 2,
+        }.items():
+            setattr(nc, chave, np.int32(valor))
+        for chave, valor in {
+            "DX": dx, "DY": dx, "DT": dx / 1000.0 * 5.0, "CEN_LAT": CEN_LAT, "CEN_LON": CEN_LON,
+            "TRUELAT1": TRUELAT1, "TRUELAT2": TRUELAT2, "MOAD_CEN_LAT": CEN_LAT, "STAND_LON": STAND_LON,
+            "POLE_LAT": 90.0, "POLE_LON": 0.0,
+        }.items():
+            setattr(nc, chave, np.float32(valor))
+        nc.MAP_PROJ_CHAR = "Lambert Conformal"
+
+        times = nc.createVariable("Times", "S1", ("Time", "DateStrLen"))
+        xtime = _variavel(nc, "XTIME", ("Time",), f"minutes since {inicio.strftime('%Y-%m-%d %H:%M:%S')}", "minutes since simulation start")
+        estaticos_2d = {
+            "XLAT": (lat, "degree_north", "LATITUDE, SOUTH IS NEGATIVE", "", ("Time", "south_north", "west_east")),
+            "XLONG": (lon, "degree_east", "LONGITUDE, WEST IS NEGATIVE", "", ("Time", "south_north", "west_east")),
+            "XLAT_U": (lat_u, "degree_north", "LATITUDE, SOUTH IS NEGATIVE", "X", ("Time", "south_north", "west_east_stag")),
+            "XLONG_U": (lon_u, "degree_east", "LONGITUDE, WEST IS NEGATIVE", "X", ("Time", "south_north", "west_east_stag")),
+            "XLAT_V": (lat_v, "degree_north", "LATITUDE, SOUTH IS NEGATIVE", "Y", ("Time", "south_north_stag", "west_east")),
+            "XLONG_V": (lon_v, "degree_east", "LONGITUDE, WEST IS NEGATIVE", "Y", ("Time", "south_north_stag", "west_east")),
+            "HGT": (hgt, "m", "Terrain Height", "", ("Time", "south_north", "west_east")),
+            "LANDMASK": (landmask, "", "LAND MASK (1 FOR LAND, 0 FOR WATER)", "", ("Time", "south_north", "west_east")),
+            "MAPFAC_M": (np.ones_like(lat), "", "Map scale factor on mass grid", "", ("Time", "south_north", "west_east")),
+            "MAPFAC_U": (np.ones_like(lat_u), "", "Map scale factor on u-grid", "X", ("Time", "south_north", "west_east_stag")),
+            "MAPFAC_V": (np.ones_like(lat_v), "", "Map scale factor on v-grid", "Y", ("Time", "south_north_stag", "west_east")),
+            "F": ((2 * 7.2921e-5 * np.sin(np.deg2rad(lat))).astype("f4"), "s-1", "Coriolis sine latitude term", "", ("Time", "south_north", "west_east")),
+            "SINALPHA": (np.zeros_like(lat), "", "Local sine of map rotation", "", ("Time", "south_north", "west_east")),
+            "COSALPHA": (np.ones_like(lat), "", "Local cosine of map rotation", "", ("Time", "south_north", "west_east")),
+        }
+        vars_2d = {nome: _variavel(nc, nome, dims, un, desc, stg) for nome, (_, un, desc, stg, dims) in estaticos_2d.items()}
+        vars_1d = {
+            "ZNU": _variavel(nc, "ZNU", ("Time", "bottom_top"), "", "eta values on half (mass) levels"),
+            "ZNW": _variavel(nc, "ZNW", ("Time", "bottom_top_stag"), "", "eta values on full (w) levels", "Z"),
+            "P_TOP": _variavel(nc, "P_TOP", ("Time",), "Pa", "PRESSURE TOP OF THE MODEL"),
+        }
+
+        m3 = ("Time", "bottom_top", "south_north", "west_east")
+        dinamicos = {
+            "P": _variavel(nc, "P", m3, "Pa", "perturbation pressure"),
+            "PB": _variavel(nc, "PB", m3, "Pa", "BASE STATE PRESSURE"),
+            "PH": _variavel(nc, "PH", ("Time", "bottom_top_stag", "south_north", "west_east"), "m2 s-2", "perturbation geopotential", "Z"),
+            "PHB": _variavel(nc, "PHB", ("Time", "bottom_top_stag", "south_north", "west_east"), "m2 s-2", "base-state geopotential", "Z"),
+            "T": _variavel(nc, "T", m3, "K", "perturbation potential temperature theta-t0"),
+            "QVAPOR": _variavel(nc, "QVAPOR", m3, "kg kg-1", "Water vapor mixing ratio"),
+            "QCLOUD": _variavel(nc, "QCLOUD", m3, "kg kg-1", "Cloud water mixing ratio"),
+            "QRAIN": _variavel(nc, "QRAIN", m3, "kg kg-1", "Rain water mixing ratio"),
+            "QICE": _variavel(nc, "QICE", m3, "kg kg-1", "Ice mixing ratio"),
+            "QSNOW": _variavel(nc, "QSNOW", m3, "kg kg-1", "Snow mixing ratio"),
+            "QGRAUP": _variavel(nc, "QGRAUP", m3, "kg kg-1", "Graupel mixing ratio"),
+            "U": _variavel(nc, "U", ("Time", "bottom_top", "south_north", "west_east_stag"), "m s-1", "x-wind component", "X"),
+            "V": _variavel(nc, "V", ("Time", "bottom_top", "south_north_stag", "west_east"), "m s-1", "y-wind component", "Y"),
+            "W": _variavel(nc, "W", ("Time", "bottom_top_stag", "south_north", "west_east"), "m s-1", "z-wind component", "Z"),
+        }
+        s2 = ("Time", "south_north", "west_east")
+        superficie = {
+            "PSFC": _variavel(nc, "PSFC", s2, "Pa", "SFC PRESSURE"),
+            "MU": _variavel(nc, "MU", s2, "Pa", "perturbation dry air mass in column"),
+            "MUB": _variavel(nc, "MUB", s2, "Pa", "base state dry air mass in column"),
+            "T2": _variavel(nc, "T2", s2, "K", "TEMP at 2 M"),
+            "Q2": _variavel(nc, "Q2", s2, "kg kg-1", "QV at 2 M"),
+            "U10": _variavel(nc, "U10", s2, "m s-1", "U at 10 M"),
+            "V10": _variavel(nc, "V10", s2, "m s-1", "V at 10 M"),
+            "TSK": _variavel(nc, "TSK", s2, "K", "SURFACE SKIN TEMPERATURE"),
+            "RAINC": _variavel(nc, "RAINC", s2, "mm", "ACCUMULATED TOTAL CUMULUS PRECIPITATION"),
+            "RAINNC": _variavel(nc, "RAINNC", s2, "mm", "ACCUMULATED TOTAL GRID SCALE PRECIPITATION"),
+        }
+
+        rainc = np.zeros((ny, nx), "f4")
+        rainnc = np.zeros((ny, nx), "f4")
+        for k in range(tempos):
+            instante = inicio + timedelta(minutes=k * intervalo_min)
+            times[k] = np.array(list(instante.strftime("%Y-%m-%d_%H:%M:%S")), dtype="S1")
+            xtime[k] = k * intervalo_min
+            for nome, (valor, *_resto) in estaticos_2d.items():
+                vars_2d[nome][k] = valor
+            vars_1d["ZNU"][k] = znu
+            vars_1d["ZNW"][k] = znw
+            vars_1d["P_TOP"][k] = P_TOP
+
+            campos = campos_do_tempo(k, nx, ny, nz, lat, lon, hgt, rng)
+            for nome, var in dinamicos.items():
+                var[k] = campos[nome]
+            # Chuva acumulada: nunca decresce; no instante 0 é zero em todo o domínio
+            if k > 0:
+                rainc += (0.4 * campos["_taxa_chuva"]).astype("f4")
+                rainnc += (1.2 * campos["_taxa_chuva"] ** 2).astype("f4")
+            campos["RAINC"], campos["RAINNC"] = rainc, rainnc
+            for nome, var in superficie.items():
+                var[k] = campos[nome]
+    return path
+
+def nome_wrfout(dominio, inicio):
+    """Nome padrão do wrfout para um domínio e instante inicial."""
+    return f"wrfout_d{dominio:02d}_{inicio.strftime('%Y-%m-%d_%H:%M:%S')}"
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Interpreta os argumentos e escreve o wrfout sintético."""
+    parser = argparse.ArgumentParser(description="Gera um wrfout sintético estruturalmente correto.")
+    parser.add_argument("--saida", help="Arquivo de saída (padrão: wrfout_d0N_<inicio> no diretório atual).")
+    parser.add_argument("--nx", type=int, default=60, help="Pontos em x (west_east).")
+    parser.add_argument("--ny", type=int, default=50, help="Pontos em y (south_north).")
+    parser.add_argument("--nz", type=int, default=20, help="Níveis verticais (bottom_top).")
+    parser.add_argument("--tempos", type=int, default=37, help="Número de instantes (Time).")
+    parser.add_argument("--intervalo", type=int, default=60, help="Intervalo entre instantes, em minutos.")
+    parser.add_argument("--inicio", default="2025072000", help="Instante inicial YYYYMMDDHH.")
+    parser.add_argument("--dominio", type=int, default=1, help="Número do domínio (1 = d01).")
+    parser.add_argument("--dx", type=float, default=9000.0, help="Espaçamento da grade em metros.")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador aleatório.")
+    args = parser.parse_args()
+
+    inicio = datetime.strptime(args.inicio, "%Y%m%d%H")
+    saida = args.saida or nome_wrfout(args.dominio, inicio)
+    gerar_wrfout(saida, args.nx, args.ny, args.nz, args.tempos, inicio, args.dominio, args.dx,
+                 args.intervalo, args.semente)
+    print(f"✅ wrfout sintético gerado: {saida} ({args.nx}x{args.ny}x{args.nz}, {args.tempos} tempos)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+DIAGNÓSTICO DE LESTADA (VENTO DE LESTE PARA A COSTA) - UFSC
+
+Detecta, a partir do wrfout, os eventos de lestada no litoral de SC e RS em uma
+única passada vetorizada sobre todos os tempos da rodada:
+1. Uma faixa costeira sobre o mar e o vetor normal à costa (apontando para a
+   terra) são derivados dos shapefiles da plotagem e guardados em cache, com
+   chave no hash da grade e do shapefile.
+2. A componente do vento a 10 m na direção da costa é calculada para todos os
+   tempos e pontos da faixa de uma vez (U10/V10 e a normal estão ambos no
+   referencial da grade).
+3. Em cada trecho do litoral, um tempo é de lestada quando a fração de pontos com
+   componente acima do limiar de intensidade passa do mínimo; o evento só conta
+   se persistir pelo número mínimo de horas.
+4. Saídas em <rodada>/lestada/: eventos.json (linha do tempo e eventos por
+   trecho) e mapas no formato de exportar_campos.py (componente para a costa e
+   horas acumuladas em lestada), desenhados pelo campos.html.
+
+Uso:
+    ./lestada.py YYYYMMDDHH [--limiar 7] [--persistencia 6] [--fracao 0.5]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+import geopandas as gpd
+import shapely
+from scipy import ndimage
+from netCDF4 import Dataset
+from wrf import extract_times, ALL_TIMES
+
+import orquestrador_web
+import exportar_campos
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+WEB_ROOT = orquestrador_web.WEB_ROOT
+LESTADA_DIR = orquestrador_web.LESTADA_DIR
+CACHE_MASCARAS_DIR = os.path.join(WORK_DIR, "cache_indices")
+SHAPEFILES = exportar_campos.SHAPEFILES
+DOMINIOS = ["d02", "d01"]   # Do mais fino para o mais grosso
+LARGURA_FAIXA_KM = 30.0     # Largura da faixa costeira sobre o mar
+SUAVIZACAO_KM = 15.0        # Escala da suavização da máscara de terra usada na normal
+PONTOS_MINIMOS = 5          # Trechos com menos pontos na faixa ficam para o domínio mais grosso
+# Trechos do litoral (nome, latitude norte, latitude sul), do PR ao Uruguai
+SEGMENTOS = [
+    ("Litoral Norte de SC", -25.9, -27.0),
+    ("Grande Florianópolis", -27.0, -28.0),
+    ("Litoral Sul de SC", -28.0, -29.35),
+    ("Litoral Norte do RS", -29.35, -30.5),
+    ("Litoral Médio do RS", -30.5, -32.0),
+    ("Litoral Sul do RS", -32.0, -33.8),
+]
+
+# ==============================================================================
+# SEÇÃO 1: FAIXA COSTEIRA E NORMAL À COSTA (EM CACHE POR HASH DA GRADE)
+# ==============================================================================
+
+def mascara_de_terra(nc, shapefile):
+    """Pontos de grade dentro dos polígonos do shapefile (ou LANDMASK se ele não existir)."""
+    lat = np.asarray(nc.variables["XLAT"][0], dtype="f8")
+    lon = np.asarray(nc.variables["XLONG"][0], dtype="f8")
+    if not os.path.isfile(shapefile):
+        print(f"  ⚠️ Shapefile '{shapefile}' não encontrado: usando o LANDMASK do wrfout.")
+        return np.asarray(nc.variables["LANDMASK"][0]) > 0.5
+    terra = shapely.union_all(gpd.read_file(shapefile).to_crs(epsg=4326).geometry.values)
+    return shapely.contains_xy(terra, lon, lat)
+
+def calcular_faixa(terra, mar, dx_km, lat):
+    """
+    Retorna (pontos, normal_x, normal_y, segmento): índices planos dos pontos da faixa
+    costeira, a normal unitária (referencial da grade, apontando para a terra) e o
+    trecho do litoral de cada ponto (-1 fora dos trechos).
+    """
+    distancia_km = ndimage.distance_transform_edt(~terra) * dx_km
+    suave = ndimage.gaussian_filter(terra.astype("f8"), sigma=SUAVIZACAO_KM / dx_km)
+    gy, gx = np.gradient(suave)
+    norma = np.hypot(gx, gy)
+    faixa = mar & ~terra & (distancia_km <= LARGURA_FAIXA_KM) & (norma > 1e-6)
+    segmento = np.full(terra.shape, -1, dtype="i4")
+    for k, (_, norte, sul) in enumerate(SEGMENTOS):
+        segmento[(lat <= norte) & (lat > sul)] = k
+    faixa &= segmento >= 0
+    pontos = np.flatnonzero(faixa)
+    normal_x = (gx.ravel()[pontos] / norma.ravel()[pontos]).astype("f4")
+    normal_y = (gy.ravel()[pontos] / norma.ravel()[pontos]).astype("f4")
+    return pontos, normal_x, normal_y, segmento.ravel()[pontos]
+
+def faixa_em_cache(nc, shapefile, cache_dir=CACHE_MASCARAS_DIR):
+    """Faixa costeira do domínio, reaproveitada enquanto a grade e o shapefile não mudarem."""
+    lat = np.asarray(nc.variables["XLAT"][0], dtype="f8")
+    lon = np.asarray(nc.variables["XLONG"][0], dtype="f8")
+    mar = np.asarray(nc.variables["LANDMASK"][0]) < 0.5
+    h = hashlib.sha256(lat.tobytes() + lon.tobytes() + mar.tobytes())
+    if os.path.isfile(shapefile):
+        with open(shapefile, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    h.update(json.dumps([SEGMENTOS, LARGURA_FAIXA_KM, SUAVIZACAO_KM]).encode("utf-8"))
+    cache_path = os.path.join(cache_dir, f"lestada_{h.hexdigest()[:20]}.npz")
+    if os.path.isfile(cache_path):
+        with np.load(cache_path) as dados:
+            return dados["pontos"], dados["normal_x"], dados["normal_y"], dados["segmento"], True
+    terra = mascara_de_terra(nc, shapefile)
+    pontos, normal_x, normal_y, segmento = calcular_faixa(terra, mar, nc.DX / 1000.0, lat)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp{os.getpid()}.npz"
+    np.savez(tmp_path, pontos=pontos, normal_x=normal_x, normal_y=normal_y, segmento=segmento)
+    os.replace(tmp_path, cache_path)
+    return pontos, normal_x, normal_y, segmento, False
+
+# ==============================================================================
+# SEÇÃO 2: DETECÇÃO VETORIZADA NO TEMPO
+# ==============================================================================
+
+def duracao_das_sequencias(ativo):
+    """
+    Para cada (tempo, coluna) de um array booleano (tempos, N), o comprimento da
+    sequência de True que contém aquele tempo (0 onde é False), sem laços no tempo.
+    """
+    nt = ativo.shape[0]
+    t = np.arange(nt)[:, None]
+    ultimo_falso = np.maximum.accumulate(np.where(ativo, -1, t), axis=0)
+    proximo_falso = np.minimum.accumulate(np.where(ativo, nt, t)[::-1], axis=0)[::-1]
+    return np.where(ativo, proximo_falso - ultimo_falso - 1, 0)
+
+def listar_eventos(evento, media, tempos, dt_h):
+    """Eventos (início, fim, duração, pico) de cada coluna de um array booleano (tempos, trechos)."""
+    borda = np.diff(np.pad(evento.astype("i1"), ((1, 1), (0, 0))), axis=0)
+    inicio_t, inicio_s = np.nonzero(borda == 1)
+    fim_t, fim_s = np.nonzero(borda == -1)
+    ordem_i, ordem_f = np.lexsort((inicio_t, inicio_s)), np.lexsort((fim_t, fim_s))
+    eventos = [[] for _ in range(evento.shape[1])]
+    for a, b, s in zip(inicio_t[ordem_i], fim_t[ordem_f], inicio_s[ordem_i]):
+        pico = a + int(np.argmax(media[a:b, s]))
+        eventos[s].append({"inicio": tempos[a], "fim": tempos[b - 1], "duracao_h": round((b - a) * dt_h, 1),
+                           "pico_ms": round(float(media[pico, s]), 1), "pico_tempo": tempos[pico]})
+    return eventos
+
+def detectar(nc, pontos, normal_x, normal_y, segmento, limiar, persistencia_h, fracao_minima, dt_h):
+    """
+    Componente para a costa em todos os tempos e pontos da faixa e a detecção por trecho.
+    Retorna (componente, evento_pontos, trechos, contagem, media, fracao, evento): os dois
+    primeiros com forma (tempos, P), os trechos presentes e seus números de pontos, e os
+    três últimos com forma (tempos, trechos presentes).
+    """
+    nt = len(nc.dimensions["Time"])
+    u10 = np.asarray(nc.variables["U10"][:], dtype="f4").reshape(nt, -1)[:, pontos]
+    v10 = np.asarray(nc.variables["V10"][:], dtype="f4").reshape(nt, -1)[:, pontos]
+    componente = u10 * normal_x + v10 * normal_y
+    passos = max(1, int(round(persistencia_h / dt_h)))
+    acima = componente >= limiar
+    evento_pontos = duracao_das_sequencias(acima) >= passos
+
+    # Agregação por trecho com reduceat sobre os pontos ordenados por trecho
+    ordem = np.argsort(segmento, kind="stable")
+    trechos, inicio, contagem = np.unique(segmento[ordem], return_index=True, return_counts=True)
+    media = np.add.reduceat(componente[:, ordem], inicio, axis=1) / contagem
+    fracao = np.add.reduceat(acima[:, ordem].astype("f4"), inicio, axis=1) / contagem
+    evento = duracao_das_sequencias(fracao >= fracao_minima) >= passos
+    return componente, evento_pontos, trechos, contagem, media, fracao, evento
+
+# ==============================================================================
+# SEÇÃO 3: MAPAS NO FORMATO DO campos.html
+# ==============================================================================
+
+def gravar_mapa(destino, domain, chave, unidade, paleta, valores, pontos, forma):
+    """Espalha os valores (tempos, P) na grade (NaN fora da faixa), quantiza e grava. Retorna o cabeçalho."""
+    campo = np.full((valores.shape[0], forma[0] * forma[1]), np.nan, dtype="f4")
+    campo[:, pontos] = valores
+    codigos, escala, deslocamento, ausente = exportar_campos.quantizar(campo.reshape((-1,) + forma), 8)
+    arquivo = f"{domain}/{chave}.bin"
+    orquestrador_web.escrever_arquivo(os.path.join(destino, arquivo), codigos.tobytes())
+    return {
+        "arquivo": arquivo, "variavel": chave, "nivel": None, "unidade": unidade, "paleta": paleta,
+        "bits": 8, "escala": escala, "deslocamento": deslocamento, "ausente": int(ausente),
+        "tempos": int(codigos.shape[0]), "ny": forma[0], "nx": forma[1], "bytes": int(codigos.nbytes),
+    }
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Detecta as lestadas da rodada e grava as linhas do tempo e os mapas."""
+    parser = argparse.ArgumentParser(description="Diagnóstico de lestada (vento de leste para a costa) no wrfout.")
+    parser.add_argument("date", help="Rodada (YYYYMMDDHH).")
+    parser.add_argument("--limiar", type=float, default=7.0, help="Componente mínima para a costa (m/s).")
+    parser.add_argument("--persistencia", type=float, default=6.0, help="Duração mínima do evento (horas).")
+    parser.add_argument("--fracao", type=float, default=0.5, help="Fração mínima dos pontos do trecho acima do limiar.")
+    parser.add_argument("--web-root", default=WEB_ROOT)
+    args = parser.parse_args()
+
+    print("="*50)
+    print(f"DIAGNÓSTICO DE LESTADA: {args.date}")
+    print("="*50)
+    wrf_dir = os.path.join(WORK_DIR, args.date, "WRF_RUN", "run_wrf")
+    destino = os.path.join(orquestrador_web.preparar_rodada(args.web_root, args.date), LESTADA_DIR)
+    t0 = time.perf_counter()
+
+    saida = {"rodada": args.date, "limiar_ms": args.limiar, "persistencia_h": args.persistencia,
+             "fracao_minima": args.fracao, "dominios": {}, "segmentos": []}
+    indice = {"rodada": args.date, "dominios": {}}
+    cobertos = set()
+    for domain in DOMINIOS:
+        arquivos = sorted(glob.glob(os.path.join(wrf_dir, f"wrfout_{domain}_*")))
+        if not arquivos:
+            print(f"⚠️ AVISO: Nenhum arquivo wrfout encontrado para o domínio {domain}. Pulando.")
+            continue
+        with Dataset(arquivos[0]) as nc:
+            pontos, normal_x, normal_y, segmento, do_cache = faixa_em_cache(nc, SHAPEFILES.get(domain, ""))
+            print(f"  -> {domain}: {len(pontos)} pontos na faixa costeira ({'cache' if do_cache else 'calculada'}).")
+            if not len(pontos):
+                continue
+            tempos_np = extract_times(nc, ALL_TIMES, meta=False)
+            tempos = [str(t)[:16] for t in tempos_np]
+            dt_h = float((tempos_np[1] - tempos_np[0]) / np.timedelta64(1, "h")) if len(tempos) > 1 else 1.0
+            componente, evento_pontos, trechos, contagem, media, fracao, evento = detectar(
+                nc, pontos, normal_x, normal_y, segmento, args.limiar, args.persistencia, args.fracao, dt_h)
+            forma = (len(nc.dimensions["south_north"]), len(nc.dimensions["west_east"]))
+            eventos = listar_eventos(evento, media, tempos, dt_h)
+
+            os.makedirs(os.path.join(destino, domain), exist_ok=True)
+            campos = {
+                "componente_costa": gravar_mapa(destino, domain, "componente_costa", "m/s", "divergente",
+                                                componente, pontos, forma),
+                "horas_lestada": gravar_mapa(destino, domain, "horas_lestada", "h", "viridis",
+                                             np.cumsum(evento_pontos, axis=0) * dt_h, pontos, forma),
+            }
+            grade = {"nx": forma[1], "ny": forma[0], "contornos": {},
+                     "mapa": exportar_campos.mapa_de_fundo(nc, SHAPEFILES.get(domain, ""))}
+        orquestrador_web.escrever_arquivo(os.path.join(destino, domain, "grade.json"),
+                                          json.dumps(grade, separators=(',', ':')))
+        indice["dominios"][domain] = {"grade": f"{domain}/grade.json", "tempos": tempos, "campos": campos}
+
+        # Cada trecho usa o domínio mais fino que o cobre com pontos suficientes
+        usados = False
+        for k, s in enumerate(trechos):
+            if s in cobertos or contagem[k] < PONTOS_MINIMOS:
+                continue
+            cobertos.add(s)
+            usados = True
+            saida["segmentos"].append({
+                "nome": SEGMENTOS[s][0], "dominio": domain, "pontos": int(contagem[k]),
+                "media_ms": np.round(media[:, k], 1).tolist(),
+                "fracao": np.round(fracao[:, k], 2).tolist(),
+                "evento": evento[:, k].astype(int).tolist(),
+                "eventos": eventos[k],
+            })
+            estado = f"{len(eventos[k])} evento(s)" if eventos[k] else "sem eventos"
+            print(f"  {'⚠️' if eventos[k] else '✔️'} {SEGMENTOS[s][0]} ({domain}): {estado}")
+        if usados:
+            saida["dominios"][domain] = tempos
+
+    saida["segmentos"].sort(key=lambda s: [n for n, _, _ in SEGMENTOS].index(s["nome"]))
+    orquestrador_web.escrever_arquivo(os.path.join(destino, "indice.json"), json.dumps(indice, separators=(',', ':')))
+    orquestrador_web.escrever_arquivo(os.path.join(destino, "eventos.json"),
+                                      json.dumps(saida, ensure_ascii=False, separators=(',', ':')))
+    print(f"\n{len(saida['segmentos'])} trechos do litoral analisados em {time.perf_counter() - t0:.1f}s -> {destino}")
+    if not saida["segmentos"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MANIFESTO DOS QUADROS ESPERADOS DA PLOTAGEM - UFSC
+
+O plotar_rodadas_diaria.sh pulava uma variável assim que encontrava qualquer PNG
+dela: uma plotagem interrompida no meio nunca era completada. Este script mantém,
+por rodada e domínio, o manifesto dos quadros esperados:
+1. 'planejar' lê os tempos do wrfout (ncdump -v Times) e, com a lista de níveis
+   (900,500,200 nas variáveis u_*), monta os nomes de PNG que o wrfplot gera por
+   quadro. Um quadro falta se algum PNG dele não existe, e está velho se foi
+   plotado de outro wrfout (nome, tamanho e mtime) ou, sem registro, é mais antigo
+   que o wrfout. Um PNG trocado pela deduplicação por uma referência (referencias.json
+   da rodada) conta como existente. Imprime, por variável, o estado e os índices a plotar.
+2. 'recortar' grava um wrfout só com os tempos pedidos, para o wrfplot plotar
+   apenas os quadros que faltam (precisa do netCDF4). Variáveis calculadas pela
+   diferença entre tempos (ppn = RAINC+RAINNC de t menos o de t-1) precisam do
+   tempo anterior e não cabem num recorte: o 'planejar' as replota inteiras.
+3. 'registrar' marca os PNGs plotados com a identidade do wrfout de origem e, com
+   --rodada, grava-os (nível, validade, tamanho e hash) no catálogo SQLite.
+4. 'config' escreve o config.js a partir dos manifestos, com as variáveis completas.
+O manifesto fica em $WORK_DIR/<rodada>/manifesto/<domínio>.json.
+
+Uso (pelo plotar_rodadas_diaria.sh):
+    ./manifesto_quadros.py planejar --wrfout F --manifesto M --saida DIR --variaveis slp,u_temp [--niveis 900,500,200]
+    ./manifesto_quadros.py recortar --wrfout F --quadros 3,4,5 --destino DIR
+    ./manifesto_quadros.py registrar --wrfout F --manifesto M --saida DIR --variavel slp [--quadros 3,4,5] [--rodada R]
+    ./manifesto_quadros.py config --manifestos M1,M2 --saida config.js
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from datetime import datetime
+
+import catalogo_quadros
+
+try:
+    from netCDF4 import Dataset
+except ImportError:
+    Dataset = None
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+NIVEIS_PADRAO = "900,500,200"
+PREFIXO_MULTINIVEL = "u_"
+# Diferença de acumulados entre tempos consecutivos: o recorte perderia o t-1
+VARIAVEIS_DIFERENCA = {"ppn", "ppn_conv"}
+PADRAO_TEMPO = re.compile(r'"(\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2})"')
+
+# ==============================================================================
+# SEÇÃO 1: QUADROS ESPERADOS
+# ==============================================================================
+
+def identidade(path):
+    st = os.stat(path)
+    return f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+def ler_tempos(wrfout):
+    """Tempos do wrfout ('YYYY-MM-DD_HH:MM:SS') lidos com o ncdump, como no restante do script de plotagem."""
+    saida = subprocess.run(["ncdump", "-v", "Times", wrfout], capture_output=True, text=True, check=True).stdout
+    return PADRAO_TEMPO.findall(saida.split("data:", 1)[-1])
+
+def carimbo(tempo):
+    """'2025-07-17_06:00:00' -> '17-07-2025_06_00', o carimbo dos nomes do wrfplot."""
+    return datetime.strptime(tempo, "%Y-%m-%d_%H:%M:%S").strftime("%d-%m-%Y_%H_%M")
+
+def arquivos_esperados(variavel, tempos, niveis):
+    """Por quadro, os PNGs (já sem o prefixo do domínio) que o wrfplot gera para a variável."""
+    if variavel.startswith(PREFIXO_MULTINIVEL):
+        return [[f"{variavel}_{nivel}_{carimbo(t)}.png" for nivel in niveis] for t in tempos]
+    return [[f"{variavel}_{carimbo(t)}.png"] for t in tempos]
+
+def carregar(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def salvar(path, dados):
+    """Grava de forma atômica (o destino pode ser um hardlink da rodada publicada)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(dados if isinstance(dados, str) else json.dumps(dados, indent=1, ensure_ascii=False))
+    os.replace(tmp_path, path)
+    os.chmod(path, 0o644)
+
+def quadros_referenciados(saida):
+    """
+    PNGs do domínio que o deduplicar_imagens.py removeu da rodada: {'variável/arquivo':
+    caminho do objeto}. O objeto é um hardlink do PNG original (mesmo mtime).
+    """
+    saida = os.path.normpath(os.path.abspath(saida))
+    forecast_dir, dominio = os.path.split(saida)
+    root_path = os.path.dirname(forecast_dir)
+    if os.path.basename(root_path) == catalogo_quadros.PREPARO_DIR:
+        root_path = os.path.dirname(root_path)
+    referencias = carregar(os.path.join(forecast_dir, catalogo_quadros.REFERENCIAS_QUADROS))
+    return {caminho.split("/", 1)[1]: os.path.join(root_path, objeto)
+            for caminho, objeto in referencias.items() if caminho.startswith(f"{dominio}/")}
+
+def localizar(saida, variavel, nome, referenciados):
+    """Caminho do PNG na rodada ou, se deduplicado, do objeto; None se o quadro não existe."""
+    path = os.path.join(saida, variavel, nome)
+    if os.path.isfile(path):
+        return path
+    objeto = referenciados.get(f"{variavel}/{nome}")
+    return objeto if objeto and os.path.isfile(objeto) else None
+
+def quadro_em_dia(saida, variavel, arquivos, renderizados, origem, mtime_wrfout, referenciados):
+    for nome in arquivos:
+        path = localizar(saida, variavel, nome, referenciados)
+        if path is None:
+            return False
+        registro = renderizados.get(f"{variavel}/{nome}")
+        if registro is not None and registro != origem:
+            return False
+        if registro is None and os.path.getmtime(path) < mtime_wrfout:
+            return False
+    return True
+
+def indices(texto):
+    return [int(i) for i in texto.split(",") if i.strip()]
+
+# ==============================================================================
+# SEÇÃO 2: SUBCOMANDOS
+# ==============================================================================
+
+def planejar(args):
+    """Atualiza o manifesto e imprime 'variável estado índices' ('-' quando não falta nada)."""
+    tempos = ler_tempos(args.wrfout)
+    if not tempos:
+        print(f"❌ ERRO: nenhum tempo lido de {args.wrfout}.", file=sys.stderr)
+        return 1
+    niveis = [n for n in args.niveis.split(",") if n]
+    manifesto = carregar(args.manifesto)
+    origem = identidade(args.wrfout)
+    renderizados = manifesto.get("renderizados", {})
+    mtime_wrfout = os.path.getmtime(args.wrfout)
+    referenciados = quadros_referenciados(args.saida)
+    variaveis = {v: arquivos_esperados(v, tempos, niveis) for v in args.variaveis.split(",") if v}
+    salvar(args.manifesto, {"wrfout": os.path.basename(args.wrfout), "origem": origem, "tempos": tempos,
+                            "niveis": niveis, "variaveis": variaveis, "renderizados": renderizados})
+    for variavel, quadros in variaveis.items():
+        faltando = [i for i, arquivos in enumerate(quadros)
+                    if not quadro_em_dia(args.saida, variavel, arquivos, renderizados, origem, mtime_wrfout, referenciados)]
+        estado = "completo" if not faltando else ("ausente" if len(faltando) == len(quadros) else "parcial")
+        if estado == "parcial" and variavel in VARIAVEIS_DIFERENCA:
+            estado, faltando = "ausente", list(range(len(quadros)))
+        print(variavel, estado, ",".join(map(str, faltando)) or "-")
+    return 0
+
+def recortar(args):
+    """Grava em --destino um wrfout com o mesmo nome e só os tempos pedidos. Imprime o caminho."""
+    if Dataset is None:
+        print("❌ ERRO: o recorte precisa do netCDF4.", file=sys.stderr)
+        return 1
+    quadros = indices(args.quadros)
+    os.makedirs(args.destino, exist_ok=True)
+    destino = os.path.join(args.destino, os.path.basename(args.wrfout))
+    with Dataset(args.wrfout) as src, Dataset(destino, "w", format=src.data_model) as dst:
+        dst.setncatts({k: src.getncattr(k) for k in src.ncattrs()})
+        for nome, dim in src.dimensions.items():
+            dst.createDimension(nome, None if dim.isunlimited() else len(dim))
+        for nome, var in src.variables.items():
+            var.set_auto_maskandscale(False)
+            fill = var.getncattr("_FillValue") if "_FillValue" in var.ncattrs() else None
+            saida = dst.createVariable(nome, var.dtype, var.dimensions, fill_value=fill)
+            saida.set_auto_maskandscale(False)
+            saida.setncatts({k: var.getncattr(k) for k in var.ncattrs() if k != "_FillValue"})
+            if var.dimensions and var.dimensions[0] == "Time":
+                for k, t in enumerate(quadros):
+                    saida[k] = var[t]
+            else:
+                saida[...] = var[...]
+    print(destino)
+    return 0
+
+def registrar(args):
+    """
+    Marca os PNGs existentes dos quadros plotados com a identidade do wrfout e, com
+    --rodada, os grava no catálogo (o domínio é o nome do diretório --saida). Imprime quantos faltam.
+    """
+    manifesto = carregar(args.manifesto)
+    quadros = manifesto.get("variaveis", {}).get(args.variavel, [])
+    alvo = indices(args.quadros) if args.quadros else range(len(quadros))
+    origem = identidade(args.wrfout)
+    renderizados = manifesto.setdefault("renderizados", {})
+    multinivel = args.variavel.startswith(PREFIXO_MULTINIVEL)
+    referenciados = quadros_referenciados(args.saida)
+    plotados = []
+    faltando = 0
+    for i in alvo:
+        valido = datetime.strptime(manifesto["tempos"][i], "%Y-%m-%d_%H:%M:%S").isoformat(timespec="minutes")
+        for j, nome in enumerate(quadros[i]):
+            path = os.path.join(args.saida, args.variavel, nome)
+            if os.path.isfile(path):
+                renderizados[f"{args.variavel}/{nome}"] = origem
+                plotados.append((path, int(manifesto["niveis"][j]) if multinivel else None, valido))
+            elif localizar(args.saida, args.variavel, nome, referenciados) is None:
+                faltando += 1
+    salvar(args.manifesto, manifesto)
+    if args.rodada and plotados:
+        dominio = os.path.basename(os.path.normpath(args.saida))
+        catalogo_quadros.registrar_quadros(args.web_root, args.rodada, dominio, args.variavel, plotados)
+    print(faltando)
+    return 0
+
+def config(args):
+    """Escreve o config.js (totalFrames e variáveis completas por domínio) a partir dos manifestos."""
+    linhas = ["const simulationConfig = {"]
+    for path in [m for m in args.manifestos.split(",") if m]:
+        manifesto = carregar(path)
+        if not manifesto:
+            continue
+        dominio = os.path.splitext(os.path.basename(path))[0]
+        saida_dominio = os.path.join(os.path.dirname(os.path.abspath(args.saida)), dominio)
+        referenciados = quadros_referenciados(saida_dominio)
+        linhas += [f"    '{dominio}': {{", f"        totalFrames: {len(manifesto['tempos'])},", "        variables: ["]
+        for variavel, quadros in manifesto["variaveis"].items():
+            ausentes = sum(localizar(saida_dominio, variavel, nome, referenciados) is None
+                           for arquivos in quadros for nome in arquivos)
+            if ausentes:
+                print(f"⚠️ {dominio}/{variavel}: {ausentes} PNG(s) ausentes; fora do {os.path.basename(args.saida)}.")
+                continue
+            linhas.append(f"            '{variavel}',")
+        linhas += ["        ]", "    },"]
+    linhas.append("};")
+    salvar(args.saida, "\n".join(linhas) + "\n")
+    return 0
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Interpreta o subcomando e o executa."""
+    parser = argparse.ArgumentParser(description="Manifesto dos quadros esperados da plotagem de uma rodada.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("planejar", help="Atualiza o manifesto e lista os quadros que faltam por variável.")
+    p.add_argument("--wrfout", required=True)
+    p.add_argument("--manifesto", required=True)
+    p.add_argument("--saida", required=True, help="Diretório do domínio (<saida>/<variável>/*.png).")
+    p.add_argument("--variaveis", required=True)
+    p.add_argument("--niveis", default=NIVEIS_PADRAO)
+    p.set_defaults(funcao=planejar)
+
+    p = sub.add_parser("recortar", help="Grava um wrfout só com os tempos pedidos.")
+    p.add_argument("--wrfout", required=True)
+    p.add_argument("--quadros", required=True)
+    p.add_argument("--destino", required=True)
+    p.set_defaults(funcao=recortar)
+
+    p = sub.add_parser("registrar", help="Registra os PNGs plotados de uma variável.")
+    p.add_argument("--wrfout", required=True)
+    p.add_argument("--manifesto", required=True)
+    p.add_argument("--saida", required=True)
+    p.add_argument("--variavel", required=True)
+    p.add_argument("--quadros", help="Índices plotados (padrão: todos).")
+    p.add_argument("--rodada", help="Grava os quadros desta rodada (YYYYMMDDHH) no catálogo SQLite.")
+    p.add_argument("--web-root", default=catalogo_quadros.WEB_ROOT)
+    p.set_defaults(funcao=registrar)
+
+    p = sub.add_parser("config", help="Escreve o config.js a partir dos manifestos.")
+    p.add_argument("--manifestos", required=True, help="Manifestos separados por vírgula (<domínio>.json).")
+    p.add_argument("--saida", required=True)
+    p.set_defaults(funcao=config)
+
+    args = parser.parse_args()
+    sys.exit(args.funcao(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+EXTRAÇÃO VETORIZADA DE METEOGRAMAS PARA UMA LISTA DE CIDADES - UFSC
+
+Gera a previsão por ponto (meteograma) das cidades de cidades_sc_rs.csv sem
+reler o wrfout cidade a cidade:
+1. Os índices de grade de cada cidade (vizinho mais próximo por KD-tree sobre
+   XLAT/XLONG, ou os 4 pontos e pesos da interpolação bilinear) são calculados
+   uma vez por grade e guardados em cache, com chave no hash da grade e da lista.
+2. Cada variável (T2, UR a 2 m, vento a 10 m, chuva, PNMM) é lida para todos os
+   tempos e extraída para todas as cidades com uma única indexação vetorizada.
+3. Cada cidade usa o domínio mais fino que a contém (d02 antes de d01).
+4. O resultado vai para <rodada>/meteograma.json, lido pelo meteograma.html
+   gerado pelo orquestrador.
+
+Uso:
+    ./meteograma.py YYYYMMDDHH [--cidades cidades_sc_rs.csv] [--metodo bilinear|proximo]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+from scipy.spatial import cKDTree
+from netCDF4 import Dataset
+from wrf import getvar, extract_times, to_np, ALL_TIMES
+
+import orquestrador_web
+from cache_diagnosticos import CacheDiagnosticos, fatia_de_tempo, normalizar
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+WEB_ROOT = orquestrador_web.WEB_ROOT
+SCRIPTS_DIR = os.environ.get("SCRIPTS_DIR", os.path.dirname(os.path.abspath(__file__)))
+CIDADES_PADRAO = os.path.join(SCRIPTS_DIR, "cidades_sc_rs.csv")
+CACHE_INDICES_DIR = os.path.join(WORK_DIR, "cache_indices")
+METEOGRAMA_ARQUIVO = orquestrador_web.METEOGRAMA_ARQUIVO
+DOMINIOS = ["d02", "d01"]   # Do mais fino para o mais grosso
+CASAS = 1
+
+# ==============================================================================
+# SEÇÃO 1: ÍNDICES DE GRADE (KD-TREE, EM CACHE POR HASH DA GRADE)
+# ==============================================================================
+
+def ler_cidades(csv_path):
+    """Lista de dicts {nome, uf, lat, lon} do CSV."""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return [{"nome": l["nome"], "uf": l["uf"], "lat": float(l["lat"]), "lon": float(l["lon"])}
+                for l in csv.DictReader(f)]
+
+def _xyz(lat, lon):
+    """Coordenadas cartesianas na esfera unitária (distâncias corretas em qualquer latitude)."""
+    lat, lon = np.deg2rad(lat), np.deg2rad(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+def calcular_indices(lat, lon, cid_lat, cid_lon, metodo):
+    """
+    Retorna (j, i, pesos, dentro): j/i com forma (N, 4) e pesos (N, 4) para
+    valor = soma(pesos * campo[..., j, i]). No método 'proximo' os 4 índices são o
+    mesmo ponto com peso 1. 'dentro' indica as cidades no interior da grade.
+    """
+    ny, nx = lat.shape
+    xyz = _xyz(lat, lon)
+    distancia, idx = cKDTree(xyz.reshape(-1, 3)).query(_xyz(cid_lat, cid_lon))
+    j0, i0 = np.divmod(idx, nx)
+    # Fora da grade o vizinho mais próximo cai na borda, a mais de um espaçamento de grade
+    espacamento = np.linalg.norm(xyz[ny // 2, nx // 2 + 1] - xyz[ny // 2, nx // 2])
+    dentro = (j0 > 0) & (j0 < ny - 1) & (i0 > 0) & (i0 < nx - 1) & (distancia < 1.5 * espacamento)
+
+    if metodo == "proximo":
+        return np.repeat(j0[:, None], 4, 1), np.repeat(i0[:, None], 4, 1), np.tile([1.0, 0, 0, 0], (len(idx), 1)), dentro
+
+    # Bilinear: posição fracionária pela inversa do jacobiano local da grade em (j0, i0)
+    jc, ic = np.clip(j0, 1, ny - 2), np.clip(i0, 1, nx - 2)
+    coslat = np.cos(np.deg2rad(lat[jc, ic]))
+    dlon_di = (lon[jc, ic + 1] - lon[jc, ic - 1]) / 2.0 * coslat
+    dlon_dj = (lon[jc + 1, ic] - lon[jc - 1, ic]) / 2.0 * coslat
+    dlat_di = (lat[jc, ic + 1] - lat[jc, ic - 1]) / 2.0
+    dlat_dj = (lat[jc + 1, ic] - lat[jc - 1, ic]) / 2.0
+    delta_lon = (cid_lon - lon[jc, ic]) * coslat
+    delta_lat = cid_lat - lat[jc, ic]
+    det = dlon_di * dlat_dj - dlon_dj * dlat_di
+    x = ic + (delta_lon * dlat_dj - delta_lat * dlon_dj) / det
+    y = jc + (delta_lat * dlon_di - delta_lon * dlat_di) / det
+    ib = np.clip(np.floor(x).astype(int), 0, nx - 2)
+    jb = np.clip(np.floor(y).astype(int), 0, ny - 2)
+    fx, fy = np.clip(x - ib, 0, 1), np.clip(y - jb, 0, 1)
+    j = np.stack([jb, jb, jb + 1, jb + 1], axis=1)
+    i = np.stack([ib, ib + 1, ib, ib + 1], axis=1)
+    pesos = np.stack([(1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy], axis=1)
+    return j, i, pesos, dentro
+
+def indices_em_cache(nc, cidades, metodo, cache_dir=CACHE_INDICES_DIR):
+    """Índices da grade do wrfout para as cidades, reaproveitados enquanto a grade e a lista não mudarem."""
+    lat = np.asarray(nc.variables["XLAT"][0], dtype="f8")
+    lon = np.asarray(nc.variables["XLONG"][0], dtype="f8")
+    h = hashlib.sha256(lat.tobytes() + lon.tobytes())
+    h.update(json.dumps(cidades, sort_keys=True).encode("utf-8"))
+    h.update(metodo.encode("utf-8"))
+    cache_path = os.path.join(cache_dir, f"indices_{h.hexdigest()[:20]}.npz")
+    if os.path.isfile(cache_path):
+        with np.load(cache_path) as dados:
+            return dados["j"], dados["i"], dados["pesos"], dados["dentro"], True
+    j, i, pesos, dentro = calcular_indices(lat, lon, np.array([c["lat"] for c in cidades]),
+                                           np.array([c["lon"] for c in cidades]), metodo)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp{os.getpid()}.npz"
+    np.savez(tmp_path, j=j, i=i, pesos=pesos, dentro=dentro)
+    os.replace(tmp_path, cache_path)
+    return j, i, pesos, dentro, False
+
+# ==============================================================================
+# SEÇÃO 2: EXTRAÇÃO VETORIZADA
+# ==============================================================================
+
+def _nos_tempos(nc, nome, t, **kwargs):
+    return getvar(nc, nome, timeidx=t, squeeze=False, meta=False, **kwargs)
+
+def _todos_tempos(nc, nome, **kwargs):
+    campo = to_np(_nos_tempos(nc, nome, ALL_TIMES, **kwargs))
+    return np.ma.filled(np.ma.asarray(campo, dtype="f4"), np.nan)
+
+def _chuva_horaria(nc, t):
+    acumulada = nc.variables["RAINC"][:] + nc.variables["RAINNC"][:]
+    return np.diff(acumulada, axis=0, prepend=acumulada[:1])
+
+# nome -> (função(nc, timeidx) -> (tempos, ny, nx), unidade, chave no cache de diagnósticos ou None)
+# A chave 'slp' é a mesma do exportar_campos.py: quem rodar primeiro calcula para os dois.
+VARIAVEIS = {
+    "t2": (lambda nc, t: nc.variables["T2"][fatia_de_tempo(t)] - 273.15, "°C", None),
+    "ur2": (lambda nc, t: _nos_tempos(nc, "rh2", t), "%", "rh2"),
+    "ppn": (_chuva_horaria, "mm/h", None),
+    "slp": (lambda nc, t: _nos_tempos(nc, "slp", t, units="hPa"), "hPa", "slp"),
+}
+
+def calcular_variavel(nc, nome, cache=None):
+    """Campo (tempos, ny, nx) da variável, lido do cache de diagnósticos quando ela tem chave."""
+    funcao, unidade, chave = VARIAVEIS[nome]
+    if cache is None or chave is None:
+        forma = (len(nc.dimensions["south_north"]), len(nc.dimensions["west_east"]))
+        return normalizar(funcao(nc, ALL_TIMES), forma)
+    return cache.obter(nc, chave, funcao, unidade=unidade)
+
+def extrair(campo, j, i, pesos):
+    """Uma indexação para todas as cidades e tempos: (tempos, ny, nx) -> (tempos, N)."""
+    return (np.asarray(campo)[:, j, i] * pesos).sum(axis=-1)
+
+def extrair_dominio(nc, j, i, pesos, cache=None):
+    """{variável: (tempos, N)} para as cidades do domínio, incluindo vento e direção a 10 m."""
+    series = {nome: extrair(calcular_variavel(nc, nome, cache), j, i, pesos) for nome in VARIAVEIS}
+    # Componentes rotacionadas para a Terra: a direção é calculada depois da interpolação
+    uv = _todos_tempos(nc, "uvmet10", units="km h-1")
+    u, v = extrair(uv[0], j, i, pesos), extrair(uv[1], j, i, pesos)
+    series["vento10"] = np.hypot(u, v)
+    series["dir10"] = np.mod(270.0 - np.rad2deg(np.arctan2(v, u)), 360.0)
+    return series
+
+UNIDADES = dict({nome: unidade for nome, (_, unidade, _) in VARIAVEIS.items()}, vento10="km/h", dir10="°")
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Extrai os meteogramas das cidades e grava o JSON da rodada."""
+    parser = argparse.ArgumentParser(description="Gera meteogramas das cidades a partir do wrfout.")
+    parser.add_argument("date", help="Rodada (YYYYMMDDHH).")
+    parser.add_argument("--cidades", default=CIDADES_PADRAO, help="CSV com nome,uf,lat,lon.")
+    parser.add_argument("--metodo", choices=["bilinear", "proximo"], default="bilinear")
+    parser.add_argument("--web-root", default=WEB_ROOT)
+    args = parser.parse_args()
+
+    print("="*50)
+    print(f"METEOGRAMAS DAS CIDADES: {args.date}")
+    print("="*50)
+    wrf_dir = os.path.join(WORK_DIR, args.date, "WRF_RUN", "run_wrf")
+    cidades = ler_cidades(args.cidades)
+    pendentes = np.ones(len(cidades), dtype=bool)
+    saida = {"rodada": args.date, "metodo": args.metodo, "unidades": UNIDADES, "dominios": {}, "cidades": []}
+    t0 = time.perf_counter()
+
+    for domain in DOMINIOS:
+        arquivos = sorted(glob.glob(os.path.join(wrf_dir, f"wrfout_{domain}_*")))
+        if not arquivos or not pendentes.any():
+            continue
+        with Dataset(arquivos[0]) as nc:
+            j, i, pesos, dentro, em_cache = indices_em_cache(nc, cidades, args.metodo)
+            usar = np.flatnonzero(pendentes & dentro)
+            if not len(usar):
+                continue
+            print(f"-> {domain}: {len(usar)} cidade(s), índices {'do cache' if em_cache else 'calculados'}.")
+            cache = CacheDiagnosticos(arquivos[0], args.date, domain)
+            series = extrair_dominio(nc, j[usar], i[usar], pesos[usar], cache)
+            saida["dominios"][domain] = [str(t)[:16] for t in extract_times(nc, ALL_TIMES, meta=False)]
+            cache.relatorio()
+        for k, c in enumerate(usar):
+            cidade = dict(cidades[c], dominio=domain)
+            cidade["series"] = {nome: np.round(valores[:, k], CASAS).tolist() for nome, valores in series.items()}
+            saida["cidades"].append(cidade)
+        pendentes[usar] = False
+
+    if pendentes.any():
+        fora = [cidades[c]["nome"] for c in np.flatnonzero(pendentes)]
+        print(f"⚠️ {len(fora)} cidade(s) fora dos domínios: {', '.join(fora)}")
+    if not saida["cidades"]:
+        print("❌ ERRO: nenhuma cidade extraída (wrfout ausente?).")
+        sys.exit(1)
+    saida["cidades"].sort(key=lambda c: (c["uf"], c["nome"]))
+    destino = os.path.join(orquestrador_web.preparar_rodada(args.web_root, args.date), METEOGRAMA_ARQUIVO)
+    orquestrador_web.escrever_arquivo(destino, json.dumps(saida, ensure_ascii=False, separators=(',', ':')))
+    print(f"✅ {len(saida['cidades'])} meteograma(s) em {time.perf_counter() - t0:.1f}s -> {destino}")
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,14 @@ ORQUESTRADOR WEB DE PREVISÃO DO TEMPO - UFSC (v5 - Adicionado Cabeçalho Instit
 Script unificado que:
 1. Adiciona um cabeçalho institucional com logo e informações da UFSC.
 2. Realiza o download do logo da UFSC se ele não existir localmente.
-3. Gera a página principal com um calendário de previsões.
-4. Gera um visualizador detalhado para cada rodada de previsão.
+3. Publica de forma atômica as rodadas montadas em WEB_ROOT/.preparo e grava todos
+   os arquivos via arquivo temporário + os.replace.
+4. Mantém um catálogo das rodadas (00Z e 12Z), em um JSON por mês, só com acréscimos.
+5. Gera a página principal, cujo calendário é montado no navegador a partir do catálogo.
+6. Gera um visualizador detalhado para cada rodada de previsão (a URL de cada quadro
+   leva a versão do conteúdo, para que um quadro replotado não fique no cache).
+7. Lê as rodadas e os quadros do catálogo SQLite (catalogo_quadros.py) em vez de
+   listar o WEB_ROOT, e registra nele a publicação de cada rodada.
 
 Autor: Gemini AI / Reinaldo Haas
 Data da Modificação: 2025-07-22
@@ -17,20 +23,60 @@ Data da Modificação: 2025-07-22
 import os
 import sys
 import json
-import calendar
 import re
+import fcntl
+import ctypes
+import shutil
+import struct
+import zipfile
 from datetime import datetime, date
-import locale
 from collections import defaultdict
+from contextlib import contextmanager
 import urllib.request
+import argparse
+
+import rastreamento
+import catalogo_quadros
 
 # --- CONFIGURAÇÕES GLOBAIS ---
-WEB_ROOT = "/var/www/html"
+WEB_ROOT = os.environ.get("WEB_ROOT", "/var/www/html")
+CATALOGO_DIR = "catalogo"
+PACOTE_QUADROS = "quadros.zip"
+REFERENCIAS_QUADROS = "referencias.json"
+CAMPOS_DIR = "campos"
+METEOGRAMA_ARQUIVO = "meteograma.json"
+LESTADA_DIR = "lestada"
+PREPARO_DIR = ".preparo"
+# Gravado pelo plotar_rodadas_diaria.sh (todos os domínios) no fim da plotagem
+PLOTAGEM_CONCLUIDA = ".plotagem_concluida"
+SERVICE_WORKER = "sw.js"
+SW_RODADAS_EM_CACHE = 4      # Rodadas mais recentes do catálogo mantidas no cache do navegador
+SW_LIMITE_CACHE_MB = 200     # Teto do cache de quadros (LRU)
+VERSAO_QUADRO_CARACTERES = 12 # Início do SHA-256 usado como ?v= na URL dos quadros
 
 # ==============================================================================
-# SEÇÃO AUXILIAR: DOWNLOAD DE RECURSOS
+# SEÇÃO AUXILIAR: ESCRITA ATÔMICA E DOWNLOAD DE RECURSOS
 # ==============================================================================
 
+def escrever_arquivo(path, conteudo):
+    """
+    Grava 'conteudo' (str ou bytes) via arquivo temporário + os.replace, para que nem o
+    navegador nem o lftp vejam um arquivo pela metade. Se o conteúdo não mudou, o arquivo
+    é mantido (e o mtime também), evitando que o mirror o envie de novo.
+    Retorna True se o arquivo foi (re)escrito.
+    """
+    modo = 'b' if isinstance(conteudo, bytes) else ''
+    if os.path.isfile(path):
+        with open(path, 'r' + modo, **({} if modo else {'encoding': 'utf-8'})) as f:
+            if f.read() == conteudo:
+                return False
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w' + modo, **({} if modo else {'encoding': 'utf-8'})) as f:
+        f.write(conteudo)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+    return True
+
 def ensure_logo_exists(target_dir):
     """Verifica se o logo da UFSC existe e, se não, faz o download."""
     logo_url = "https://upload.wikimedia.org/wikipedia/commons/6/6f/Brasao_UFSC_vertical_extenso.svg"
@@ -40,11 +86,9 @@ def ensure_logo_exists(target_dir):
     if not os.path.exists(logo_path):
         print(f"-> Baixando o logo da UFSC para '{logo_path}'...")
         try:
-            with urllib.request.urlopen(logo_url) as response, open(logo_path, 'wb') as out_file:
-                data = response.read()
-                out_file.write(data)
+            with urllib.request.urlopen(logo_url) as response:
+                escrever_arquivo(logo_path, response.read())
             print("✅ Logo baixado com sucesso.")
-            os.chmod(logo_path, 0o644)
         except Exception as e:
             print(f"❌ ERRO ao baixar o logo: {e}")
 
@@ -53,59 +97,172 @@ def ensure_logo_exists(target_dir):
 # ==============================================================================
 
 def find_forecast_dirs(root_path):
-    """Encontra os diretórios de previsão e os mapeia para objetos de data."""
+    """Rodadas publicadas (00Z e 12Z), lidas do catálogo SQLite, mapeadas para objetos de data."""
     forecasts = {}
     if not os.path.isdir(root_path):
         print(f"AVISO: Diretório raiz '{root_path}' não encontrado.")
         return forecasts
-    for item in os.listdir(root_path):
-        if os.path.isdir(os.path.join(root_path, item)) and len(item) == 10 and item.isdigit():
-            try:
-                forecast_date = date(int(item[0:4]), int(item[4:6]), int(item[6:8]))
-                if forecast_date not in forecasts:
-                    forecasts[forecast_date] = item
-            except ValueError:
-                continue
+    for item in catalogo_quadros.rodadas(root_path):
+        # Uma rodada apagada à mão sai do catálogo com 'catalogo_quadros.py importar'
+        if not os.path.isdir(os.path.join(root_path, item)):
+            print(f"AVISO: Rodada '{item}' está no catálogo mas não no disco.")
+            continue
+        try:
+            forecasts[item] = date(int(item[0:4]), int(item[4:6]), int(item[6:8]))
+        except ValueError:
+            continue
     return forecasts
 
-def generate_calendar_html(year, month, forecasts, today):
-    """Gera o HTML de uma tabela de calendário para o mês e ano fornecidos."""
+# ==============================================================================
+# SEÇÃO 1.1: CATÁLOGO DE RODADAS (JSON POR MÊS, SOMENTE ACRÉSCIMO)
+# ==============================================================================
+# WEB_ROOT/catalogo/indice.json -> {"meses": ["2025-06", "2025-07", ...]}
+# WEB_ROOT/catalogo/YYYY-MM.json -> {"mes": "2025-07", "rodadas": ["2025070100", "2025070112", ...]}
+# Registrar uma rodada reescreve apenas o arquivo do mês dela (no máximo ~62
+# entradas) e, se o mês for novo, o índice. A página principal lê esses
+# arquivos no navegador, então nada precisa ser reescaneado nem regenerado.
+
+def _caminho_catalogo(root_path, nome):
+    return os.path.join(root_path, CATALOGO_DIR, nome)
+
+def _ler_json(path, padrao):
     try:
-        locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
-    except locale.Error:
-        print("AVISO: Locale 'pt_BR.UTF-8' não disponível.")
-    cal = calendar.monthcalendar(year, month)
-    month_name = date(year, month, 1).strftime('%B').capitalize()
-    html = f'<div class="calendar-header"><h2>{month_name} de {year}</h2></div>'
-    html += '<table class="calendar">'
-    html += '<thead><tr>' + ''.join(f'<th>{day}</th>' for day in ['Dom', 'Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb']) + '</tr></thead>'
-    html += '<tbody>'
-    for week in cal:
-        html += '<tr>'
-        for day in week:
-            if day == 0:
-                html += '<td class="empty"></td>'
-            else:
-                current_date = date(year, month, day)
-                classes = ["day-cell", "today"] if current_date == today else ["day-cell"]
-                if current_date in forecasts:
-                    dir_name = forecasts[current_date]
-                    classes.append("active")
-                    html += f'<td class="{" ".join(classes)}"><a href="./{dir_name}/index.html" title="Ver previsão de {day}/{month}/{year}">{day}</a></td>'
-                else:
-                    classes.append("inactive")
-                    html += f'<td class="{" ".join(classes)}">{day}</td>'
-        html += '</tr>'
-    html += '</tbody></table>'
-    return html
-
-def generate_main_index(root_path, forecasts):
-    """Gera o arquivo index.html principal com o calendário e novo cabeçalho."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return padrao
+
+def _escrever_json(path, dados):
+    escrever_arquivo(path, json.dumps(dados, separators=(',', ':')))
+
+@contextmanager
+def _trava_catalogo(root_path):
+    """Serializa as atualizações do catálogo (as etapas 'web' e 'web_historico' rodam em paralelo)."""
+    os.makedirs(os.path.join(root_path, CATALOGO_DIR), exist_ok=True)
+    with open(_caminho_catalogo(root_path, ".trava"), 'w') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+def registrar_rodadas(root_path, dir_names):
+    """Acrescenta rodadas ao catálogo. Só os meses afetados são reescritos. Retorna quantas eram novas."""
+    por_mes = defaultdict(set)
+    for dir_name in dir_names:
+        por_mes[f"{dir_name[0:4]}-{dir_name[4:6]}"].add(dir_name)
+    novas = 0
+    with _trava_catalogo(root_path):
+        indice_path = _caminho_catalogo(root_path, "indice.json")
+        indice = _ler_json(indice_path, {"meses": []})
+        for mes, rodadas in por_mes.items():
+            mes_path = _caminho_catalogo(root_path, f"{mes}.json")
+            catalogo_mes = _ler_json(mes_path, {"mes": mes, "rodadas": []})
+            faltantes = rodadas - set(catalogo_mes["rodadas"])
+            if faltantes:
+                catalogo_mes["rodadas"] = sorted(set(catalogo_mes["rodadas"]) | faltantes)
+                _escrever_json(mes_path, catalogo_mes)
+                novas += len(faltantes)
+        meses = sorted(set(indice["meses"]) | set(por_mes))
+        if meses != indice["meses"]:
+            indice["meses"] = meses
+            _escrever_json(indice_path, indice)
+    return novas
+
+def registrar_rodada(root_path, dir_name):
+    """Acrescenta uma única rodada ao catálogo (custo O(1), sem listar o WEB_ROOT)."""
+    return registrar_rodadas(root_path, [dir_name])
+
+# ==============================================================================
+# SEÇÃO 1.2: PUBLICAÇÃO ATÔMICA DAS RODADAS (DIRETÓRIO DE PREPARO)
+# ==============================================================================
+# O plotar_rodadas_diaria.sh escreve em WEB_ROOT/.preparo/<rodada>; a rodada só
+# aparece em WEB_ROOT/<rodada> quando está completa, por um rename no mesmo
+# sistema de arquivos. O sync_html.sh exclui o .preparo do mirror.
+
+def diretorio_preparo(root_path, dir_name):
+    return os.path.join(root_path, PREPARO_DIR, dir_name)
+
+def diretorio_da_rodada(root_path, dir_name):
+    """Diretório onde a rodada está sendo montada, se houver; senão o publicado."""
+    preparo = diretorio_preparo(root_path, dir_name)
+    return preparo if os.path.isdir(preparo) else os.path.join(root_path, dir_name)
+
+def rodadas_em_preparo(root_path):
+    base = os.path.join(root_path, PREPARO_DIR)
+    if not os.path.isdir(base):
+        return []
+    return sorted(d for d in os.listdir(base) if len(d) == 10 and d.isdigit())
+
+def preparar_rodada(root_path, dir_name):
+    """
+    Garante o diretório de preparo da rodada, como o plotar_rodadas_diaria.sh: cópia por
+    hardlinks da versão publicada (ou diretório vazio), colocada no lugar com um rename,
+    de modo que etapas paralelas não criem dois preparos. Retorna o caminho.
+    """
+    preparo = diretorio_preparo(root_path, dir_name)
+    if os.path.isdir(preparo):
+        return preparo
+    os.makedirs(os.path.dirname(preparo), exist_ok=True)
+    tmp_dir = f"{preparo}.tmp{os.getpid()}"
+    publicado = os.path.join(root_path, dir_name)
+    if os.path.isdir(publicado):
+        shutil.copytree(publicado, tmp_dir, copy_function=os.link)
+    else:
+        os.makedirs(tmp_dir)
+    try:
+        os.rename(tmp_dir, preparo)
+    except OSError:
+        # Outra etapa criou o preparo primeiro
+        shutil.rmtree(tmp_dir)
+    return preparo
+
+def _trocar_diretorios(origem, destino):
+    """Troca dois diretórios em uma única operação (renameat2 com RENAME_EXCHANGE, Linux >= 3.15)."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    AT_FDCWD, RENAME_EXCHANGE = -100, 2
+    if renameat2(AT_FDCWD, os.fsencode(origem), AT_FDCWD, os.fsencode(destino), RENAME_EXCHANGE) != 0:
+        return False
+    return True
+
+def plotagem_concluida(root_path, dir_name):
+    return os.path.isfile(os.path.join(diretorio_preparo(root_path, dir_name), PLOTAGEM_CONCLUIDA))
+
+def publicar_rodada(root_path, dir_name):
+    """Move a rodada do diretório de preparo para WEB_ROOT/<rodada> de forma atômica."""
+    preparo = diretorio_preparo(root_path, dir_name)
+    publicado = os.path.join(root_path, dir_name)
+    # O marcador só vale para o preparo; não vai para a rodada publicada nem para o mirror
+    if os.path.exists(os.path.join(preparo, PLOTAGEM_CONCLUIDA)):
+        os.remove(os.path.join(preparo, PLOTAGEM_CONCLUIDA))
+    if not os.path.isdir(publicado):
+        os.rename(preparo, publicado)
+    elif _trocar_diretorios(preparo, publicado):
+        # Após a troca, o preparo contém a versão antiga publicada
+        shutil.rmtree(preparo)
+    else:
+        # Sem renameat2: dois renames seguidos (a rodada some só entre eles)
+        antigo = f"{preparo}.antigo{os.getpid()}"
+        os.rename(publicado, antigo)
+        os.rename(preparo, publicado)
+        shutil.rmtree(antigo)
+    catalogo_quadros.marcar_publicada(root_path, dir_name)
+    print(f"✅ Rodada {dir_name} publicada.")
+
+def generate_main_index(root_path):
+    """
+    Gera o index.html principal com o cabeçalho e o calendário.
+    A página não depende das rodadas: o calendário é montado no navegador a partir
+    do catálogo, então o arquivo só é reescrito quando o próprio template muda.
+    """
     print(">> Gerando a página principal (index.html)...")
     ensure_logo_exists(root_path) # Garante que o logo da UFSC está presente
-    
-    today = date.today()
-    calendar_html = generate_calendar_html(today.year, today.month, forecasts, today)
+
+    calendar_html = CALENDARIO_HTML
     main_page_html = f"""
 <!DOCTYPE html>
 <html lang="pt-BR">
@@ -157,7 +314,7 @@ def generate_main_index(root_path, forecasts):
         a {{ color: #005a9c; text-decoration: none; }}
         hr {{ border: 0; border-top: 1px solid #eee; margin: 25px 0; }}
         footer {{ margin-top: 30px; padding-top: 20px; border-top: 1px solid #ccc; font-size: 0.9em; text-align: center; }}
-        .calendar-header {{ text-align: center; margin-bottom: 15px; }}
+        .calendar-header {{ display: flex; align-items: center; justify-content: space-between; margin-bottom: 15px; }}
         .calendar-header h2 {{ margin: 0; color: #333; }}
         .calendar {{ width: 100%; border-collapse: collapse; }}
         .calendar th {{ padding: 10px; background-color: #e9f5ff; color: #005a9c; font-weight: bold; }}
@@ -165,9 +322,14 @@ def generate_main_index(root_path, forecasts):
         .day-cell {{ font-size: 1.2em; font-weight: bold; transition: background-color 0.3s; }}
         .day-cell.inactive {{ color: #aaa; background-color: #f9f9f9; }}
         .day-cell.today {{ box-shadow: inset 0 0 0 3px #ff9800; }}
-        .day-cell.active a {{ display: flex; align-items: center; justify-content: center; width: 100%; height: 100%; background-color: #c8e6c9; color: #2e7d32; font-weight: bold; }}
-        .day-cell.active a:hover {{ background-color: #a5d6a7; text-decoration: none; }}
+        .day-cell.active {{ background-color: #c8e6c9; color: #2e7d32; }}
         .day-cell.empty {{ background-color: #fafafa; border: 1px solid #eee; }}
+        .calendar-header button {{ padding: 6px 14px; border: 1px solid #005a9c; border-radius: 5px; background-color: #fff; color: #005a9c; font-size: 1.1em; cursor: pointer; }}
+        .calendar-header button:disabled {{ border-color: #ccc; color: #ccc; cursor: default; }}
+        .day-cell .day-number {{ display: block; }}
+        .day-cell .badges {{ display: flex; gap: 4px; justify-content: center; margin-top: 4px; }}
+        .day-cell .badges a {{ display: inline-block; width: auto; padding: 0 6px; border-radius: 4px; background-color: #2e7d32; color: #fff; font-size: 0.7em; }}
+        .day-cell .badges a:hover {{ background-color: #1b5e20; }}
     </style>
 </head>
 <body>
@@ -204,13 +366,107 @@ def generate_main_index(root_path, forecasts):
     """
     try:
         output_path = os.path.join(root_path, 'index.html')
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(main_page_html)
-        os.chmod(output_path, 0o644)
-        print("✅ Página principal gerada com sucesso.")
+        if escrever_arquivo(output_path, main_page_html):
+            print("✅ Página principal gerada com sucesso.")
+        else:
+            print("✔️ Página principal já está atualizada.")
+        gerar_service_worker(root_path)
     except IOError as e:
         print(f"❌ ERRO ao gerar a página principal: {e}")
 
+# ==============================================================================
+# TEMPLATE DO CALENDÁRIO (MONTADO NO NAVEGADOR A PARTIR DO CATÁLOGO)
+# ==============================================================================
+CALENDARIO_HTML = """
+        <div class="calendar-header">
+            <button id="cal-anterior" title="Mês anterior">&lsaquo;</button>
+            <h2 id="cal-titulo">Carregando...</h2>
+            <button id="cal-proximo" title="Próximo mês">&rsaquo;</button>
+        </div>
+        <table class="calendar">
+            <thead><tr><th>Dom</th><th>Seg</th><th>Ter</th><th>Qua</th><th>Qui</th><th>Sex</th><th>Sáb</th></tr></thead>
+            <tbody id="cal-corpo"></tbody>
+        </table>
+        <script>
+        (function () {
+            const MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho',
+                           'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'];
+            const titulo = document.getElementById('cal-titulo');
+            const corpo = document.getElementById('cal-corpo');
+            const btnAnterior = document.getElementById('cal-anterior');
+            const btnProximo = document.getElementById('cal-proximo');
+            const shards = {};
+            let meses = [], ano, mes;
+
+            const chave = (a, m) => `${a}-${String(m + 1).padStart(2, '0')}`;
+            const carregar = (url) => fetch(url, { cache: 'no-cache' }).then(r => r.ok ? r.json() : null).catch(() => null);
+
+            async function rodadasDoMes(a, m) {
+                const k = chave(a, m);
+                if (!meses.includes(k)) return [];
+                if (!(k in shards)) {
+                    const dados = await carregar(`catalogo/${k}.json`);
+                    shards[k] = dados ? dados.rodadas : [];
+                }
+                return shards[k];
+            }
+
+            async function desenhar() {
+                titulo.textContent = `${MESES[mes]} de ${ano}`;
+                btnAnterior.disabled = !meses.length || chave(ano, mes) <= meses[0];
+                btnProximo.disabled = !meses.length || chave(ano, mes) >= meses[meses.length - 1];
+                const porDia = {};
+                for (const rodada of await rodadasDoMes(ano, mes)) {
+                    const dia = parseInt(rodada.slice(6, 8), 10);
+                    (porDia[dia] = porDia[dia] || []).push(rodada);
+                }
+                const hoje = new Date();
+                const primeiro = new Date(ano, mes, 1).getDay();
+                const dias = new Date(ano, mes + 1, 0).getDate();
+                let html = '<tr>';
+                for (let i = 0; i < primeiro; i++) html += '<td class="empty"></td>';
+                for (let dia = 1; dia <= dias; dia++) {
+                    const classes = ['day-cell'];
+                    if (hoje.getFullYear() === ano && hoje.getMonth() === mes && hoje.getDate() === dia) classes.push('today');
+                    const rodadas = porDia[dia];
+                    if (rodadas) {
+                        classes.push('active');
+                        const badges = rodadas.map(r => `<a href="./${r}/index.html" title="Rodada ${r.slice(8, 10)}Z de ${dia}/${mes + 1}/${ano}">${r.slice(8, 10)}Z</a>`).join('');
+                        html += `<td class="${classes.join(' ')}"><span class="day-number">${dia}</span><span class="badges">${badges}</span></td>`;
+                    } else {
+                        classes.push('inactive');
+                        html += `<td class="${classes.join(' ')}">${dia}</td>`;
+                    }
+                    if ((primeiro + dia) % 7 === 0 && dia < dias) html += '</tr><tr>';
+                }
+                for (let i = (primeiro + dias) % 7; i > 0 && i < 7; i++) html += '<td class="empty"></td>';
+                corpo.innerHTML = html + '</tr>';
+            }
+
+            function mover(delta) {
+                mes += delta;
+                if (mes < 0) { mes = 11; ano--; }
+                if (mes > 11) { mes = 0; ano++; }
+                desenhar();
+            }
+
+            btnAnterior.addEventListener('click', () => mover(-1));
+            btnProximo.addEventListener('click', () => mover(1));
+
+            carregar('catalogo/indice.json').then(indice => {
+                meses = indice ? indice.meses : [];
+                const hoje = new Date();
+                const atual = chave(hoje.getFullYear(), hoje.getMonth());
+                // Abre no mês atual; se ele ainda não tem rodadas, no último mês com rodadas
+                const inicial = (!meses.length || meses.includes(atual)) ? atual : meses[meses.length - 1];
+                ano = parseInt(inicial.slice(0, 4), 10);
+                mes = parseInt(inicial.slice(5, 7), 10) - 1;
+                desenhar();
+            });
+        })();
+        </script>
+"""
+
 # ==============================================================================
 # SEÇÃO 2: FUNÇÕES PARA O VISUALIZADOR (LÓGICA CORRIGIDA COM REGEX)
 # ==============================================================================
@@ -288,18 +544,84 @@ def get_variable_descriptions():
 
 
 
+def indice_do_pacote(pacote_path):
+    """
+    Lê o diretório central do pacote (zip sem compressão) de uma rodada arquivada e
+    retorna {caminho_relativo: [offset, tamanho]} com a posição dos bytes de cada PNG,
+    para que o visualizador busque os quadros com requisições HTTP Range.
+    """
+    indice = {}
+    with zipfile.ZipFile(pacote_path) as pacote, open(pacote_path, 'rb') as f:
+        for info in pacote.infolist():
+            # Cabeçalho local: 30 bytes fixos + nome + campo extra (tamanhos nos bytes 26-29)
+            f.seek(info.header_offset + 26)
+            nome_len, extra_len = struct.unpack('<HH', f.read(4))
+            indice[info.filename] = [info.header_offset + 30 + nome_len + extra_len, info.file_size]
+    return indice
+
+def ler_referencias(forecast_dir):
+    """Quadros removidos por deduplicar_imagens.py: {caminho_relativo: objeto em WEB_ROOT/objetos}."""
+    try:
+        with open(os.path.join(forecast_dir, REFERENCIAS_QUADROS), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def raiz_e_rodada(forecast_dir):
+    """WEB_ROOT/<rodada> ou WEB_ROOT/.preparo/<rodada> -> (WEB_ROOT, rodada)."""
+    pai, dir_name = os.path.split(os.path.normpath(os.path.abspath(forecast_dir)))
+    if os.path.basename(pai) == PREPARO_DIR:
+        pai = os.path.dirname(pai)
+    return pai, dir_name
+
+def listar_quadros(forecast_dir):
+    """
+    Retorna ({domínio: {variável: [arquivos .png]}}, índice do pacote ou None, referências,
+    versões). Os quadros vêm do catálogo SQLite. Rodadas arquivadas por arquivar_rodadas.py
+    são listadas a partir do pacote (que tem o índice de bytes), e quadros deduplicados (sem
+    arquivo na rodada) entram pelas referências ao armazenamento comum. As versões
+    ({caminho: início do SHA-256}) vão na URL dos quadros, que são servidos como imutáveis
+    mas mantêm o nome quando replotados.
+    """
+    quadros = defaultdict(dict)
+    referencias = {}
+    versoes = {}
+    pacote_path = os.path.join(forecast_dir, PACOTE_QUADROS)
+    if not os.path.isfile(pacote_path):
+        # O catálogo já sabe quais quadros estão na rodada e quais apontam para objetos
+        # (um quadro replotado depois da deduplicação volta a existir e prevalece)
+        root_path, dir_name = raiz_e_rodada(forecast_dir)
+        for domain, variable, nome, objeto, digest in catalogo_quadros.quadros_da_rodada(root_path, dir_name):
+            quadros[domain].setdefault(variable, []).append(nome)
+            if objeto:
+                referencias[f"{domain}/{variable}/{nome}"] = f"../{objeto}"
+            elif digest:
+                # Sem hash (quadro importado do disco) a URL fica sem versão até a próxima plotagem
+                versoes[f"{domain}/{variable}/{nome}"] = digest[:VERSAO_QUADRO_CARACTERES]
+        return quadros, None, referencias, versoes
+
+    indice = indice_do_pacote(pacote_path)
+    for caminho in indice:
+        partes = caminho.split('/')
+        if len(partes) == 3 and partes[0].startswith('d0') and partes[2].endswith('.png'):
+            quadros[partes[0]].setdefault(partes[1], []).append(partes[2])
+    for caminho, objeto in ler_referencias(forecast_dir).items():
+        domain, variable, nome = caminho.split('/')
+        existentes = quadros[domain].setdefault(variable, [])
+        if nome not in existentes:
+            existentes.append(nome)
+            referencias[caminho] = f"../{objeto}"
+    return quadros, indice, referencias, versoes
+
 def generate_forecast_viewer(forecast_dir):
     """Gera os arquivos do visualizador usando Regex para robustez."""
     print(f"  -> Processando visualizador para: {os.path.basename(forecast_dir)}")
     simulation_data = {}
-    domains = [d for d in os.listdir(forecast_dir) if os.path.isdir(os.path.join(forecast_dir, d)) and d.startswith('d0')]
-    for domain in sorted(domains):
-        domain_path = os.path.join(forecast_dir, domain)
+    quadros, indice_pacote, referencias, versoes = listar_quadros(forecast_dir)
+    for domain in sorted(quadros):
         simulation_data[domain] = {}
-        variables = [v for v in os.listdir(domain_path) if os.path.isdir(os.path.join(domain_path, v))]
-        for variable in sorted(variables):
-            variable_path = os.path.join(domain_path, variable)
-            image_files = [f for f in os.listdir(variable_path) if f.endswith('.png')]
+        for variable in sorted(quadros[domain]):
+            image_files = quadros[domain][variable]
             
             is_multilevel = variable.startswith('u_')
             
@@ -318,20 +640,32 @@ def generate_forecast_viewer(forecast_dir):
                 sorted_files = sorted(image_files, key=lambda f: parse_info_from_filename(f, is_multilevel=False)[1])
                 simulation_data[domain][variable] = [os.path.join(domain, variable, f) for f in sorted_files]
 
-    data_js_path = os.path.join(forecast_dir, 'data.js')
-    with open(data_js_path, 'w', encoding='utf-8') as f:
-        f.write("const simulationData = ")
-        json.dump(simulation_data, f, indent=4)
-        f.write(";")
+    data_js = "const simulationData = " + json.dumps(simulation_data, indent=4) + ";"
+    if indice_pacote is not None:
+        data_js += (f"\nconst pacoteQuadros = {{\"arquivo\": \"{PACOTE_QUADROS}\", \"indice\": "
+                    + json.dumps(indice_pacote, separators=(',', ':')) + "};")
+    if referencias:
+        data_js += "\nconst referenciasQuadros = " + json.dumps(referencias, separators=(',', ':')) + ";"
+    if versoes:
+        data_js += "\nconst versoesQuadros = " + json.dumps(versoes, separators=(',', ':')) + ";"
+    # Campos quantizados de exportar_campos.py: página em canvas ao lado das imagens
+    if os.path.isfile(os.path.join(forecast_dir, CAMPOS_DIR, "indice.json")):
+        data_js += "\nconst camposInterativos = \"campos.html\";"
+    # Lestada de lestada.py: linha do tempo por trecho; os mapas usam o mesmo campos.html
+    if os.path.isfile(os.path.join(forecast_dir, LESTADA_DIR, "eventos.json")):
+        data_js += "\nconst lestada = \"lestada.html\";"
+        escrever_arquivo(os.path.join(forecast_dir, 'lestada.html'), HTML_TEMPLATE_LESTADA)
+    if any(os.path.isfile(os.path.join(forecast_dir, d, "indice.json")) for d in (CAMPOS_DIR, LESTADA_DIR)):
+        escrever_arquivo(os.path.join(forecast_dir, 'campos.html'), HTML_TEMPLATE_CAMPOS)
+    # Meteogramas das cidades de meteograma.py
+    if os.path.isfile(os.path.join(forecast_dir, METEOGRAMA_ARQUIVO)):
+        data_js += "\nconst meteogramas = \"meteograma.html\";"
+        escrever_arquivo(os.path.join(forecast_dir, 'meteograma.html'), HTML_TEMPLATE_METEOGRAMA)
+    escrever_arquivo(os.path.join(forecast_dir, 'data.js'), data_js)
 
-    viewer_html_path = os.path.join(forecast_dir, 'index.html')
     descriptions_json = json.dumps(get_variable_descriptions(), indent=12)
     viewer_template = HTML_TEMPLATE_VISUALIZADOR.replace("'%%VARIABLE_DESCRIPTIONS%%'", descriptions_json)
-    with open(viewer_html_path, 'w', encoding='utf-8') as f:
-        f.write(viewer_template)
-    
-    os.chmod(data_js_path, 0o644)
-    os.chmod(viewer_html_path, 0o644)
+    escrever_arquivo(os.path.join(forecast_dir, 'index.html'), viewer_template)
 
 # ==============================================================================
 # TEMPLATE HTML PARA O VISUALIZADOR (JAVASCRIPT TAMBÉM CORRIGIDO)
@@ -368,6 +702,9 @@ HTML_TEMPLATE_VISUALIZADOR = """
     <header>
         <h1>Visualizador de Rodadas do Modelo WRF</h1>
         <p id="run-date"></p>
+        <p id="campos-link" style="display: none;"><a href="campos.html" style="color: #fff;">Campos interativos (valores sob o cursor)</a></p>
+        <p id="meteograma-link" style="display: none;"><a href="meteograma.html" style="color: #fff;">Meteogramas das cidades</a></p>
+        <p id="lestada-link" style="display: none;"><a href="lestada.html" style="color: #fff;">Lestada no litoral</a></p>
     </header>
     <div class="container">
         <div class="controls">
@@ -418,6 +755,9 @@ HTML_TEMPLATE_VISUALIZADOR = """
         function init() {
             const pathParts = window.location.pathname.split('/').filter(Boolean);
             runDateElement.textContent = `Rodada de: ${pathParts[pathParts.length - 2] || 'Data não encontrada'}`;
+            if (typeof camposInterativos !== 'undefined') document.getElementById('campos-link').style.display = 'block';
+            if (typeof meteogramas !== 'undefined') document.getElementById('meteograma-link').style.display = 'block';
+            if (typeof lestada !== 'undefined') document.getElementById('lestada-link').style.display = 'block';
             const domains = Object.keys(simulationData);
             if (domains.length === 0) {
                 alert("Dados de simulação não encontrados ou vazios. Verifique o arquivo data.js");
@@ -460,7 +800,34 @@ HTML_TEMPLATE_VISUALIZADOR = """
             imagePaths = simulationData[currentDomain][currentVariable][currentLevel];
             updateAnimationUI();
         }
+        const urlsDoPacote = new Map();
+        function mostrarQuadro(path) {
+            // Quadros deduplicados apontam para o armazenamento comum em ../objetos; os demais
+            // levam a versão do conteúdo na URL (um quadro replotado mantém o nome do arquivo)
+            const versao = typeof versoesQuadros !== 'undefined' && versoesQuadros[path];
+            const url = (typeof referenciasQuadros !== 'undefined' && referenciasQuadros[path])
+                || (versao ? `${path}?v=${versao}` : path);
+            if (typeof pacoteQuadros === 'undefined' || !(path in pacoteQuadros.indice)) {
+                imageDisplay.src = url;
+                return;
+            }
+            // Rodada arquivada: os bytes do PNG são lidos de dentro do pacote com HTTP Range
+            if (urlsDoPacote.has(path)) {
+                imageDisplay.src = urlsDoPacote.get(path);
+                return;
+            }
+            const [inicio, tamanho] = pacoteQuadros.indice[path];
+            fetch(pacoteQuadros.arquivo, { headers: { Range: `bytes=${inicio}-${inicio + tamanho - 1}` } })
+                .then(r => r.status === 206 ? r.blob() : r.blob().then(b => b.slice(inicio, inicio + tamanho)))
+                .then(b => {
+                    const url = URL.createObjectURL(new Blob([b], { type: 'image/png' }));
+                    urlsDoPacote.set(path, url);
+                    if (imagePaths[currentFrame] === path) imageDisplay.src = url;
+                });
+        }
         function updateAnimationUI() {
+            urlsDoPacote.forEach(url => URL.revokeObjectURL(url));
+            urlsDoPacote.clear();
             currentFrame = 0;
             frameSlider.max = imagePaths.length > 0 ? imagePaths.length - 1 : 0;
             frameSlider.value = 0;
@@ -473,7 +840,7 @@ HTML_TEMPLATE_VISUALIZADOR = """
                 frameInfo.textContent = "Frame: 0/0 | Validade: --";
                 return;
             };
-            imageDisplay.src = imagePaths[currentFrame];
+            mostrarQuadro(imagePaths[currentFrame]);
             frameSlider.value = currentFrame;
             const totalFrames = imagePaths.length;
             const filename = imagePaths[currentFrame].split('/').pop();
@@ -513,28 +880,745 @@ HTML_TEMPLATE_VISUALIZADOR = """
             playPauseBtn.textContent = "Play";
         }
         document.addEventListener('DOMContentLoaded', init);
+        if ('serviceWorker' in navigator) {
+            // sw.js fica na raiz do site (ao lado do catálogo) e atende todas as rodadas
+            navigator.serviceWorker.register('../sw.js', { scope: '../' }).catch(() => {});
+        }
+    </script>
+</body>
+</html>
+"""
+
+# ==============================================================================
+# TEMPLATE DA PÁGINA DE CAMPOS QUANTIZADOS (CANVAS + PALETA)
+# ==============================================================================
+# Lê campos/indice.json e os binários de exportar_campos.py (ou, com ?fonte=lestada, os
+# mapas de lestada.py no mesmo formato). Cada binário tem todos os tempos de um campo:
+# o quadro t é o trecho [t*nx*ny, (t+1)*nx*ny) do vetor uint8/uint16;
+# valor = deslocamento + código * escala (o código 'ausente' é transparente).
+HTML_TEMPLATE_CAMPOS = """
+<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Campos Interativos - Rodadas WRF</title>
+    <style>
+        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; margin: 0; background-color: #f4f4f9; color: #333; }
+        .container { max-width: 1200px; margin: auto; padding: 20px; }
+        header { background-color: #004b8d; color: white; padding: 20px; text-align: center; }
+        header h1 { margin: 0; font-size: 2em; }
+        header p { margin: 5px 0 0; }
+        header a { color: #fff; }
+        .controls { display: flex; flex-wrap: wrap; gap: 20px; align-items: flex-end; background-color: #fff; padding: 15px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px; }
+        .control-group { display: flex; flex-direction: column; }
+        label { font-weight: bold; margin-bottom: 5px; font-size: 0.9em; }
+        select, button { padding: 10px; border-radius: 5px; border: 1px solid #ccc; font-size: 1em; }
+        button { background-color: #0056b3; color: white; cursor: pointer; border: none; height: 40px; }
+        .viewer { text-align: center; }
+        #mapa { max-width: 100%; border: 1px solid #ddd; background-color: #fff; border-radius: 8px; cursor: crosshair; }
+        #legenda { display: block; margin: 8px auto 0; }
+        #leitura { font-weight: bold; min-height: 1.5em; margin-top: 8px; }
+        .animation-controls { display: flex; align-items: center; justify-content: center; gap: 15px; margin-top: 15px; flex-wrap: wrap; }
+        #frame-slider { flex-grow: 1; max-width: 600px; cursor: pointer; }
+        #frame-info { font-weight: bold; min-width: 220px; text-align: center; }
+    </style>
+</head>
+<body>
+    <header>
+        <h1>Campos Interativos do Modelo WRF</h1>
+        <p id="run-date"></p>
+        <p><a href="index.html">Voltar ao visualizador de imagens</a></p>
+    </header>
+    <div class="container">
+        <div class="controls">
+            <div class="control-group">
+                <label for="domain-select">Domínio:</label>
+                <select id="domain-select"></select>
+            </div>
+            <div class="control-group">
+                <label for="field-select">Campo:</label>
+                <select id="field-select"></select>
+            </div>
+            <div class="control-group">
+                <label for="palette-select">Paleta:</label>
+                <select id="palette-select"></select>
+            </div>
+        </div>
+        <div class="viewer">
+            <canvas id="mapa" width="900" height="700"></canvas>
+            <canvas id="legenda" width="600" height="40"></canvas>
+            <div id="leitura">Passe o mouse sobre o mapa para ler o valor.</div>
+            <div class="animation-controls">
+                <button id="play-pause-btn">Play</button>
+                <input type="range" id="frame-slider" min="0" max="0" value="0">
+                <span id="frame-info">Validade: --</span>
+            </div>
+        </div>
+    </div>
+    <script>
+        const PALETAS = {
+            viridis: ['#440154', '#3b528b', '#21918c', '#5ec962', '#fde725'],
+            temperatura: ['#313695', '#4575b4', '#abd9e9', '#ffffbf', '#fdae61', '#d73027', '#a50026'],
+            chuva: ['#ffffff', '#c6dbef', '#6baed6', '#2171b5', '#08306b', '#54278f'],
+            divergente: ['#2166ac', '#92c5de', '#f7f7f7', '#f4a582', '#b2182b'],
+            cinza: ['#000000', '#ffffff'],
+        };
+        const LARGURA_MAX = 900;
+        const fonteParam = new URLSearchParams(window.location.search).get('fonte');
+        const FONTE = /^[a-z_]+$/.test(fonteParam || '') ? fonteParam : 'campos';
+        const mapa = document.getElementById('mapa');
+        const ctx = mapa.getContext('2d');
+        const legenda = document.getElementById('legenda');
+        const domainSelect = document.getElementById('domain-select');
+        const fieldSelect = document.getElementById('field-select');
+        const paletteSelect = document.getElementById('palette-select');
+        const frameSlider = document.getElementById('frame-slider');
+        const frameInfo = document.getElementById('frame-info');
+        const leitura = document.getElementById('leitura');
+        const playPauseBtn = document.getElementById('play-pause-btn');
+        const grades = new Map();
+        const binarios = new Map();
+        const luts = {};
+        let indice = null, grade = null, cabecalho = null, dados = null, tempo = 0, escalaPx = 1;
+        let animacao = null;
+
+        // LUT de 256 cores RGB interpolando as cores da paleta
+        function lut(nome) {
+            if (luts[nome]) return luts[nome];
+            const cores = PALETAS[nome].map(c => [1, 3, 5].map(i => parseInt(c.slice(i, i + 2), 16)));
+            const tabela = new Uint8Array(256 * 3);
+            for (let k = 0; k < 256; k++) {
+                const pos = k / 255 * (cores.length - 1);
+                const a = Math.min(Math.floor(pos), cores.length - 2), f = pos - a;
+                for (let c = 0; c < 3; c++) tabela[k * 3 + c] = Math.round(cores[a][c] + f * (cores[a + 1][c] - cores[a][c]));
+            }
+            return (luts[nome] = tabela);
+        }
+
+        async function carregarGrade(domain) {
+            if (!grades.has(domain)) grades.set(domain, await fetch(`${FONTE}/${indice.dominios[domain].grade}`).then(r => r.json()));
+            return grades.get(domain);
+        }
+
+        async function carregarBinario(cab) {
+            if (!binarios.has(cab.arquivo)) {
+                const buffer = await fetch(`${FONTE}/${cab.arquivo}`).then(r => r.arrayBuffer());
+                binarios.set(cab.arquivo, cab.bits === 16 ? new Uint16Array(buffer) : new Uint8Array(buffer));
+            }
+            return binarios.get(cab.arquivo);
+        }
+
+        function formatarTempo(t) {
+            return `${t.slice(8, 10)}/${t.slice(5, 7)}/${t.slice(0, 4)} ${t.slice(11, 16)} UTC`;
+        }
+
+        function desenharLinha(coords, cor, tracejado) {
+            ctx.strokeStyle = cor;
+            ctx.setLineDash(tracejado ? [6, 4] : []);
+            ctx.beginPath();
+            for (let k = 0; k < coords.length; k += 2) {
+                const px = (coords[k] + 0.5) * escalaPx, py = (grade.ny - 0.5 - coords[k + 1]) * escalaPx;
+                if (k === 0) ctx.moveTo(px, py); else ctx.lineTo(px, py);
+            }
+            ctx.stroke();
+        }
+
+        function desenharLegenda() {
+            const lctx = legenda.getContext('2d');
+            const tabela = lut(paletteSelect.value);
+            lctx.clearRect(0, 0, legenda.width, legenda.height);
+            for (let x = 0; x < legenda.width; x++) {
+                const k = Math.round(x / (legenda.width - 1) * 255);
+                lctx.fillStyle = `rgb(${tabela[k * 3]},${tabela[k * 3 + 1]},${tabela[k * 3 + 2]})`;
+                lctx.fillRect(x, 0, 1, 20);
+            }
+            const vmax = cabecalho.deslocamento + (cabecalho.ausente - 1) * cabecalho.escala;
+            lctx.fillStyle = '#333';
+            lctx.font = '12px sans-serif';
+            lctx.textAlign = 'left';
+            lctx.fillText(`${cabecalho.deslocamento.toFixed(1)} ${cabecalho.unidade}`, 0, 36);
+            lctx.textAlign = 'right';
+            lctx.fillText(`${vmax.toFixed(1)} ${cabecalho.unidade}`, legenda.width, 36);
+        }
+
+        function desenhar() {
+            const { nx, ny, ausente } = cabecalho;
+            const n = nx * ny;
+            const quadro = dados.subarray(tempo * n, (tempo + 1) * n);
+            const tabela = lut(paletteSelect.value);
+            const imagem = new ImageData(nx, ny);
+            const px = imagem.data;
+            for (let j = 0; j < ny; j++) {
+                const linha = (ny - 1 - j) * nx;  // j = 0 é a borda sul da grade
+                for (let i = 0; i < nx; i++) {
+                    const codigo = quadro[j * nx + i];
+                    const o = (linha + i) * 4;
+                    if (codigo === ausente) { px[o + 3] = 0; continue; }
+                    const k = Math.round(codigo / (ausente - 1) * 255) * 3;
+                    px[o] = tabela[k]; px[o + 1] = tabela[k + 1]; px[o + 2] = tabela[k + 2]; px[o + 3] = 255;
+                }
+            }
+            const fora = document.createElement('canvas');
+            fora.width = nx; fora.height = ny;
+            fora.getContext('2d').putImageData(imagem, 0, 0);
+            escalaPx = Math.max(1, Math.floor(LARGURA_MAX / nx));
+            mapa.width = nx * escalaPx; mapa.height = ny * escalaPx;
+            ctx.imageSmoothingEnabled = false;
+            ctx.drawImage(fora, 0, 0, mapa.width, mapa.height);
+            ctx.lineWidth = 1;
+            grade.mapa.forEach(l => desenharLinha(l, '#222', false));
+            Object.values(grade.contornos).forEach(l => desenharLinha(l, '#c00', true));
+            frameSlider.value = tempo;
+            frameInfo.textContent = `Quadro ${tempo + 1}/${cabecalho.tempos} | Validade: ${formatarTempo(indice.dominios[domainSelect.value].tempos[tempo])}`;
+        }
+
+        async function onDomainChange() {
+            grade = await carregarGrade(domainSelect.value);
+            const campos = indice.dominios[domainSelect.value].campos;
+            fieldSelect.innerHTML = Object.keys(campos).map(c => `<option value="${c}">${campos[c].nivel ? `${campos[c].variavel} ${campos[c].nivel} hPa` : c}</option>`).join('');
+            await onFieldChange();
+        }
+
+        async function onFieldChange() {
+            cabecalho = indice.dominios[domainSelect.value].campos[fieldSelect.value];
+            dados = await carregarBinario(cabecalho);
+            paletteSelect.value = cabecalho.paleta;
+            tempo = Math.min(tempo, cabecalho.tempos - 1);
+            frameSlider.max = cabecalho.tempos - 1;
+            desenharLegenda();
+            desenhar();
+        }
+
+        function onMouseMove(evento) {
+            if (!dados) return;
+            const r = mapa.getBoundingClientRect();
+            const i = Math.floor((evento.clientX - r.left) * mapa.width / r.width / escalaPx);
+            const j = cabecalho.ny - 1 - Math.floor((evento.clientY - r.top) * mapa.height / r.height / escalaPx);
+            if (i < 0 || j < 0 || i >= cabecalho.nx || j >= cabecalho.ny) return;
+            const codigo = dados[tempo * cabecalho.nx * cabecalho.ny + j * cabecalho.nx + i];
+            leitura.textContent = codigo === cabecalho.ausente ? `Ponto (${i}, ${j}): sem dado`
+                : `Ponto (${i}, ${j}): ${(cabecalho.deslocamento + codigo * cabecalho.escala).toFixed(2)} ${cabecalho.unidade}`;
+        }
+
+        function alternarAnimacao() {
+            if (animacao) {
+                clearInterval(animacao);
+                animacao = null;
+                playPauseBtn.textContent = 'Play';
+            } else if (cabecalho && cabecalho.tempos > 1) {
+                playPauseBtn.textContent = 'Pause';
+                animacao = setInterval(() => { tempo = (tempo + 1) % cabecalho.tempos; desenhar(); }, 500);
+            }
+        }
+
+        async function init() {
+            const pathParts = window.location.pathname.split('/').filter(Boolean);
+            document.getElementById('run-date').textContent = `Rodada de: ${pathParts[pathParts.length - 2] || '--'}`;
+            indice = await fetch(`${FONTE}/indice.json`, { cache: 'no-cache' }).then(r => r.json());
+            paletteSelect.innerHTML = Object.keys(PALETAS).map(p => `<option value="${p}">${p}</option>`).join('');
+            domainSelect.innerHTML = Object.keys(indice.dominios).map(d => `<option value="${d}">${d.toUpperCase()}</option>`).join('');
+            domainSelect.addEventListener('change', onDomainChange);
+            fieldSelect.addEventListener('change', onFieldChange);
+            paletteSelect.addEventListener('change', () => { desenharLegenda(); desenhar(); });
+            frameSlider.addEventListener('input', () => { tempo = parseInt(frameSlider.value, 10); desenhar(); });
+            playPauseBtn.addEventListener('click', alternarAnimacao);
+            mapa.addEventListener('mousemove', onMouseMove);
+            await onDomainChange();
+        }
+        document.addEventListener('DOMContentLoaded', init);
+    </script>
+</body>
+</html>
+"""
+
+# ==============================================================================
+# TEMPLATE DA PÁGINA DE METEOGRAMAS DAS CIDADES
+# ==============================================================================
+# Lê o meteograma.json de meteograma.py: uma série por variável e cidade, nos tempos
+# do domínio usado para a cidade. Os gráficos são desenhados em canvas, sem bibliotecas.
+HTML_TEMPLATE_METEOGRAMA = """
+<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Meteogramas - Rodadas WRF</title>
+    <style>
+        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; margin: 0; background-color: #f4f4f9; color: #333; }
+        .container { max-width: 1200px; margin: auto; padding: 20px; }
+        header { background-color: #004b8d; color: white; padding: 20px; text-align: center; }
+        header h1 { margin: 0; font-size: 2em; }
+        header p { margin: 5px 0 0; }
+        header a { color: #fff; }
+        .controls { display: flex; flex-wrap: wrap; gap: 20px; align-items: flex-end; background-color: #fff; padding: 15px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px; }
+        .control-group { display: flex; flex-direction: column; }
+        label { font-weight: bold; margin-bottom: 5px; font-size: 0.9em; }
+        select { padding: 10px; border-radius: 5px; border: 1px solid #ccc; font-size: 1em; }
+        .painel { background-color: #fff; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 15px; padding: 10px; }
+        .painel h3 { margin: 0 0 5px; color: #004b8d; font-size: 1em; }
+        .painel canvas { width: 100%; height: 180px; }
+    </style>
+</head>
+<body>
+    <header>
+        <h1>Meteogramas das Cidades</h1>
+        <p id="run-date"></p>
+        <p><a href="index.html">Voltar ao visualizador de imagens</a></p>
+    </header>
+    <div class="container">
+        <div class="controls">
+            <div class="control-group">
+                <label for="city-select">Cidade:</label>
+                <select id="city-select"></select>
+            </div>
+            <div class="control-group"><span id="city-info"></span></div>
+        </div>
+        <div id="paineis"></div>
+    </div>
+    <script>
+        const PAINEIS = [
+            { titulo: 'Temperatura a 2 m', series: [['t2', '#d73027']] },
+            { titulo: 'Umidade relativa a 2 m', series: [['ur2', '#2171b5']], min: 0, max: 100 },
+            { titulo: 'Vento a 10 m (setas: direção de onde sopra)', series: [['vento10', '#238b45']], min: 0, setas: 'dir10' },
+            { titulo: 'Precipitação horária', series: [['ppn', '#08519c']], min: 0, barras: true },
+            { titulo: 'Pressão ao nível do mar', series: [['slp', '#54278f']] },
+        ];
+        let dados = null;
+
+        function desenharPainel(canvas, painel, cidade, tempos) {
+            const dpr = window.devicePixelRatio || 1;
+            canvas.width = canvas.clientWidth * dpr;
+            canvas.height = canvas.clientHeight * dpr;
+            const ctx = canvas.getContext('2d');
+            ctx.scale(dpr, dpr);
+            const w = canvas.clientWidth, h = canvas.clientHeight, m = { e: 50, d: 10, t: 10, b: 25 };
+            const valores = painel.series.flatMap(([nome]) => cidade.series[nome]);
+            let vmin = painel.min !== undefined ? painel.min : Math.min(...valores);
+            let vmax = painel.max !== undefined ? painel.max : Math.max(...valores);
+            if (vmax - vmin < 1e-6) vmax = vmin + 1;
+            const px = k => m.e + k / Math.max(tempos.length - 1, 1) * (w - m.e - m.d);
+            const py = v => h - m.b - (v - vmin) / (vmax - vmin) * (h - m.t - m.b);
+            ctx.clearRect(0, 0, w, h);
+            ctx.strokeStyle = '#ddd'; ctx.fillStyle = '#555'; ctx.font = '11px sans-serif';
+            for (let g = 0; g <= 4; g++) {
+                const v = vmin + g / 4 * (vmax - vmin);
+                ctx.beginPath(); ctx.moveTo(m.e, py(v)); ctx.lineTo(w - m.d, py(v)); ctx.stroke();
+                ctx.textAlign = 'right'; ctx.fillText(`${v.toFixed(1)}`, m.e - 4, py(v) + 4);
+            }
+            ctx.textAlign = 'center';
+            const passo = Math.max(1, Math.ceil(tempos.length / 12));
+            for (let k = 0; k < tempos.length; k += passo) {
+                ctx.fillText(`${tempos[k].slice(8, 10)}/${tempos[k].slice(11, 13)}h`, px(k), h - 8);
+            }
+            for (const [nome, cor] of painel.series) {
+                const serie = cidade.series[nome];
+                ctx.strokeStyle = cor; ctx.fillStyle = cor; ctx.lineWidth = 2;
+                if (painel.barras) {
+                    const largura = Math.max(2, (w - m.e - m.d) / tempos.length * 0.7);
+                    serie.forEach((v, k) => ctx.fillRect(px(k) - largura / 2, py(v), largura, py(vmin) - py(v)));
+                } else {
+                    ctx.beginPath();
+                    serie.forEach((v, k) => (k ? ctx.lineTo(px(k), py(v)) : ctx.moveTo(px(k), py(v))));
+                    ctx.stroke();
+                }
+                if (painel.setas) {
+                    ctx.lineWidth = 1;
+                    cidade.series[painel.setas].forEach((graus, k) => {
+                        if (k % passo) return;
+                        // A seta aponta para onde o vento vai (direção meteorológica + 180°)
+                        const a = (graus + 180) * Math.PI / 180, x = px(k), y = m.t + 8;
+                        ctx.beginPath(); ctx.moveTo(x - 7 * Math.sin(a), y + 7 * Math.cos(a)); ctx.lineTo(x + 7 * Math.sin(a), y - 7 * Math.cos(a)); ctx.stroke();
+                        ctx.beginPath(); ctx.arc(x + 7 * Math.sin(a), y - 7 * Math.cos(a), 2, 0, 2 * Math.PI); ctx.fill();
+                    });
+                }
+            }
+        }
+
+        function mostrarCidade() {
+            const cidade = dados.cidades[parseInt(document.getElementById('city-select').value, 10)];
+            const tempos = dados.dominios[cidade.dominio];
+            document.getElementById('city-info').textContent =
+                `${cidade.lat.toFixed(2)}, ${cidade.lon.toFixed(2)} | domínio ${cidade.dominio.toUpperCase()} | horários em UTC`;
+            const paineis = document.getElementById('paineis');
+            paineis.innerHTML = PAINEIS.map((p, k) => {
+                const unidade = dados.unidades[p.series[0][0]];
+                return `<div class="painel"><h3>${p.titulo} (${unidade})</h3><canvas id="painel-${k}"></canvas></div>`;
+            }).join('');
+            PAINEIS.forEach((p, k) => desenharPainel(document.getElementById(`painel-${k}`), p, cidade, tempos));
+        }
+
+        async function init() {
+            const pathParts = window.location.pathname.split('/').filter(Boolean);
+            document.getElementById('run-date').textContent = `Rodada de: ${pathParts[pathParts.length - 2] || '--'}`;
+            dados = await fetch('meteograma.json', { cache: 'no-cache' }).then(r => r.json());
+            const select = document.getElementById('city-select');
+            select.innerHTML = dados.cidades.map((c, k) => `<option value="${k}">${c.nome} (${c.uf})</option>`).join('');
+            select.addEventListener('change', mostrarCidade);
+            window.addEventListener('resize', mostrarCidade);
+            mostrarCidade();
+        }
+        document.addEventListener('DOMContentLoaded', init);
     </script>
 </body>
 </html>
 """
 
+# ==============================================================================
+# TEMPLATE DA PÁGINA DE LESTADA (LINHA DO TEMPO POR TRECHO DO LITORAL)
+# ==============================================================================
+# Lê lestada/eventos.json de lestada.py: para cada trecho do litoral, a componente
+# média do vento para a costa, a fração de pontos acima do limiar e os eventos.
+# Os mapas ficam em lestada/ no formato dos campos e abrem no campos.html?fonte=lestada.
+HTML_TEMPLATE_LESTADA = """
+<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Lestada - Rodadas WRF</title>
+    <style>
+        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; margin: 0; background-color: #f4f4f9; color: #333; }
+        .container { max-width: 1200px; margin: auto; padding: 20px; }
+        header { background-color: #004b8d; color: white; padding: 20px; text-align: center; }
+        header h1 { margin: 0; font-size: 2em; }
+        header p { margin: 5px 0 0; }
+        header a { color: #fff; }
+        .trecho { background-color: #fff; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 15px; padding: 10px 15px; }
+        .trecho h3 { margin: 0 0 8px; color: #004b8d; font-size: 1em; }
+        .linha { display: flex; height: 28px; }
+        .linha div { flex: 1; border-right: 1px solid #fff; }
+        .linha div.evento { border-bottom: 4px solid #c00; }
+        .eixo { display: flex; font-size: 0.75em; color: #666; }
+        .eixo span { flex: 1; }
+        ul { margin: 8px 0 0; padding-left: 20px; font-size: 0.9em; }
+        #criterio { background-color: #fff; padding: 10px 15px; border-radius: 8px; margin-bottom: 15px; font-size: 0.9em; }
+    </style>
+</head>
+<body>
+    <header>
+        <h1>Lestada no Litoral de SC e RS</h1>
+        <p id="run-date"></p>
+        <p><a href="index.html">Voltar ao visualizador de imagens</a> | <a href="campos.html?fonte=lestada">Mapas da lestada</a></p>
+    </header>
+    <div class="container">
+        <div id="criterio"></div>
+        <div id="trechos"></div>
+    </div>
+    <script>
+        // Cor da célula pela componente média para a costa: azul (para o mar) a vermelho (forte para a costa)
+        function cor(v, limiar) {
+            const f = Math.max(-1, Math.min(1.5, v / limiar));
+            if (f < 0) return `rgb(${Math.round(255 + 120 * f)}, ${Math.round(255 + 80 * f)}, 255)`;
+            const g = Math.round(255 - 150 * Math.min(f, 1));
+            return f >= 1 ? `rgb(${Math.round(255 - 100 * (f - 1))}, 60, 40)` : `rgb(255, ${g}, ${Math.round(g * 0.8)})`;
+        }
+
+        function hora(t) { return `${t.slice(8, 10)}/${t.slice(5, 7)} ${t.slice(11, 13)}h`; }
+
+        function trecho(s, tempos, dados) {
+            const passo = Math.max(1, Math.ceil(tempos.length / 8));
+            const celulas = s.media_ms.map((v, k) =>
+                `<div class="${s.evento[k] ? 'evento' : ''}" style="background-color: ${cor(v, dados.limiar_ms)}" ` +
+                `title="${hora(tempos[k])} UTC: ${v.toFixed(1)} m/s para a costa, ${Math.round(100 * s.fracao[k])}% dos pontos acima do limiar"></div>`).join('');
+            const eixo = tempos.map((t, k) => `<span>${k % passo ? '' : hora(t)}</span>`).join('');
+            const eventos = s.eventos.length
+                ? s.eventos.map(e => `<li>${hora(e.inicio)} a ${hora(e.fim)} UTC (${e.duracao_h} h), pico de ${e.pico_ms} m/s em ${hora(e.pico_tempo)}</li>`).join('')
+                : '<li>Sem lestada prevista.</li>';
+            return `<div class="trecho"><h3>${s.nome} <small>(${s.dominio.toUpperCase()}, ${s.pontos} pontos)</small></h3>` +
+                   `<div class="linha">${celulas}</div><div class="eixo">${eixo}</div><ul>${eventos}</ul></div>`;
+        }
+
+        async function init() {
+            const pathParts = window.location.pathname.split('/').filter(Boolean);
+            document.getElementById('run-date').textContent = `Rodada de: ${pathParts[pathParts.length - 2] || '--'}`;
+            const dados = await fetch('lestada/eventos.json', { cache: 'no-cache' }).then(r => r.json());
+            document.getElementById('criterio').textContent =
+                `Lestada: vento a 10 m para a costa de pelo menos ${dados.limiar_ms} m/s em ${Math.round(100 * dados.fracao_minima)}% ` +
+                `dos pontos do trecho, por ${dados.persistencia_h} h ou mais. Horários em UTC.`;
+            document.getElementById('trechos').innerHTML =
+                dados.segmentos.map(s => trecho(s, dados.dominios[s.dominio], dados)).join('');
+        }
+        document.addEventListener('DOMContentLoaded', init);
+    </script>
+</body>
+</html>
+"""
+
+# ==============================================================================
+# SEÇÃO 3: SERVICE WORKER (CACHE OFFLINE DO VISUALIZADOR)
+# ==============================================================================
+# O visualizador registra WEB_ROOT/sw.js, que:
+# - guarda index.html e data.js de cada rodada (rede primeiro, cache se offline);
+# - atende do cache, sem ir à rede, qualquer quadro já visto (PNGs da rodada, objetos
+#   da deduplicação e trechos Range do quadros.zip das rodadas arquivadas);
+# - limita o cache de quadros a SW_LIMITE_CACHE_MB, descartando os menos usados (LRU);
+# - remove as rodadas que não estão entre as SW_RODADAS_EM_CACHE mais recentes do catálogo.
+
+def gerar_service_worker(root_path):
+    """Grava o sw.js na raiz do site (só reescrito se o template ou os limites mudarem)."""
+    sw_js = (SERVICE_WORKER_JS.replace("%%RODADAS_EM_CACHE%%", str(SW_RODADAS_EM_CACHE))
+             .replace("%%LIMITE_CACHE_BYTES%%", str(SW_LIMITE_CACHE_MB * 1024 * 1024)))
+    if escrever_arquivo(os.path.join(root_path, SERVICE_WORKER), sw_js):
+        print(f"✅ Service worker ({SERVICE_WORKER}) atualizado.")
+
+SERVICE_WORKER_JS = r"""// Gerado por orquestrador_web.py - cache offline do visualizador de rodadas
+const VERSAO = 'v1';
+const CACHE_VISUALIZADOR = `ufsc-visualizador-${VERSAO}`;
+const CACHE_QUADROS = `ufsc-quadros-${VERSAO}`;
+const RODADAS_EM_CACHE = %%RODADAS_EM_CACHE%%;
+const LIMITE_CACHE_BYTES = %%LIMITE_CACHE_BYTES%%;
+const INTERVALO_LIMPEZA_MS = 60 * 60 * 1000;
+
+const ESCOPO = self.registration.scope;
+const BASE = new URL(ESCOPO).pathname;
+const RE_VISUALIZADOR = /^(\d{10})\/(index\.html|data\.js)?$/;
+const RE_QUADRO = /^(\d{10})\/d0\d\/[^/]+\/[^/]+\.png$/;
+const RE_OBJETO = /^objetos\/[0-9a-f]{2}\/[0-9a-f]{64}\.png$/;
+const RE_PACOTE = /^(\d{10})\/quadros\.zip$/;
+
+// Tamanho de cada entrada do cache de quadros (reconstruído quando o worker reinicia)
+let tamanhos = null;
+let totalBytes = 0;
+let ultimaLimpeza = 0;
+let fila = Promise.resolve();
+const emFila = (tarefa) => (fila = fila.then(tarefa).catch(() => {}));
+
+function relativo(url) {
+    const u = new URL(url);
+    return u.origin === self.location.origin && u.pathname.startsWith(BASE) ? u.pathname.slice(BASE.length) : null;
+}
+
+function rodadaDaUrl(url) {
+    const rel = relativo(url);
+    const m = rel && rel.match(/^(\d{10})\//);
+    return m ? m[1] : null;
+}
+
+async function carregarTamanhos() {
+    if (tamanhos) return;
+    tamanhos = new Map();
+    totalBytes = 0;
+    const cache = await caches.open(CACHE_QUADROS);
+    for (const req of await cache.keys()) {
+        const resp = await cache.match(req);
+        const tamanho = parseInt(resp && resp.headers.get('x-tamanho'), 10) || 0;
+        tamanhos.set(req.url, tamanho);
+        totalBytes += tamanho;
+    }
+}
+
+async function esquecer(cache, req) {
+    await cache.delete(req);
+    if (tamanhos && tamanhos.has(req.url)) {
+        totalBytes -= tamanhos.get(req.url);
+        tamanhos.delete(req.url);
+    }
+}
+
+// cache.put sempre acrescenta a entrada no fim de cache.keys(): a ordem das chaves é a do LRU
+async function guardarQuadro(chave, corpo, headers) {
+    await carregarTamanhos();
+    const h = new Headers(headers);
+    h.set('x-tamanho', String(corpo.size));
+    const cache = await caches.open(CACHE_QUADROS);
+    await cache.put(chave, new Response(corpo, { status: 200, headers: h }));
+    totalBytes += corpo.size - (tamanhos.get(chave) || 0);
+    tamanhos.set(chave, corpo.size);
+    if (totalBytes > LIMITE_CACHE_BYTES) {
+        for (const req of await cache.keys()) {
+            if (totalBytes <= LIMITE_CACHE_BYTES * 0.9) break;
+            if (req.url !== chave) await esquecer(cache, req);
+        }
+    }
+}
+
+async function marcarUso(chave, resp) {
+    const cache = await caches.open(CACHE_QUADROS);
+    await cache.put(chave, resp);
+}
+
+async function lerJson(url) {
+    try {
+        const r = await fetch(url, { cache: 'no-cache' });
+        return r.ok ? await r.json() : null;
+    } catch (e) {
+        return null;
+    }
+}
+
+// As N rodadas mais recentes do catálogo que alimenta o calendário da página principal
+async function rodadasRecentes() {
+    const indice = await lerJson(`${ESCOPO}catalogo/indice.json`);
+    if (!indice) return null;
+    const rodadas = [];
+    for (const mes of indice.meses.slice().reverse()) {
+        const shard = await lerJson(`${ESCOPO}catalogo/${mes}.json`);
+        if (!shard) return null;
+        rodadas.push(...shard.rodadas.slice().sort().reverse());
+        if (rodadas.length >= RODADAS_EM_CACHE) break;
+    }
+    return new Set(rodadas.slice(0, RODADAS_EM_CACHE));
+}
+
+async function purgarRodadasAntigas() {
+    const recentes = await rodadasRecentes();
+    if (!recentes || !recentes.size) return;  // Offline ou catálogo vazio: não remove nada
+    ultimaLimpeza = Date.now();
+    await carregarTamanhos();
+    for (const nome of [CACHE_VISUALIZADOR, CACHE_QUADROS]) {
+        const cache = await caches.open(nome);
+        for (const req of await cache.keys()) {
+            const rodada = rodadaDaUrl(req.url);
+            if (rodada && !recentes.has(rodada)) await esquecer(cache, req);
+        }
+    }
+}
+
+// index.html e data.js mudam quando a rodada é republicada: rede primeiro, cache se offline
+async function visualizador(event) {
+    const cache = await caches.open(CACHE_VISUALIZADOR);
+    try {
+        const resp = await fetch(event.request);
+        if (resp.ok) {
+            event.waitUntil(cache.put(event.request, resp.clone()));
+            if (Date.now() - ultimaLimpeza > INTERVALO_LIMPEZA_MS) event.waitUntil(emFila(purgarRodadasAntigas));
+        }
+        return resp;
+    } catch (e) {
+        const guardada = await cache.match(event.request);
+        if (guardada) return guardada;
+        throw e;
+    }
+}
+
+// Quadros têm na URL a versão do conteúdo (?v=, do data.js) ou são objetos por hash: cache primeiro
+async function quadro(event) {
+    const chave = event.request.url;
+    const guardada = await caches.match(chave, { cacheName: CACHE_QUADROS });
+    if (guardada) {
+        const copia = guardada.clone();
+        event.waitUntil(emFila(() => marcarUso(chave, copia)));
+        return guardada;
+    }
+    const resp = await fetch(event.request);
+    if (resp.status === 200) {
+        const copia = resp.clone();
+        event.waitUntil(emFila(async () => guardarQuadro(chave, await copia.blob(), copia.headers)));
+    }
+    return resp;
+}
+
+// Rodadas arquivadas: cada trecho Range do pacote é guardado como uma entrada própria
+async function trechoDoPacote(event, range) {
+    const chave = `${event.request.url}?${range.replace('=', '-')}`;
+    const resposta206 = (corpo, headers) => new Response(corpo, {
+        status: 206,
+        headers: { 'Content-Type': 'application/octet-stream', 'Content-Range': headers.get('x-content-range') || '' },
+    });
+    const guardada = await caches.match(chave, { cacheName: CACHE_QUADROS });
+    if (guardada) {
+        const copia = guardada.clone();
+        event.waitUntil(emFila(() => marcarUso(chave, copia)));
+        return resposta206(guardada.body, guardada.headers);
+    }
+    const resp = await fetch(event.request);
+    if (resp.status === 206) {
+        const copia = resp.clone();
+        event.waitUntil(emFila(async () => guardarQuadro(chave, await copia.blob(),
+            { 'x-content-range': copia.headers.get('Content-Range') || '' })));
+    }
+    return resp;
+}
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        const atuais = [CACHE_VISUALIZADOR, CACHE_QUADROS];
+        for (const nome of await caches.keys()) {
+            if (nome.startsWith('ufsc-') && !atuais.includes(nome)) await caches.delete(nome);
+        }
+        await self.clients.claim();
+        await emFila(purgarRodadasAntigas);
+    })());
+});
+
+self.addEventListener('fetch', (event) => {
+    if (event.request.method !== 'GET') return;
+    const rel = relativo(event.request.url);
+    if (rel === null) return;
+    const range = event.request.headers.get('Range');
+    if (range && RE_PACOTE.test(rel)) {
+        event.respondWith(trechoDoPacote(event, range));
+    } else if (range) {
+        return;
+    } else if (RE_VISUALIZADOR.test(rel)) {
+        event.respondWith(visualizador(event));
+    } else if (RE_QUADRO.test(rel) || RE_OBJETO.test(rel)) {
+        event.respondWith(quadro(event));
+    }
+});
+"""
+
 # ==============================================================================
 # FUNÇÃO PRINCIPAL (ORQUESTRADOR)
 # ==============================================================================
 def main():
     """Função principal que orquestra todo o processo de geração das páginas web."""
+    parser = argparse.ArgumentParser(description="Gera a página principal e os visualizadores das rodadas.")
+    parser.add_argument("--rodada", help="Gera apenas o visualizador desta rodada (YYYYMMDDHH).")
+    parser.add_argument("--excluir", help="Gera todos os visualizadores, exceto o desta rodada (YYYYMMDDHH).")
+    args = parser.parse_args()
+
     print("="*50)
     print("INICIANDO ORQUESTRADOR WEB DE PREVISÃO DO TEMPO (UFSC)")
     print("="*50)
-    forecast_dirs_map = find_forecast_dirs(WEB_ROOT)
-    if not forecast_dirs_map:
-        print("Nenhum diretório de previsão encontrado. Saindo.")
-        return
-    generate_main_index(WEB_ROOT, forecast_dirs_map)
+    # Rodada montada no diretório de preparo: o visualizador é gerado lá e a rodada só é
+    # publicada depois, já completa. Sem --rodada, só são publicados os preparos que o
+    # plotar_rodadas_diaria.sh marcou como concluídos: com ciclos sobrepostos, um preparo
+    # de outra rodada pode estar no meio da plotagem (esse é publicado pela etapa 'web' dele).
+    a_publicar = []
+    if args.rodada:
+        a_publicar = [args.rodada] if os.path.isdir(diretorio_preparo(WEB_ROOT, args.rodada)) else []
+    else:
+        for dir_name in rodadas_em_preparo(WEB_ROOT):
+            if dir_name == args.excluir:
+                continue
+            if plotagem_concluida(WEB_ROOT, dir_name):
+                a_publicar.append(dir_name)
+            else:
+                print(f"-> Rodada {dir_name} ainda em plotagem: fica para 'orquestrador_web.py --rodada {dir_name}'.")
+    for dir_name in a_publicar:
+        with rastreamento.span("visualizador", etapa="web", rodada=dir_name):
+            generate_forecast_viewer(diretorio_preparo(WEB_ROOT, dir_name))
+        publicar_rodada(WEB_ROOT, dir_name)
+
+    if args.rodada:
+        # Rodada nova: registra só ela no catálogo, sem listar o WEB_ROOT
+        if not os.path.isdir(os.path.join(WEB_ROOT, args.rodada)):
+            print(f"Diretório da rodada '{args.rodada}' não encontrado. Saindo.")
+            return
+        with rastreamento.span("catalogo", etapa="web", rodada=args.rodada):
+            registrar_rodada(WEB_ROOT, args.rodada)
+        dir_names = [] if a_publicar else [args.rodada]
+    else:
+        forecast_dirs_map = find_forecast_dirs(WEB_ROOT)
+        if not forecast_dirs_map:
+            print("Nenhum diretório de previsão encontrado. Saindo.")
+            return
+        # Varredura completa: acrescenta ao catálogo rodadas que ainda não estão nele
+        with rastreamento.span("catalogo", etapa="web"):
+            novas = registrar_rodadas(WEB_ROOT, forecast_dirs_map)
+        print(f"-> Catálogo: {novas} rodada(s) nova(s) de {len(forecast_dirs_map)} encontradas.")
+        dir_names = [d for d in forecast_dirs_map if d != args.excluir and d not in a_publicar]
+    with rastreamento.span("index_principal", etapa="web"):
+        generate_main_index(WEB_ROOT)
     print("\n>> Gerando visualizadores para cada rodada...")
-    for dir_name in sorted(forecast_dirs_map.values(), reverse=True):
+    for dir_name in sorted(dir_names, reverse=True):
         forecast_path = os.path.join(WEB_ROOT, dir_name)
-        generate_forecast_viewer(forecast_path)
+        with rastreamento.span("visualizador", etapa="web", rodada=dir_name):
+            generate_forecast_viewer(forecast_path)
     print("\n" + "="*50)
     print("Orquestração concluída com sucesso!")
     print("="*50)
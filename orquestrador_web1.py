@@ -62,7 +62,7 @@ def find_forecast_dirs(root_path):
         if os.path.isdir(os.path.join(root_path, item)) and len(item) == 10 and item.isdigit():
             try:
                 forecast_date = date(int(item[0:4]), int(item[4:6]), int(item[6:8]))
-                if forecast_date not in forecasts:
+                if forecast_date not in forecasts or item > forecasts[forecast_date]:
                     forecasts[forecast_date] = item
             except ValueError:
                 continue
@@ -20,7 +20,7 @@ echo "-> Ativando ambiente Conda: wrf_enviroment"
 # Defina o caminho completo para a sua instalação do Miniconda/Anaconda
 # Substitua '/home/geral1/miniconda3' pelo caminho real onde seu conda está instalado.
 # Baseado na sua informação anterior, este parece ser o caminho:
-export CONDA_INSTALL_PATH="/home/geral1/miniconda3"
+export CONDA_INSTALL_PATH="${CONDA_INSTALL_PATH:-/home/geral1/miniconda3}"
 
 # Verifica se o script de inicialização do conda existe antes de tentar carregá-lo
 if [ -f "${CONDA_INSTALL_PATH}/etc/profile.d/conda.sh" ]; then
@@ -50,10 +50,22 @@ fi
 echo "-> Data da rodada definida para: ${DATE}"
 
 # --- CONFIGURAÇÃO DE CAMINHOS E VARIÁVEIS ---
-WRF_INPUT_DIR="/trabalho/icon/${DATE}/WRF_RUN/run_wrf"
+SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+WRF_INPUT_DIR="${WORK_DIR:-/trabalho/icon}/${DATE}/WRF_RUN/run_wrf"
 pwd
-WEB_OUTPUT_DIR="/var/www/html/${DATE}"
+WEB_ROOT_DIR="${WEB_ROOT:-/var/www/html}"
+WEB_PUBLISHED_DIR="${WEB_ROOT_DIR}/${DATE}"
+# A rodada é montada em .preparo e só aparece em ${WEB_PUBLISHED_DIR} quando o
+# orquestrador_web.py a publica (rename atômico), já com data.js e index.html.
+WEB_OUTPUT_DIR="${WEB_ROOT_DIR}/.preparo/${DATE}"
 DOMAINS_TO_PLOT=("d01" "d02")
+# Um segundo argumento opcional restringe os domínios (ex.: "d01" ou "d01,d02"),
+# permitindo que o executor da cadeia plote cada domínio em paralelo.
+CONFIG_JS_NAME="config.js"
+if [[ -n $2 ]]; then
+    IFS=',' read -r -a DOMAINS_TO_PLOT <<< "$2"
+    CONFIG_JS_NAME="config_$(IFS=_; echo "${DOMAINS_TO_PLOT[*]}").js"
+fi
 ALL_VARIABLES=(
     "slp"
     "mcape"
@@ -72,6 +84,7 @@ ALL_VARIABLES=(
     "u_winds"
     "u_temp"
 )
+ULEVELS="900,500,200"
 # --- FIM DA CONFIGURAÇÃO ---
 
 echo "-> Verificando diretório de entrada: ${WRF_INPUT_DIR}"
@@ -81,11 +94,30 @@ if [ ! -d "$WRF_INPUT_DIR" ]; then
 fi
 cd "$WRF_INPUT_DIR"
 
-echo "-> Limpando e criando diretório de saída: ${WEB_OUTPUT_DIR}"
-mkdir -p "$WEB_OUTPUT_DIR"
+echo "-> Preparando diretório de montagem: ${WEB_OUTPUT_DIR}"
+if [ ! -d "$WEB_OUTPUT_DIR" ]; then
+    mkdir -p "${WEB_ROOT_DIR}/.preparo"
+    tmp_dir="${WEB_OUTPUT_DIR}.tmp$$"
+    if [ -d "$WEB_PUBLISHED_DIR" ]; then
+        # Replotagem de uma rodada publicada: cópia por hardlinks (sem copiar dados),
+        # para que as variáveis já plotadas continuem sendo puladas
+        cp -al "$WEB_PUBLISHED_DIR" "$tmp_dir"
+    else
+        mkdir -p "$tmp_dir"
+    fi
+    # d01 e d02 podem ser plotados em paralelo: só o primeiro 'mv' vale
+    mv -T "$tmp_dir" "$WEB_OUTPUT_DIR" 2>/dev/null || rm -rf "$tmp_dir"
+fi
 
-CONFIG_JS_FILE="${WEB_OUTPUT_DIR}/config.js"
-echo "const simulationConfig = {" > "$CONFIG_JS_FILE"
+CONFIG_JS_FILE="${WEB_OUTPUT_DIR}/${CONFIG_JS_NAME}"
+# Marcador de plotagem concluída: o orquestrador_web.py sem --rodada só publica preparos
+# que o tenham. Sai no início de qualquer plotagem e só volta no fim de uma com todos os domínios.
+PLOTAGEM_CONCLUIDA="${WEB_OUTPUT_DIR}/.plotagem_concluida"
+rm -f "$PLOTAGEM_CONCLUIDA"
+# Manifesto por domínio dos quadros esperados (tempos do wrfout x níveis): só os quadros
+# ausentes ou velhos são plotados, e o config.js é escrito a partir dele.
+MANIFESTO_DIR="${WORK_DIR:-/trabalho/icon}/${DATE}/manifesto"
+MANIFESTOS=()
 
 for domain in "${DOMAINS_TO_PLOT[@]}"; do
     echo -e "\n--- Processando Domínio: ${domain} ---"
@@ -95,35 +127,54 @@ for domain in "${DOMAINS_TO_PLOT[@]}"; do
         continue
     fi
     echo "  -> Arquivo de entrada: ${wrf_file}"
-    
-    echo "    '${domain}': {" >> "$CONFIG_JS_FILE"
-    
-    num_frames=$(ncdump -h "$wrf_file" | grep 'Time = ' | sed 's/.* = \(.*\).*/\1/' | tr -d ';')
-    echo "        totalFrames: ${num_frames}," >> "$CONFIG_JS_FILE"
-    echo "        variables: [" >> "$CONFIG_JS_FILE"
-
-    for variable in "${ALL_VARIABLES[@]}"; do
+
+    manifesto="${MANIFESTO_DIR}/${domain}.json"
+    MANIFESTOS+=("$manifesto")
+    plano="${MANIFESTO_DIR}/${domain}.plano$$"
+    mkdir -p "$MANIFESTO_DIR"
+    python3 "$SCRIPTS_DIR/manifesto_quadros.py" planejar --wrfout "$wrf_file" --manifesto "$manifesto" \
+        --saida "${WEB_OUTPUT_DIR}/${domain}" --variaveis "$(IFS=,; echo "${ALL_VARIABLES[*]}")" --niveis "$ULEVELS" > "$plano"
+    mapfile -t PLANO < "$plano"
+    rm -f "$plano"
+
+    for linha in "${PLANO[@]}"; do
+        read -r variable estado quadros <<< "$linha"
         domain_output_dir="${WEB_OUTPUT_DIR}/${domain}/${variable}"
         mkdir -p "$domain_output_dir"
         echo "  -> Processando variável '${variable}'..."
         if [[ "$domain" = 'd02' ]]  ; then
-           shapefile='/home/geral1/scripts_previsao_UFSC/BR_SC_RS_d02/BR_SC_RS_d02.shp' 
+           shapefile="${SCRIPTS_DIR}/BR_SC_RS_d02/BR_SC_RS_d02.shp" 
          else
-           shapefile='/home/geral1/scripts_previsao_UFSC/SC_RS_d01/SC_RS_d01.shp' 
+           shapefile="${SCRIPTS_DIR}/SC_RS_d01/SC_RS_d01.shp" 
         fi
 
         # ==============================================================================
-        # CONTROLE PARA EVITAR REPLOTAGEM SE OS ARQUIVOS PNG JÁ EXISTIREM
+        # CONTROLE PARA PLOTAR SÓ OS QUADROS AUSENTES OU VELHOS (MANIFESTO)
         # ==============================================================================
-        if compgen -G "${domain_output_dir}/${variable}_*.png" > /dev/null; then
-           echo "  ✅ Arquivos de saída para '${variable}' já existem em ${domain_output_dir}. Pulando wrfplot."
-            echo "            '${variable}'," >> "$CONFIG_JS_FILE"
-           continue # Pula para a próxima variável se os PNGs já existem
+        if [[ "$estado" = "completo" ]]; then
+           echo "  ✅ Todos os quadros de '${variable}' já existem em ${domain_output_dir}. Pulando wrfplot."
+           continue
+        fi
+        entrada="$wrf_file"
+        registrar_quadros=()
+        if [[ "$estado" = "parcial" ]]; then
+            # Um wrfout só com os tempos que faltam: o wrfplot gera exatamente esses quadros
+            recorte_dir="${MANIFESTO_DIR}/recorte_${domain}_${variable}"
+            if recorte=$(python3 "$SCRIPTS_DIR/manifesto_quadros.py" recortar --wrfout "$wrf_file" --quadros "$quadros" --destino "$recorte_dir"); then
+                echo "     - Plotando só os quadros ${quadros}"
+                entrada="$recorte"
+                registrar_quadros=(--quadros "$quadros")
+            else
+                echo "     ⚠️ Recorte indisponível: plotando todos os quadros de '${variable}'."
+            fi
         fi
         # ==============================================================================
 
-        echo wrfplot --shapefile $shapefile  --input "${wrf_file}" --vars "${variable}" --ulevels '900,500,200' --output "${domain_output_dir}" 
-        wrfplot --shapefile  $shapefile   --input "${wrf_file}" --vars "${variable}" --ulevels '900,500,200' --output "${domain_output_dir}" >/dev/null 2>&1
+        echo wrfplot --shapefile $shapefile  --input "${entrada}" --vars "${variable}" --ulevels "$ULEVELS" --output "${domain_output_dir}" 
+        # O wrfplot roda sob o rastreador: com RASTREAMENTO_TIMELINE definido,
+        # o tempo, a CPU, a memória e a E/S de cada variável vão para a linha do tempo.
+        python3 "$SCRIPTS_DIR/rastreamento.py" executar --etapa "plot_${domain}" --dominio "${domain}" --variavel "${variable}" -- \
+            wrfplot --shapefile  $shapefile   --input "${entrada}" --vars "${variable}" --ulevels "$ULEVELS" --output "${domain_output_dir}" >/dev/null 2>&1
 
         if [ $? -eq 0 ]; then
             # ==========================================================
@@ -142,24 +193,33 @@ for domain in "${DOMAINS_TO_PLOT[@]}"; do
             done
             popd > /dev/null
             # ==========================================================
-            
-            echo "            '${variable}'," >> "$CONFIG_JS_FILE"
+
+            faltando=$(python3 "$SCRIPTS_DIR/manifesto_quadros.py" registrar --wrfout "$wrf_file" --manifesto "$manifesto" \
+                --saida "${WEB_OUTPUT_DIR}/${domain}" --variavel "${variable}" "${registrar_quadros[@]}" \
+                --rodada "${DATE}" --web-root "${WEB_ROOT_DIR}")
+            if [[ "$faltando" != "0" ]]; then
+                echo "      ⚠️ ${faltando} PNG(s) de '${variable}' ainda ausentes; serão plotados na próxima execução."
+            fi
         else
             echo "      ❌ ERRO ao executar 'wrfplot' para a variável '${variable}' no domínio '${domain}'."
         fi
+        rm -rf "${MANIFESTO_DIR}/recorte_${domain}_${variable}"
     done
-    
-    echo "        ]" >> "$CONFIG_JS_FILE"
-    echo "    }," >> "$CONFIG_JS_FILE"
 done
 
-echo "};" >> "$CONFIG_JS_FILE"
+python3 "$SCRIPTS_DIR/manifesto_quadros.py" config --manifestos "$(IFS=,; echo "${MANIFESTOS[*]}")" --saida "$CONFIG_JS_FILE"
 
 echo -e "\n-> Desativando ambiente Conda."
 conda deactivate
 
 echo -e "\n-> Ajustando permissões finais para o diretório web..."
 chmod -R 755 "$WEB_OUTPUT_DIR"
+# Só a plotagem de todos os domínios conclui a rodada (a cadeia em DAG plota um domínio
+# por etapa e publica pela etapa 'web', com --rodada)
+if [[ -z $2 ]]; then
+    date -u +%Y-%m-%dT%H:%M:%SZ > "$PLOTAGEM_CONCLUIDA"
+fi
+echo "-> Rodada montada em ${WEB_OUTPUT_DIR}; a publicação em ${WEB_PUBLISHED_DIR} é feita pelo orquestrador_web.py."
 
 echo "=================================================="
 echo "RODADA DIÁRIA CONCLUÍDA: $(date)"
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+POLÍTICA DE ARMAZENAMENTO DAS RODADAS (STAGING EM TMPFS E RETENÇÃO) - UFSC
+
+Cada ciclo deixava em /trabalho/icon/$DATE os .bz2, os GRIB2 globais
+descompactados, os GRIB2 regradeados, os concatenados, os met_em e os wrfout,
+e nada era apagado. Este script define onde cada coisa mora:
+1. 'staging' escolhe o diretório dos intermediários de vida curta do
+   trazer_icon_sul_br.sh (.bz2, GRIB2 globais, regrid por campo): um diretório em
+   tmpfs (/dev/shm) com limite de tamanho, se a estimativa do ciclo (o maior
+   staging dos últimos ciclos, ou o limite inteiro sem histórico) cabe no limite
+   e no espaço livre; senão, $WORK_DIR/<rodada>/staging, em disco.
+2. 'concluir' mede o staging, registra os bytes que deixaram de ir para o disco
+   e os bytes promovidos (concatenados ou intermediários do WPS) e apaga o staging.
+3. 'reter' aplica a retenção às rodadas antigas (nunca à rodada em andamento nem
+   às N mais recentes): primeiro remove os intermediários (regrid, met_em,
+   wrfinput/wrfbdy, wrfrst, caches), mantendo wrfout, logs e manifestos; se o
+   total ainda passa do orçamento, remove as rodadas inteiras, da mais antiga
+   para a mais nova. As imagens publicadas ficam no WEB_ROOT e não são afetadas.
+4. 'relatorio' mostra, por rodada, o staging usado e o I/O de disco evitado.
+O registro fica em $WORK_DIR/armazenamento.json.
+
+Uso:
+    ./politica_armazenamento.py staging YYYYMMDDHH
+    ./politica_armazenamento.py concluir YYYYMMDDHH --promovidos DIR[,DIR]
+    ./politica_armazenamento.py reter [--excluir YYYYMMDDHH] [--manter 2] [--orcamento-gb 300] [--simular]
+    ./politica_armazenamento.py relatorio
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import fcntl
+import shutil
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+STAGING_RAIZ = os.environ.get("STAGING_RAIZ", "/dev/shm/icon_staging")
+STAGING_LIMITE_GB = float(os.environ.get("STAGING_LIMITE_GB", "16"))
+RETENCAO_ORCAMENTO_GB = float(os.environ.get("RETENCAO_ORCAMENTO_GB", "300"))
+REGISTRO_FILENAME = "armazenamento.json"
+STAGING_DISCO = "staging"
+MANTER_PADRAO = 2
+CICLOS_ESTIMATIVA = 7
+MARGEM_ESTIMATIVA = 1.2
+FOLGA_TMPFS = 0.1
+SISTEMAS_MEMORIA = ("tmpfs", "ramfs")
+PADRAO_RODADA = re.compile(r"^\d{10}$")
+# Intermediários de uma rodada antiga (relativos a $WORK_DIR/<rodada>); wrfout, logs,
+# manifestos, namelists e o cache de etapas são os artefatos finais e ficam.
+INTERMEDIARIOS = [
+    "*.bz2", "*.grib2", "regrid", "intermediario", STAGING_DISCO, "diagnosticos",
+    os.path.join("WRF_RUN", "run_wps"),
+    os.path.join("WRF_RUN", "run_wrf", "met_em.d0*"),
+    os.path.join("WRF_RUN", "run_wrf", "wrfinput_d0*"),
+    os.path.join("WRF_RUN", "run_wrf", "wrfbdy_d0*"),
+    os.path.join("WRF_RUN", "run_wrf", "wrflowinp_d0*"),
+    os.path.join("WRF_RUN", "run_wrf", "wrfrst_d0*"),
+    os.path.join("WRF_RUN", "run_wrf", "autotune"),
+]
+
+# ==============================================================================
+# SEÇÃO 1: REGISTRO E MEDIÇÃO
+# ==============================================================================
+
+def _caminho_registro():
+    return os.path.join(WORK_DIR, REGISTRO_FILENAME)
+
+@contextmanager
+def _registro():
+    """Lê o registro sob trava exclusiva (ciclos 00Z e 12Z podem se sobrepor) e o grava ao sair."""
+    os.makedirs(WORK_DIR, exist_ok=True)
+    path = _caminho_registro()
+    with open(path + ".trava", 'w') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    registro = json.load(f)
+            except (IOError, ValueError):
+                registro = {}
+            registro.setdefault("rodadas", {})
+            registro.setdefault("retencao", {"bytes_liberados": 0, "rodadas_removidas": [], "execucoes": 0})
+            yield registro
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(registro, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+def tamanho(path):
+    """Bytes de um arquivo ou de uma árvore (sem seguir links simbólicos)."""
+    if os.path.islink(path) or not os.path.exists(path):
+        return 0
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for raiz, _, nomes in os.walk(path):
+        for nome in nomes:
+            caminho = os.path.join(raiz, nome)
+            if not os.path.islink(caminho):
+                total += os.path.getsize(caminho)
+    return total
+
+def em_memoria(path):
+    """True se o path (ou o ancestral existente mais próximo) está num tmpfs/ramfs."""
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    path = os.path.realpath(path)
+    melhor, tipo = "", ""
+    try:
+        with open("/proc/mounts") as f:
+            for linha in f:
+                campos = linha.split()
+                if len(campos) < 3:
+                    continue
+                ponto = campos[1].replace("\\040", " ")
+                if (path == ponto or path.startswith(ponto.rstrip("/") + "/")) and len(ponto) >= len(melhor):
+                    melhor, tipo = ponto, campos[2]
+    except IOError:
+        return False
+    return tipo in SISTEMAS_MEMORIA
+
+def espaco_livre(path):
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+def remover(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+def mb(n):
+    return n / 1e6
+
+# ==============================================================================
+# SEÇÃO 2: STAGING DOS INTERMEDIÁRIOS DE VIDA CURTA
+# ==============================================================================
+
+def estimar_staging(registro):
+    """Maior staging medido nos últimos ciclos, com margem; None sem histórico."""
+    medidos = [r["bytes_staging"] for _, r in sorted(registro["rodadas"].items())
+               if r.get("bytes_staging")][-CICLOS_ESTIMATIVA:]
+    return int(max(medidos) * MARGEM_ESTIMATIVA) if medidos else None
+
+def escolher_staging(date_arg, registro):
+    """(diretório, em tmpfs?, motivo). Um staging já existente da rodada é reaproveitado."""
+    em_tmpfs = os.path.join(STAGING_RAIZ, date_arg)
+    em_disco = os.path.join(WORK_DIR, date_arg, STAGING_DISCO)
+    if os.path.isdir(em_tmpfs):
+        return em_tmpfs, em_memoria(em_tmpfs), "staging da rodada já existente"
+    if os.path.isdir(em_disco):
+        return em_disco, False, "staging da rodada já existente"
+    if not em_memoria(STAGING_RAIZ):
+        return em_disco, False, f"{STAGING_RAIZ} não está em tmpfs"
+    limite = int(STAGING_LIMITE_GB * 1e9)
+    estimativa = estimar_staging(registro)
+    necessario = estimativa if estimativa is not None else limite
+    # O limite vale para a raiz inteira: stagings de outros ciclos ainda em andamento contam
+    ocupado = tamanho(STAGING_RAIZ)
+    livre = espaco_livre(STAGING_RAIZ)
+    if ocupado + necessario > limite:
+        return em_disco, False, (f"estimativa {mb(necessario):.0f} MB + {mb(ocupado):.0f} MB em uso "
+                                 f"passa do limite de {mb(limite):.0f} MB")
+    if necessario > livre * (1 - FOLGA_TMPFS):
+        return em_disco, False, f"estimativa {mb(necessario):.0f} MB, só {mb(livre):.0f} MB livres no tmpfs"
+    return em_tmpfs, True, f"estimativa {mb(necessario):.0f} MB, limite {mb(limite):.0f} MB"
+
+def staging(args):
+    """Cria o staging da rodada e imprime o caminho (as mensagens vão para o stderr)."""
+    with _registro() as registro:
+        diretorio, tmpfs, motivo = escolher_staging(args.date, registro)
+        os.makedirs(diretorio, exist_ok=True)
+        rodada = registro["rodadas"].setdefault(args.date, {})
+        rodada.update({"staging": diretorio, "tmpfs": tmpfs})
+    local = "tmpfs" if tmpfs else "disco"
+    print(f"📦 Staging em {local}: {diretorio} ({motivo})", file=sys.stderr)
+    print(diretorio)
+    return 0
+
+def concluir(args):
+    """Registra o staging e os artefatos promovidos da rodada e apaga o staging."""
+    with _registro() as registro:
+        rodada = registro["rodadas"].setdefault(args.date, {})
+        diretorio = rodada.get("staging") or os.path.join(WORK_DIR, args.date, STAGING_DISCO)
+        bytes_staging = tamanho(diretorio)
+        promovidos = sum(tamanho(p) for p in args.promovidos.split(",") if p)
+        tmpfs = rodada.get("tmpfs", False)
+        rodada.update({
+            "bytes_staging": max(bytes_staging, rodada.get("bytes_staging", 0)),
+            "bytes_promovidos": promovidos,
+            # O que passou pelo tmpfs foi escrito (e relido) sem tocar o disco
+            "bytes_evitados": max(bytes_staging, rodada.get("bytes_evitados", 0)) if tmpfs else 0,
+            "concluida_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        })
+        evitados = rodada["bytes_evitados"]
+    remover(diretorio)
+    print(f"✅ Staging {mb(bytes_staging):.1f} MB removido; {mb(promovidos):.1f} MB promovidos para o disco; "
+          f"{mb(evitados):.1f} MB de escrita em disco evitados.")
+    return 0
+
+# ==============================================================================
+# SEÇÃO 3: RETENÇÃO DAS RODADAS ANTIGAS
+# ==============================================================================
+
+def rodadas_em_disco():
+    if not os.path.isdir(WORK_DIR):
+        return []
+    return sorted(d for d in os.listdir(WORK_DIR)
+                  if PADRAO_RODADA.match(d) and os.path.isdir(os.path.join(WORK_DIR, d)))
+
+def intermediarios_da_rodada(date_arg):
+    rodada_dir = os.path.join(WORK_DIR, date_arg)
+    caminhos = set()
+    for padrao in INTERMEDIARIOS:
+        caminhos.update(glob.glob(os.path.join(rodada_dir, padrao)))
+    return sorted(caminhos)
+
+def reter(args):
+    """Remove os intermediários das rodadas antigas e, acima do orçamento, as rodadas mais antigas."""
+    rodadas = [d for d in rodadas_em_disco() if d != args.excluir]
+    protegidas = set(rodadas[-args.manter:]) if args.manter > 0 else set()
+    if args.excluir:
+        protegidas.add(args.excluir)
+    antigas = [d for d in rodadas if d not in protegidas]
+    acao = "seriam liberados" if args.simular else "liberados"
+    liberados_rodada, removidas = {}, []
+
+    # 1. Intermediários das rodadas antigas e stagings abandonados no tmpfs
+    for date_arg in antigas:
+        caminhos = intermediarios_da_rodada(date_arg)
+        staging_tmpfs = os.path.join(STAGING_RAIZ, date_arg)
+        if os.path.isdir(staging_tmpfs):
+            caminhos.append(staging_tmpfs)
+        bytes_rodada = sum(tamanho(p) for p in caminhos)
+        if not bytes_rodada:
+            continue
+        if not args.simular:
+            for path in caminhos:
+                remover(path)
+        liberados_rodada[date_arg] = bytes_rodada
+        print(f"🧹 {date_arg}: {len(caminhos)} intermediário(s), {mb(bytes_rodada):.1f} MB {acao}")
+    liberados = sum(liberados_rodada.values())
+
+    # 2. Orçamento: rodadas inteiras, da mais antiga para a mais nova
+    orcamento = int(args.orcamento_gb * 1e9)
+    # Na simulação os intermediários ainda estão lá: desconta o que a fase 1 liberaria
+    tamanhos = {d: tamanho(os.path.join(WORK_DIR, d)) - (liberados_rodada.get(d, 0) if args.simular else 0)
+                for d in rodadas_em_disco()}
+    total = sum(tamanhos.values())
+    for date_arg in antigas:
+        if total <= orcamento:
+            break
+        if not args.simular:
+            remover(os.path.join(WORK_DIR, date_arg))
+        total -= tamanhos[date_arg]
+        liberados += tamanhos[date_arg]
+        removidas.append(date_arg)
+        print(f"🗑️ {date_arg}: rodada removida ({mb(tamanhos[date_arg]):.1f} MB {acao}) para caber no orçamento")
+
+    print(f"\n{mb(liberados):.1f} MB {acao}; {len(removidas)} rodada(s) removida(s); "
+          f"{mb(total) / 1e3:.1f} GB em {WORK_DIR} (orçamento {args.orcamento_gb:g} GB).")
+    if total > orcamento:
+        print(f"⚠️ AVISO: acima do orçamento mesmo após a retenção (rodadas protegidas: {', '.join(sorted(protegidas))}).")
+    if not args.simular:
+        with _registro() as registro:
+            retencao = registro["retencao"]
+            retencao["bytes_liberados"] += liberados
+            retencao["rodadas_removidas"] = sorted(set(retencao["rodadas_removidas"]) | set(removidas))
+            retencao["execucoes"] += 1
+            retencao["ultima"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            for date_arg in removidas:
+                registro["rodadas"].get(date_arg, {})["removida"] = True
+    return 0
+
+# ==============================================================================
+# SEÇÃO 4: RELATÓRIO
+# ==============================================================================
+
+def relatorio(args):
+    """Staging, bytes promovidos e bytes de disco evitados por rodada, com os totais."""
+    try:
+        with open(_caminho_registro(), 'r', encoding='utf-8') as f:
+            registro = json.load(f)
+    except (IOError, ValueError):
+        registro = {}
+    rodadas = registro.get("rodadas", {})
+    retencao = registro.get("retencao", {"bytes_liberados": 0, "rodadas_removidas": [], "execucoes": 0})
+    print(f"{'rodada':<12} {'staging':<7} {'staging MB':>11} {'promovido MB':>13} {'evitado MB':>11}")
+    for date_arg, r in sorted(rodadas.items()):
+        local = "tmpfs" if r.get("tmpfs") else "disco"
+        print(f"{date_arg:<12} {local:<7} {mb(r.get('bytes_staging', 0)):>11.1f} "
+              f"{mb(r.get('bytes_promovidos', 0)):>13.1f} {mb(r.get('bytes_evitados', 0)):>11.1f}")
+    evitados = sum(r.get("bytes_evitados", 0) for r in rodadas.values())
+    print(f"\nEscrita em disco evitada pelo tmpfs: {mb(evitados):.1f} MB em {len(rodadas)} rodada(s).")
+    print(f"Retenção: {mb(retencao['bytes_liberados']):.1f} MB liberados em {retencao['execucoes']} execução(ões), "
+          f"{len(retencao['rodadas_removidas'])} rodada(s) removida(s).")
+    return 0
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Interpreta o subcomando e o executa."""
+    parser = argparse.ArgumentParser(description="Staging em tmpfs e retenção das rodadas em disco.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("staging", help="Cria e imprime o diretório de staging da rodada.")
+    p.add_argument("date", help="Rodada (YYYYMMDDHH).")
+    p.set_defaults(funcao=staging)
+
+    p = sub.add_parser("concluir", help="Registra o staging e os artefatos promovidos e apaga o staging.")
+    p.add_argument("date", help="Rodada (YYYYMMDDHH).")
+    p.add_argument("--promovidos", default="", help="Diretórios promovidos para o disco, separados por vírgula.")
+    p.set_defaults(funcao=concluir)
+
+    p = sub.add_parser("reter", help="Aplica a retenção às rodadas antigas.")
+    p.add_argument("--excluir", help="Nunca toca nesta rodada (a rodada em andamento).")
+    p.add_argument("--manter", type=int, default=MANTER_PADRAO, help="Rodadas mais recentes mantidas intactas.")
+    p.add_argument("--orcamento-gb", type=float, default=RETENCAO_ORCAMENTO_GB, help="Orçamento total das rodadas em disco.")
+    p.add_argument("--simular", action="store_true", help="Só mostra o que seria removido.")
+    p.set_defaults(funcao=reter)
+
+    p = sub.add_parser("relatorio", help="Mostra o staging e o I/O evitado por rodada.")
+    p.set_defaults(funcao=relatorio)
+
+    args = parser.parse_args()
+    sys.exit(args.funcao(args))
+
+if __name__ == "__main__":
+    main()
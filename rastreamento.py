@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+RASTREAMENTO (TRACING) LEVE DA CADEIA WRF-ICON - UFSC
+
+Registra "spans" (etapa, domínio, variável, quadro) com tempo de parede, tempo
+de CPU, pico de memória (RSS) e bytes lidos/escritos, gravando uma linha JSON
+por span em uma linha do tempo por ciclo (timeline.jsonl). A partir dela gera
+um relatório HTML em formato de Gantt.
+
+Uso como biblioteca:
+    import rastreamento
+    with rastreamento.span("web", variavel="data.js"):
+        ...
+    rastreamento.executar_comando(["wrfplot", ...], "plot", dominio="d01", variavel="slp")
+
+Uso pela linha de comando (ex.: dentro de scripts bash):
+    ./rastreamento.py executar --etapa plot --dominio d01 --variavel slp -- wrfplot ...
+    ./rastreamento.py relatorio timeline.jsonl -o timeline.html
+
+O arquivo de destino vem de RASTREAMENTO_TIMELINE (ou --timeline). Sem ele,
+nada é registrado e os comandos rodam normalmente.
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import json
+import html
+import time
+import socket
+import resource
+import argparse
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+ENV_TIMELINE = "RASTREAMENTO_TIMELINE"
+ENV_ETAPA = "RASTREAMENTO_ETAPA"
+BLOCO_RUSAGE = 512  # ru_inblock/ru_oublock são contados em blocos de 512 bytes
+
+# ==============================================================================
+# SEÇÃO 1: COLETA DE MÉTRICAS
+# ==============================================================================
+
+def _io_do_processo():
+    """Lê os bytes de E/S do próprio processo em /proc/self/io (Linux)."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            campos = dict(linha.split(":", 1) for linha in f if ":" in linha)
+        return int(campos["read_bytes"]), int(campos["write_bytes"])
+    except (IOError, KeyError, ValueError):
+        uso = resource.getrusage(resource.RUSAGE_SELF)
+        return uso.ru_inblock * BLOCO_RUSAGE, uso.ru_oublock * BLOCO_RUSAGE
+
+def timeline_ativa():
+    """Retorna o caminho da linha do tempo configurada, ou None."""
+    return os.environ.get(ENV_TIMELINE) or None
+
+def registrar(registro, timeline=None):
+    """
+    Acrescenta um span à linha do tempo. Cada span é gravado com uma única
+    chamada write() em modo append, para que processos concorrentes não se misturem.
+    """
+    timeline = timeline or timeline_ativa()
+    if not timeline:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(timeline)), exist_ok=True)
+    linha = (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+    fd = os.open(timeline, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, linha)
+    finally:
+        os.close(fd)
+
+def _novo_registro(nome, etapa, atributos, inicio):
+    """Monta os campos comuns de um span."""
+    registro = {
+        "nome": nome,
+        "etapa": etapa or os.environ.get(ENV_ETAPA) or nome,
+        "inicio": inicio,
+        "inicio_iso": datetime.fromtimestamp(inicio, timezone.utc).isoformat(),
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+    }
+    for chave in ("dominio", "variavel", "nivel", "quadro"):
+        registro[chave] = atributos.pop(chave, None)
+    registro["extra"] = atributos
+    return registro
+
+@contextmanager
+def span(nome, etapa=None, timeline=None, **atributos):
+    """
+    Mede um trecho de código do próprio processo.
+    O pico de RSS é o do processo até o fim do span (o kernel não expõe picos por trecho).
+    """
+    timeline = timeline or timeline_ativa()
+    if not timeline:
+        yield
+        return
+    registro = _novo_registro(nome, etapa, dict(atributos), time.time())
+    t0 = time.perf_counter()
+    uso0 = resource.getrusage(resource.RUSAGE_SELF)
+    lidos0, escritos0 = _io_do_processo()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "erro"
+        raise
+    finally:
+        uso1 = resource.getrusage(resource.RUSAGE_SELF)
+        lidos1, escritos1 = _io_do_processo()
+        registro.update({
+            "wall_s": round(time.perf_counter() - t0, 6),
+            "cpu_s": round((uso1.ru_utime - uso0.ru_utime) + (uso1.ru_stime - uso0.ru_stime), 6),
+            "pico_rss_kb": uso1.ru_maxrss,
+            "bytes_lidos": lidos1 - lidos0,
+            "bytes_escritos": escritos1 - escritos0,
+            "status": status,
+        })
+        registrar(registro, timeline)
+
+def executar_comando(comando, etapa, timeline=None, stdout=None, stderr=None, env=None, **atributos):
+    """
+    Executa um comando como subprocesso e registra um span com o consumo exato
+    daquele filho (via wait4), mesmo com outras etapas rodando em paralelo.
+    Retorna o código de saída.
+    """
+    timeline = timeline or timeline_ativa()
+    inicio = time.time()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(comando, stdout=stdout, stderr=stderr, env=env)
+    _, status_wait, uso = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status_wait)
+    if timeline:
+        registro = _novo_registro(atributos.pop("nome", etapa), etapa, dict(atributos), inicio)
+        registro.update({
+            "wall_s": round(time.perf_counter() - t0, 6),
+            "cpu_s": round(uso.ru_utime + uso.ru_stime, 6),
+            "pico_rss_kb": uso.ru_maxrss,
+            "bytes_lidos": uso.ru_inblock * BLOCO_RUSAGE,
+            "bytes_escritos": uso.ru_oublock * BLOCO_RUSAGE,
+            "status": "ok" if proc.returncode == 0 else f"codigo {proc.returncode}",
+            "comando": " ".join(str(c) for c in comando),
+        })
+        registrar(registro, timeline)
+    return proc.returncode
+
+def ler_timeline(timeline):
+    """Lê os spans de uma linha do tempo, ignorando linhas corrompidas."""
+    spans = []
+    with open(timeline, "r", encoding="utf-8") as f:
+        for linha in f:
+            try:
+                spans.append(json.loads(linha))
+            except ValueError:
+                continue
+    return spans
+
+# ==============================================================================
+# SEÇÃO 2: RELATÓRIO HTML (GANTT)
+# ==============================================================================
+
+CORES_ETAPAS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+                "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+
+def _formatar_bytes(n):
+    """Formata um número de bytes em unidades legíveis."""
+    for unidade in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unidade}" if unidade == "B" else f"{n:.1f} {unidade}"
+        n /= 1024.0
+    return f"{n:.1f} TB"
+
+def _rotulo(s):
+    """Rótulo de uma linha do Gantt: nome mais os atributos preenchidos."""
+    partes = [s.get("nome", "?")]
+    for chave in ("dominio", "variavel", "nivel", "quadro"):
+        if s.get(chave) is not None:
+            partes.append(str(s[chave]))
+    partes.extend(str(v) for v in (s.get("extra") or {}).values())
+    return " / ".join(partes)
+
+def gerar_relatorio_html(spans, titulo="Linha do tempo da rodada"):
+    """Gera o HTML de um gráfico de Gantt e de uma tabela com os spans."""
+    spans = sorted((s for s in spans if "wall_s" in s), key=lambda s: s["inicio"])
+    if not spans:
+        return f"<!DOCTYPE html><html lang=\"pt-BR\"><body><p>{html.escape(titulo)}: nenhum span registrado.</p></body></html>"
+
+    t_min = min(s["inicio"] for s in spans)
+    t_max = max(s["inicio"] + s["wall_s"] for s in spans)
+    total = max(t_max - t_min, 1e-6)
+    etapas = list(dict.fromkeys(s["etapa"] for s in spans))
+    cores = {e: CORES_ETAPAS[i % len(CORES_ETAPAS)] for i, e in enumerate(etapas)}
+
+    barras, linhas = [], []
+    for s in spans:
+        esquerda = 100.0 * (s["inicio"] - t_min) / total
+        largura = max(100.0 * s["wall_s"] / total, 0.2)
+        rotulo = html.escape(_rotulo(s))
+        dica = html.escape(f"{_rotulo(s)}: {s['wall_s']:.1f}s parede, {s.get('cpu_s', 0):.1f}s CPU")
+        barras.append(
+            f'<div class="row"><div class="label">{rotulo}</div><div class="track">'
+            f'<div class="bar" style="left:{esquerda:.3f}%;width:{largura:.3f}%;background:{cores[s["etapa"]]}" title="{dica}"></div>'
+            f'</div></div>'
+        )
+        linhas.append(
+            "<tr>" + "".join(f"<td>{c}</td>" for c in (
+                html.escape(s["etapa"]), rotulo,
+                f"{s['inicio'] - t_min:.1f}", f"{s['wall_s']:.2f}", f"{s.get('cpu_s', 0):.2f}",
+                f"{s.get('pico_rss_kb', 0) / 1024:.1f}",
+                _formatar_bytes(s.get("bytes_lidos", 0)), _formatar_bytes(s.get("bytes_escritos", 0)),
+                html.escape(str(s.get("status", ""))),
+            )) + "</tr>"
+        )
+
+    # Tempo total por etapa, para ver onde vai a janela do cron
+    resumo = []
+    for etapa in etapas:
+        da_etapa = [s for s in spans if s["etapa"] == etapa]
+        inicio = min(s["inicio"] for s in da_etapa)
+        fim = max(s["inicio"] + s["wall_s"] for s in da_etapa)
+        resumo.append(f'<li><span class="dot" style="background:{cores[etapa]}"></span>'
+                      f'<b>{html.escape(etapa)}</b>: {fim - inicio:.1f}s de parede, '
+                      f'{sum(s.get("cpu_s", 0) for s in da_etapa):.1f}s de CPU</li>')
+
+    inicio_iso = datetime.fromtimestamp(t_min, timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{html.escape(titulo)}</title>
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; margin: 20px; background-color: #f4f4f9; color: #333; }}
+        h1 {{ color: #004b8d; }}
+        .gantt {{ background: #fff; padding: 15px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
+        .row {{ display: flex; align-items: center; height: 22px; }}
+        .label {{ flex: 0 0 280px; font-size: 0.8em; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
+        .track {{ position: relative; flex: 1; height: 14px; background: #f0f0f0; }}
+        .bar {{ position: absolute; top: 0; height: 14px; border-radius: 3px; }}
+        .dot {{ display: inline-block; width: 10px; height: 10px; border-radius: 5px; margin-right: 6px; }}
+        table {{ border-collapse: collapse; margin-top: 20px; background: #fff; font-size: 0.85em; }}
+        th, td {{ border: 1px solid #ddd; padding: 4px 8px; text-align: right; }}
+        th {{ background: #e9f5ff; color: #005a9c; }}
+        td:nth-child(1), td:nth-child(2) {{ text-align: left; }}
+    </style>
+</head>
+<body>
+    <h1>{html.escape(titulo)}</h1>
+    <p>Início: {inicio_iso} | Duração total: {total:.1f}s | Spans: {len(spans)}</p>
+    <ul>{''.join(resumo)}</ul>
+    <div class="gantt">{''.join(barras)}</div>
+    <table>
+        <thead><tr><th>Etapa</th><th>Span</th><th>Início (s)</th><th>Parede (s)</th><th>CPU (s)</th><th>Pico RSS (MB)</th><th>Lidos</th><th>Escritos</th><th>Status</th></tr></thead>
+        <tbody>{''.join(linhas)}</tbody>
+    </table>
+</body>
+</html>
+"""
+
+def escrever_relatorio(timeline, output_path, titulo="Linha do tempo da rodada"):
+    """Lê a linha do tempo e grava o relatório HTML."""
+    conteudo = gerar_relatorio_html(ler_timeline(timeline), titulo)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    os.replace(tmp_path, output_path)
+    os.chmod(output_path, 0o644)
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Interface de linha de comando: 'executar' (envolve um comando) e 'relatorio'."""
+    parser = argparse.ArgumentParser(description="Rastreamento de etapas da cadeia WRF-ICON.")
+    sub = parser.add_subparsers(dest="acao", required=True)
+
+    p_exec = sub.add_parser("executar", help="Executa um comando registrando um span.")
+    p_exec.add_argument("--timeline", help=f"Linha do tempo de destino (padrão: ${ENV_TIMELINE}).")
+    p_exec.add_argument("--etapa", default=os.environ.get(ENV_ETAPA, "comando"))
+    p_exec.add_argument("--nome")
+    p_exec.add_argument("--dominio")
+    p_exec.add_argument("--variavel")
+    p_exec.add_argument("--nivel")
+    p_exec.add_argument("--quadro")
+    p_exec.add_argument("comando", nargs=argparse.REMAINDER)
+
+    p_rel = sub.add_parser("relatorio", help="Gera o relatório HTML (Gantt) de uma linha do tempo.")
+    p_rel.add_argument("timeline")
+    p_rel.add_argument("-o", "--output", default="timeline.html")
+    p_rel.add_argument("--titulo", default="Linha do tempo da rodada")
+
+    args = parser.parse_args()
+    if args.acao == "relatorio":
+        escrever_relatorio(args.timeline, args.output, args.titulo)
+        print(f"✅ Relatório gerado em {args.output}")
+        return
+
+    comando = args.comando[1:] if args.comando[:1] == ["--"] else args.comando
+    if not comando:
+        parser.error("informe o comando após '--'")
+    atributos = {k: getattr(args, k) for k in ("dominio", "variavel", "nivel", "quadro") if getattr(args, k)}
+    if args.nome:
+        atributos["nome"] = args.nome
+    sys.exit(executar_comando(comando, args.etapa, timeline=args.timeline, **atributos))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+RESERVAS DE NÚCLEOS DE CPU ENTRE CICLOS SIMULTÂNEOS - UFSC
+
+Com os ciclos 00Z e 12Z sobrepostos (o pós-processamento de um enquanto o
+próximo baixa o ICON e roda o WRF), os processos de plotagem competiam com os
+slots do mpirun do wrf.exe. As etapas pesadas passam a reservar núcleos num
+registro comum a todos os ciclos da máquina:
+1. O registro ($WORK_DIR/reservas_cpu.json) lista as reservas ativas (pid,
+   rótulo, classe, núcleos), atualizado sob trava exclusiva. Reservas de
+   processos que já morreram são descartadas na leitura.
+2. Classe 'wrf' (mpirun do real.exe e do wrf.exe): pode usar todos os núcleos.
+   Classe 'pos' (download/regrid, plotagem, campos, meteogramas): nunca passa de
+   NUCLEOS_TOTAIS - RESERVA_NUCLEOS_WRF no total, de modo que os slots do WRF do
+   ciclo seguinte estão sempre livres quando ele chega ao mpirun.
+3. Uma reserva com mínimo é elástica: recebe o que estiver livre (até o pedido),
+   desde que seja ao menos o mínimo. O processo recebe o número concedido em
+   NUCLEOS_RESERVADOS, para ajustar o próprio paralelismo.
+4. Quem não encontra núcleos livres espera (consultando o registro a cada
+   poucos segundos); um pedido maior que o limite da classe é reduzido a ele.
+5. Um pedido 'wrf' em espera fica no registro ('espera'): enquanto ele não é
+   atendido, os núcleos dele não são concedidos a novas reservas 'pos'. Assim um
+   WRF com -np maior que RESERVA_NUCLEOS_WRF (perfil do autotune) recebe os
+   núcleos que a plotagem do outro ciclo for liberando, em vez de esperar por ela.
+
+Uso como biblioteca:
+    import reservas_cpu
+    with reservas_cpu.reservar("plot_d01 2025072000", 2, minimo=1) as nucleos:
+        ...
+
+Uso pela linha de comando (ex.: em volta do mpirun):
+    ./reservas_cpu.py executar --nucleos 6 --classe wrf --rotulo "wrf 2025072000" -- mpirun -np 6 ./wrf.exe
+    ./reservas_cpu.py listar
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import uuid
+import argparse
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+RESERVAS_PATH = os.environ.get("RESERVAS_CPU", os.path.join(WORK_DIR, "reservas_cpu.json"))
+NUCLEOS_TOTAIS = int(os.environ.get("NUCLEOS_TOTAIS") or os.cpu_count() or 1)
+# Núcleos que a classe 'pos' deixa sempre livres para o WRF (o -np padrão do rodar_wps_wrf.sh)
+RESERVA_NUCLEOS_WRF = int(os.environ.get("RESERVA_NUCLEOS_WRF") or os.environ.get("NUM_CORES_WRF") or 6)
+ENV_NUCLEOS = "NUCLEOS_RESERVADOS"
+CLASSE_WRF = "wrf"
+CLASSE_POS = "pos"
+INTERVALO_ESPERA = 2.0
+
+# ==============================================================================
+# SEÇÃO 1: REGISTRO DAS RESERVAS
+# ==============================================================================
+
+@contextmanager
+def _trava():
+    os.makedirs(os.path.dirname(os.path.abspath(RESERVAS_PATH)), exist_ok=True)
+    with open(RESERVAS_PATH + ".trava", 'w') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _ler():
+    """Reservas ativas, sem as de processos mortos. Chamar com a trava."""
+    try:
+        with open(RESERVAS_PATH, 'r', encoding='utf-8') as f:
+            reservas = json.load(f)
+    except (IOError, ValueError):
+        reservas = []
+    return [r for r in reservas if _processo_vivo(r["pid"])]
+
+def _gravar(reservas):
+    tmp_path = RESERVAS_PATH + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(reservas, f, indent=1)
+    os.replace(tmp_path, RESERVAS_PATH)
+
+def limite_da_classe(classe):
+    if classe == CLASSE_WRF:
+        return NUCLEOS_TOTAIS
+    # Numa máquina menor que o WRF, o pós-processamento ainda precisa de 1 núcleo
+    return max(1, NUCLEOS_TOTAIS - RESERVA_NUCLEOS_WRF)
+
+def _conceder(reservas, nucleos, classe, minimo):
+    """Núcleos que podem ser concedidos agora (0 se o pedido ainda não cabe)."""
+    ativas = [r for r in reservas if not r.get("espera")]
+    livres = NUCLEOS_TOTAIS - sum(r["nucleos"] for r in ativas)
+    if classe != CLASSE_WRF:
+        usados_classe = sum(r["nucleos"] for r in ativas if r["classe"] != CLASSE_WRF)
+        livres = min(livres, limite_da_classe(classe) - usados_classe)
+        # Núcleos guardados para os pedidos do WRF que ainda esperam
+        livres -= sum(r["nucleos"] for r in reservas if r.get("espera") and r["classe"] == CLASSE_WRF)
+    if minimo is not None:
+        return min(nucleos, livres) if livres >= minimo else 0
+    return nucleos if livres >= nucleos else 0
+
+# ==============================================================================
+# SEÇÃO 2: RESERVA
+# ==============================================================================
+
+@contextmanager
+def reservar(rotulo, nucleos, classe=CLASSE_POS, minimo=None, intervalo=INTERVALO_ESPERA):
+    """
+    Espera até poder reservar os núcleos e os mantém reservados dentro do bloco.
+    Retorna o número concedido (pode ser menor que o pedido se houver mínimo).
+    """
+    if nucleos <= 0:
+        yield 0
+        return
+    limite = limite_da_classe(classe)
+    nucleos = min(nucleos, limite)
+    if minimo is not None:
+        minimo = max(1, min(minimo, nucleos))
+    ident = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    avisado = False
+    try:
+        while True:
+            with _trava():
+                reservas = [r for r in _ler() if r["id"] != ident]
+                concedidos = _conceder(reservas, nucleos, classe, minimo)
+                if concedidos or classe == CLASSE_WRF:
+                    # Concedido: a reserva entra ativa; o WRF que não coube fica registrado em espera
+                    reservas.append({"id": ident, "pid": os.getpid(), "rotulo": rotulo, "classe": classe,
+                                     "nucleos": concedidos or nucleos, "espera": not concedidos,
+                                     "inicio": datetime.now(timezone.utc).isoformat(timespec="seconds")})
+                    _gravar(reservas)
+                if concedidos:
+                    break
+            if not avisado:
+                ocupados = ", ".join(f"{r['rotulo']} ({r['nucleos']})" for r in reservas if not r.get("espera"))
+                print(f"⏳ {rotulo}: aguardando {minimo or nucleos} núcleo(s) livre(s) (em uso: {ocupados or '-'}).",
+                      file=sys.stderr, flush=True)
+                avisado = True
+            time.sleep(intervalo)
+    except BaseException:
+        # Interrompido na espera: o pedido registrado sai do registro
+        with _trava():
+            _gravar([r for r in _ler() if r["id"] != ident])
+        raise
+    try:
+        yield concedidos
+    finally:
+        with _trava():
+            _gravar([r for r in _ler() if r["id"] != ident])
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def main():
+    """Interface de linha de comando: 'executar' (envolve um comando) e 'listar'."""
+    parser = argparse.ArgumentParser(description="Reservas de núcleos de CPU entre ciclos simultâneos.")
+    sub = parser.add_subparsers(dest="acao", required=True)
+
+    p_exec = sub.add_parser("executar", help="Reserva núcleos, executa o comando e os libera.")
+    p_exec.add_argument("--nucleos", type=int, required=True)
+    p_exec.add_argument("--minimo", type=int, help="Aceita menos núcleos que o pedido, desde que ao menos este número.")
+    p_exec.add_argument("--classe", choices=(CLASSE_POS, CLASSE_WRF), default=CLASSE_POS)
+    p_exec.add_argument("--rotulo", default="comando")
+    p_exec.add_argument("comando", nargs=argparse.REMAINDER)
+
+    sub.add_parser("listar", help="Mostra as reservas ativas.")
+
+    args = parser.parse_args()
+    if args.acao == "listar":
+        with _trava():
+            reservas = _ler()
+        usados = sum(r["nucleos"] for r in reservas if not r.get("espera"))
+        print(f"{usados}/{NUCLEOS_TOTAIS} núcleos reservados (pós-processamento até {limite_da_classe(CLASSE_POS)}):")
+        for r in reservas:
+            estado = "aguardando" if r.get("espera") else "desde"
+            print(f"  {r['nucleos']:>3}  {r['classe']:<4} pid {r['pid']:<8} {estado} {r['inicio']}  {r['rotulo']}")
+        return
+
+    comando = args.comando[1:] if args.comando[:1] == ["--"] else args.comando
+    if not comando:
+        parser.error("informe o comando após '--'")
+    with reservar(args.rotulo, args.nucleos, args.classe, args.minimo) as nucleos:
+        env = dict(os.environ, **{ENV_NUCLEOS: str(nucleos)})
+        try:
+            retorno = subprocess.call(comando, env=env)
+        except OSError as e:
+            print(f"❌ ERRO ao iniciar o comando: {e}", file=sys.stderr)
+            retorno = 127
+    sys.exit(retorno)
+
+if __name__ == "__main__":
+    main()
@@ -21,31 +21,41 @@ echo ">> 1. CONFIGURANDO AMBIENTE"
 
 if [[ ! -n $1 ]] ; then
     export DATE=$(date -u +%Y%m%d)00
-    export AMANHA=$(date -u -d "${DATE:0:8} +36 hours" +%Y%m%d%H) 
+    export AMANHA=$(date -u -d "@$(( $(date -u -d "${DATE:0:8} ${DATE:8:2}" +%s) + 36 * 3600 ))" +%Y%m%d%H)
 else
     export DATE=$1
-# Gerar AMANHA baseado na DATE
-    export AMANHA=$(date -u -d "${DATE:0:8} +36 hours"  +%Y%m%d%H)
+# Gerar AMANHA baseado na DATE (a partir da hora do ciclo: 00Z ou 12Z)
+    export AMANHA=$(date -u -d "@$(( $(date -u -d "${DATE:0:8} ${DATE:8:2}" +%s) + 36 * 3600 ))" +%Y%m%d%H)
 fi
 DATE_FORMATTED=$(echo $DATE | sed 's/\(....\)\(..\)\(..\)\(..\)/\1-\2-\3_\4:00:00/')
 AMANHA_FORMATTED=$(echo $AMANHA | sed 's/\(....\)\(..\)\(..\)\(..\)/\1-\2-\3_\4:00:00/')
 
-export WORK_DIR="/trabalho/icon"
+export WORK_DIR="${WORK_DIR:-/trabalho/icon}"
 export TEMPLATE_DIR="$WORK_DIR/template"
-export WPS_HOME="/home/geral1/gis4wrf/dist/WPS-4.6.0"
-export WRF_HOME="/home/geral1/gis4wrf/dist/WRF-4.7.1"
+export WPS_HOME="${WPS_HOME:-/home/geral1/gis4wrf/dist/WPS-4.6.0}"
+export WRF_HOME="${WRF_HOME:-/home/geral1/gis4wrf/dist/WRF-4.7.1}"
 export ICON_DATA_DIR="$WORK_DIR/$DATE/regrid/concatenado"
+export INTERMEDIARIO_DIR="$WORK_DIR/$DATE/intermediario"
 export RUN_DIR="$WORK_DIR/$DATE/WRF_RUN"
 export WPS_RUN_DIR="$RUN_DIR/run_wps"
 export WRF_RUN_DIR="$RUN_DIR/run_wrf"
 export VTABLE_FILE="Vtable.ICONp"
-export NUM_CORES_WRF=6
+# NUM_CORES_WRF definido no ambiente tem precedência sobre o perfil do autotune_wrf.py
+NUM_CORES_WRF_FIXO="${NUM_CORES_WRF:-}"
+export NUM_CORES_WRF="${NUM_CORES_WRF:-6}"
+export PERFIL_WRF="${PERFIL_WRF:-$WORK_DIR/perfil_wrf.json}"
+SCRIPTS_DIR="$(dirname "$(readlink -f "$0")")"
+export GEOG_DATA_DIR="${GEOG_DATA_DIR:-$HOME/gis4wrf/datasets/geog}"
+export GEOGRID_CACHE_DIR="${GEOGRID_CACHE_DIR:-$WORK_DIR/cache_geogrid}"
+export NUM_WORKERS_UNGRIB="${NUM_WORKERS_UNGRIB:-4}"
+# Intervalo (minutos) dos wrfrst: uma execução interrompida é retomada do último válido
+export RESTART_INTERVALO_MIN="${RESTART_INTERVALO_MIN:-360}"
 
 echo "   - Data da Simulação: $DATE até $AMANHA"
 echo "   - Diretório de Trabalho: $RUN_DIR"
 
-if [ ! -d "$ICON_DATA_DIR" ]; then
-    echo "❌ ERRO: Diretório de dados do ICON não encontrado: $ICON_DATA_DIR"
+if [ ! -d "$ICON_DATA_DIR" ] && [ ! -d "$INTERMEDIARIO_DIR" ]; then
+    echo "❌ ERRO: Diretório de dados do ICON não encontrado: $ICON_DATA_DIR (nem $INTERMEDIARIO_DIR)"
     exit 1
 fi
 
@@ -59,7 +69,16 @@ echo -e "\n>> Verificando arquivos WRF de saída existentes para a data ${DATE}.
 # Verifica se existem arquivos wrfout para d01 E d02 e se ambos são não-vazios
 # 'find ... -size +0 -print -quit' retorna o nome do primeiro arquivo não-vazio e sai do find.
 # 'grep -q .' verifica se algo foi retornado (i.e., um arquivo não-vazio foi encontrado).
-if find "$WRF_RUN_DIR" -maxdepth 1 -name "wrfout_d01_*" -size +0 -print -quit | grep -q . && \
+# Um wrf.exe interrompido (queda, reinício do nó) deixa wrfout parciais e um rsl.error.0000
+# sem "SUCCESS COMPLETE WRF": nesse caso a execução é retomada do último wrfrst válido.
+wrf_interrompido() {
+    [ -f "$WRF_RUN_DIR/rsl.error.0000" ] && ls "$WRF_RUN_DIR"/wrfout_d01_* 1> /dev/null 2>&1 && \
+        ! grep -q "SUCCESS COMPLETE WRF" "$WRF_RUN_DIR/rsl.error.0000"
+}
+if wrf_interrompido; then
+    echo "⚠️ A execução anterior do wrf.exe foi interrompida (rsl.error.0000 sem SUCCESS COMPLETE WRF)."
+    echo "Etapas do WPS já concluídas serão puladas e o WRF será retomado do último wrfrst válido."
+elif find "$WRF_RUN_DIR" -maxdepth 1 -name "wrfout_d01_*" -size +0 -print -quit | grep -q . && \
    find "$WRF_RUN_DIR" -maxdepth 1 -name "wrfout_d02_*" -size +0 -print -quit | grep -q .; then
     echo "✔️ Arquivos wrfout_d01* e wrfout_d02* já existem e não estão vazios em $WRF_RUN_DIR."
     echo "Pulando a execução completa da cadeia WPS-WRF para evitar reprocessamento desnecessário."
@@ -84,9 +103,9 @@ echo -e "\n>> 2. INICIANDO ETAPA WPS EM: $WPS_RUN_DIR"
 cd "$WPS_RUN_DIR"
 
 # --- 2.1. geogrid.exe ---
-echo "   -> 2.1. Executando geogrid.exe"
+echo "   -> 2.1. Preparando geogrid.exe"
 ln -sf "$WPS_HOME/geogrid.exe" .
-ln -sf ~/gis4wrf/datasets/geog/QNWFA_QNIFA_QNBCA_SIGMA_MONTHLY.dat .
+ln -sf "$GEOG_DATA_DIR/QNWFA_QNIFA_QNBCA_SIGMA_MONTHLY.dat" .
 cp -rf "$TEMPLATE_DIR/namelist_chem.wps" namelist.wps
 echo ">> 2. ATUALIZANDO namelist.wps"
 sed -i "/start_date/s/'.*'/'${DATE_FORMATTED}', '${DATE_FORMATTED}'/" namelist.wps
@@ -99,41 +118,196 @@ ln -sf "$WPS_HOME/geogrid/GEOGRID.TBL.ARW" ./geogrid/GEOGRID.TBL
 # NOTA: O link para os dados geográficos não é criado, pois assumimos que a variável
 # 'geog_data_path' está configurada corretamente dentro do 'namelist.wps'.
 
-./geogrid.exe >& geogrid.log
-
-if [ ! -f "geo_em.d01.nc" ]; then
-    echo "❌ ERRO: geogrid.exe falhou. Verifique o arquivo $WPS_RUN_DIR/geogrid.log"
-    exit 1
+# Os geo_em.d0*.nc só dependem da definição dos domínios e dos dados estáticos, não da data.
+# A chave do cache é o hash das seções &share/&geogrid do namelist (sem as datas e o
+# intervalo, sem comentários e espaços) mais o conteúdo do GEOGRID.TBL.
+chave_geogrid() {
+    {
+        awk '
+            /^[[:space:]]*&/ { secao = tolower($1) }
+            secao == "&share" || secao == "&geogrid" {
+                linha = $0
+                sub(/!.*/, "", linha)
+                gsub(/[[:space:]]/, "", linha)
+                if (linha != "" && tolower(linha) !~ /^(start_date|end_date|interval_seconds)=/) print linha
+            }
+            /^[[:space:]]*\/[[:space:]]*$/ { secao = "" }
+        ' namelist.wps
+        cat geogrid/GEOGRID.TBL
+    } | sha256sum | cut -c1-20
+}
+
+GEOGRID_CHAVE=$(chave_geogrid)
+GEOGRID_CACHE="$GEOGRID_CACHE_DIR/$GEOGRID_CHAVE"
+if [ -f "$GEOGRID_CACHE/geo_em.d01.nc" ]; then
+    echo "      ⏭️  Domínios inalterados (chave $GEOGRID_CHAVE): usando os geo_em do cache."
+    ln -sf "$GEOGRID_CACHE"/geo_em.d0*.nc .
+else
+    echo "      Domínios novos ou alterados (chave $GEOGRID_CHAVE): executando geogrid.exe"
+    ./geogrid.exe >& geogrid.log
+
+    if [ ! -f "geo_em.d01.nc" ]; then
+        echo "❌ ERRO: geogrid.exe falhou. Verifique o arquivo $WPS_RUN_DIR/geogrid.log"
+        exit 1
+    fi
+    # Publica no cache de uma vez (cópia para um temporário + mv): um ciclo concorrente
+    # nunca vê um cache incompleto; se outro publicou antes, o temporário é descartado.
+    mkdir -p "$GEOGRID_CACHE_DIR"
+    GEOGRID_TMP=$(mktemp -d "$GEOGRID_CACHE_DIR/.tmp.XXXXXX")
+    cp geo_em.d0*.nc namelist.wps geogrid.log "$GEOGRID_TMP"/
+    chmod 755 "$GEOGRID_TMP"
+    mv -T "$GEOGRID_TMP" "$GEOGRID_CACHE" 2>/dev/null || rm -rf "$GEOGRID_TMP"
 fi
-echo "      ✔️  geogrid.exe concluído com sucesso."
+echo "      ✔️  geogrid concluído com sucesso."
 
 # --- 2.2. ungrib.exe ---
-echo "   -> 2.2. Executando ungrib.exe"
+# O período é dividido em trechos contíguos, cada um processado por um ungrib.exe em
+# um diretório próprio (ungrib_N/) com as datas do trecho no namelist e só os GRIB
+# das horas do trecho (icon_sulbr_HHH.grib2, HHH = hora de previsão). Cada FILE:* é
+# um instante independente, então juntá-los reproduz a execução serial.
 ln -sf "$WPS_HOME/ungrib.exe" .
 ln -sf "$TEMPLATE_DIR/link_grib.csh" .
 ln -sf "$TEMPLATE_DIR/$VTABLE_FILE" ./Vtable
-./link_grib.csh "$ICON_DATA_DIR"/icon_sulbr_*.grib2
-./ungrib.exe >& ungrib.log
+INTERVALO=$(grep -iE "^[[:space:]]*interval_seconds" namelist.wps | head -n1 | sed -E 's/[^=]*=[^0-9]*([0-9]+).*/\1/')
+INTERVALO=${INTERVALO:-3600}
+PREFIXO=$(grep -iE "^[[:space:]]*prefix" namelist.wps | head -n1 | sed -E "s/[^=]*=[[:space:]]*'?([^',]*).*/\1/")
+PREFIXO=${PREFIXO:-FILE}
+T_INICIO=$(date -u -d "${DATE:0:8} ${DATE:8:2}" +%s)
+T_FIM=$(date -u -d "${AMANHA:0:8} ${AMANHA:8:2}" +%s)
+N_INSTANTES=$(( (T_FIM - T_INICIO) / INTERVALO + 1 ))
+WORKERS=$(( NUM_WORKERS_UNGRIB < N_INSTANTES ? NUM_WORKERS_UNGRIB : N_INSTANTES ))
+(( WORKERS >= 1 )) || WORKERS=1
+
+# Assinatura das entradas de uma etapa do WPS (namelist.wps mais nome, tamanho e mtime dos
+# arquivos). Cada etapa grava a sua em .<etapa>_ok ao terminar; se na próxima execução a
+# assinatura for a mesma e as saídas estiverem lá, a etapa é pulada.
+assinatura() {
+    { cat namelist.wps; stat -L -c '%n %s %Y' "$@" 2>/dev/null; } | sha256sum | cut -c1-20
+}
+UNGRIB_ASSINATURA=$(assinatura "$TEMPLATE_DIR/$VTABLE_FILE" "$ICON_DATA_DIR"/icon_sulbr_*.grib2)
+
+# Roda o ungrib para os instantes [inicio, fim] (segundos desde a época) no diretório dado.
+# Com "todos" como 4º argumento, liga todos os GRIB (como na execução serial original).
+rodar_ungrib() {
+    local dir=$1 inicio=$2 fim=$3 modo=${4:-trecho}
+    local ini_fmt fim_fmt t f
+    ini_fmt=$(date -u -d "@$inicio" +%Y-%m-%d_%H:%M:%S)
+    fim_fmt=$(date -u -d "@$fim" +%Y-%m-%d_%H:%M:%S)
+    rm -rf "$dir"
+    mkdir -p "$dir"
+    cp namelist.wps "$dir/namelist.wps"
+    sed -i "/start_date/s/'.*'/'${ini_fmt}', '${ini_fmt}'/" "$dir/namelist.wps"
+    sed -i "/end_date/s/'.*'/'${fim_fmt}', '${fim_fmt}'/" "$dir/namelist.wps"
+    ln -sf "$WPS_RUN_DIR/ungrib.exe" "$WPS_RUN_DIR/Vtable" "$dir"/
+    local arquivos=()
+    if [ "$modo" != "todos" ]; then
+        for (( t = inicio; t <= fim; t += INTERVALO )); do
+            f="$ICON_DATA_DIR/icon_sulbr_$(printf '%03d' $(( (t - T_INICIO) / 3600 ))).grib2"
+            [ -f "$f" ] && arquivos+=("$f")
+        done
+    fi
+    # Sem arquivos por hora de previsão (outra convenção de nomes): liga todos
+    (( ${#arquivos[@]} )) || arquivos=("$ICON_DATA_DIR"/icon_sulbr_*.grib2)
+    (cd "$dir" && "$WPS_RUN_DIR/link_grib.csh" "${arquivos[@]}" && ./ungrib.exe >& ungrib.log)
+}
+
+# Intermediários já gravados pelo regrid (trazer_icon_sul_br.sh com ICON_INTERMEDIARIO=1):
+# são ligados diretamente e o ungrib.exe não roda. Só valem se o .icon_ok confere com a
+# lista de URLs desta rodada (mesma assinatura do trazer_icon_sul_br.sh) e cobrem todos
+# os instantes; senão são restos de uma execução interrompida ou de outra lista.
+USAR_INTERMEDIARIOS=0
+N_INTERMEDIARIOS=$(ls "$INTERMEDIARIO_DIR/$PREFIXO":* 2>/dev/null | wc -l)
+if (( N_INTERMEDIARIOS > 0 )); then
+    ICON_ASSINATURA=$( (cat "$WORK_DIR/$DATE/urls.txt"; echo 1) 2>/dev/null | sha256sum | cut -d' ' -f1)
+    if [ -f "$WORK_DIR/$DATE/urls.txt" ] && \
+       [ "$(cat "$INTERMEDIARIO_DIR/.icon_ok" 2>/dev/null)" = "$ICON_ASSINATURA" ] && \
+       [ "$N_INTERMEDIARIOS" -ge "$N_INSTANTES" ]; then
+        USAR_INTERMEDIARIOS=1
+    elif ls "$ICON_DATA_DIR"/icon_sulbr_*.grib2 1> /dev/null 2>&1; then
+        echo "   ⚠️ AVISO: intermediários em $INTERMEDIARIO_DIR incompletos ou sem .icon_ok válido ($N_INTERMEDIARIOS de $N_INSTANTES). Usando o ungrib.exe."
+    else
+        echo "❌ ERRO: intermediários em $INTERMEDIARIO_DIR incompletos ou sem .icon_ok válido ($N_INTERMEDIARIOS de $N_INSTANTES) e nenhum GRIB2 em $ICON_DATA_DIR para o ungrib.exe."
+        exit 1
+    fi
+fi
+if [ "$USAR_INTERMEDIARIOS" = "1" ]; then
+    echo "   -> 2.2. Intermediários gravados pelo regrid em $INTERMEDIARIO_DIR: ungrib.exe dispensado"
+    rm -f "$PREFIXO":* GRIBFILE.???
+    ln -sf "$INTERMEDIARIO_DIR/$PREFIXO":* .
+    echo "      ✔️  $(ls "$PREFIXO":* | wc -l) intermediários ligados."
+elif [ "$(cat .ungrib_ok 2>/dev/null)" = "$UNGRIB_ASSINATURA" ] && \
+     [ "$(ls "$PREFIXO":* 2>/dev/null | wc -l)" -ge "$N_INSTANTES" ]; then
+    echo "   -> 2.2. ⏭️  ungrib.exe já concluído para estas entradas ($N_INSTANTES intermediários)."
+else
+    echo "   -> 2.2. Executando ungrib.exe: $N_INSTANTES instantes em $WORKERS processo(s)"
+    rm -f .ungrib_ok "$PREFIXO":* GRIBFILE.???
+    PIDS=()
+    for (( k = 0; k < WORKERS; k++ )); do
+        a=$(( k * N_INSTANTES / WORKERS ))
+        b=$(( (k + 1) * N_INSTANTES / WORKERS - 1 ))
+        rodar_ungrib "ungrib_$k" $(( T_INICIO + a * INTERVALO )) $(( T_INICIO + b * INTERVALO )) &
+        PIDS+=($!)
+    done
+    UNGRIB_FALHOU=0
+    for pid in "${PIDS[@]}"; do
+        wait "$pid" || UNGRIB_FALHOU=1
+    done
+    : > ungrib.log
+    for (( k = 0; k < WORKERS; k++ )); do
+        cat "ungrib_$k/ungrib.log" >> ungrib.log 2>/dev/null || true
+        if ls "ungrib_$k/$PREFIXO":* 1> /dev/null 2>&1; then
+            mv "ungrib_$k/$PREFIXO":* .
+        fi
+    done
 
-if ! ls GRIBFILE.* 1> /dev/null 2>&1 || ! ls FILE:* 1> /dev/null 2>&1; then
-    echo "❌ ERRO: ungrib.exe falhou. Verifique $WPS_RUN_DIR/ungrib.log e a Vtable."
-    exit 1
+    # Cada instante precisa do seu intermediário: um bloco sem alguns GRIB2 não pode passar
+    N_GERADOS=$(ls "$PREFIXO":* 2>/dev/null | wc -l)
+    if [ "$UNGRIB_FALHOU" -ne 0 ] || [ "$N_GERADOS" -lt "$N_INSTANTES" ]; then
+        echo "❌ ERRO: ungrib.exe falhou ($N_GERADOS de $N_INSTANTES intermediários). Verifique $WPS_RUN_DIR/ungrib.log (e ungrib_*/) e a Vtable."
+        exit 1
+    fi
+
+    # Conferência opcional: uma execução serial completa deve gerar os mesmos intermediários
+    if [ "${VERIFICAR_UNGRIB:-0}" = "1" ] && (( WORKERS > 1 )); then
+        echo "      Conferindo com uma execução serial do ungrib..."
+        rodar_ungrib ungrib_serial "$T_INICIO" "$T_FIM" todos
+        if [ "$(ls ungrib_serial/"$PREFIXO":* | wc -l)" -ne "$(ls "$PREFIXO":* | wc -l)" ]; then
+            echo "❌ ERRO: o ungrib paralelo gerou um número de intermediários diferente do serial."
+            exit 1
+        fi
+        for f in ungrib_serial/"$PREFIXO":*; do
+            if ! cmp -s "$f" "$(basename "$f")"; then
+                echo "❌ ERRO: $(basename "$f") difere entre as execuções serial e paralela."
+                exit 1
+            fi
+        done
+        echo "      ✔️  Intermediários idênticos aos da execução serial."
+    fi
+    rm -rf ungrib_*
+    echo "$UNGRIB_ASSINATURA" > .ungrib_ok
+    echo "      ✔️  ungrib.exe concluído com sucesso."
 fi
-echo "      ✔️  ungrib.exe concluído com sucesso."
 
 # --- 2.3. metgrid.exe ---
-echo "   -> 2.3. Executando metgrid.exe"
 ln -sf "$WPS_HOME/metgrid.exe" .
 # Assim como o geogrid, o metgrid.exe procura o METGRID.TBL no diretório atual.
 mkdir -p metgrid
 ln -sf "$WPS_HOME/metgrid/METGRID.TBL.ARW" ./metgrid/METGRID.TBL
-./metgrid.exe >& metgrid.log
-
-if ! ls met_em.d0*.nc 1> /dev/null 2>&1; then
-    echo "❌ ERRO: metgrid.exe falhou. Verifique o arquivo $WPS_RUN_DIR/metgrid.log"
-    exit 1
+METGRID_ASSINATURA=$(assinatura geo_em.d0*.nc "$PREFIXO":* metgrid/METGRID.TBL)
+if [ "$(cat .metgrid_ok 2>/dev/null)" = "$METGRID_ASSINATURA" ] && ls met_em.d0*.nc 1> /dev/null 2>&1; then
+    echo "   -> 2.3. ⏭️  metgrid.exe já concluído para estes intermediários."
+else
+    echo "   -> 2.3. Executando metgrid.exe"
+    rm -f .metgrid_ok
+    ./metgrid.exe >& metgrid.log
+
+    if ! ls met_em.d0*.nc 1> /dev/null 2>&1; then
+        echo "❌ ERRO: metgrid.exe falhou. Verifique o arquivo $WPS_RUN_DIR/metgrid.log"
+        exit 1
+    fi
+    echo "$METGRID_ASSINATURA" > .metgrid_ok
+    echo "      ✔️  metgrid.exe concluído com sucesso."
 fi
-echo "      ✔️  metgrid.exe concluído com sucesso."
 echo "✅ ETAPA WPS CONCLUÍDA"
 
 # ========================================
@@ -153,9 +327,49 @@ END_MONTH=${AMANHA:4:2}
 END_DAY=${AMANHA:6:2}
 END_HOUR=${AMANHA:8:2}
 
+# Último instante com wrfrst de todos os domínios, não vazios e registrados como gravados até
+# o fim ("Timing for Writing wrfrst_...") no rsl do wrf.exe (atual ou de execuções anteriores,
+# guardadas em rsl.historico). Só instantes em hora cheia, como o start_* do namelist exige.
+ultimo_wrfrst_valido() {
+    local f instante d max_dom
+    max_dom=$(grep -iE "^[[:space:]]*max_dom" namelist.input | head -n1 | sed -E 's/[^=]*=[^0-9]*([0-9]+).*/\1/')
+    for f in $(ls -r wrfrst_d01_*:00:00 2>/dev/null); do
+        instante=${f#wrfrst_d01_}
+        for (( d = 1; d <= ${max_dom:-1}; d++ )); do
+            if [ ! -s "wrfrst_d0${d}_$instante" ] || \
+               ! grep -qs "Timing for Writing wrfrst_d0${d}_$instante" rsl.error.0000 rsl.historico; then
+                continue 2
+            fi
+        done
+        echo "$instante"
+        return 0
+    done
+    return 1
+}
+
+cp -rf $TEMPLATE_DIR/namelist_chem.input namelist.input
+RETOMAR_DE=""
+if wrf_interrompido && [ -s wrfbdy_d01 ] && RETOMAR_DE=$(ultimo_wrfrst_valido); then
+    RESTANTE_MIN=$(( (T_FIM - $(date -u -d "${RETOMAR_DE/_/ }" +%s)) / 60 ))
+    echo "   -> 3.0. Retomando o WRF do wrfrst de $RETOMAR_DE ($RESTANTE_MIN min restantes)"
+    START_YEAR=${RETOMAR_DE:0:4}
+    START_MONTH=${RETOMAR_DE:5:2}
+    START_DAY=${RETOMAR_DE:8:2}
+    START_HOUR=${RETOMAR_DE:11:2}
+    # Guarda o rsl interrompido (prova dos wrfrst gravados) e descarta trechos posteriores ao reinício
+    cat rsl.error.0000 >> rsl.historico
+    for f in wrfout_d0*_* wrfrst_d0*_*; do
+        if [ -e "$f" ] && [[ "${f#wrf???_d0?_}" > "$RETOMAR_DE" ]]; then
+            rm -f "$f"
+        fi
+    done
+else
+    RETOMAR_DE=""
+    rm -f wrfout_d0* wrfrst_d0* rsl.historico
+fi
+
 
 # --- 3.1. real.exe ---
-echo "   -> 3.1. Executando real.exe com $NUM_CORES_WRF núcleos"
 ln -sf "$WRF_HOME/main/real.exe" .
 ln -sf "$WRF_HOME/main/wrf.exe" .
 
@@ -170,7 +384,19 @@ for pattern in "ozon*" "*TBL*" "*DATA" "C*" "c*" "a*" "b*" "i*" "p3*" "t[e,r]*"
     done
 done
 
-cp -rf $TEMPLATE_DIR/namelist_chem.input namelist.input 
+# Define uma variável do &time_control: substitui a linha existente ou, se o template não a
+# tiver, acrescenta-a logo após '&time_control' (sem ela a retomada e os wrfrst ficariam desligados)
+definir_time_control() {
+    if grep -qE "^[[:space:]]*$1[[:space:]]*=" namelist.input; then
+        sed -i -E "/^[[:space:]]*$1[[:space:]]*=/c\\ $1 = $2," namelist.input
+    elif grep -qiE "^[[:space:]]*&time_control" namelist.input; then
+        sed -i -E "/^[[:space:]]*&time_control/I a\\ $1 = $2," namelist.input
+    else
+        echo "❌ ERRO: namelist.input sem a seção &time_control; não foi possível definir $1."
+        exit 1
+    fi
+}
+
 # Substitui cada linha relevante no namelist.input
 sed -i "/start_year/c\ start_year = ${START_YEAR}, ${START_YEAR}" namelist.input
 sed -i "/start_month/c\ start_month = ${START_MONTH}, ${START_MONTH}" namelist.input
@@ -181,28 +407,66 @@ sed -i "/end_year/c\ end_year = ${END_YEAR}, ${END_YEAR}" namelist.input
 sed -i "/end_month/c\ end_month = ${END_MONTH}, ${END_MONTH}" namelist.input
 sed -i "/end_day/c\ end_day = ${END_DAY}, ${END_DAY}" namelist.input
 sed -i "/end_hour/c\ end_hour = ${END_HOUR}, ${END_HOUR}" namelist.input
+definir_time_control restart_interval "${RESTART_INTERVALO_MIN}"
+if [ -n "$RETOMAR_DE" ]; then
+    definir_time_control run_days 0
+    definir_time_control run_hours $(( RESTANTE_MIN / 60 ))
+    definir_time_control run_minutes $(( RESTANTE_MIN % 60 ))
+    definir_time_control restart .true.
+fi
 
 
 
-ln -sf $WPS_RUN_DIR/met_em.*.nc .
-mpirun -np "$NUM_CORES_WRF" ./real.exe
+# Perfil medido pelo autotune_wrf.py para estes domínios: -np, nproc_x/nproc_y, numtiles e OpenMP
+if [ -z "$NUM_CORES_WRF_FIXO" ] && [ -f "$PERFIL_WRF" ] && \
+   AJUSTE=$(python3 "$SCRIPTS_DIR/autotune_wrf.py" --aplicar namelist.input --perfil "$PERFIL_WRF" 2>/dev/null); then
+    read -r NUM_CORES_WRF OMP_THREADS <<< "$AJUSTE"
+    export OMP_NUM_THREADS="$OMP_THREADS"
+    echo "      Perfil do autotune ($PERFIL_WRF): -np $NUM_CORES_WRF, OMP_NUM_THREADS=$OMP_THREADS"
+fi
 
-if [[ ! -f "wrfinput_d01" || ! -f "wrfbdy_d01" ]]; then
-    echo "❌ ERRO: real.exe falhou. Verifique os arquivos rsl.error.* em $WRF_RUN_DIR"
-    exit 1
+# Os slots do mpirun (processos MPI x threads OpenMP) são reservados no registro de núcleos
+# comum aos ciclos (reservas_cpu.py): com o 00Z e o 12Z sobrepostos, a plotagem de um ciclo
+# não ocupa os núcleos do WRF do outro, e dois WRF nunca dividem os mesmos núcleos.
+mpirun_reservado() {
+    python3 "$SCRIPTS_DIR/reservas_cpu.py" executar --classe wrf \
+        --nucleos $(( NUM_CORES_WRF * ${OMP_NUM_THREADS:-1} )) --rotulo "$1 $DATE" -- \
+        mpirun -np "$NUM_CORES_WRF" "./$1"
+}
+
+if [ -n "$RETOMAR_DE" ]; then
+    echo "   -> 3.1. ⏭️  real.exe dispensado: a retomada usa o wrfrst e o wrfbdy_d01 existentes."
+else
+    echo "   -> 3.1. Executando real.exe com $NUM_CORES_WRF núcleos"
+    ln -sf $WPS_RUN_DIR/met_em.*.nc .
+    mpirun_reservado real.exe
+
+    if [[ ! -f "wrfinput_d01" || ! -f "wrfbdy_d01" ]]; then
+        echo "❌ ERRO: real.exe falhou. Verifique os arquivos rsl.error.* em $WRF_RUN_DIR"
+        exit 1
+    fi
+    echo "      ✔️  real.exe concluído com sucesso."
 fi
-echo "      ✔️  real.exe concluído com sucesso."
 
 # --- 3.2. wrf.exe ---
 echo "   -> 3.2. Executando wrf.exe com $NUM_CORES_WRF núcleos"
-mpirun -np "$NUM_CORES_WRF" ./wrf.exe
+mpirun_reservado wrf.exe
 
 if ! ls wrfout_d01_* 1> /dev/null 2>&1; then
     echo "❌ ERRO: wrf.exe falhou. Verifique os arquivos rsl.error.* em $WRF_RUN_DIR"
     exit 1
 fi
+# Concluída a integração, os wrfrst (vários GB cada) não servem mais para retomar
+rm -f wrfrst_d0* rsl.historico
 echo "      ✔️  wrf.exe concluído com sucesso."
 
+# A retomada gera um wrfout por trecho (wrfout_d0N_<reinício>): junta-os no primeiro arquivo
+if [ -n "$RETOMAR_DE" ]; then
+    echo "   -> 3.3. Juntando os trechos dos wrfout da rodada retomada"
+    python3 "$SCRIPTS_DIR/converter_wrfout.py" "$DATE" --juntar-segmentos || \
+        echo "      ⚠️  Trechos mantidos separados; o converter_wrfout.py os juntará na conversão."
+fi
+
 # ========================================
 # FINALIZAÇÃO
 # ========================================
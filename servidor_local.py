@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SERVIDOR HTTP LOCAL DE PRÉ-VISUALIZAÇÃO DO WEB_ROOT - UFSC
+
+Servidor estático em asyncio, para testar o visualizador (e fazer testes de
+carga) com o mesmo comportamento de cache esperado em produção:
+1. Serve data.js.br / data.js.gz (e qualquer outro .br/.gz pré-comprimido)
+   quando o navegador aceita a codificação.
+2. Quadros PNG com carimbo de tempo no nome (o data.js acrescenta ?v=<hash> quando
+   um quadro é replotado com o mesmo nome) e objetos da deduplicação recebem
+   'Cache-Control: immutable'. data.js, index.html e o catálogo são revalidados a
+   cada acesso (ETag / Last-Modified).
+3. Responde a requisições condicionais (If-None-Match, If-Modified-Since -> 304)
+   e a requisições Range (206), usadas pelo visualizador nas rodadas arquivadas.
+4. Registra a latência de cada requisição e, ao encerrar, o resumo (p50/p95/p99).
+
+Com --precomprimir, gera os .gz (e .br, se o módulo brotli estiver instalado) dos
+arquivos de texto que ainda não têm versão comprimida atualizada.
+Com --exemplo-nginx, imprime a configuração equivalente para o servidor real.
+
+Uso:
+    ./servidor_local.py [--web-root /var/www/html] [--porta 8000] [--precomprimir] [--log latencias.jsonl]
+
+Autor: Reinaldo Haas
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import signal
+import asyncio
+import argparse
+import mimetypes
+from urllib.parse import unquote, urlsplit
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- CONFIGURAÇÕES GLOBAIS ---
+WEB_ROOT = os.environ.get("WEB_ROOT", "/var/www/html")
+PORTA_PADRAO = 8000
+# Quadros do wrfplot (..._dd-mm-YYYY_HH_MM.png) e objetos da deduplicação (objetos/ab/<sha256>.png)
+QUADRO_IMUTAVEL = re.compile(r"(_\d{2}-\d{2}-\d{4}_\d{2}_\d{2}\.png|/objetos/[0-9a-f]{2}/[0-9a-f]{64}\.png)$")
+REVALIDAR = re.compile(r"(\.html|\.js|\.json)$")
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+CACHE_PADRAO = "public, max-age=3600"
+EXTENSOES_TEXTO = (".html", ".js", ".json", ".css", ".svg")
+CODIFICACOES = [("br", ".br"), ("gzip", ".gz")]
+LIMITE_CABECALHO = 64 * 1024
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("image/svg+xml", ".svg")
+
+# ==============================================================================
+# SEÇÃO 1: RESOLUÇÃO DO ARQUIVO E CABEÇALHOS
+# ==============================================================================
+
+def resolver_caminho(root, url_path):
+    """
+    Converte o caminho da URL em um arquivo dentro do root (ou None se sair dele).
+    Componentes ocultos (.preparo, .catalogo, temporários) não são servidos, como no nginx.
+    """
+    caminho = os.path.realpath(os.path.join(root, unquote(url_path).lstrip('/')))
+    if caminho != root and not caminho.startswith(root + os.sep):
+        return None
+    if any(parte.startswith('.') for parte in os.path.relpath(caminho, root).split(os.sep) if parte != '.'):
+        return None
+    if os.path.isdir(caminho):
+        caminho = os.path.join(caminho, "index.html")
+    return caminho if os.path.isfile(caminho) else None
+
+def escolher_representacao(caminho, accept_encoding):
+    """Retorna (arquivo a enviar, Content-Encoding) preferindo as versões pré-comprimidas."""
+    aceitas = {c.split(';')[0].strip() for c in accept_encoding.split(',')}
+    for codificacao, sufixo in CODIFICACOES:
+        comprimido = caminho + sufixo
+        if codificacao in aceitas and os.path.isfile(comprimido) \
+                and os.path.getmtime(comprimido) >= os.path.getmtime(caminho):
+            return comprimido, codificacao
+    return caminho, None
+
+def politica_cache(url_path):
+    if QUADRO_IMUTAVEL.search(url_path):
+        return CACHE_IMUTAVEL
+    if REVALIDAR.search(url_path) or url_path.endswith('/'):
+        return CACHE_REVALIDAR
+    return CACHE_PADRAO
+
+def etag_de(st, codificacao):
+    """ETag forte por representação: tamanho e mtime do arquivo efetivamente enviado."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}{"-" + codificacao if codificacao else ""}"'
+
+def nao_modificado(cabecalhos, etag, mtime):
+    """Avalia If-None-Match (prioritário) e If-Modified-Since."""
+    if_none_match = cabecalhos.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(',')]
+    if_modified_since = cabecalhos.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def intervalo_pedido(cabecalhos, tamanho, etag, mtime):
+    """
+    Interpreta 'Range: bytes=...'. Retorna None (resposta completa), (inicio, fim)
+    inclusivo, ou 'invalido' (416). Vários intervalos são atendidos com o arquivo inteiro.
+    """
+    valor = cabecalhos.get("range")
+    if not valor or not valor.startswith("bytes=") or ',' in valor:
+        return None
+    if_range = cabecalhos.get("if-range")
+    if if_range and if_range != etag and if_range != formatdate(mtime, usegmt=True):
+        return None
+    inicio_txt, _, fim_txt = valor[6:].strip().partition('-')
+    try:
+        if inicio_txt == "":
+            sufixo = int(fim_txt)
+            if sufixo == 0:
+                return "invalido"
+            inicio, fim = max(tamanho - sufixo, 0), tamanho - 1
+        else:
+            inicio = int(inicio_txt)
+            fim = min(int(fim_txt), tamanho - 1) if fim_txt else tamanho - 1
+    except ValueError:
+        return None
+    if inicio >= tamanho or inicio > fim:
+        return "invalido"
+    return inicio, fim
+
+# ==============================================================================
+# SEÇÃO 2: SERVIDOR ASYNCIO
+# ==============================================================================
+
+class Estatisticas:
+    """Latências por requisição, para o resumo ao encerrar."""
+
+    def __init__(self, log_path=None):
+        self.latencias_ms = []
+        self.bytes_enviados = 0
+        self.por_status = {}
+        self.log = open(log_path, "a", encoding="utf-8") if log_path else None
+
+    def registrar(self, metodo, caminho, status, enviados, latencia_ms):
+        self.latencias_ms.append(latencia_ms)
+        self.bytes_enviados += enviados
+        self.por_status[status] = self.por_status.get(status, 0) + 1
+        linha = {"t": round(time.time(), 3), "metodo": metodo, "caminho": caminho,
+                 "status": status, "bytes": enviados, "latencia_ms": round(latencia_ms, 3)}
+        if self.log:
+            self.log.write(json.dumps(linha) + "\n")
+            self.log.flush()
+        else:
+            print(f"{metodo} {caminho} {status} {enviados}B {latencia_ms:.2f}ms")
+
+    def resumo(self):
+        if not self.latencias_ms:
+            return "Nenhuma requisição atendida."
+        ordenadas = sorted(self.latencias_ms)
+        pct = lambda p: ordenadas[min(len(ordenadas) - 1, int(p / 100.0 * len(ordenadas)))]
+        return (f"{len(ordenadas)} requisições | p50 {pct(50):.2f}ms p95 {pct(95):.2f}ms "
+                f"p99 {pct(99):.2f}ms máx {ordenadas[-1]:.2f}ms | {self.bytes_enviados / 1e6:.1f} MB enviados | "
+                f"status {dict(sorted(self.por_status.items()))}")
+
+async def enviar_resposta(writer, status, motivo, cabecalhos, corpo=b""):
+    linhas = [f"HTTP/1.1 {status} {motivo}"] + [f"{k}: {v}" for k, v in cabecalhos.items()]
+    writer.write(("\r\n".join(linhas) + "\r\n\r\n").encode("latin-1") + corpo)
+    await writer.drain()
+
+async def atender(root, metodo, alvo, cabecalhos, writer):
+    """Atende uma requisição GET/HEAD. Retorna (status, bytes do corpo enviados)."""
+    base = {"Date": formatdate(usegmt=True), "Server": "servidor_local_ufsc"}
+    if metodo not in ("GET", "HEAD"):
+        await enviar_resposta(writer, 405, "Method Not Allowed", {**base, "Allow": "GET, HEAD", "Content-Length": "0"})
+        return 405, 0
+    url_path = urlsplit(alvo).path
+    caminho = resolver_caminho(root, url_path)
+    if caminho is None:
+        corpo = b"404 Not Found"
+        await enviar_resposta(writer, 404, "Not Found", {**base, "Content-Type": "text/plain", "Content-Length": str(len(corpo))},
+                              corpo if metodo == "GET" else b"")
+        return 404, 0
+
+    arquivo, codificacao = escolher_representacao(caminho, cabecalhos.get("accept-encoding", ""))
+    st = os.stat(arquivo)
+    etag = etag_de(st, codificacao)
+    tipo = mimetypes.guess_type(caminho)[0] or "application/octet-stream"
+    if tipo.startswith("text/") or tipo in ("application/javascript", "application/json", "image/svg+xml"):
+        tipo += "; charset=utf-8"
+    cabecalhos_resposta = {
+        **base,
+        "Content-Type": tipo,
+        "Cache-Control": politica_cache(url_path),
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+    }
+    if codificacao:
+        cabecalhos_resposta["Content-Encoding"] = codificacao
+
+    if nao_modificado(cabecalhos, etag, st.st_mtime):
+        del cabecalhos_resposta["Content-Type"]
+        await enviar_resposta(writer, 304, "Not Modified", cabecalhos_resposta)
+        return 304, 0
+
+    intervalo = intervalo_pedido(cabecalhos, st.st_size, etag, st.st_mtime)
+    if intervalo == "invalido":
+        cabecalhos_resposta.update({"Content-Range": f"bytes */{st.st_size}", "Content-Length": "0"})
+        await enviar_resposta(writer, 416, "Range Not Satisfiable", cabecalhos_resposta)
+        return 416, 0
+    if intervalo:
+        inicio, fim = intervalo
+        status, motivo = 206, "Partial Content"
+        cabecalhos_resposta["Content-Range"] = f"bytes {inicio}-{fim}/{st.st_size}"
+    else:
+        inicio, fim = 0, st.st_size - 1
+        status, motivo = 200, "OK"
+    tamanho = fim - inicio + 1
+    cabecalhos_resposta["Content-Length"] = str(tamanho)
+    await enviar_resposta(writer, status, motivo, cabecalhos_resposta)
+    if metodo == "HEAD" or tamanho <= 0:
+        return status, 0
+    with open(arquivo, "rb") as f:
+        # sendfile(2) quando o transporte permite; senão cópia em blocos
+        await asyncio.get_running_loop().sendfile(writer.transport, f, inicio, tamanho, fallback=True)
+    return status, tamanho
+
+async def tratar_conexao(root, estatisticas, reader, writer):
+    """Laço de uma conexão keep-alive: lê requisições até o cliente fechar."""
+    try:
+        while True:
+            try:
+                bruto = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            t0 = time.perf_counter()
+            linhas = bruto.decode("latin-1").split("\r\n")
+            partes = linhas[0].split()
+            if len(partes) != 3:
+                break
+            metodo, alvo, versao = partes
+            cabecalhos = {}
+            for linha in linhas[1:]:
+                if ':' in linha:
+                    nome, _, valor = linha.partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+            status, enviados = await atender(root, metodo, alvo, cabecalhos, writer)
+            estatisticas.registrar(metodo, alvo, status, enviados, (time.perf_counter() - t0) * 1000.0)
+            conexao = cabecalhos.get("connection", "").lower()
+            if conexao == "close" or (versao == "HTTP/1.0" and conexao != "keep-alive"):
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+# ==============================================================================
+# SEÇÃO 3: PRÉ-COMPRESSÃO E CONFIGURAÇÃO DE REFERÊNCIA
+# ==============================================================================
+
+def precomprimir(root):
+    """Gera .gz (e .br) dos arquivos de texto cujo comprimido falta ou está desatualizado."""
+    gerados = 0
+    for raiz, dirs, arquivos in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for nome in arquivos:
+            if not nome.endswith(EXTENSOES_TEXTO):
+                continue
+            caminho = os.path.join(raiz, nome)
+            mtime = os.path.getmtime(caminho)
+            alvos = [(".gz", lambda dados: gzip.compress(dados, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                alvos.append((".br", lambda dados: brotli.compress(dados, quality=11)))
+            dados = None
+            for sufixo, comprimir in alvos:
+                destino = caminho + sufixo
+                if os.path.isfile(destino) and os.path.getmtime(destino) >= mtime:
+                    continue
+                if dados is None:
+                    with open(caminho, "rb") as f:
+                        dados = f.read()
+                tmp_path = f"{destino}.tmp{os.getpid()}"
+                with open(tmp_path, "wb") as f:
+                    f.write(comprimir(dados))
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, destino)
+                gerados += 1
+    return gerados
+
+EXEMPLO_NGINX = r"""
+# Configuração equivalente ao servidor_local.py (nginx; brotli_static requer o módulo ngx_brotli)
+location / {
+    root /var/www/html;
+    gzip_static on;
+    brotli_static on;
+    etag on;
+    add_header Vary Accept-Encoding;
+    location ~ \.(html|js|json)$ {
+        add_header Cache-Control "no-cache";
+    }
+    location ~ (_\d{2}-\d{2}-\d{4}_\d{2}_\d{2}\.png|/objetos/[0-9a-f]{2}/[0-9a-f]{64}\.png)$ {
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+    location ~ /\. {
+        deny all;
+    }
+}
+"""
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+async def servir(root, host, porta, estatisticas):
+    servidor = await asyncio.start_server(lambda r, w: tratar_conexao(root, estatisticas, r, w),
+                                          host, porta, limit=LIMITE_CABECALHO)
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, parar.set)
+    print(f"✅ Servindo {root} em http://{host}:{porta}/ (Ctrl+C para encerrar)")
+    async with servidor:
+        await parar.wait()
+
+def main():
+    """Prepara o WEB_ROOT (opcional) e serve até receber SIGINT/SIGTERM."""
+    parser = argparse.ArgumentParser(description="Servidor estático local com cache de produção.")
+    parser.add_argument("--web-root", default=WEB_ROOT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--precomprimir", action="store_true", help="Gera .gz/.br dos arquivos de texto antes de servir.")
+    parser.add_argument("--log", help="Grava a latência de cada requisição neste JSONL (padrão: terminal).")
+    parser.add_argument("--exemplo-nginx", action="store_true", help="Imprime a configuração equivalente para o nginx.")
+    args = parser.parse_args()
+
+    if args.exemplo_nginx:
+        print(EXEMPLO_NGINX)
+        return
+    root = os.path.realpath(args.web_root)
+    if not os.path.isdir(root):
+        print(f"❌ ERRO: diretório '{root}' não encontrado.")
+        sys.exit(1)
+    if args.precomprimir:
+        aviso = "" if brotli is not None else " (módulo brotli ausente: só .gz)"
+        print(f"-> Pré-comprimindo arquivos de texto{aviso}...")
+        print(f"✅ {precomprimir(root)} arquivo(s) comprimido(s) gerado(s).")
+
+    estatisticas = Estatisticas(args.log)
+    try:
+        asyncio.run(servir(root, args.host, args.porta, estatisticas))
+    finally:
+        print("\n" + estatisticas.resumo())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/bin/bash
+# Funções comuns aos executáveis stub (carregado com 'source').
+#
+# Variáveis de ambiente:
+#   STUB_ATRASO            atraso padrão de cada stub, em segundos (padrão: 0)
+#   STUB_ATRASO_<NOME>     atraso de um stub específico (ex.: STUB_ATRASO_WRF=5)
+#   STUB_REGISTRO          arquivo JSON-lines onde cada execução de stub é registrada
+#   STUB_TAMANHO_<NOME>    tamanho, em bytes, dos arquivos gerados por um stub
+#
+# Um stub pode definir STUB_BYTES (bytes transferidos/escritos) antes de sair;
+# o valor vai para o registro.
+
+STUB_NOME="$(basename "$0")"
+STUB_NOME="${STUB_NOME%.exe}"
+STUB_CHAVE="$(echo "$STUB_NOME" | tr '[:lower:]-' '[:upper:]_')"
+STUB_INICIO="$(date +%s.%N)"
+STUB_BYTES=0
+
+# Dorme o atraso configurado para este stub.
+stub_atraso() {
+    local var="STUB_ATRASO_${STUB_CHAVE}"
+    sleep "${!var:-${STUB_ATRASO:-0}}"
+}
+
+# Tamanho dos arquivos gerados por este stub (com padrão dado como argumento).
+stub_tamanho() {
+    local var="STUB_TAMANHO_${STUB_CHAVE}"
+    echo "${!var:-$1}"
+}
+
+# Escreve um arquivo com N bytes pseudoaleatórios: escrever_bytes ARQUIVO N
+escrever_bytes() {
+    head -c "$2" /dev/urandom > "$1"
+}
+
+# Registra a execução (início/fim) no STUB_REGISTRO, se definido. Chamado via trap.
+stub_registrar() {
+    local codigo=$?
+    if [[ -n "$STUB_REGISTRO" ]]; then
+        printf '{"stub": "%s", "inicio": %s, "fim": %s, "codigo": %d, "pid": %d, "bytes": %d}\n' \
+            "$STUB_NOME" "$STUB_INICIO" "$(date +%s.%N)" "$codigo" "$$" "$STUB_BYTES" >> "$STUB_REGISTRO"
+    fi
+}
+trap stub_registrar EXIT
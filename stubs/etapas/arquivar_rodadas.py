@@ -0,0 +1 @@
+../../arquivar_rodadas.py
\ No newline at end of file
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Stub de converter_wrfout.py: sem netCDF4, só relata os wrfout que seriam convertidos.
+# Uso: ./converter_wrfout.py YYYYMMDDHH
+import os
+import sys
+import glob
+import time
+
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+date_arg = sys.argv[1]
+time.sleep(float(os.environ.get("STUB_ATRASO", "0")))
+arquivos = sorted(glob.glob(os.path.join(WORK_DIR, date_arg, "WRF_RUN", "run_wrf", "wrfout_d0*")))
+if not arquivos:
+    print("stub: nenhum wrfout para converter")
+    sys.exit(1)
+print(f"stub: {len(arquivos)} wrfout mantidos sem conversão")
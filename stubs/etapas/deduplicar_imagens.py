@@ -0,0 +1 @@
+../../deduplicar_imagens.py
\ No newline at end of file
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Stub de exportar_campos.py: sem wrf-python/numpy, grava um campo uint8 em gradiente
+# por domínio no formato real (campos/indice.json + <domínio>/<campo>.bin) no preparo.
+# Uso: ./exportar_campos.py YYYYMMDDHH
+import os
+import sys
+import glob
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+import orquestrador_web
+
+WORK_DIR = os.environ.get("WORK_DIR", "/trabalho/icon")
+date_arg = sys.argv[1]
+wrf_dir = os.path.join(WORK_DIR, date_arg, "WRF_RUN", "run_wrf")
+time.sleep(float(os.environ.get("STUB_ATRASO", "0")))
+destino = os.path.join(orquestrador_web.preparar_rodada(orquestrador_web.WEB_ROOT, date_arg), orquestrador_web.CAMPOS_DIR)
+nx, ny, tempos = 40, 30, 3
+indice = {"rodada": date_arg, "dominios": {}}
+for domain in ("d01", "d02"):
+    if not glob.glob(os.path.join(wrf_dir, f"wrfout_{domain}_*")):
+        continue
+    os.makedirs(os.path.join(destino, domain), exist_ok=True)
+    codigos = bytes((i + j + 20 * t) % 255 for t in range(tempos) for j in range(ny) for i in range(nx))
+    orquestrador_web.escrever_arquivo(os.path.join(destino, domain, "slp.bin"), codigos)
+    orquestrador_web.escrever_arquivo(os.path.join(destino, domain, "grade.json"),
+                                      json.dumps({"nx": nx, "ny": ny, "mapa": [], "contornos": {}}))
+    indice["dominios"][domain] = {
+        "grade": f"{domain}/grade.json",
+        "tempos": [f"{date_arg[0:4]}-{date_arg[4:6]}-{date_arg[6:8]}T{h:02d}:00" for h in range(tempos)],
+        "campos": {"slp": {"arquivo": f"{domain}/slp.bin", "variavel": "slp", "nivel": None, "unidade": "hPa",
+                           "paleta": "viridis", "bits": 8, "escala": 0.2, "deslocamento": 990.0, "ausente": 255,
+                           "tempos": tempos, "ny": ny, "nx": nx, "bytes": len(codigos)}},
+    }
+orquestrador_web.escrever_arquivo(os.path.join(destino, "indice.json"), json.dumps(indice))
+print(f"stub: campos exportados em {destino}")
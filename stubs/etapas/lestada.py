@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Stub de lestada.py: sem wrf-python/numpy, grava uma linha do tempo sintética por
+# trecho do litoral (lestada/eventos.json) e um mapa uint8 no formato dos campos.
+# Uso: ./lestada.py YYYYMMDDHH
+import os
+import sys
+import json
+import math
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+import orquestrador_web
+
+date_arg = sys.argv[1]
+time.sleep(float(os.environ.get("STUB_ATRASO", "0")))
+destino = os.path.join(orquestrador_web.preparar_rodada(orquestrador_web.WEB_ROOT, date_arg), orquestrador_web.LESTADA_DIR)
+os.makedirs(os.path.join(destino, "d02"), exist_ok=True)
+tempos = [f"{date_arg[0:4]}-{date_arg[4:6]}-{date_arg[6:8]}T{h:02d}:00" for h in range(24)]
+segmentos = []
+for k, nome in enumerate(["Litoral Norte de SC", "Grande Florianópolis", "Litoral Sul de SC"]):
+    media = [round(9 * math.sin((h + 4 * k) / 24 * 2 * math.pi), 1) for h in range(24)]
+    evento = [int(v >= 7.0) for v in media]
+    eventos = []
+    if any(evento):
+        a = evento.index(1)
+        b = a + sum(evento)
+        eventos.append({"inicio": tempos[a], "fim": tempos[b - 1], "duracao_h": float(b - a),
+                        "pico_ms": max(media), "pico_tempo": tempos[media.index(max(media))]})
+    segmentos.append({"nome": nome, "dominio": "d02", "pontos": 12, "media_ms": media,
+                      "fracao": [round(max(0.0, v / 9), 2) for v in media], "evento": evento, "eventos": eventos})
+orquestrador_web.escrever_arquivo(os.path.join(destino, "eventos.json"), json.dumps(
+    {"rodada": date_arg, "limiar_ms": 7.0, "persistencia_h": 6.0, "fracao_minima": 0.5,
+     "dominios": {"d02": tempos}, "segmentos": segmentos}, ensure_ascii=False))
+nx, ny = 40, 30
+codigos = bytes(255 if i < 30 else (i * 8 + t) % 255 for t in range(24) for j in range(ny) for i in range(nx))
+orquestrador_web.escrever_arquivo(os.path.join(destino, "d02", "componente_costa.bin"), codigos)
+orquestrador_web.escrever_arquivo(os.path.join(destino, "d02", "grade.json"),
+                                  json.dumps({"nx": nx, "ny": ny, "mapa": [], "contornos": {}}))
+orquestrador_web.escrever_arquivo(os.path.join(destino, "indice.json"), json.dumps({"rodada": date_arg, "dominios": {"d02": {
+    "grade": "d02/grade.json", "tempos": tempos,
+    "campos": {"componente_costa": {"arquivo": "d02/componente_costa.bin", "variavel": "componente_costa", "nivel": None,
+                                    "unidade": "m/s", "paleta": "divergente", "bits": 8, "escala": 0.1,
+                                    "deslocamento": -10.0, "ausente": 255, "tempos": 24, "ny": ny, "nx": nx,
+                                    "bytes": len(codigos)}}}}}))
+print(f"stub: lestada gravada em {destino}")
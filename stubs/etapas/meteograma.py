@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Stub de meteograma.py: sem wrf-python/numpy, grava séries sintéticas para as
+# cidades do CSV no formato real (meteograma.json) no preparo.
+# Uso: ./meteograma.py YYYYMMDDHH
+import os
+import sys
+import csv
+import json
+import math
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+import orquestrador_web
+
+date_arg = sys.argv[1]
+time.sleep(float(os.environ.get("STUB_ATRASO", "0")))
+destino = orquestrador_web.preparar_rodada(orquestrador_web.WEB_ROOT, date_arg)
+csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "cidades_sc_rs.csv")
+with open(csv_path, newline='', encoding='utf-8') as f:
+    cidades = list(csv.DictReader(f))[:5]
+tempos = [f"{date_arg[0:4]}-{date_arg[4:6]}-{date_arg[6:8]}T{h:02d}:00" for h in range(24)]
+saida = {
+    "rodada": date_arg, "metodo": "bilinear",
+    "unidades": {"t2": "°C", "ur2": "%", "ppn": "mm", "slp": "hPa", "vento10": "km h-1", "dir10": "graus"},
+    "dominios": {"d02": tempos},
+    "cidades": [{"nome": c["nome"], "uf": c["uf"], "lat": float(c["lat"]), "lon": float(c["lon"]), "dominio": "d02",
+                 "series": {"t2": [round(20 + 5 * math.sin(h / 24 * 2 * math.pi), 1) for h in range(24)],
+                            "ur2": [round(70 - 20 * math.sin(h / 24 * 2 * math.pi), 1) for h in range(24)],
+                            "ppn": [round(max(0.0, 3 * math.sin(h / 6)), 1) for h in range(24)],
+                            "slp": [round(1015 - h * 0.2, 1) for h in range(24)],
+                            "vento10": [round(10 + h * 0.5, 1) for h in range(24)],
+                            "dir10": [float(h * 15 % 360) for h in range(24)]}}
+                for c in cidades],
+}
+orquestrador_web.escrever_arquivo(os.path.join(destino, orquestrador_web.METEOGRAMA_ARQUIVO),
+                                  json.dumps(saida, ensure_ascii=False, separators=(",", ":")))
+print(f"stub: meteogramas gravados em {destino}")
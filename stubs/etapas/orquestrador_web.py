@@ -0,0 +1 @@
+../../orquestrador_web.py
\ No newline at end of file
@@ -0,0 +1,41 @@
+#!/bin/bash
+# Stub de plotar_rodadas_diaria.sh: gera PNGs vazios com nomes no formato do wrfplot
+# no diretório de montagem (WEB_ROOT/.preparo), como o script real, e os grava no
+# catálogo SQLite (aqui importando a rodada do disco, em vez do manifesto).
+# Uso: ./plotar_rodadas_diaria.sh YYYYMMDDHH [d01,d02]
+set -e
+WORK_DIR="${WORK_DIR:-/trabalho/icon}"
+WEB_ROOT="${WEB_ROOT:-/var/www/html}"
+DATE="${1:-$(date -u +%Y%m%d)00}"
+DOMAINS="${2:-d01,d02}"
+WRF_INPUT_DIR="$WORK_DIR/$DATE/WRF_RUN/run_wrf"
+MARCADOR="$WEB_ROOT/.preparo/$DATE/.plotagem_concluida"
+rm -f "$MARCADOR"
+sleep "${STUB_ATRASO:-0}"
+IFS=',' read -r -a DOMAINS_TO_PLOT <<< "$DOMAINS"
+for domain in "${DOMAINS_TO_PLOT[@]}"; do
+    if ! ls "$WRF_INPUT_DIR"/wrfout_${domain}_* > /dev/null 2>&1; then
+        echo "⚠️ AVISO: Nenhum arquivo wrfout encontrado para o domínio ${domain}."
+        continue
+    fi
+    for variable in slp winds u_temp; do
+        out="$WEB_ROOT/.preparo/$DATE/$domain/$variable"
+        mkdir -p "$out"
+        for hora in 00 01 02; do
+            stamp="${DATE:6:2}-${DATE:4:2}-${DATE:0:4}_${hora}_00"
+            if [[ $variable == u_* ]]; then
+                for level in 900 500 200; do
+                    echo png > "$out/${variable}_${level}_${stamp}.png"
+                done
+            else
+                echo png > "$out/${variable}_${stamp}.png"
+            fi
+        done
+    done
+done
+python3 "$(dirname "$(readlink -f "$0")")/../../catalogo_quadros.py" --web-root "$WEB_ROOT" importar --rodada "$DATE" > /dev/null
+# Como o script real: só a plotagem de todos os domínios marca a rodada como concluída
+if [[ -z "${2:-}" && -d "$WEB_ROOT/.preparo/$DATE" ]]; then
+    date -u +%Y-%m-%dT%H:%M:%SZ > "$MARCADOR"
+fi
+echo "stub: plotagem concluída para $DOMAINS"
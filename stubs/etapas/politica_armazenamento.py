@@ -0,0 +1 @@
+../../politica_armazenamento.py
\ No newline at end of file
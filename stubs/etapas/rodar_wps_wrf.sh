@@ -0,0 +1,24 @@
+#!/bin/bash
+# Stub de rodar_wps_wrf.sh: exige as entradas do ICON (GRIB2 concatenados ou
+# intermediários FILE:* do WPS) e gera wrfout d01/d02.
+set -e
+WORK_DIR="${WORK_DIR:-/trabalho/icon}"
+DATE="${1:-$(date -u +%Y%m%d)00}"
+ICON_DATA_DIR="$WORK_DIR/$DATE/regrid/concatenado"
+INTERMEDIARIO_DIR="$WORK_DIR/$DATE/intermediario"
+WRF_RUN_DIR="$WORK_DIR/$DATE/WRF_RUN/run_wrf"
+if ls "$INTERMEDIARIO_DIR"/FILE:* > /dev/null 2>&1; then
+    ENTRADAS=("$INTERMEDIARIO_DIR"/FILE:*)
+elif ls "$ICON_DATA_DIR"/icon_sulbr_*.grib2 > /dev/null 2>&1; then
+    ENTRADAS=("$ICON_DATA_DIR"/icon_sulbr_*.grib2)
+else
+    echo "❌ ERRO: dados do ICON não encontrados em $ICON_DATA_DIR nem em $INTERMEDIARIO_DIR"
+    exit 1
+fi
+mkdir -p "$WRF_RUN_DIR"
+sleep "${STUB_ATRASO:-0}"
+START="${DATE:0:4}-${DATE:4:2}-${DATE:6:2}_${DATE:8:2}:00:00"
+for domain in d01 d02; do
+    cat "${ENTRADAS[@]}" > "$WRF_RUN_DIR/wrfout_${domain}_${START}"
+done
+echo "stub: wrfout gerados em $WRF_RUN_DIR"
@@ -0,0 +1,9 @@
+#!/bin/bash
+# Stub de sync_html.sh: espelha o WEB_ROOT em um diretório local em vez do SFTP.
+set -e
+WEB_ROOT="${WEB_ROOT:-/var/www/html}"
+REMOTE_DIR="${STUB_REMOTE_DIR:-$WEB_ROOT/../remoto}"
+mkdir -p "$REMOTE_DIR"
+sleep "${STUB_ATRASO:-0}"
+cp -a "$WEB_ROOT/." "$REMOTE_DIR/"
+echo "stub: WEB_ROOT espelhado em $REMOTE_DIR"
@@ -0,0 +1,24 @@
+#!/bin/bash
+# Stub de trazer_icon_sul_br.sh: gera os GRIB2 concatenados sem rede nem cdo.
+# Com ICON_INTERMEDIARIO=1, gera os intermediários FILE:* do WPS no lugar dos GRIB2.
+# Uso: ./trazer_icon_sul_br.sh YYYYMMDDHH   (STUB_ATRASO em segundos, opcional)
+set -e
+WORK_DIR="${WORK_DIR:-/trabalho/icon}"
+DATE="${1:-$(date -u +%Y%m%d)00}"
+OUT_DIR="$WORK_DIR/$DATE/regrid/concatenado"
+sleep "${STUB_ATRASO:-0}"
+if [ "${ICON_INTERMEDIARIO:-0}" = "1" ]; then
+    OUT_DIR="$WORK_DIR/$DATE/intermediario"
+    mkdir -p "$OUT_DIR"
+    inicio=$(date -u -d "${DATE:0:8} ${DATE:8:2}" +%s)
+    for hora in $(seq 0 36); do
+        instante=$(date -u -d "@$(( inicio + hora * 3600 ))" +%Y-%m-%d_%H)
+        printf 'stub intermediario %s\n' "$instante" > "$OUT_DIR/FILE:$instante"
+    done
+else
+    mkdir -p "$OUT_DIR"
+    for hora in $(seq -w 0 1 36); do
+        echo "stub grib2 $DATE +${hora}h" > "$OUT_DIR/icon_sulbr_0${hora}.grib2"
+    done
+fi
+echo "stub: $(ls "$OUT_DIR" | wc -l) arquivos em $OUT_DIR"
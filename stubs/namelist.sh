@@ -0,0 +1,18 @@
+#!/bin/bash
+# Funções para ler valores dos namelists do WPS/WRF nos stubs (carregado com 'source').
+
+# Primeiro valor de uma entrada do namelist, sem aspas: nml_valor ARQUIVO CHAVE
+nml_valor() {
+    grep -E "^[[:space:]]*$2[[:space:]]*=" "$1" | head -n1 | sed -E "s/^[^=]*=[[:space:]]*//; s/,.*//; s/'//g; s/[[:space:]]//g"
+}
+
+# Instantes entre início e fim (formato WPS YYYY-MM-DD_HH:MM:SS), passo em segundos:
+# nml_instantes INICIO FIM PASSO  -> imprime "YYYY-MM-DD_HH" por linha
+nml_instantes() {
+    local t0 t1 t
+    t0=$(date -u -d "${1/_/ }" +%s)
+    t1=$(date -u -d "${2/_/ }" +%s)
+    for (( t = t0; t <= t1; t += $3 )); do
+        date -u -d "@$t" +%Y-%m-%d_%H
+    done
+}
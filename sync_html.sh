@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Variáveis
-LOCAL_DIR="/var/www/html/"
+LOCAL_DIR="${WEB_ROOT:-/var/www/html}/"
 REMOTE_DIR="/public_html"
 SFTP_HOST="nfs.sites.ufsc.br"
 SFTP_PORT=2200
@@ -9,8 +9,9 @@ USER="tempo"
 PASS="Rtzof3uK"
 
 # Comando de sincronização com lftp
+# Rodadas em montagem (.preparo), o catálogo SQLite (.catalogo) e arquivos temporários das escritas atômicas não são enviados
 lftp -u "$USER","$PASS" -p $SFTP_PORT sftp://$SFTP_HOST <<EOF
-mirror -R --delete --verbose $LOCAL_DIR $REMOTE_DIR
+mirror -R --delete --verbose --exclude-glob .preparo/ --exclude-glob .catalogo/ --exclude-glob *.tmp* --exclude-glob .trava $LOCAL_DIR $REMOTE_DIR
 bye
 EOF
 
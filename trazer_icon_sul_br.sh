@@ -3,13 +3,23 @@
 # ========================================
 # CONFIGURAÇÃO DE AMBIENTE E DATA
 # ========================================
-export WORKDIR="/trabalho/icon"
+export WORKDIR="${WORK_DIR:-/trabalho/icon}"
 if [[ ! -n $1 ]] ; then
 export DATE=$(date -u +%Y%m%d)00
 else 
 export DATE=$1
 fi
 export RUNDIR="$WORKDIR/$DATE"
+# ICON_INTERMEDIARIO=1: o regrid grava NetCDF e o escrever_intermediario.py gera os
+# FILE:* do WPS diretamente (sem recodificar em GRIB2, sem grib_copy e sem ungrib.exe)
+export ICON_INTERMEDIARIO="${ICON_INTERMEDIARIO:-0}"
+SCRIPTS_DIR="$(dirname "$(readlink -f "$0")")"
+# Saídas finais (vão para o disco); o resto passa pelo staging
+if [ "$ICON_INTERMEDIARIO" = "1" ]; then
+  export FINAL_DIR="$RUNDIR/intermediario"
+else
+  export FINAL_DIR="$RUNDIR/regrid/concatenado"
+fi
 mkdir -p "$RUNDIR"
 cd "$RUNDIR"
 echo $DATE
@@ -20,12 +30,38 @@ echo ">> Diretório de trabalho: $RUNDIR"
 # ========================================
 OLD_DATE=$(head -n1 $WORKDIR/template/urls.txt | grep -oP '\d{10}')
 NEW_DATE=$DATE
-awk -v old="$OLD_DATE" -v new="$NEW_DATE" '{ gsub(old, new); print }' $WORKDIR/template/urls.txt > urls_tmp && mv urls_tmp urls.txt
+# O diretório do ciclo no servidor (/grib/00/ ou /grib/12/) acompanha a hora da rodada
+awk -v old="$OLD_DATE" -v new="$NEW_DATE" -v ciclo="/grib/${NEW_DATE:8:2}/" \
+  '{ gsub(old, new); gsub("/grib/[0-9][0-9]/", ciclo); print }' $WORKDIR/template/urls.txt > urls_tmp && mv urls_tmp urls.txt
+
+# Saídas já gravadas para esta lista de URLs: nada a fazer (o staging já foi apagado)
+ASSINATURA=$( (cat urls.txt; echo "$ICON_INTERMEDIARIO") | sha256sum | cut -d' ' -f1)
+if [ "$(cat "$FINAL_DIR/.icon_ok" 2>/dev/null)" = "$ASSINATURA" ]; then
+  echo "✔️ Saídas do ICON já gravadas em $FINAL_DIR. Nada a fazer."
+  exit 0
+fi
+
+# ========================================
+# STAGING DOS INTERMEDIÁRIOS (TMPFS COM LIMITE, OU DISCO)
+# ========================================
+# .bz2, GRIB2 globais e regrid por campo só vivem até a concatenação
+STAGE=$(python3 "$SCRIPTS_DIR/politica_armazenamento.py" staging "$DATE") || STAGE="$RUNDIR/staging"
+mkdir -p "$STAGE"
+cd "$STAGE"
+echo ">> Staging dos intermediários: $STAGE"
+
+# Marca as saídas finais como completas, registra o I/O evitado e apaga o staging
+concluir_staging() {
+  echo "$ASSINATURA" > "$FINAL_DIR/.icon_ok"
+  cd "$RUNDIR"
+  python3 "$SCRIPTS_DIR/politica_armazenamento.py" concluir "$DATE" --promovidos "$FINAL_DIR" \
+    || echo "⚠️ Não foi possível registrar e limpar o staging $STAGE."
+}
 
 # ========================================
 # DOWNLOAD COM ARIA2C
 # ========================================
-if [ ! -f urls.txt ]; then
+if [ ! -f "$RUNDIR/urls.txt" ]; then
   echo "❌ Arquivo urls.txt não encontrado!"
   exit 1
 fi
@@ -43,14 +79,14 @@ awk -F/ -v pwd="$PWD" '
     next
   }
   print
-}' urls.txt > urls_para_baixar.txt
+}' "$RUNDIR/urls.txt" > urls_para_baixar.txt
 
 # Caso todos os arquivos já existam
 if [ ! -s urls_para_baixar.txt ]; then
   echo "✔️ Todos os arquivos já foram descompactados. Nada para baixar."
 else
   echo ">> Iniciando download apenas dos arquivos necessários com aria2c..."
-  aria2c -x 15 -j 10 --file-allocation=none -i urls_para_baixar.txt -l aria2.log
+  aria2c -x 15 -j 10 --file-allocation=none -i urls_para_baixar.txt -l "$RUNDIR/aria2.log"
 fi
 
 # ========================================
@@ -58,22 +94,48 @@ fi
 # ========================================
 echo ">> Descompactando arquivos .bz2 apenas se necessário..."
 for f in *.bz2; do
+  [ -e "$f" ] || continue
   grib="${f%.bz2}"
   if [ ! -f "$grib" ]; then
     echo " - Descompactando $f → $grib"
-    bunzip2 -k "$f"
+    # Sem -k: o .bz2 não é mais lido e ocuparia o staging à toa
+    bunzip2 "$f"
   else
     echo " - Pulando $f (já descompactado)"
+    rm -f "$f"
   fi
 done
 
 # ========================================
 # REGRID COM CDO EM PARALELO (ATÉ 10 THREADS)
 # ========================================
-echo ">> Regradeando com até 10 núcleos usando GNU parallel..."
 mkdir -p regrid
+# Sob o executar_pipeline.py, o número de processos é o de núcleos reservados (reservas_cpu.py)
+NUM_JOBS_CDO="${NUCLEOS_RESERVADOS:-10}"
+
+if [ "$ICON_INTERMEDIARIO" = "1" ]; then
+  echo ">> Regradeando para NetCDF com até $NUM_JOBS_CDO núcleos usando GNU parallel..."
+  mkdir -p regrid/netcdf
+  find . -maxdepth 1 -name "*.grib2" | parallel -j "$NUM_JOBS_CDO" '
+    infile={}
+    outfile=regrid/netcdf/sulbr_$(basename "$infile" .grib2).nc
+    if [ ! -f "$outfile" ]; then
+      echo " -> Processando $infile → $outfile"
+      cdo -f nc4 remap,$WORKDIR/template/target_grid_sul_br_0125.txt,$WORKDIR/template/weights_sul_br_0125.nc "$infile" "$outfile"
+    else
+      echo " -> Pulando $infile (já regradeado)"
+    fi
+  '
+  echo ">> Gravando os intermediários do WPS a partir do regrid..."
+  python3 "$SCRIPTS_DIR/escrever_intermediario.py" "$DATE" --origem "$STAGE/regrid/netcdf" --processos "$NUM_JOBS_CDO" || { echo "❌ Falha ao gravar os intermediários."; exit 1; }
+  echo "✅ Intermediários gravados em $FINAL_DIR"
+  concluir_staging
+  exit 0
+fi
 
-find . -maxdepth 1 -name "*.grib2" | parallel -j 10 '
+echo ">> Regradeando com até $NUM_JOBS_CDO núcleos usando GNU parallel..."
+
+find . -maxdepth 1 -name "*.grib2" | parallel -j "$NUM_JOBS_CDO" '
   infile={}
   outfile=regrid/sulbr_$(basename "$infile")
   if [ ! -f "$outfile" ]; then
@@ -84,15 +146,16 @@ find . -maxdepth 1 -name "*.grib2" | parallel -j 10 '
   fi
 '
 
-# Diretório de entrada: arquivos regrid já separados por hora
-REGRID_DIR="$WORKDIR/$DATE/regrid"
-OUT_DIR="$REGRID_DIR/concatenado"
+# Diretório de entrada: arquivos regrid já separados por hora (no staging);
+# a saída concatenada é o que o WPS lê e vai para o disco
+REGRID_DIR="$STAGE/regrid"
+OUT_DIR="$FINAL_DIR"
 mkdir -p "$OUT_DIR"
 
 echo "🔗 Concatenando arquivos GRIB2 com grib_copy no diretório: $REGRID_DIR"
 
 # Extrai todas as horas únicas dos arquivos
-HORAS=$(ls "$REGRID_DIR"/*.grib2 2>/dev/null | grep -oP '_\d{3}_' | sort -u | tr -d '_')
+HORAS=$(cd "$REGRID_DIR" && ls *.grib2 2>/dev/null | grep -oP '_\d{3}_' | sort -u | tr -d '_')
 
 for hora in $HORAS; do
   echo "⏱️  Processando hora $hora..."
@@ -110,6 +173,8 @@ for hora in $HORAS; do
   echo " - Concatenando $(echo "$arquivos" | wc -l) arquivos com grib_copy → $OUTFILE"
 
   # Usar grib_copy corretamente
-  grib_copy $arquivos   "$OUTFILE"
+  grib_copy $arquivos   "$OUTFILE" || { echo "❌ Falha ao concatenar a hora $hora."; exit 1; }
 done
 
+concluir_staging
+